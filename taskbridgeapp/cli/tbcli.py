@@ -4,6 +4,7 @@ import logging
 import os
 import pathlib
 import sys
+import time
 from datetime import datetime
 from getpass import getpass
 from pathlib import Path
@@ -17,6 +18,10 @@ import argparse
 
 from taskbridgeapp.notes.controller import NoteController
 from taskbridgeapp.notes.model import notescript
+from taskbridgeapp.notes.model.nextcloudnotes import NextCloudNotesApi
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.notefolder import NoteFolder
+from taskbridgeapp.notes.watcher import RemoteNoteWatcher
 from taskbridgeapp.reminders.controller import ReminderController
 from taskbridgeapp.reminders.model import reminderscript
 
@@ -28,7 +33,12 @@ class TaskBridgeCli:
 
     SETTINGS = {
         'sync_notes': '0',
+        'watch_notes': '0',
+        'notes_batch_size': 0,
+        'embed_note_metadata': '0',
         'remote_notes_folder': '',
+        'notes_server': '',
+        'notes_username': '',
         'associations': {
             'bi_directional': [],
             'local_to_remote': [],
@@ -42,6 +52,7 @@ class TaskBridgeCli:
         'caldav_username': '',
         'caldav_type': '',
         'reminder_sync': [],
+        'reminder_plan_file': '',
         'log_level': 'debug',
         'autosync': '0',
         'autosync_interval': 0,
@@ -51,12 +62,20 @@ class TaskBridgeCli:
     def __init__(self, args):
         self.args = args
         self.logger = self.setup_logging()
+        if getattr(args, 'command', 'sync') == 'search':
+            TaskBridgeCli.search(' '.join(args.query), args.search_limit)
+            return
         self.apply_settings()
-        if (TaskBridgeCli.SETTINGS['sync_reminders'] == '1'
-                and self.authenticate_caldav() and TaskBridgeCli.preflight_reminders()):
-            TaskBridgeCli.sync_reminders()
-        if TaskBridgeCli.SETTINGS['sync_notes'] == '1' and TaskBridgeCli.preflight_notes():
-            TaskBridgeCli.sync_notes()
+        # All stages share one database connection
+        with helpers.Database.session():
+            if (TaskBridgeCli.SETTINGS['sync_reminders'] == '1'
+                    and self.authenticate_caldav() and TaskBridgeCli.preflight_reminders()):
+                TaskBridgeCli.sync_reminders()
+            if (TaskBridgeCli.SETTINGS['sync_notes'] == '1' and TaskBridgeCli.preflight_notes()
+                    and self.authenticate_notes_server()):
+                TaskBridgeCli.sync_notes()
+                if TaskBridgeCli.SETTINGS['watch_notes'] == '1' and TaskBridgeCli.SETTINGS['notes_server'] == '':
+                    TaskBridgeCli.watch_notes()
         logging.info("Synchronisation tasks completed")
 
     @staticmethod
@@ -81,10 +100,16 @@ class TaskBridgeCli:
 
         :return: True if all pre-flight checks are successful.
         """
-        if TaskBridgeCli.SETTINGS['remote_notes_folder'] == '':
+        if TaskBridgeCli.SETTINGS['remote_notes_folder'] == '' and TaskBridgeCli.SETTINGS['notes_server'] == '':
             logging.critical(
                 'Remote notes folder not set. ' +
-                'Use --remote-notes-folder to specify or add "remote_notes_folder" to configuration file.')
+                'Use --remote-notes-folder to specify or add "remote_notes_folder" to configuration file, or use ' +
+                '--notes-server to synchronise with the NextCloud Notes API.')
+            sys.exit(13)
+        if TaskBridgeCli.SETTINGS['notes_server'] != '' and TaskBridgeCli.SETTINGS['notes_username'] == '':
+            logging.critical(
+                'NextCloud Notes username missing. Use --notes-username to specify or add "notes_username" to ' +
+                'configuration file.')
             sys.exit(13)
         associations = TaskBridgeCli.SETTINGS['associations']
         if len(associations['bi_directional']) == 0 and len(associations['local_to_remote']) == 0 and len(
@@ -104,6 +129,12 @@ class TaskBridgeCli:
 
         NoteController.REMOTE_NOTE_FOLDER = Path(TaskBridgeCli.SETTINGS['remote_notes_folder'])
         NoteController.ASSOCIATIONS = TaskBridgeCli.SETTINGS['associations']
+        NoteFolder.REMOTE_BATCH_SIZE = int(TaskBridgeCli.SETTINGS['notes_batch_size']) or None
+        Note.EMBED_METADATA = TaskBridgeCli.SETTINGS['embed_note_metadata'] == '1'
+        if TaskBridgeCli.SETTINGS['notes_server'] != '':
+            NoteFolder.NOTES_API = NextCloudNotesApi(TaskBridgeCli.SETTINGS['notes_server'],
+                                                     TaskBridgeCli.SETTINGS['notes_username'],
+                                                     keyring.get_password("TaskBridge", "NOTES-PWD"))
 
         # Check if the Notes app is running
         is_notes_running_script = notescript.is_notes_running_script
@@ -151,6 +182,47 @@ class TaskBridgeCli:
 
         logging.info("Note synchronisation completed successfully.")
 
+    @staticmethod
+    def watch_notes() -> None:
+        """
+        Watches the remote notes folder after synchronisation, and synchronises the folders and notes which change until
+        interrupted. Changes are picked up from inotify if ``watchdog`` is installed, or by polling otherwise.
+        """
+
+        def sync_remote_changes(dirty: dict) -> None:
+            logging.info('Synchronising remote changes in {}...'.format(', '.join(dirty.keys())))
+            success, data = NoteController.sync_remote_changes(dirty)
+            if not success:
+                logging.warning("Failed to synchronise remote changes.")
+
+        watcher = RemoteNoteWatcher(NoteController.REMOTE_NOTE_FOLDER, sync_remote_changes)
+        watcher.start()
+        logging.info("Watching remote notes folder for changes. Press Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            watcher.stop()
+
+    @staticmethod
+    def search(query: str, limit: int) -> None:
+        """
+        Searches the notes and reminders indexed during synchronisation, and prints the matches, best first. If the search
+        fails, an error message is logged, and the CLI exits with a status code.
+
+        :param query: the words to search for.
+        :param limit: the maximum number of matches to print.
+        """
+        start = time.perf_counter()
+        success, data = helpers.SearchIndex.search(query, limit)
+        if not success:
+            logging.critical('Failed to search synchronised notes and reminders: {}'.format(data))
+            sys.exit(21)
+        for row in data:
+            print('{0} | {1} | {2}: {3}'.format(row['kind'], row['scope'], row['title'],
+                                                ' '.join(row['snippet'].split())))
+        logging.info('{0} matches found in {1:.1f} ms.'.format(len(data), (time.perf_counter() - start) * 1000))
+
     @staticmethod
     def preflight_reminders() -> bool:
         """
@@ -190,6 +262,8 @@ class TaskBridgeCli:
         ReminderController.CALDAV_HEADERS = {}
         ReminderController.CALDAV_PASSWORD = keyring.get_password("TaskBridge", "CALDAV-PWD")
         ReminderController.TO_SYNC = TaskBridgeCli.SETTINGS['reminder_sync']
+        ReminderController.PLAN_FILE = Path(TaskBridgeCli.SETTINGS['reminder_plan_file']) \
+            if TaskBridgeCli.SETTINGS['reminder_plan_file'] else None
 
         # Check if the Reminders app is running
         is_reminders_running_script = reminderscript.is_reminders_running_script
@@ -275,6 +349,31 @@ class TaskBridgeCli:
             sys.exit(3)
         return True
 
+    def authenticate_notes_server(self) -> bool:
+        """
+        Performs NextCloud Notes authentication, if notes are synchronised with the NextCloud Notes API. If the
+        --notes-password option is used, this method will ask for a password regardless of whether one is saved. If no
+        password is saved, the CLI exits with an error.
+
+        :return: True on finding or receiving a password, or if the NextCloud Notes API is not used.
+        """
+
+        if TaskBridgeCli.SETTINGS['notes_server'] == '':
+            return True
+
+        if 'notes_password' in self.args:
+            # User specifically wants to be asked for password
+            new_password = getpass('NextCloud Notes Password> ')
+            keyring.set_password("TaskBridge", "NOTES-PWD", new_password)
+            return True
+
+        # Check if password is in keyring
+        password = keyring.get_password("TaskBridge", "NOTES-PWD")
+        if password is None:
+            logging.critical('No NextCloud Notes Password in keyring. Use --notes-password to be prompted for a password.')
+            sys.exit(3)
+        return True
+
     def apply_settings(self) -> None:
         """
         Load settings from the configuration file, This is normally in ~/Library/Application Support/TaskBridge/conf.json,
@@ -391,6 +490,25 @@ def main():
         description="Export your Apple Reminders & Notes to NextCloud, a local folder, or CalDav - and keep them in sync!",
     )
 
+    # Commands
+    parser.add_argument(
+        "command",
+        type=str,
+        nargs='?',
+        choices=['sync', 'search'],
+        default='sync',
+        help="sync to synchronise notes and reminders (the default), or search to search the synchronised ones.")
+    parser.add_argument(
+        "query",
+        type=str,
+        nargs='*',
+        help="the words to search for.")
+    parser.add_argument(
+        "--search-limit",
+        type=int,
+        default=20,
+        help="specify the maximum number of search results.")
+
     # TaskBridge options
     parser.add_argument(
         "--sync-notes",
@@ -398,11 +516,43 @@ def main():
         choices=['0', '1'],
         default=argparse.SUPPRESS,
         help="set to 1 to enable note synchronisation, or 0 to disable it.")
+    parser.add_argument(
+        "--watch-notes",
+        type=str,
+        choices=['0', '1'],
+        default=argparse.SUPPRESS,
+        help="set to 1 to keep watching the remote notes folder and synchronise changes as they happen.")
+    parser.add_argument(
+        "--notes-batch-size",
+        type=int,
+        default=argparse.SUPPRESS,
+        help="stream remote notes and synchronise them in batches of this size, to limit memory use.")
+    parser.add_argument(
+        "--embed-note-metadata",
+        type=str,
+        choices=['0', '1'],
+        default=argparse.SUPPRESS,
+        help="set to 1 to add a hidden trailer to remote notes, so that renamed notes can still be matched.")
     parser.add_argument(
         "--remote-notes-folder",
         type=str,
         default=argparse.SUPPRESS,
         help="set the location of the folder where remote notes are synchronised.")
+    parser.add_argument(
+        "--notes-server",
+        type=str,
+        default=argparse.SUPPRESS,
+        help="specify a NextCloud server to synchronise notes with through the Notes API, instead of a folder.")
+    parser.add_argument(
+        "--notes-username",
+        type=str,
+        default=argparse.SUPPRESS,
+        help="specify username for the NextCloud Notes API.")
+    parser.add_argument(
+        "--notes-password",
+        default=argparse.SUPPRESS,
+        action='store_true',
+        help="prompt for NextCloud Notes password.")
     parser.add_argument(
         "--notes-bi-directional",
         type=str,
@@ -455,6 +605,11 @@ def main():
         type=str,
         default=argparse.SUPPRESS,
         help="specify reminder lists to be synchronised.")
+    parser.add_argument(
+        "--reminder-plan-file",
+        type=str,
+        default=argparse.SUPPRESS,
+        help="export the planned reminder changes to this JSON file, for inspection.")
 
     # Cli-specific options
     parser.add_argument(
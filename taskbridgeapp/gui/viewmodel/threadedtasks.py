@@ -277,49 +277,51 @@ class Sync(QThread):
         2. Synchronising notes.
 
         """
-        progress = 0
-        progress_increment = 25 if self.sync_reminders and self.sync_notes else 50
-        self.progress_signal.emit(progress)
-
-        if self.sync_reminders:
-            is_reminders_running_script = reminderscript.is_reminders_running_script
-            return_code, stdout, stderr = helpers.run_applescript(is_reminders_running_script)
-            reminders_was_running = stdout.strip() == 'true'
-            if self.prune_reminders:
-                self.message_signal.emit('Pruning completed reminders...')
-                ReminderController.delete_completed()
-            self.message_signal.emit('Synchronising deleted reminders...')
-            ReminderController.sync_deleted_reminders()
-            progress += progress_increment
+        # All stages share one database connection
+        with helpers.Database.session():
+            progress = 0
+            progress_increment = 25 if self.sync_reminders and self.sync_notes else 50
             self.progress_signal.emit(progress)
-            self.message_signal.emit('Synchronising reminders...')
-            ReminderController.sync_reminders()
-            ReminderController.sync_reminders_to_db()
-            progress += progress_increment
-            self.progress_signal.emit(progress)
-            quit_reminders_script = reminderscript.quit_reminders_script
-            helpers.run_applescript(quit_reminders_script)
-            if not reminders_was_running:
+
+            if self.sync_reminders:
+                is_reminders_running_script = reminderscript.is_reminders_running_script
+                return_code, stdout, stderr = helpers.run_applescript(is_reminders_running_script)
+                reminders_was_running = stdout.strip() == 'true'
+                if self.prune_reminders:
+                    self.message_signal.emit('Pruning completed reminders...')
+                    ReminderController.delete_completed()
+                self.message_signal.emit('Synchronising deleted reminders...')
+                ReminderController.sync_deleted_reminders()
+                progress += progress_increment
+                self.progress_signal.emit(progress)
+                self.message_signal.emit('Synchronising reminders...')
+                ReminderController.sync_reminders()
+                ReminderController.sync_reminders_to_db()
+                progress += progress_increment
+                self.progress_signal.emit(progress)
                 quit_reminders_script = reminderscript.quit_reminders_script
                 helpers.run_applescript(quit_reminders_script)
-
-        if self.sync_notes:
-            is_notes_running_script = notescript.is_notes_running_script
-            return_code, stdout, stderr = helpers.run_applescript(is_notes_running_script)
-            notes_was_running = stdout.strip() == 'true'
-            self.message_signal.emit('Synchronising deleted notes...')
-            NoteController.sync_deleted_notes()
-            progress += progress_increment
-            self.progress_signal.emit(progress)
-            self.message_signal.emit('Synchronising notes...')
-            NoteController.sync_notes()
-            progress += progress_increment
-            self.progress_signal.emit(progress)
-            quit_notes_script = notescript.quit_notes_script
-            helpers.run_applescript(quit_notes_script)
-            if not notes_was_running:
+                if not reminders_was_running:
+                    quit_reminders_script = reminderscript.quit_reminders_script
+                    helpers.run_applescript(quit_reminders_script)
+
+            if self.sync_notes:
+                is_notes_running_script = notescript.is_notes_running_script
+                return_code, stdout, stderr = helpers.run_applescript(is_notes_running_script)
+                notes_was_running = stdout.strip() == 'true'
+                self.message_signal.emit('Synchronising deleted notes...')
+                NoteController.sync_deleted_notes()
+                progress += progress_increment
+                self.progress_signal.emit(progress)
+                self.message_signal.emit('Synchronising notes...')
+                NoteController.sync_notes()
+                progress += progress_increment
+                self.progress_signal.emit(progress)
                 quit_notes_script = notescript.quit_notes_script
                 helpers.run_applescript(quit_notes_script)
+                if not notes_was_running:
+                    quit_notes_script = notescript.quit_notes_script
+                    helpers.run_applescript(quit_notes_script)
 
         self.cb()
 
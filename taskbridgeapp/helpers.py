@@ -4,14 +4,21 @@ This is a helper file for both note and reminder synchronisation.
 
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
 import logging
+import os
 import re
+import sqlite3
 import sys
+import threading
 import uuid
+from contextlib import closing, contextmanager
 from datetime import datetime
 from pathlib import Path
 from subprocess import Popen, PIPE
-from typing import Callable
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Set
 
 from caldav import Principal
 import markdown2
@@ -21,6 +28,10 @@ DATA_LOCATION: Path = Path.home() / "Library" / "Application Support" / "TaskBri
 # stored.
 DRY_RUN: bool = False  #: If set to true, the user will have to confirm any change made by TaskBridge.
 CALDAV_PRINCIPAL: Principal | None = None
+_DATA_FOLDERS: Set[Path] = set()  #: Data folders which are known to exist.
+#: The characters escaped in the fields of a bulk manifest, with their escape sequence, in the order they are escaped.
+MANIFEST_ESCAPES: List[tuple[str, str]] = [('%', '%25'), ('~', '%7E'), ('\n', '%0A'), ('\r', '%0D'), ('\u2028', '%u2028'),
+                                           ('\u2029', '%u2029')]
 
 
 def confirm(prompt: str) -> bool:
@@ -56,12 +67,16 @@ def run_applescript(script: str, *args) -> tuple[int, str, str]:
     return p.returncode, stdout, stderr
 
 
-def get_uuid() -> str:
+def get_uuid(seed: str | None = None) -> str:
     """
     Generates a UUID.
 
+    :param seed: if given, the UUID is derived from this value, so the same seed always gives the same UUID.
+
     :return: a UUID.
     """
+    if seed is not None:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, seed))
     return str(uuid.uuid4())
 
 
@@ -80,6 +95,58 @@ def html_to_markdown(html: str) -> str:
     return mdown
 
 
+def normalize_markdown(text: str) -> str:
+    """
+    Normalises Markdown so that the same content is always written the same way. Line endings are converted to
+    ``\\n``, blank lines are emptied, trailing whitespace which marks a line break is reduced to two spaces and any other
+    trailing whitespace is removed. The text ends with a single newline.
+
+    :param text: the Markdown to normalise.
+
+    :return: the normalised Markdown.
+    """
+    lines = []
+    for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        stripped = line.rstrip()
+        if stripped != '' and line.endswith('  '):
+            stripped += '  '
+        lines.append(stripped)
+    return '\n'.join(lines).rstrip('\n') + '\n'
+
+
+def file_hash(path: Path) -> str:
+    """
+    Calculates the SHA-256 hash of a file's content.
+
+    :param path: the file to hash.
+
+    :return: the hexadecimal digest of the file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_line(fields: List[str]) -> str:
+    """
+    Joins the fields of an item of a bulk manifest read by AppleScript into a line, separated by ``~~``. The characters
+    in ``MANIFEST_ESCAPES`` are escaped in each field, so that a name containing ``~~`` or a line break does not shift
+    the fields which follow it. The scripts reading a manifest decode each field with their ``decode_fields`` handler.
+
+    :param fields: the fields of the item.
+
+    :return: the line of the manifest, without a line break.
+    """
+    escaped = []
+    for field in fields:
+        for character, sequence in MANIFEST_ESCAPES:
+            field = field.replace(character, sequence)
+        escaped.append(field)
+    return '~~'.join(escaped)
+
+
 def markdown_to_html(text: str) -> str:
     """
     Converts Markdown to HTML using the `markdown2 <https://pypi.org/project/markdown2/>`_ library.
@@ -105,7 +172,9 @@ def db_folder() -> Path:
 
     :return: path to the SQLite database file.
     """
-    DATA_LOCATION.mkdir(parents=True, exist_ok=True)
+    if DATA_LOCATION not in _DATA_FOLDERS:
+        DATA_LOCATION.mkdir(parents=True, exist_ok=True)
+        _DATA_FOLDERS.add(DATA_LOCATION)
     return DATA_LOCATION / "TaskBridge.db"
 
 
@@ -174,6 +243,823 @@ class DateUtil:
                 return False
 
 
+class AtomicWriteBatch:
+    """
+    Writes files atomically. Each file is first written to a hidden temporary file in the same folder. When the batch is
+    committed, all temporary files are flushed to disk and renamed over their destination, and the folders containing
+    them are flushed, so that a whole batch of writes shares a single round of ``fsync`` calls.
+    """
+
+    def __init__(self):
+        #: Temporary files waiting to be committed, keyed by destination.
+        self.pending: Dict[Path, Path] = {}
+
+    def write(self, path: Path, content: bytes, times: tuple[float, float] | None = None) -> None:
+        """
+        Writes content to a temporary file, which replaces ``path`` when the batch is committed.
+
+        :param path: the destination file.
+        :param content: the content to write.
+        :param times: if given, the access and modification times to set on the file.
+        """
+        temp_path = path.parent / '.{}.tbtmp'.format(path.name)
+        with open(temp_path, 'wb') as fp:
+            fp.write(content)
+        if times is not None:
+            os.utime(temp_path, times)
+        self.pending[path] = temp_path
+
+    def commit(self) -> tuple[bool, str]:
+        """
+        Flushes all temporary files to disk and renames them over their destination.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if all files are successfully written.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        pending = self.pending
+        self.pending = {}
+        try:
+            for temp_path in pending.values():
+                AtomicWriteBatch._fsync(temp_path)
+            for path, temp_path in pending.items():
+                os.replace(temp_path, path)
+            for folder in {path.parent for path in pending.keys()}:
+                AtomicWriteBatch._fsync(folder)
+        except OSError as e:
+            for temp_path in pending.values():
+                temp_path.unlink(missing_ok=True)
+            return False, 'Failed to write files: {}'.format(e)
+        return True, '{} files written.'.format(len(pending))
+
+    def discard(self) -> None:
+        """
+        Removes all temporary files without writing them.
+        """
+        for temp_path in self.pending.values():
+            temp_path.unlink(missing_ok=True)
+        self.pending = {}
+
+    @staticmethod
+    def _fsync(path: Path) -> None:
+        """
+        Flushes a file or folder to disk.
+
+        :param path: the file or folder to flush.
+        """
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class Database:
+    """
+    Manages the connections to the SQLite database. Outside a session, every ``connection`` is a new connection, which
+    is committed and closed at the end. Within a ``session``, the thread shares one connection, so that its statement
+    cache is reused between persistence helpers, and within a ``transaction`` the changes of every helper are committed
+    together at the end of the stage.
+
+    Connections use write-ahead logging, so that the database can be read while a stage writes to it.
+    """
+
+    #: Pragmas applied to every new connection.
+    PRAGMAS: tuple = ('PRAGMA journal_mode = WAL', 'PRAGMA synchronous = NORMAL', 'PRAGMA temp_store = MEMORY',
+                      'PRAGMA cache_size = -16000')
+
+    #: The number of prepared statements cached by each connection.
+    CACHED_STATEMENTS: int = 256
+
+    #: The session state of each thread.
+    _local: threading.local = threading.local()
+
+    @staticmethod
+    def _open(path: Path) -> sqlite3.Connection:
+        """
+        Opens a new connection with the tuned pragmas.
+
+        :param path: the path to the database file.
+        :return: the connection.
+        """
+        connection = sqlite3.connect(path, cached_statements=Database.CACHED_STATEMENTS)
+        for pragma in Database.PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    @staticmethod
+    def _shared(path: Path) -> sqlite3.Connection | None:
+        """
+        Gets the connection of the session of this thread, opening it the first time it is needed.
+
+        :param path: the path to the database file.
+        :return: the shared connection, or None outside a session, or if the session uses another database file.
+        """
+        local = Database._local
+        if not getattr(local, 'active', False):
+            return None
+        if local.connection is None:
+            local.connection, local.path = Database._open(path), path
+        return local.connection if local.path == path else None
+
+    @staticmethod
+    @contextmanager
+    def session() -> Iterator[None]:
+        """
+        Shares one connection between all the persistence helpers called by this thread until the session ends. Nested
+        sessions use the outer session.
+        """
+        local = Database._local
+        if getattr(local, 'active', False):
+            yield
+            return
+        local.active, local.connection, local.path, local.transaction, local.failed = True, None, None, False, False
+        try:
+            yield
+        finally:
+            if local.connection is not None:
+                local.connection.close()
+            local.active, local.connection, local.path = False, None, None
+
+    @staticmethod
+    @contextmanager
+    def transaction() -> Iterator[None]:
+        """
+        Wraps a stage of sync in one transaction on the shared connection, opening a session if needed. The transaction is
+        rolled back if an error is raised in the stage or a persistence helper fails, and committed otherwise. Nested
+        transactions are part of the outer transaction.
+        """
+        local = Database._local
+        if getattr(local, 'transaction', False):
+            yield
+            return
+        with Database.session():
+            local.transaction, local.failed, local.committed = True, False, []
+            try:
+                yield
+            except BaseException:
+                local.failed = True
+                raise
+            finally:
+                local.transaction = False
+                if local.connection is not None and local.connection.in_transaction:
+                    if local.failed:
+                        local.connection.rollback()
+                    else:
+                        local.connection.commit()
+                callbacks, local.committed = local.committed, []
+                if not local.failed:
+                    for callback in callbacks:
+                        callback()
+
+    @staticmethod
+    def in_transaction() -> bool:
+        """
+        Checks whether this thread is in a ``transaction``, whose changes may still be rolled back.
+
+        :return: True within a transaction.
+        """
+        return getattr(Database._local, 'transaction', False)
+
+    @staticmethod
+    def after_commit(callback: Callable[[], object]) -> None:
+        """
+        Calls a function once the current transaction is committed, or straight away outside a transaction. The function
+        is not called if the transaction is rolled back.
+
+        :param callback: the function to call.
+        """
+        if Database.in_transaction():
+            Database._local.committed.append(callback)
+        else:
+            callback()
+
+    @staticmethod
+    def fail_transaction() -> None:
+        """
+        Marks the current transaction as failed, so that it is rolled back at the end of the stage.
+        """
+        Database._local.failed = True
+
+    @staticmethod
+    def stage(func: Callable) -> Callable:
+        """
+        Decorates a stage of sync, so that it runs in a ``transaction``. The transaction is rolled back if the stage
+        returns a failure, as a tuple starting with False.
+
+        :param func: the stage.
+        :return: the decorated stage.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Database.transaction():
+                result = func(*args, **kwargs)
+                if isinstance(result, tuple) and len(result) > 0 and result[0] is False:
+                    Database.fail_transaction()
+            return result
+        return wrapper
+
+    @staticmethod
+    @contextmanager
+    def connection() -> Iterator[sqlite3.Connection]:
+        """
+        Gets a connection to the database, which is the shared connection within a session. The changes made with the
+        connection are committed at the end, unless it is part of a transaction, and rolled back if an error is raised.
+        """
+        path = db_folder()
+        connection = Database._shared(path)
+        if connection is None:
+            with closing(Database._open(path)) as connection:
+                yield connection
+                connection.commit()
+            return
+        connection.row_factory = None
+        try:
+            yield connection
+        except BaseException:
+            if Database._local.transaction:
+                Database._local.failed = True
+            elif connection.in_transaction:
+                connection.rollback()
+            raise
+        if not Database._local.transaction:
+            connection.commit()
+
+    @staticmethod
+    def persist_rows(cursor: sqlite3.Cursor, item_table: str, key_columns: Sequence[str],
+                     value_columns: Sequence[str], rows: Iterable[tuple],
+                     scope: Dict[str, object] | None = None) -> tuple[int, int, int]:
+        """
+        Replaces the rows of a table with the given rows, writing only the rows which changed. Stored rows are matched
+        to the given rows by their key columns, in order if several rows have the same key. Matched rows are updated if
+        a value differs, the other given rows are inserted, and the other stored rows are deleted. Rows are identified
+        by their ``rowid``, which is the ``id`` primary key of the tables which have one.
+
+        :param cursor: the cursor to use.
+        :param item_table: the name of the table.
+        :param key_columns: the columns which identify a row.
+        :param value_columns: the other columns.
+        :param rows: the rows, with the values of the key columns followed by those of the value columns.
+        :param scope: if given, only the stored rows with these values are replaced, such as the rows of one folder. The
+            given rows must have the same values.
+        :return: the number of rows inserted, updated and deleted.
+        """
+        key_length = len(key_columns)
+        columns = list(key_columns) + list(value_columns)
+        scope = scope or {}
+        sql_get_rows = "SELECT rowid, {0} FROM {1}".format(', '.join(columns), item_table)
+        if scope:
+            sql_get_rows += " WHERE " + ' AND '.join('{} = ?'.format(column) for column in scope)
+        stored: Dict[tuple, List[tuple]] = {}
+        for row in cursor.execute(sql_get_rows, tuple(scope.values())):
+            row = tuple(row)
+            stored.setdefault(row[1:key_length + 1], []).append(row)
+
+        inserts, updates = [], []
+        for row in rows:
+            matches = stored.get(row[:key_length])
+            if not matches:
+                inserts.append(row)
+                continue
+            match = matches.pop(0)
+            if match[key_length + 1:] != row[key_length:]:
+                updates.append(row[key_length:] + (match[0],))
+        deletes = [(match[0],) for matches in stored.values() for match in matches]
+
+        cursor.executemany("DELETE FROM {} WHERE rowid = ?".format(item_table), deletes)
+        cursor.executemany("UPDATE {0} SET {1} WHERE rowid = ?".format(
+            item_table, ', '.join('{} = ?'.format(column) for column in value_columns)), updates)
+        cursor.executemany("INSERT INTO {0}({1}) VALUES ({2})".format(
+            item_table, ', '.join(columns), ', '.join('?' * len(columns))), inserts)
+        return len(inserts), len(updates), len(deletes)
+
+
+class Schema:
+    """
+    Versions the structure of the tables in SQLite. Each table has an ordered list of migrations, and its version,
+    recorded in ``tb_schema``, is the number of migrations applied to it. A migration is either an SQL statement, or a
+    function which is given a cursor, for changes which depend on the current structure of the table. The first
+    migrations of a table bring the tables created by versions before migrations up to date, so they must leave an
+    existing table unchanged.
+
+    Pending migrations are applied together, and a table is only checked once per database file after its migrations
+    are committed.
+    """
+
+    #: The tables known to be up to date, by database file.
+    _MIGRATED: Set[tuple[Path, str]] = set()
+
+    @staticmethod
+    def add_columns(item_table: str, columns: Dict[str, str]) -> Callable[[sqlite3.Cursor], None]:
+        """
+        Gets a migration which adds columns to a table, unless the table already has them.
+
+        :param item_table: the name of the table.
+        :param columns: the type of each column, by name.
+        :return: the migration.
+        """
+        def migration(cursor: sqlite3.Cursor) -> None:
+            existing = [col[1] for col in cursor.execute("PRAGMA table_info('{}');".format(item_table))]
+            for column, definition in columns.items():
+                if column not in existing:
+                    cursor.execute("ALTER TABLE {0} ADD COLUMN {1} {2}".format(item_table, column, definition))
+        return migration
+
+    @staticmethod
+    def migrate(item_table: str, migrations: List[str | Callable[[sqlite3.Cursor], None]]) -> tuple[bool, str]:
+        """
+        Applies the pending migrations of a table.
+
+        :param item_table: the name of the table.
+        :param migrations: the migrations of the table, in order.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the table is up to date.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        path = db_folder()
+        if (path, item_table) in Schema._MIGRATED:
+            return True, '{} table is up to date'.format(item_table)
+        try:
+            with Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    cursor.execute("""CREATE TABLE IF NOT EXISTS tb_schema (
+                                        item_table TEXT PRIMARY KEY,
+                                        version INT
+                                        );""")
+                    row = cursor.execute("SELECT version FROM tb_schema WHERE item_table = ?",
+                                         (item_table,)).fetchone()
+                    version = row[0] if row else 0
+                    if version < len(migrations):
+                        cursor.execute("SAVEPOINT tb_schema_migration")
+                        try:
+                            for migration in migrations[version:]:
+                                if callable(migration):
+                                    migration(cursor)
+                                else:
+                                    cursor.execute(migration)
+                            cursor.execute("INSERT OR REPLACE INTO tb_schema(item_table, version) VALUES (?, ?)",
+                                           (item_table, len(migrations)))
+                        except sqlite3.Error:
+                            cursor.execute("ROLLBACK TO tb_schema_migration")
+                            raise
+                        finally:
+                            cursor.execute("RELEASE tb_schema_migration")
+        except sqlite3.Error as e:
+            return False, repr(e)
+        # Migrations made within a transaction are only final once it is committed
+        if not Database.in_transaction():
+            Schema._MIGRATED.add((path, item_table))
+        return True, '{0} table migrated to version {1}'.format(item_table, len(migrations))
+
+
+class SyncGeneration:
+    """
+    Counts sync runs in SQLite. The rows of the tables storing synchronised items carry the generation in which each
+    item was last seen. A run marks the items it sees with a new generation, so that the items which were deleted since
+    the last run are the rows left with an older generation, and can be found and removed with a single indexed query.
+    The stored rows are never emptied, so they remain valid if a run stops partway.
+    """
+
+    #: The migrations of ``tb_generation``.
+    MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_generation (
+            item_table TEXT PRIMARY KEY,
+            generation INT
+            );"""
+    ]
+
+    @staticmethod
+    def seed_generation_table() -> tuple[bool, str]:
+        """
+        Creates the table storing the current generation of each item table in SQLite, or migrates it to the current
+        version.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the table is successfully created.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        return Schema.migrate('tb_generation', SyncGeneration.MIGRATIONS)
+
+    @staticmethod
+    def current(item_table: str) -> tuple[bool, str] | tuple[bool, int]:
+        """
+        Gets the current generation of an item table.
+
+        :param item_table: the name of the item table.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the generation is successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`int`) - error message on failure, or the generation, which is 0 before
+            the first run.
+
+        """
+        success, data = SyncGeneration.seed_generation_table()
+        if not success:
+            return False, data
+        try:
+            with Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    row = cursor.execute("SELECT generation FROM tb_generation WHERE item_table = ?",
+                                         (item_table,)).fetchone()
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, row[0] if row else 0
+
+    @staticmethod
+    def start(item_table: str) -> tuple[bool, str] | tuple[bool, int]:
+        """
+        Starts a new generation of an item table.
+
+        :param item_table: the name of the item table.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the generation is successfully started.
+
+            -data (:py:class:`str` | :py:class:`int`) - error message on failure, or the new generation.
+
+        """
+        success, data = SyncGeneration.current(item_table)
+        if not success:
+            return False, data
+        generation = data + 1
+        try:
+            with Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    cursor.execute("INSERT OR REPLACE INTO tb_generation(item_table, generation) VALUES (?, ?)",
+                                   (item_table, generation))
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, generation
+
+    @staticmethod
+    def seen_keys(cursor: sqlite3.Cursor, name: str, keys: Iterable[str | None]) -> None:
+        """
+        Fills a temporary table with the keys of the items seen in this run, so that their rows can be marked in a
+        single ``UPDATE`` which selects the keys from the table. Empty keys are left out.
+
+        :param cursor: the cursor to use. The table only exists on the connection of this cursor.
+        :param name: the name of the temporary table, which has a single column ``key``.
+        :param keys: the keys.
+        """
+        cursor.execute("DROP TABLE IF EXISTS temp.{}".format(name))
+        cursor.execute("CREATE TEMP TABLE {} (key TEXT PRIMARY KEY)".format(name))
+        cursor.executemany("INSERT OR IGNORE INTO temp.{} (key) VALUES (?)".format(name),
+                           ((key,) for key in keys if key))
+
+
+class SyncJournal:
+    """
+    Write-ahead journal of the operations of a sync stage. The operations are recorded as planned before they are
+    carried out, and marked as done as each one completes. Once the changes of the stage are committed, its entries are
+    removed. Entries left in the journal therefore belong to a stage which was interrupted: the operations marked as
+    done were carried out, but the rows recording them were rolled back, so a resumed stage skips them, or restores what
+    they recorded, instead of carrying them out again.
+
+    The journal is kept in its own database file, and every change to it is committed straight away, so that it is not
+    rolled back with the transaction of the stage and does not wait for it.
+    """
+
+    #: The operation is planned.
+    PLANNED: str = 'planned'
+
+    #: The operation is done.
+    DONE: str = 'done'
+
+    #: Journal files known to have the journal table.
+    _CREATED: Set[Path] = set()
+
+    @staticmethod
+    def journal_file() -> Path:
+        """
+        Get the location of the SQLite database file of the journal.
+
+        :return: path to the journal database file.
+        """
+        return db_folder().with_name("TaskBridge-journal.db")
+
+    @staticmethod
+    @contextmanager
+    def _connection() -> Iterator[sqlite3.Connection]:
+        """
+        Gets a connection to the journal, which is committed and closed at the end.
+        """
+        path = SyncJournal.journal_file()
+        with closing(Database._open(path)) as connection:
+            if path not in SyncJournal._CREATED:
+                connection.execute("""CREATE TABLE IF NOT EXISTS tb_journal (
+                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                        stage TEXT,
+                                        scope TEXT,
+                                        operation TEXT,
+                                        item TEXT,
+                                        state TEXT,
+                                        data TEXT
+                                        );""")
+                connection.execute("CREATE INDEX IF NOT EXISTS tb_journal_scope ON tb_journal(stage, scope)")
+                SyncJournal._CREATED.add(path)
+            yield connection
+            connection.commit()
+
+    @staticmethod
+    def plan(stage: str, scope: str, operations: List[tuple[str, str]]) -> tuple[bool, str] | tuple[bool, List[int]]:
+        """
+        Records operations as planned.
+
+        :param stage: the name of the stage.
+        :param scope: the part of the stage the operations belong to, such as a folder or a container.
+        :param operations: the operations, as the name of the operation and the item it applies to.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the operations are successfully recorded.
+
+            -data (:py:class:`str` | :py:class:`List[int]`) - error message on failure, or the ID of the entry of each
+            operation.
+
+        """
+        if len(operations) == 0:
+            return True, []
+        try:
+            with SyncJournal._connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    entry_ids = []
+                    for operation, item in operations:
+                        cursor.execute("""INSERT INTO tb_journal(stage, scope, operation, item, state)
+                                       VALUES (?, ?, ?, ?, ?)""", (stage, scope, operation, item, SyncJournal.PLANNED))
+                        entry_ids.append(cursor.lastrowid)
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, entry_ids
+
+    @staticmethod
+    def complete(entries: List[tuple[int, dict | None]]) -> tuple[bool, str]:
+        """
+        Marks operations as done.
+
+        :param entries: the ID of the entry of each operation, and what the operation recorded, which is restored if the
+            stage is resumed.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the operations are successfully marked.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        if len(entries) == 0:
+            return True, 'No journal entries to complete'
+        try:
+            with SyncJournal._connection() as connection:
+                connection.executemany("UPDATE tb_journal SET state = ?, data = ? WHERE id = ?",
+                                       [(SyncJournal.DONE, json.dumps(data) if data is not None else None, entry_id)
+                                        for entry_id, data in entries])
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, '{} journal entries completed'.format(len(entries))
+
+    @staticmethod
+    def completed(stage: str, scope: str) -> tuple[bool, str] | tuple[bool, Dict[tuple[str, str], dict | None]]:
+        """
+        Gets the operations of an interrupted stage which were done.
+
+        :param stage: the name of the stage.
+        :param scope: the part of the stage.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the journal is successfully read.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or what each operation recorded, by
+            operation and item.
+
+        """
+        try:
+            with SyncJournal._connection() as connection:
+                rows = connection.execute("""SELECT operation, item, data FROM tb_journal
+                                          WHERE stage = ? AND scope = ? AND state = ? ORDER BY id""",
+                                          (stage, scope, SyncJournal.DONE)).fetchall()
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, {(operation, item): json.loads(data) if data is not None else None
+                      for operation, item, data in rows}
+
+    @staticmethod
+    def finish(stage: str, scope: str) -> tuple[bool, str]:
+        """
+        Removes the entries of a stage whose changes have been committed.
+
+        :param stage: the name of the stage.
+        :param scope: the part of the stage.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the entries are successfully removed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        try:
+            with SyncJournal._connection() as connection:
+                connection.execute("DELETE FROM tb_journal WHERE stage = ? AND scope = ?", (stage, scope))
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, 'Journal of {0} ({1}) finished'.format(stage, scope)
+
+
+class SearchIndex:
+    """
+    Full-text index of the synchronised notes and reminders, kept in an SQLite FTS5 table of the TaskBridge database.
+    Each note or reminder is a document with a title and a body, which belongs to a kind and a scope (the local folder
+    or list). The documents of a scope are updated once it is synchronised, and only the documents whose title or body
+    changed since are written again, as found from the hash stored alongside each document.
+    """
+
+    #: Documents which are notes.
+    NOTE: str = 'note'
+
+    #: Documents which are reminders.
+    REMINDER: str = 'reminder'
+
+    #: The weight of a match in the title of a document, relative to a match in its body.
+    TITLE_WEIGHT: float = 5.0
+
+    #: The migrations of ``tb_search``.
+    MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_search_doc (
+            id INTEGER PRIMARY KEY,
+            kind TEXT,
+            scope TEXT,
+            item TEXT,
+            title TEXT,
+            hash TEXT
+            );""",
+        "CREATE INDEX IF NOT EXISTS tb_search_doc_scope ON tb_search_doc(kind, scope)",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS tb_search USING fts5(
+            title,
+            body,
+            tokenize = 'unicode61 remove_diacritics 2'
+            );"""
+    ]
+
+    @staticmethod
+    def seed_search_table() -> tuple[bool, str]:
+        """
+        Creates the tables storing the search index in SQLite, or migrates them to the current version.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the tables are successfully created.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        return Schema.migrate('tb_search', SearchIndex.MIGRATIONS)
+
+    @staticmethod
+    def update(kind: str, scope: str, documents: Iterable[tuple[str, str, str]]) -> tuple[bool, str]:
+        """
+        Replaces the documents of a scope. Documents which are unchanged are left as they are, and documents which are
+        no longer given are removed.
+
+        :param kind: ``NOTE`` or ``REMINDER``.
+        :param scope: the name of the local folder or list.
+        :param documents: the documents, as (item, title, body). The item identifies the document within the scope.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the index is successfully updated.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = SearchIndex.seed_search_table()
+        if not success:
+            return False, data
+        documents = {item: (title, body or '') for item, title, body in documents}
+        try:
+            with Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    sql_get_documents = "SELECT item, id, hash FROM tb_search_doc WHERE kind = ? AND scope = ?"
+                    indexed = {item: (doc_id, doc_hash)
+                               for item, doc_id, doc_hash in cursor.execute(sql_get_documents, (kind, scope))}
+                    removed, added = [], []
+                    for item, (title, body) in documents.items():
+                        doc_hash = hashlib.sha256('{0}\0{1}'.format(title, body).encode()).hexdigest()
+                        doc_id, indexed_hash = indexed.pop(item, (None, None))
+                        if indexed_hash == doc_hash:
+                            continue
+                        if doc_id is not None:
+                            removed.append((doc_id,))
+                        added.append((item, title, body, doc_hash))
+                    removed.extend((doc_id,) for doc_id, doc_hash in indexed.values())
+
+                    cursor.executemany("DELETE FROM tb_search WHERE rowid = ?", removed)
+                    cursor.executemany("DELETE FROM tb_search_doc WHERE id = ?", removed)
+                    sql_insert_document = """INSERT INTO tb_search_doc(kind, scope, item, title, hash)
+                                          VALUES (?, ?, ?, ?, ?)"""
+                    for item, title, body, doc_hash in added:
+                        cursor.execute(sql_insert_document, (kind, scope, item, title, doc_hash))
+                        cursor.execute("INSERT INTO tb_search(rowid, title, body) VALUES (?, ?, ?)",
+                                       (cursor.lastrowid, title, body))
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, 'Search index of {0} {1} updated: {2} documents written, {3} removed'.format(
+            kind, scope, len(added), len(removed))
+
+    @staticmethod
+    def retain(kind: str, scopes: Iterable[str]) -> tuple[bool, str]:
+        """
+        Removes the documents of the scopes which are no longer synchronised.
+
+        :param kind: ``NOTE`` or ``REMINDER``.
+        :param scopes: the scopes to keep.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the documents are successfully removed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = SearchIndex.seed_search_table()
+        if not success:
+            return False, data
+        scopes = set(scopes)
+        try:
+            with Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    sql_get_documents = "SELECT id, scope FROM tb_search_doc WHERE kind = ?"
+                    removed = [(doc_id,) for doc_id, scope in cursor.execute(sql_get_documents, (kind,)).fetchall()
+                               if scope not in scopes]
+                    cursor.executemany("DELETE FROM tb_search WHERE rowid = ?", removed)
+                    cursor.executemany("DELETE FROM tb_search_doc WHERE id = ?", removed)
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, '{0} {1} documents removed from the search index'.format(len(removed), kind)
+
+    @staticmethod
+    def match_expression(query: str) -> str:
+        """
+        Converts a search query to an FTS5 match expression. Every word of the query must be found, and the last word
+        may be the start of a longer word. Other characters are ignored, so that the query is never invalid.
+
+        :param query: the search query.
+        :return: the match expression, or an empty string if the query has no words.
+        """
+        words = re.findall(r'\w+', query)
+        return ' '.join('"{}"'.format(word) for word in words) + ('*' if words else '')
+
+    @staticmethod
+    def search(query: str, limit: int = 20) -> tuple[bool, str] | tuple[bool, List[sqlite3.Row]]:
+        """
+        Searches the index. Matches are ranked with BM25, and a match in the title counts ``TITLE_WEIGHT`` times as much
+        as a match in the body.
+
+        :param query: the search query.
+        :param limit: the maximum number of matches.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the index is successfully searched.
+
+            -data (:py:class:`str` | :py:class:`List[sqlite3.Row]`) - error message on failure, or the matches, best
+            first, with the ``kind``, ``scope``, ``item``, ``title``, ``snippet`` and ``rank`` of each.
+
+        """
+        expression = SearchIndex.match_expression(query)
+        if expression == '':
+            return True, []
+        success, data = SearchIndex.seed_search_table()
+        if not success:
+            return False, data
+        try:
+            with Database.connection() as connection:
+                connection.row_factory = sqlite3.Row
+                with closing(connection.cursor()) as cursor:
+                    sql_search = """SELECT d.kind, d.scope, d.item, d.title,
+                                    snippet(tb_search, 1, '[', ']', '...', 12) AS snippet,
+                                    bm25(tb_search, ?, 1.0) AS rank
+                                    FROM tb_search JOIN tb_search_doc d ON d.id = tb_search.rowid
+                                    WHERE tb_search MATCH ? ORDER BY rank LIMIT ?"""
+                    rows = cursor.execute(sql_search, (SearchIndex.TITLE_WEIGHT, expression, limit)).fetchall()
+        except sqlite3.Error as e:
+            return False, repr(e)
+        return True, rows
+
+
 class FunctionHandler(logging.Handler):
     def __init__(self, func: Callable):
         logging.Handler.__init__(self)
@@ -6,9 +6,12 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Set
 
+from taskbridgeapp import helpers
 from taskbridgeapp.notes.model.notefolder import NoteFolder, LocalNoteFolder, RemoteNoteFolder
+from taskbridgeapp.notes.model.notesnapshot import NoteSnapshot
+from taskbridgeapp.notes.model.remotetree import RemoteTreeIndex
 
 
 class NoteController:
@@ -72,6 +75,7 @@ class NoteController:
         return True, debug_msg
 
     @staticmethod
+    @helpers.Database.stage
     def sync_folder_deletions() -> tuple[bool, str]:
         """
         Synchronise deleted local/remote notes folders.
@@ -84,7 +88,8 @@ class NoteController:
 
         """
         success, data = NoteFolder.sync_folder_deletions(NoteController.LOCAL_NOTE_FOLDERS,
-                                                         NoteController.REMOTE_NOTE_FOLDERS)
+                                                         NoteController.REMOTE_NOTE_FOLDERS,
+                                                         NoteController.ASSOCIATIONS)
         if not success:
             error = 'Failed to sync folder deletions {}'.format(data)
             logging.critical(error)
@@ -94,6 +99,7 @@ class NoteController:
         return True, debug_msg
 
     @staticmethod
+    @helpers.Database.stage
     def associate_folders() -> tuple[bool, str] | tuple[bool, List[NoteFolder]]:
         """
         Associate local/remote folders.
@@ -121,6 +127,7 @@ class NoteController:
         return True, NoteFolder.FOLDER_LIST
 
     @staticmethod
+    @helpers.Database.stage
     def sync_deleted_notes() -> tuple[bool, str]:
         """
         Synchronise notes deleted locally/remotely.
@@ -149,6 +156,7 @@ class NoteController:
         return True, debug_msg
 
     @staticmethod
+    @helpers.Database.stage
     def sync_notes() -> tuple[bool, str] | tuple[bool, dict]:
         """
         Synchronise notes. Returns a dictionary with the following keys:
@@ -176,6 +184,23 @@ class NoteController:
                 logging.critical(error)
                 return False, error
 
+        success, message = helpers.SearchIndex.retain(
+            helpers.SearchIndex.NOTE,
+            [folder.local_folder.name for folder in NoteFolder.FOLDER_LIST
+             if folder.sync_direction != NoteFolder.SYNC_NONE])
+        if not success:
+            logging.warning(message)
+
+        if NoteFolder.NOTES_API is not None:
+            success, message = NoteFolder.NOTES_API.finish_sync()
+            if not success:
+                error = 'Failed to save NextCloud notes state {}'.format(message)
+                logging.critical(error)
+                return False, error
+
+        # The parsed notes are saved once this sync is committed, so that the next run starts from them
+        helpers.Database.after_commit(NoteSnapshot.save)
+
         debug_msg = (
             "Notes synchronisation:: Remote Added: {} | Remote Updated: {} | Local Added: {} | Local Updated: {"
             "}").format(
@@ -186,3 +211,58 @@ class NoteController:
         )
         logging.debug(debug_msg)
         return True, data
+
+    @staticmethod
+    @helpers.Database.stage
+    def sync_remote_changes(dirty: Dict[str, Set[str]]) -> tuple[bool, str] | tuple[bool, dict]:
+        """
+        Synchronise only the remote folders and notes which changed, as reported by ``RemoteNoteWatcher``. Folders must
+        have been associated beforehand. Returns a dictionary with the keys of ``sync_notes``, as well as:
+
+        - ``local_deleted`` - name of deleted local notes as :py:class:`List[str]`.
+        - ``local_not_found`` - name of notes marked for local deletion which were not found as :py:class:`List[str]`.
+
+        :param dirty: the changed note names, keyed by remote folder name. An empty set means the whole folder changed.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the changes are successfully synchronised.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or :py:class:`dict` with results as
+            above.
+
+        """
+        result = {
+            'remote_added': [],
+            'remote_updated': [],
+            'local_added': [],
+            'local_updated': [],
+            'local_deleted': [],
+            'local_not_found': []
+        }
+        success, data = RemoteTreeIndex.build(NoteController.REMOTE_NOTE_FOLDER)
+        if not success:
+            error = 'Failed to index remote notes folder: {}'.format(data)
+            logging.critical(error)
+            return False, error
+        for folder in NoteFolder.FOLDER_LIST:
+            if folder.remote_folder is None or folder.remote_folder.name not in dirty:
+                continue
+            success, data = folder.sync_remote_changes(dirty[folder.remote_folder.name])
+            if not success:
+                error = 'Failed to sync changes to remote folder {0}: {1}'.format(folder.remote_folder.name, data)
+                logging.critical(error)
+                return False, error
+            for key in result.keys():
+                result[key].extend(data[key])
+
+        debug_msg = (
+            "Remote changes synchronisation:: Folders: {} | Local Added: {} | Local Updated: {} | Local Deleted: {"
+            "}").format(
+            ','.join(dirty.keys()),
+            ','.join(result['local_added'] or ['No local notes added']),
+            ','.join(result['local_updated'] or ['No local notes updated']),
+            ','.join(result['local_deleted'] or ['No local notes deleted'])
+        )
+        logging.debug(debug_msg)
+        return True, result
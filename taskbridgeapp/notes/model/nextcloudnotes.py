@@ -0,0 +1,661 @@
+"""
+Contains the ``NextCloudNotesApi`` class, which talks to the NextCloud Notes REST API, and the ``NextCloudNoteFolder``
+class, which represents a note category on the NextCloud server. Together, these can be used in place of a locally
+synchronised remote notes folder.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import sqlite3
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import closing
+from datetime import datetime
+from typing import Callable, Dict, List, Set
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
+
+
+class NextCloudNotesApi:
+    """
+    Client for version 1 of the NextCloud Notes REST API.
+
+    The list of notes is fetched at most once per sync, and only notes which changed since the last sync are
+    transferred. The request carries the ``ETag`` of the previous response in ``If-None-Match``, so that nothing is
+    transferred if no note changed, and ``pruneBefore`` is set to the latest modification time seen, so that the server
+    only returns the ``id`` of notes which were not modified since. The title, category, modification time, ``ETag`` and
+    content hash of every note are stored in SQLite, so that pruned notes are still known. As with other tables, no note
+    content is stored in the database.
+    """
+
+    #: Path to the Notes API, relative to the server URL.
+    API_PATH: str = '/index.php/apps/notes/api/v1'
+
+    #: The migrations of ``tb_nextcloud_note``.
+    NOTE_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_nextcloud_note (
+            server TEXT,
+            id INTEGER,
+            category TEXT,
+            title TEXT,
+            modified INTEGER,
+            etag TEXT,
+            hash TEXT,
+            PRIMARY KEY (server, id)
+            );"""
+    ]
+
+    #: The migrations of ``tb_nextcloud_state``.
+    STATE_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_nextcloud_state (
+            server TEXT PRIMARY KEY,
+            etag TEXT,
+            prune_before INTEGER
+            );"""
+    ]
+
+    def __init__(self, server: str, username: str, password: str, timeout: float = 30):
+        """
+        Creates a new API client.
+
+        :param server: the URL of the NextCloud server, e.g. ``https://cloud.example.com``.
+        :param username: the NextCloud username.
+        :param password: the NextCloud password, or an app password.
+        :param timeout: number of seconds to wait for the server to respond.
+        """
+        self.server: str = server.rstrip('/')
+        self.username: str = username
+        self.password: str = password
+        self.timeout: float = timeout
+        #: Notes on the server, keyed by ID, as returned by the API. Notes which did not change since the last sync
+        #: have the fields stored in SQLite, and no ``content``.
+        self.notes: Dict[int, dict] = {}
+        #: Whether ``notes`` has been fetched during this sync.
+        self.fetched: bool = False
+        #: The ``ETag`` of the list of notes fetched during this sync.
+        self.etag: str = ''
+        #: Whether notes were written or deleted during this sync.
+        self.changed: bool = False
+
+    def request(self, method: str, path: str, params: dict | None = None, body: dict | None = None,
+                headers: dict | None = None) -> tuple[bool, str] | tuple[bool, tuple[int, dict, object]]:
+        """
+        Sends a request to the Notes API.
+
+        :param method: the HTTP method.
+        :param path: the path of the endpoint, relative to ``API_PATH``.
+        :param params: query string parameters.
+        :param body: a JSON request body.
+        :param headers: additional request headers.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the server responded, even with an error status.
+
+            -data (:py:class:`str` | :py:class:`tuple[int, dict, object]`) - error message on failure, or the status,
+            headers and decoded JSON body of the response.
+
+        """
+        url = self.server + NextCloudNotesApi.API_PATH + path
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        credentials = base64.b64encode('{0}:{1}'.format(self.username, self.password).encode()).decode()
+        request_headers = {'Accept': 'application/json', 'Authorization': 'Basic ' + credentials}
+        request_headers.update(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            request_headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(url, data=data, headers=request_headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, response_headers, content = response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            status, response_headers, content = e.code, dict(e.headers), e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return False, 'Failed to connect to NextCloud Notes at {0}: {1}'.format(self.server, e)
+        try:
+            decoded = json.loads(content) if content else None
+        except ValueError:
+            decoded = None
+        return True, (status, response_headers, decoded)
+
+    @staticmethod
+    def seed_note_table() -> tuple[bool, str]:
+        """
+        Creates the tables storing the state of the NextCloud notes in SQLite, or migrates them to the current version.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the tables are successfully created.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = helpers.Schema.migrate('tb_nextcloud_note', NextCloudNotesApi.NOTE_MIGRATIONS)
+        if not success:
+            return False, data
+        return helpers.Schema.migrate('tb_nextcloud_state', NextCloudNotesApi.STATE_MIGRATIONS)
+
+    def load_state(self) -> tuple[bool, str] | tuple[bool, tuple[str, int, Dict[int, dict]]]:
+        """
+        Loads the state saved after the last sync.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the state is successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`tuple[str, int, dict]`) - error message on failure, or the ``ETag`` of
+            the last list of notes, the ``pruneBefore`` value to use and the stored notes keyed by ID.
+
+        """
+        success, data = NextCloudNotesApi.seed_note_table()
+        if not success:
+            return False, data
+        try:
+            with helpers.Database.connection() as connection:
+                connection.row_factory = sqlite3.Row
+                with closing(connection.cursor()) as cursor:
+                    state = cursor.execute("SELECT * FROM tb_nextcloud_state WHERE server = ?",
+                                           (self.server,)).fetchone()
+                    rows = cursor.execute("SELECT * FROM tb_nextcloud_note WHERE server = ?",
+                                          (self.server,)).fetchall()
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        notes = {row['id']: {'id': row['id'], 'category': row['category'], 'title': row['title'],
+                             'modified': row['modified'], 'etag': row['etag'], 'hash': row['hash']} for row in rows}
+        if state is None:
+            return True, ('', 0, notes)
+        return True, (state['etag'] or '', state['prune_before'] or 0, notes)
+
+    def save_state(self, etag: str) -> tuple[bool, str]:
+        """
+        Saves the list of notes, without their content, together with the ``ETag`` of the list. Only the notes which
+        changed are written.
+
+        :param etag: the ``ETag`` of the list of notes.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the state is successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        rows = [(self.server, note['id'], note.get('category', ''), note.get('title', ''), note.get('modified', 0),
+                 note.get('etag', ''), note.get('hash', '')) for note in self.notes.values()]
+        prune_before = max((note.get('modified', 0) for note in self.notes.values()), default=0)
+        try:
+            with helpers.Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    helpers.Database.persist_rows(cursor, 'tb_nextcloud_note', ('server', 'id'),
+                                                  ('category', 'title', 'modified', 'etag', 'hash'), rows,
+                                                  {'server': self.server})
+                    cursor.execute("INSERT OR REPLACE INTO tb_nextcloud_state(server, etag, prune_before) VALUES (?, ?, ?)",
+                                   (self.server, etag, prune_before))
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, 'NextCloud notes state saved'
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        """
+        Hashes the content of a note, ignoring any metadata trailer, so that unchanged notes are not uploaded again.
+
+        :param content: the content of the note.
+        :return: the hexadecimal digest of the content.
+        """
+        body = helpers.normalize_markdown(Note.split_remote_metadata(content)[0])
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    def _store_note(self, note: dict) -> None:
+        """
+        Stores a note returned by the API in ``notes``, together with the hash of its content.
+
+        :param note: the note as returned by the API.
+        """
+        if 'content' in note:
+            note['hash'] = NextCloudNotesApi.content_hash(note['content'])
+        elif note['id'] in self.notes:
+            note['hash'] = self.notes[note['id']].get('hash', '')
+        self.notes[note['id']] = note
+
+    def _store_notes(self, body: List[dict], stored: Dict[int, dict]) -> tuple[bool, str]:
+        """
+        Replaces ``notes`` with the notes in a list fetched by ``fetch_notes``. Notes pruned from the list are taken from
+        the stored state, or fetched if they are not stored.
+
+        :param body: the notes in the list.
+        :param stored: the notes in the stored state, keyed by ID.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully stored.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        self.notes = {}
+        for note in body:
+            if 'title' in note:
+                self._store_note(note)
+            elif note['id'] in stored:
+                # Pruned since it was not modified since the last sync
+                self.notes[note['id']] = stored[note['id']]
+            else:
+                success, data = self.get_note(note['id'])
+                if not success:
+                    return False, data
+        return True, 'Notes stored'
+
+    def fetch_notes(self) -> tuple[bool, str] | tuple[bool, Dict[int, dict]]:
+        """
+        Fetches the list of notes, transferring only the notes which changed since the last sync. Notes which were not
+        modified since are taken from the stored state, without their content. Notes missing from the list were deleted.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully fetched.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or the notes keyed by ID.
+
+        """
+        if self.fetched:
+            return True, self.notes
+        success, data = self.load_state()
+        if not success:
+            return False, data
+        etag, prune_before, stored = data
+
+        params = {'pruneBefore': prune_before} if prune_before and len(stored) > 0 else None
+        headers = {'If-None-Match': etag} if etag and len(stored) > 0 else None
+        success, data = self.request('GET', '/notes', params=params, headers=headers)
+        if not success:
+            return False, data
+        status, response_headers, body = data
+        if status == 304:
+            self.notes = stored
+        elif status == 200 and isinstance(body, list):
+            success, data = self._store_notes(body, stored)
+            if not success:
+                return False, data
+            etag = response_headers.get('ETag', '')
+        else:
+            return False, 'Failed to fetch notes from NextCloud (HTTP {})'.format(status)
+
+        success, data = self.save_state(etag)
+        if not success:
+            return False, data
+        self.fetched = True
+        self.etag = etag
+        self.changed = False
+        return True, self.notes
+
+    def get_note(self, note_id: int) -> tuple[bool, str] | tuple[bool, dict]:
+        """
+        Fetches a single note, with its content.
+
+        :param note_id: the ID of the note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully fetched.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or the note.
+
+        """
+        success, data = self.request('GET', '/notes/{}'.format(note_id))
+        if not success:
+            return False, data
+        status, response_headers, body = data
+        if status != 200 or not isinstance(body, dict):
+            return False, 'Failed to fetch NextCloud note {0} (HTTP {1})'.format(note_id, status)
+        self._store_note(body)
+        return True, body
+
+    def save_note(self, title: str, content: str | None, category: str, note_id: int | None = None) \
+            -> tuple[bool, str] | tuple[bool, dict]:
+        """
+        Creates a note, or updates an existing note. Updates carry the ``ETag`` of the note in ``If-Match``, so that a
+        note which changed on the server since it was fetched is not overwritten.
+
+        :param title: the title of the note.
+        :param content: the content of the note, or None to leave the content of an existing note unchanged.
+        :param category: the category of the note.
+        :param note_id: the ID of the note to update, or None to create a note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully saved.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or the saved note.
+
+        """
+        body = {'title': title, 'content': content, 'category': category}
+        if content is None:
+            del body['content']
+        if note_id is None:
+            success, data = self.request('POST', '/notes', body=body)
+        else:
+            etag = self.notes.get(note_id, {}).get('etag', '')
+            success, data = self.request('PUT', '/notes/{}'.format(note_id), body=body,
+                                         headers={'If-Match': '"{}"'.format(etag)} if etag else None)
+        if not success:
+            return False, data
+        status, response_headers, note = data
+        if status == 412:
+            return False, 'NextCloud note {} was changed on the server since it was fetched.'.format(title)
+        if status != 200 or not isinstance(note, dict):
+            return False, 'Failed to save NextCloud note {0} (HTTP {1})'.format(title, status)
+        self._store_note(note)
+        self.changed = True
+        return True, note
+
+    def delete_note(self, note_id: int) -> tuple[bool, str]:
+        """
+        Deletes a note.
+
+        :param note_id: the ID of the note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully deleted.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = self.request('DELETE', '/notes/{}'.format(note_id))
+        if not success:
+            return False, data
+        status = data[0]
+        if status not in (200, 404):
+            return False, 'Failed to delete NextCloud note {0} (HTTP {1})'.format(note_id, status)
+        self.notes.pop(note_id, None)
+        self.changed = True
+        return True, 'NextCloud note {} deleted.'.format(note_id)
+
+    def finish_sync(self) -> tuple[bool, str]:
+        """
+        Saves the notes written during sync, so that they are not transferred again on the next sync, and makes the
+        next sync fetch the list of notes again. The ``ETag`` of the list is kept only if no notes were written.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the state is successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        if not self.fetched:
+            return True, 'NextCloud notes were not fetched.'
+        self.fetched = False
+        if not self.changed:
+            return True, 'NextCloud notes unchanged.'
+        # The ETag of the list no longer matches once notes were written
+        return self.save_state('')
+
+
+class NextCloudNoteFolder:
+    """
+    Represents a note category on a NextCloud server. Provides the same interface as ``RemoteNoteFolder``, as well as
+    methods to read and write the notes in the category through ``NextCloudNotesApi``. Note attachments are not
+    synchronised through the API.
+    """
+
+    def __init__(self, api: NextCloudNotesApi, name: str):
+        """
+        Creates a new NextCloud note folder instance.
+
+        :param api: the API client for the NextCloud server.
+        :param name: the name of the category.
+        """
+        self.api: NextCloudNotesApi = api
+        self.name: str = name
+        self.path: str = '{0}#{1}'.format(api.server, name)
+
+    @staticmethod
+    def load_folders(api: NextCloudNotesApi) -> tuple[bool, str] | tuple[bool, List[NextCloudNoteFolder]]:
+        """
+        Loads the list of note categories on the server.
+
+        :param api: the API client for the NextCloud server.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the folders are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`List[NextCloudNoteFolder]`) - error message on failure, list of folders
+            on success.
+
+        """
+        success, data = api.fetch_notes()
+        if not success:
+            return False, data
+        categories = sorted({note.get('category', '') for note in data.values() if note.get('category', '')})
+        return True, [NextCloudNoteFolder(api, category) for category in categories]
+
+    def create(self) -> tuple[bool, str]:
+        """
+        Categories exist on the server as long as they contain notes, so nothing needs to be created.
+
+        :returns:
+
+            -success (:py:class:`bool`) - always true.
+
+            -data (:py:class:`str`) - success message.
+
+        """
+        return True, 'Remote folder {} created.'.format(self.name)
+
+    def delete(self) -> tuple[bool, str]:
+        """
+        Deletes the category by deleting every note in it.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the category is successfully deleted.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = self.api.fetch_notes()
+        if not success:
+            return False, data
+        for note_id in [note['id'] for note in data.values() if note.get('category', '') == self.name]:
+            success, data = self.api.delete_note(note_id)
+            if not success:
+                return False, data
+        return True, 'Remote folder {} deleted.'.format(self.name)
+
+    def rename(self, name: str) -> tuple[bool, str]:
+        """
+        Renames the category by moving every note in it to the new category. Only the category of the notes is sent,
+        not their content.
+
+        :param name: the new name of the category.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the category is successfully renamed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = self.api.fetch_notes()
+        if not success:
+            return False, data
+        for note in [note for note in data.values() if note.get('category', '') == self.name]:
+            success, data = self.api.save_note(note.get('title', ''), None, name, note['id'])
+            if not success:
+                return False, data
+        old_name = self.name
+        self.name = name
+        self.path = '{0}#{1}'.format(self.api.server, name)
+        return True, 'Remote folder {0} renamed to {1}.'.format(old_name, name)
+
+    def find_note(self, name: str) -> dict | None:
+        """
+        Finds a note in this category by name.
+
+        :param name: the name of the note.
+        :return: the note as returned by the API, or None if no such note exists.
+        """
+        return next((note for note in self.api.notes.values()
+                     if note.get('category', '') == self.name and note.get('title', '') == name), None)
+
+    @staticmethod
+    def note_from_api(note: dict) -> Note:
+        """
+        Creates a Note instance from a note returned by the API. If the note has no content, only its name and dates are
+        set.
+
+        :param note: the note as returned by the API.
+        :return: a Note instance representing the note.
+        """
+        modified_date = datetime.fromtimestamp(note.get('modified', 0))
+        if 'content' not in note:
+            return Note(name=note.get('title', ''), created_date=modified_date, modified_date=modified_date)
+        content, metadata = Note.split_remote_metadata(note['content'])
+        lines = content.splitlines()
+        remote_note = Note(
+            uuid=metadata.get('id'),
+            name=note.get('title', ''),
+            created_date=modified_date,
+            modified_date=modified_date,
+            body_markdown=''.join(line + '\n' for line in lines),
+            body_html=Note.markdown_to_html(list(lines), []))
+        remote_note.remote_metadata = metadata
+        return remote_note
+
+    def load_notes(self, summary_only: bool = False, names: Set[str] | None = None) \
+            -> tuple[bool, str] | tuple[bool, List[Note]]:
+        """
+        Loads the notes in this category. Notes which did not change since the last sync are loaded without content;
+        ``load_full_note()`` fetches their content if it is needed.
+
+        :param summary_only: ignored, since only the notes which changed are transferred with their content.
+        :param names: if given, only the notes with these names are loaded.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`List[Note]`) - error message on failure, or the notes.
+
+        """
+        success, data = self.api.fetch_notes()
+        if not success:
+            return False, data
+        return True, [NextCloudNoteFolder.note_from_api(note) for note in data.values()
+                      if note.get('category', '') == self.name and (names is None or note.get('title') in names)]
+
+    def load_full_note(self, remote: Note) -> tuple[bool, str] | tuple[bool, Note]:
+        """
+        Gets a remote note with its content, fetching it from the server if it was loaded without content.
+
+        :param remote: the remote note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`Note`) - error message on failure, or the note with its content.
+
+        """
+        note = self.find_note(remote.name)
+        if note is None or 'content' in note:
+            return True, remote
+        success, data = self.api.get_note(note['id'])
+        if not success:
+            return False, data
+        full_note = NextCloudNoteFolder.note_from_api(data)
+        full_note.uuid = remote.uuid or full_note.uuid
+        return True, full_note
+
+    def is_note_unchanged(self, note: Note) -> bool:
+        """
+        Checks whether the note on the server already has the content of a local note, using the stored content hash.
+
+        :param note: the local note.
+        :return: True if the note exists on the server and its content matches.
+        """
+        remote = self.find_note(note.name)
+        if remote is None or remote.get('hash', '') != hashlib.sha256(note.remote_body().encode()).hexdigest():
+            return False
+        if not Note.EMBED_METADATA or not note.uuid or 'content' not in remote:
+            return True
+        return Note.split_remote_metadata(remote['content'])[1].get('id') == note.uuid
+
+    def upsert_note(self, note: Note, batch: helpers.AtomicWriteBatch | None = None) -> tuple[bool, str]:
+        """
+        Creates or updates a note in this category. The note is saved on the server immediately.
+
+        :param note: the note to save.
+        :param batch: ignored, since notes saved through the API are not written to the filesystem.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        existing = self.find_note(note.name)
+        success, data = self.api.save_note(note.name, note.remote_content().decode(), self.name,
+                                           existing['id'] if existing else None)
+        if not success:
+            return False, data
+        return True, 'Remote note {} saved.'.format(note.name)
+
+    def rename_note(self, remote: Note, name: str) -> tuple[bool, str]:
+        """
+        Renames a note in this category.
+
+        :param remote: the remote note.
+        :param name: the new name of the note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully renamed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        existing = self.find_note(remote.name)
+        if existing is None or self.find_note(name) is not None:
+            return True, 'Remote note {} not moved.'.format(remote.name)
+        if helpers.confirm('Rename remote note {0} to {1}'.format(remote.name, name)):
+            success, data = self.api.get_note(existing['id']) if 'content' not in existing else (True, existing)
+            if not success:
+                return False, data
+            success, data = self.api.save_note(name, data['content'], self.name, existing['id'])
+            if not success:
+                return False, data
+            remote.name = name
+        return True, 'Remote note renamed to {}.'.format(name)
+
+    def delete_note(self, remote: Note) -> tuple[bool, str]:
+        """
+        Deletes a note in this category by name.
+
+        :param remote: the remote note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully deleted.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        existing = self.find_note(remote.name)
+        if existing is None:
+            return False, 'Remote note {} not found.'.format(remote.name)
+        return self.api.delete_note(existing['id'])
+
+    def __str__(self):
+        return "NextCloud Folder: {}".format(self.name)
@@ -6,6 +6,7 @@ represents an attachment within a note.
 from __future__ import annotations
 
 import base64
+import hashlib
 import os
 import re
 import shutil
@@ -26,6 +27,19 @@ class Note:
     Can also convert one type to the other.
     """
 
+    #: Used in bulk local writes to denote that a note should be created.
+    LOCAL_CREATE: str = 'create'
+    #: Used in bulk local writes to denote that an existing note should be updated.
+    LOCAL_UPDATE: str = 'update'
+
+    #: When True, remote notes are written with a metadata trailer holding the local note's UUID, the hash of the
+    #: note's content and its modification date, so that remote notes can be matched to local notes even if renamed.
+    EMBED_METADATA: bool = False
+
+    #: Matches the metadata trailer of a remote note. The trailer is a Markdown link reference definition, which
+    #: NextCloud Notes (like any CommonMark renderer) does not display.
+    METADATA_PATTERN: re.Pattern = re.compile(r'^\[//\]: # \(taskbridge ([^)]*)\)$')
+
     def __init__(self,
                  name: str,
                  created_date: datetime.date,
@@ -54,6 +68,8 @@ class Note:
         self.body_markdown: str = body_markdown
         self.body_html: str = body_html
         self.attachments: List[Attachment] = attachments
+        #: Metadata read from the trailer of a remote note, if any.
+        self.remote_metadata: dict = {}
 
     @staticmethod
     def create_from_local(staged_content: str, staged_location: Path) -> Note:
@@ -97,15 +113,18 @@ class Note:
             attachments=parsed_attachments)
 
     @staticmethod
-    def create_from_remote(remote_content: str, remote_location: Path, remote_file_name: str) -> Note:
+    def create_from_remote(remote_content: str, remote_location: Path, remote_file_name: str,
+                           load_images: bool = True) -> Note:
         """
         Creates a Note instance from an exported Markdown file.
 
         :param remote_content: a list of strings from the remote Markdown content.
         :param remote_location: the location of the remote note *excluding file name*.
         :param remote_file_name: the file name of the remote note *excluding path*.
+        :param load_images: if false, referenced images are not read into the attachments' Base64 data.
         :return: a Note instance representing the content of the Markdown document.
         """
+        remote_content, metadata = Note.split_remote_metadata(remote_content)
         remote_lines = remote_content.splitlines()
 
         # Meta Data
@@ -128,7 +147,7 @@ class Note:
                     url=image_path
                 ))
 
-        parsed_attachments = Attachment.parse_remote(attachments)
+        parsed_attachments = Attachment.parse_remote(attachments, load_images)
 
         # Body
         body_markdown = ""
@@ -136,13 +155,56 @@ class Note:
             body_markdown += remote_lines[idx] + "\n"
         body_html = Note.markdown_to_html(remote_lines, parsed_attachments)
 
-        return Note(
+        note = Note(
+            uuid=metadata.get('id'),
             name=name,
             created_date=created_date,
             modified_date=modified_date,
             body_markdown=body_markdown,
             body_html=body_html,
             attachments=parsed_attachments)
+        note.remote_metadata = metadata
+        return note
+
+    @staticmethod
+    def split_remote_metadata(remote_content: str) -> tuple[str, dict]:
+        """
+        Separates the metadata trailer from the content of a remote note. The trailer is the last non-empty line of the
+        note, in the form ``[//]: # (taskbridge id=... hash=... modified=...)``.
+
+        :param remote_content: the content of the remote note.
+
+        :returns:
+
+            -content (:py:class:`str`) - the content of the note without the trailer.
+
+            -metadata (:py:class:`dict`) - the values in the trailer, keyed by name, or an empty dictionary if the note
+            has no trailer.
+
+        """
+        stripped = remote_content.rstrip()
+        start = stripped.rfind('\n') + 1
+        match = Note.METADATA_PATTERN.match(stripped[start:])
+        if not match:
+            return remote_content, {}
+        metadata = dict(field.split('=', 1) for field in match.group(1).split() if '=' in field)
+        return stripped[:start].rstrip() + '\n', metadata
+
+    @staticmethod
+    def read_remote_metadata(remote_file: Path) -> dict:
+        """
+        Reads the metadata trailer of a remote note without reading the whole note.
+
+        :param remote_file: the path to the remote note.
+        :return: the values in the trailer, keyed by name, or an empty dictionary if the note has no trailer.
+        """
+        try:
+            with open(remote_file, 'rb') as fp:
+                fp.seek(max(0, os.path.getsize(remote_file) - 1024))
+                tail = fp.read().decode(errors='ignore')
+        except OSError:
+            return {}
+        return Note.split_remote_metadata(tail)[1]
 
     @staticmethod
     def staged_to_markdown(staged_lines: List[str], attachments: List[Attachment], attachment_end: int) -> str:
@@ -172,7 +234,9 @@ class Note:
     @staticmethod
     def markdown_to_html(remote_lines: List[str], attachments: List[Attachment]) -> str:
         """
-        Converts a Note's body from Markdown to HTML.
+        Converts a Note's body from Markdown to HTML. Image lines are replaced with the image attachments of the note in
+        order; image lines left without an attachment, such as those of notes loaded from the NextCloud Notes API, are
+        converted as any other Markdown line.
 
         :param remote_lines: a list of Markdown lines.
         :param attachments: A list of Attachment associated with this note.
@@ -188,7 +252,7 @@ class Note:
             match = re.search(r"\(.*?\)", line)
             if match:
                 f_ext = os.path.splitext(match.group()[1:-1])[1]
-                if f_ext in Attachment.get_supported_image_types():
+                if f_ext in Attachment.get_supported_image_types() and image_index < len(image_list):
                     image_path = "file://" + image_list[image_index].url
                     line = '<div><img style="max-width: 100%; max-height: 100%;" src="{image_path}"/><br></div>'.format(
                         image_path=image_path)
@@ -197,37 +261,85 @@ class Note:
             html += line + "\n"
         return helpers.markdown_to_html(html)
 
-    def create_local(self, folder_name: str) -> tuple[bool, str]:
+    def build_local_body(self) -> tuple[str, List[str]]:
         """
-        Creates this note locally.
+        Builds the HTML body of this note as it should be written to Apple Notes. The note's name is added as a heading,
+        and every line containing an image is replaced with a standard image block. Images referencing a file are
+        collected, so they can be added to the local note as attachments.
 
-        :param folder_name: the name of the folder where this note should be created.
         :returns:
 
-            -success (:py:class:`bool`) - true if the note is successfully created.
+            -body (:py:class:`str`) - the HTML body to write to the local note.
 
-            -data (:py:class:`str`) - success message, or error message on failure.
+            -attachments (:py:class:`List[str]`) - paths of the image files to attach to the local note.
 
         """
+        body = ["<h1>{}</h1>".format(self.name)]
+        attachment_paths = []
+        for line in self.body_html.splitlines():
+            if "<img" in line:
+                match = re.search(r'src="([^"]*)"', line)
+                image_url = match.group(1) if match else ''
+                image_path = image_url[len('file://'):] if image_url.startswith('file://') else image_url
+                if image_path.startswith('/'):
+                    attachment_paths.append(image_path)
+                    line = ('<div><img style="max-width: 100%; max-height: 100%;" src="{image_url}"/>'
+                            '<div><br></div>').format(image_url=image_url)
+            body.append(line)
+        return ''.join(body), attachment_paths
+
+    def _export_local(self) -> tuple[bool, str] | tuple[bool, tuple[Path, List[str]]]:
+        """
+        Writes the body of this note, as built by ``build_local_body()``, to a temporary file for AppleScript to read.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note body is successfully exported.
+
+            -data (:py:class:`str` | :py:class:`tuple[Path, List[str]]`) - error message on failure, or the path to the
+            exported body and the list of files to attach.
+
+        """
+        body, attachment_paths = self.build_local_body()
         try:
             temp_file_name = helpers.temp_folder() / (self.name + '.html')
             with open(temp_file_name, 'w') as fp:
-                fp.write(self.body_html)
+                fp.write(body)
                 fp.close()
         except (IOError, OSError) as e:
             return False, 'Failed to export data for local note {0}: {1}'.format(self.name, e)
+        return True, (temp_file_name, attachment_paths)
+
+    def create_local(self, folder_name: str) -> tuple[bool, str]:
+        """
+        Creates this note locally. On success, the UUID of this note is set to that of the newly created local note.
+
+        :param folder_name: the name of the folder where this note should be created.
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully created.
+
+            -data (:py:class:`str`) - success message, or error message on failure.
+
+        """
+        success, data = self._export_local()
+        if not success:
+            return False, data
+        temp_file_name, attachment_paths = data
 
         create_note_script = notescript.create_note_script
         return_code, stdout, stderr = helpers.run_applescript(
-            create_note_script, folder_name, self.name, str(temp_file_name))
+            create_note_script, folder_name, self.name, str(temp_file_name), *attachment_paths)
         if return_code == 0:
             temp_file_name.unlink()
+            self.uuid = stdout.strip()
             return True, 'Created local note {}'.format(self.name)
         return False, 'Error creating local note {0}: {1}'.format(self.name, stderr)
 
     def update_local(self, folder_name: str) -> tuple[bool, str]:
         """
-        Updates this note locally.
+        Updates this note locally. If this note has a local (``x-coredata``) UUID, the note is found by its UUID;
+        otherwise, it is found by its name.
 
         :param folder_name: the name of the folder where this note resides.
         :returns:
@@ -237,22 +349,120 @@ class Note:
             -data (:py:class:`str`) - success message, or error message on failure.
 
         """
-        try:
-            temp_file_name = helpers.temp_folder() / (self.name + '.html')
-            with open(temp_file_name, 'w') as fp:
-                fp.write(self.body_html)
-                fp.close()
-        except (IOError, OSError) as e:
-            return False, 'Failed to export data for local note {0}: {1}'.format(self.name, e)
+        success, data = self._export_local()
+        if not success:
+            return False, data
+        temp_file_name, attachment_paths = data
 
         update_note_script = notescript.update_note_script
         return_code, stdout, stderr = helpers.run_applescript(
-            update_note_script, folder_name, self.name, str(temp_file_name))
+            update_note_script, folder_name, self.name, str(temp_file_name),
+            self.uuid if self.uuid and self.uuid.startswith('x-coredata') else '',
+            *attachment_paths)
         if return_code == 0:
             temp_file_name.unlink()
             return True, 'Updated local note {}'.format(self.name)
         return False, 'Error updating local note {0}: {1}'.format(self.name, stderr)
 
+    @staticmethod
+    def upsert_local_bulk(operations: List[tuple[str, str, Note]]) -> tuple[bool, str] | tuple[bool, dict]:
+        """
+        Creates and updates several local notes in a single AppleScript invocation. The body of each note is exported to
+        a temporary file, and a manifest listing every note is passed to AppleScript, which applies all changes in one
+        Notes session. The files are written to a folder of their own, so that concurrent writes do not remove each
+        other's files.
+
+        Each operation is a tuple of ``(operation, folder_name, note)``, where ``operation`` is ``Note.LOCAL_CREATE`` or
+        ``Note.LOCAL_UPDATE``. Notes which are written successfully have their UUID and modification date updated to
+        those of the local note. On success, a dictionary with the following keys is returned:
+
+        - ``written`` - notes written, with their local UUID and modification date, or None if the date was not
+          returned, as :py:class:`List[tuple[Note, str, datetime | None]]`.
+        - ``failed`` - notes which could not be written, with the error message, as :py:class:`List[tuple[Note, str]]`.
+
+        :param operations: the list of operations to carry out.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the bulk write is carried out, even if some notes failed.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or :py:class:`dict` as above.
+
+        """
+        result = {'written': [], 'failed': []}
+        if len(operations) == 0:
+            return True, result
+
+        bulk_folder = helpers.temp_folder() / 'notes-bulk-{}'.format(helpers.get_uuid())
+        manifest_file = bulk_folder / 'manifest.txt'
+        try:
+            Note._export_bulk_manifest(operations, bulk_folder, manifest_file)
+        except OSError as e:
+            shutil.rmtree(bulk_folder, ignore_errors=True)
+            return False, 'Failed to export data for local notes: {}'.format(e)
+
+        upsert_notes_script = notescript.upsert_notes_script
+        return_code, stdout, stderr = helpers.run_applescript(upsert_notes_script, str(manifest_file))
+        shutil.rmtree(bulk_folder, ignore_errors=True)
+        if return_code != 0:
+            return False, 'Error writing local notes: {}'.format(stderr)
+
+        reported = set()
+        for line in stdout.splitlines():
+            fields = line.strip().split('~~', 3)
+            if len(fields) >= 3 and fields[0].isdigit() and int(fields[0]) < len(operations):
+                reported.add(int(fields[0]))
+                Note._read_bulk_result(operations[int(fields[0])][2], fields, result)
+        for idx, (operation, folder_name, note) in enumerate(operations):
+            if idx not in reported:
+                result['failed'].append((note, 'No result returned for local note {}'.format(note.name)))
+        return True, result
+
+    @staticmethod
+    def _export_bulk_manifest(operations: List[tuple[str, str, Note]], bulk_folder: Path, manifest_file: Path) -> None:
+        """
+        Exports the body of each note of ``upsert_local_bulk`` to a file in ``bulk_folder``, and writes the manifest
+        listing every note to ``manifest_file``.
+
+        :param operations: the list of operations to carry out.
+        :param bulk_folder: the folder where the bodies are exported.
+        :param manifest_file: the path of the manifest.
+
+        :raises OSError: if a file cannot be written.
+        """
+        manifest = []
+        bulk_folder.mkdir(parents=True, exist_ok=True)
+        for idx, (operation, folder_name, note) in enumerate(operations):
+            body, attachment_paths = note.build_local_body()
+            body_file = bulk_folder / '{}.html'.format(idx)
+            with open(body_file, 'w') as fp:
+                fp.write(body)
+            note_id = note.uuid if operation == Note.LOCAL_UPDATE and note.uuid and note.uuid.startswith(
+                'x-coredata') else ''
+            manifest.append(helpers.manifest_line([operation, folder_name, note_id, note.name, str(body_file)] +
+                                                  attachment_paths))
+        with open(manifest_file, 'w') as fp:
+            fp.write('\n'.join(manifest) + '\n')
+
+    @staticmethod
+    def _read_bulk_result(note: Note, fields: List[str], result: dict) -> None:
+        """
+        Reads the result line returned by ``upsert_notes_script`` for a note, and adds the note to the ``written`` or
+        ``failed`` results of ``upsert_local_bulk``.
+
+        :param note: the note written.
+        :param fields: the fields of the result line.
+        :param result: dictionary where results are appended.
+        """
+        if fields[1] == 'OK' and len(fields) == 4:
+            note.uuid = fields[2]
+            modified_date = DateUtil.convert(DateUtil.APPLE_DATETIME, fields[3])
+            if modified_date:
+                note.modified_date = modified_date
+            result['written'].append((note, note.uuid, modified_date or None))
+        else:
+            result['failed'].append((note, fields[2]))
+
     @staticmethod
     def sanitize_filename(name: str) -> str:
         """
@@ -278,11 +488,73 @@ class Note:
             
         return name
     
-    def upsert_remote(self, remote_path: Path) -> tuple[bool, str]:
+    def remote_body(self) -> str:
+        """
+        Gets the body of the Markdown file for this note, normalised so that unchanged notes are always written the same
+        way. Any metadata trailer is left out.
+
+        :return: the body of the remote note.
+        """
+        return helpers.normalize_markdown(Note.split_remote_metadata(self.body_markdown)[0])
+
+    def remote_metadata_trailer(self) -> str:
+        """
+        Builds the metadata trailer for the remote note. The trailer holds the UUID of the local note, the hash of the
+        note's body and the modification date at which the note was synchronised.
+
+        :return: the metadata trailer, or an empty string if metadata is not embedded or the note has no UUID.
+        """
+        if not Note.EMBED_METADATA or not self.uuid:
+            return ''
+        modified = self.modified_date.isoformat(timespec='seconds') if isinstance(self.modified_date, datetime) else ''
+        fields = ['id=' + self.uuid, 'hash=' + hashlib.sha256(self.remote_body().encode()).hexdigest()]
+        if modified:
+            fields.append('modified=' + modified)
+        return '[//]: # (taskbridge {})\n'.format(' '.join(fields))
+
+    def remote_content(self) -> bytes:
+        """
+        Gets the content of the Markdown file for this note, normalised so that unchanged notes are always written the
+        same way. If ``EMBED_METADATA`` is set, the metadata trailer is added after a blank line.
+
+        :return: the content of the remote note.
+        """
+        trailer = self.remote_metadata_trailer()
+        return (self.remote_body() + ('\n' + trailer if trailer else '')).encode()
+
+    def is_remote_unchanged(self, remote_path: Path) -> bool:
         """
-        Upserts the remote note.
+        Checks whether the remote note already has the content of this note, in which case it does not need to be
+        written. The modification date in the metadata trailer is not compared, so that a note is not rewritten only
+        because its local modification date changed.
+
+        :param remote_path: the path where the remote note resides, *excluding the file name*.
+        :return: True if the remote note exists and its content matches this note.
+        """
+        remote_file = remote_path / (self.sanitize_filename(self.name) + '.md')
+        try:
+            if not remote_file.is_file():
+                return False
+            with open(remote_file, 'r') as fp:
+                remote_body, metadata = Note.split_remote_metadata(fp.read())
+        except (OSError, UnicodeDecodeError):
+            return False
+        body = self.remote_body()
+        if helpers.normalize_markdown(remote_body) != body:
+            return False
+        if not Note.EMBED_METADATA or not self.uuid:
+            return True
+        return metadata.get('id') == self.uuid and metadata.get(
+            'hash') == hashlib.sha256(body.encode()).hexdigest()
+
+    def upsert_remote(self, remote_path: Path, batch: helpers.AtomicWriteBatch | None = None) -> tuple[bool, str]:
+        """
+        Upserts the remote note. If the remote note already has the same content, it is left untouched. Otherwise, it is
+        written atomically through ``batch``, or immediately if no batch is given.
 
         :param remote_path: the path where the remote note resides, *excluding the file name*.
+        :param batch: the batch of remote writes to add this note to. The note is only written once the batch is
+            committed.
         :returns:
 
             -success (:py:class:`bool`) - true if the note is successfully upserted.
@@ -295,26 +567,52 @@ class Note:
             ts = self.modified_date.timestamp()
         else:
             ts = datetime.now().timestamp()
-            
-        try:
-            with open(remote_path / filename, 'w') as fp:
-                fp.write(self.body_markdown)
-                fp.close()
-            os.utime(remote_path / filename, (ts, ts))
-        except IOError as e:
-            return False, 'Failed to create remote note {0}: {1}'.format(remote_path / filename, e)
 
-        # Attachments
+        unchanged = self.is_remote_unchanged(remote_path)
+        if not unchanged:
+            write_batch = batch if batch is not None else helpers.AtomicWriteBatch()
+            try:
+                write_batch.write(remote_path / filename, self.remote_content(), (ts, ts))
+            except OSError as e:
+                return False, 'Failed to create remote note {0}: {1}'.format(remote_path / filename, e)
+            if batch is None:
+                success, data = write_batch.commit()
+                if not success:
+                    return False, 'Failed to create remote note {0}: {1}'.format(remote_path / filename, data)
+
+        success, data = self.copy_remote_attachments(remote_path)
+        if not success:
+            return False, data
+
+        if unchanged:
+            return True, 'Remote note {} unchanged.'.format(remote_path / filename)
+        return True, 'Remote note {} created.'.format(remote_path / filename)
+
+    def copy_remote_attachments(self, remote_path: Path) -> tuple[bool, str]:
+        """
+        Copies the images attached to this note to the ``.attachments`` folder of the remote folder, unless they are
+        already there.
+
+        :param remote_path: the path where the remote note resides, *excluding the file name*.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the attachments are successfully copied.
+
+            -data (:py:class:`str`) - success message, or error message on failure.
+
+        """
         for attachment in [a for a in self.attachments if a.file_type == Attachment.TYPE_IMAGE]:
             att_path = remote_path / '.attachments/'
             Path(att_path).mkdir(parents=True, exist_ok=True)
             attachment.remote_location = att_path / attachment.uuid
+            if attachment.remote_location.exists():
+                continue
             try:
                 shutil.copy2(attachment.url, attachment.remote_location)
             except (FileNotFoundError, TypeError):
                 return False, 'Failed to read attachment {}'.format(attachment.staged_location)
-
-        return True, 'Remote note {} created.'.format(remote_path / filename)
+        return True, 'Attachments copied for remote note {}'.format(self.name)
 
     def __str__(self):
         return self.name
@@ -423,7 +721,8 @@ class Attachment:
                 attachment.b64_data = Attachment._get_local_image(staged_lines, image_index)
                 if attachment.b64_data is None:
                     return False, "Warning, could not find Base64 data for image {}".format(attachment.file_name)
-                attachment.uuid = helpers.get_uuid() + f_ext
+                # Derive the file name from the image, so unchanged notes are exported to identical Markdown
+                attachment.uuid = helpers.get_uuid(attachment.b64_data) + f_ext
                 attachment.save_image_to_file(dest_folder)
                 image_index += 1
             elif f_ext == '' and not attachment.url == '':
@@ -434,11 +733,12 @@ class Attachment:
         return result
 
     @staticmethod
-    def parse_remote(attachments: List[Attachment]) -> List[Attachment]:
+    def parse_remote(attachments: List[Attachment], load_images: bool = True) -> List[Attachment]:
         """
         Parses attachments from a remote note and updates Attachment fields
 
         :param attachments: the list of attachments from the file
+        :param load_images: if false, images are not read and their Base64 data is left empty
 
         :return: the list of parsed attachments for this note
 
@@ -447,7 +747,8 @@ class Attachment:
         for attachment in attachments:
             f_name, f_ext = os.path.splitext(attachment.file_name)
             if f_ext in Attachment._SUPPORTED_IMAGE_TYPES:
-                attachment.b64_data = Attachment._get_remote_image(attachment.url)
+                if load_images:
+                    attachment.b64_data = Attachment._get_remote_image(attachment.url)
                 attachment.uuid = helpers.get_uuid() + f_ext
             result.append(attachment)
         return result
@@ -8,17 +8,25 @@ from __future__ import annotations
 import copy
 import datetime
 import glob
+import logging
 import os
 import shutil
 import sqlite3
 from contextlib import closing
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, List, Set
 
 from taskbridgeapp import helpers
 from taskbridgeapp.notes.model import notescript
+from taskbridgeapp.notes.model.nextcloudnotes import NextCloudNoteFolder, NextCloudNotesApi
 from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.notesnapshot import NoteSnapshot
+from taskbridgeapp.notes.model.notestate import NoteState
+from taskbridgeapp.notes.model.reconcile import NoteFingerprint, NoteIndex, NoteReconciliation
+from taskbridgeapp.notes.model.remotemanifest import RemoteNoteManifest
+from taskbridgeapp.notes.model.remotetree import RemoteTreeIndex
 
 
 class NoteFolder:
@@ -42,9 +50,51 @@ class NoteFolder:
     #: Synchronise changes from both folders.
     SYNC_BOTH: int = 3
 
+    #: When set, remote notes are streamed during sync and reconciled in batches of this size rather than loaded at
+    #: once. Only the name and dates of remote notes are then kept in ``remote_notes``.
+    REMOTE_BATCH_SIZE: int | None = None
+
+    #: When set, remote notes are synchronised with the NextCloud Notes API rather than a remote notes folder.
+    NOTES_API: NextCloudNotesApi | None = None
+
+    #: The journal stage of note deletions.
+    DELETE_JOURNAL: str = 'note_deletions'
+
+    #: The migrations of ``tb_folder``.
+    FOLDER_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_folder (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            local_uuid TEXT,
+            local_name TEXT,
+            remote_path TEXT,
+            remote_name TEXT,
+            sync_direction INT,
+            generation INT DEFAULT 0
+            );""",
+        helpers.Schema.add_columns('tb_folder', {'generation': 'INT DEFAULT 0'})
+    ]
+
+    #: The migrations of ``tb_note``.
+    NOTE_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_note (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            folder TEXT,
+            location TEXT,
+            uuid TEXT,
+            name TEXT,
+            created TEXT,
+            modified TEXT,
+            generation INT DEFAULT 0
+            );""",
+        helpers.Schema.add_columns('tb_note', {'generation': 'INT DEFAULT 0'}),
+        "CREATE INDEX IF NOT EXISTS tb_note_generation ON tb_note(folder, location, generation)",
+        "CREATE INDEX IF NOT EXISTS tb_note_uuid ON tb_note(folder, location, uuid)",
+        "CREATE INDEX IF NOT EXISTS tb_note_name ON tb_note(folder, location, name)"
+    ]
+
     def __init__(self,
                  local_folder: LocalNoteFolder | None = None,
-                 remote_folder: RemoteNoteFolder | None = None,
+                 remote_folder: RemoteNoteFolder | NextCloudNoteFolder | None = None,
                  sync_direction: int = SYNC_NONE):
         """
         Create a new note folder.
@@ -61,17 +111,34 @@ class NoteFolder:
         - ``NoteFolder.SYNC_BOTH`` - bidirectional sync based on the note's modification date/time.
         """
         self.local_folder: LocalNoteFolder = local_folder
-        self.remote_folder: RemoteNoteFolder = remote_folder
+        self.remote_folder: RemoteNoteFolder | NextCloudNoteFolder = remote_folder
         self.sync_direction: int = sync_direction
         self.local_notes: List[Note] = []
         self.remote_notes: List[Note] = []
+        #: Local writes waiting to be applied in bulk, as (operation, note to write, remote note). When None, local
+        #: notes are written immediately.
+        self.pending_local_writes: List[tuple[str, Note, Note]] | None = None
+        #: Remote writes waiting to be committed together. When None, remote notes are written immediately.
+        self.remote_write_batch: helpers.AtomicWriteBatch | None = None
+        #: The state of each note after the last sync, keyed by the UUID of the local note.
+        self.note_states: Dict[str, NoteState] = {}
+        #: The state of each note synchronised during the current sync, keyed by the UUID of the local note.
+        self.synced_states: Dict[str, NoteState] = {}
+        #: The local notes written from remote during the current sync, keyed by UUID, or by name if they have none.
+        self.written_notes: Dict[str, Note] = {}
         NoteFolder.FOLDER_LIST.append(self)
 
-    def load_local_notes(self) -> tuple[bool, str] | tuple[bool, int]:
+    def load_local_notes(self, note_names: Set[str] | None = None) -> tuple[bool, str] | tuple[bool, int]:
         """
         Calls an AppleScript script to fetch the notes in the local folder. The script saves each note with a ``.staged``
         file name in a temporary folder. Each file is then read, parsed and added as a ``Note`` instance in the
-        in ``local_notes``.
+        in ``local_notes``. Files whose content was parsed before, in this run or in the ``NoteSnapshot`` of the last
+        sync, are not parsed again.
+
+        If ``note_names`` is given, only the local notes with these names or UUIDs are exported, and they replace the
+        matching notes already in ``local_notes`` rather than the whole list.
+
+        :param note_names: the names or UUIDs of the notes to load, or None to load every note in the folder.
 
         :returns:
 
@@ -80,9 +147,15 @@ class NoteFolder:
             -data (:py:class:`str` | :py:class:`int`) - error message on failure, or number of notes loaded on success.
 
         """
-        self.local_notes.clear()
+        if note_names is None:
+            self.local_notes.clear()
+        else:
+            self.local_notes[:] = [note for note in self.local_notes
+                                   if note.name not in note_names and note.uuid not in note_names]
+        NoteSnapshot.load()
         get_notes_script = notescript.get_notes_script
-        return_code, stdout, stderr = helpers.run_applescript(get_notes_script, self.local_folder.name)
+        return_code, stdout, stderr = helpers.run_applescript(get_notes_script, self.local_folder.name,
+                                                              *sorted(note_names or []))
 
         if return_code != 0:
             return False, stderr
@@ -95,7 +168,7 @@ class NoteFolder:
             staged_file = os.path.join(staging_folder_path, filename)
             with open(staged_file) as fp:
                 staged_content = fp.read()
-            self.local_notes.append(Note.create_from_local(staged_content, Path(staging_folder_path)))
+            self.local_notes.append(NoteSnapshot.parse_local(staged_content, Path(staging_folder_path)))
 
         staged = glob.glob(staging_folder_path + '/*.staged')
         for s in staged:
@@ -103,10 +176,23 @@ class NoteFolder:
 
         return True, len(self.local_notes)
 
-    def load_remote_notes(self) -> tuple[bool, str] | tuple[bool, int]:
+    def load_remote_notes(self, note_names: Set[str] | None = None) -> tuple[bool, str] | tuple[bool, int]:
         """
         Loads the Markdown notes from the remote notes folder. Each note is then parsed and added as a ``Note`` instance
-        in ``remote_notes``.
+        in ``remote_notes``. Files which have not changed since the last load are served from the
+        ``RemoteNoteManifest`` rather than parsed again, including on the first load of a run, from the ``NoteSnapshot``
+        of the last sync.
+
+        If ``REMOTE_BATCH_SIZE`` is set, only the name and dates of each remote note are loaded, and the full notes are
+        streamed during sync.
+
+        The notes are loaded through the ``load_notes()`` method of the remote folder, so that a ``NextCloudNoteFolder``
+        loads them from the NextCloud Notes API instead.
+
+        If ``note_names`` is given, only the remote notes with these names are loaded, and they replace the notes with
+        the same names already in ``remote_notes`` rather than the whole list.
+
+        :param note_names: the names of the notes to load, or None to load every note in the folder.
 
         :returns:
 
@@ -115,27 +201,28 @@ class NoteFolder:
             -data (:py:class:`str` | :py:class:`int`) - error message on failure, or number of notes loaded on success.
 
         """
-        self.remote_notes.clear()
-
-        for root, dirs, files in os.walk(self.remote_folder.path):
-            for remote_file in files:
-                f_name, f_ext = os.path.splitext(remote_file)
-                if not f_ext == ".md":
-                    continue
-                remote_note = self.remote_folder.path / remote_file
-                with open(remote_note) as fp:
-                    remote_content = fp.read()
-                self.remote_notes.append(Note.create_from_remote(remote_content, self.remote_folder.path, remote_file))
+        success, data = self.remote_folder.load_notes(summary_only=bool(NoteFolder.REMOTE_BATCH_SIZE), names=note_names)
+        if not success:
+            return False, data
+        if note_names is None:
+            self.remote_notes.clear()
+        else:
+            self.remote_notes[:] = [note for note in self.remote_notes if note.name not in note_names]
+        self.remote_notes.extend(data)
 
         return True, len(self.remote_notes)
 
-    def sync_local_note_to_remote(self, local: Note, remote: Note | None, result: dict) -> tuple[bool, str]:
+    def sync_local_note_to_remote(self, local: Note, remote: Note | None, result: dict, force: bool = False) \
+            -> tuple[bool, str]:
         """
-        Sync local notes to remote. This performs an update or an insert.
+        Sync local notes to remote. This performs an update or an insert. If the remote note was matched by its UUID but
+        has a different name, the local note was renamed, so the remote note is moved to its new name before it is
+        updated.
 
         :param local: the local note.
         :param remote: the remote note.
         :param result: a dictionary where results of sync will be saved.
+        :param force: if True, the remote note is updated even if it is newer than the local note.
 
         :returns:
 
@@ -144,26 +231,37 @@ class NoteFolder:
             -data (:py:class:`str`) - error message on failure, or dictionary of changes.
 
         """
-        if remote is None or not isinstance(local.modified_date, datetime) or not isinstance(remote.modified_date, datetime) or local.modified_date > remote.modified_date:
+        if force or remote is None or not isinstance(local.modified_date, datetime) or not isinstance(remote.modified_date, datetime) or local.modified_date > remote.modified_date:
             key = 'remote_added' if remote is None else 'remote_updated'
+            if remote is not None and remote.name != local.name:
+                success, data = self.move_remote_note(remote, local.name)
+                if not success:
+                    return False, data
             remote = copy.deepcopy(local)
+            if self.remote_folder.is_note_unchanged(remote):
+                self._record_state(local)
+                return True, 'Remote note {} is unchanged.'.format(remote.name)
             if helpers.confirm("Upsert remote note {}".format(remote.name)):
-                i_success, i_data = remote.upsert_remote(self.remote_folder.path)
+                i_success, i_data = self.remote_folder.upsert_note(remote, self.remote_write_batch)
                 if not i_success:
                     return False, i_data
+                self._record_state(local)
                 result[key].append(remote.name)
                 return True, i_data
         return True, ''
 
-    def sync_remote_note_to_local(self, local: Note, remote: Note, result: dict) -> tuple[bool, str]:
+    def sync_remote_note_to_local(self, local: Note, remote: Note, result: dict, force: bool = False) \
+            -> tuple[bool, str]:
         """
         Sync remote notes to local. This performs an update or an insert.
-        Since the Apple Notes modified date is read only, we have to update the modified date of the remote note as well,
-        otherwise the remote note will be overwritten on the next sync.
+        Since the Apple Notes modified date is read only, the local note will appear newer than the remote one on the
+        next sync. The remote note is not rewritten to bump its modification date; instead, the base state recorded for
+        the note shows on the next sync that the content of neither note changed.
 
         :param local: the local note.
         :param remote: the remote note.
         :param result: a dictionary where results of sync will be saved.
+        :param force: if True, the local note is updated even if it is newer than the remote note.
 
         :returns:
 
@@ -172,27 +270,279 @@ class NoteFolder:
             -data (:py:class:`str`) - error message on failure, or success message.
 
         """
-        if remote is not None and local.modified_date < remote.modified_date:
-            key = 'local_updated'
+        if remote is not None and (force or local.modified_date < remote.modified_date):
+            success, data = self.load_full_remote_note(remote)
+            if not success:
+                return False, data
+            remote = data
+            local_uuid = local.uuid
             local = copy.deepcopy(remote)
+            local.uuid = local_uuid
             if helpers.confirm("Update local note {}".format(local.name)):
+                if self.pending_local_writes is not None:
+                    self.pending_local_writes.append((Note.LOCAL_UPDATE, local, remote))
+                    return True, 'Local note {} queued for update.'.format(local.name)
                 i_success, i_data = local.update_local(self.local_folder.name)
                 if not i_success:
                     return False, i_data
-                result[key].append(local.name)
-
-                # Update modification date of remote note
-                remote.modified_date = datetime.now()
-                remote.upsert_remote(self.remote_folder.path)
-
+                self._local_note_written(Note.LOCAL_UPDATE, local, remote, result)
                 return True, i_data
         return True, 'Sync skipped since local note has been modified.'
 
-    def sync_local_to_remote(self, result: dict) -> tuple[bool, str]:
+    def load_full_remote_note(self, remote: Note) -> tuple[bool, str] | tuple[bool, Note]:
+        """
+        Gets a remote note with its content, through the ``load_full_note()`` method of the remote folder. Notes loaded
+        from the NextCloud Notes API which did not change since the last sync have no content, so it is fetched when the
+        note needs to be written locally.
+
+        :param remote: the remote note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`Note`) - error message on failure, or the note with its content.
+
+        """
+        return self.remote_folder.load_full_note(remote)
+
+    def move_remote_note(self, remote: Note, name: str) -> tuple[bool, str]:
+        """
+        Renames a remote note, so that it matches the new name of its local counterpart.
+
+        :param remote: the remote note.
+        :param name: the new name of the note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the remote note is successfully moved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        return self.remote_folder.rename_note(remote, name)
+
+    def _local_note_written(self, operation: str, local: Note, remote: Note, result: dict,
+                            local_modified: datetime | None = None) -> None:
+        """
+        Records a local note which has been written from its remote counterpart. The local note is converted to HTML and
+        back when it is loaded again, so its content will not hash the same as what was written. If the modification
+        date of the written note is known, the note is unchanged on the next sync as long as it keeps this date;
+        otherwise, the note is reloaded once written by ``reload_written_notes``, which records its actual state.
+
+        :param operation: ``Note.LOCAL_CREATE`` or ``Note.LOCAL_UPDATE``.
+        :param local: the local note which was written.
+        :param remote: the remote note it was written from.
+        :param result: a dictionary where results of sync will be saved.
+        :param local_modified: the modification date of the written local note, if it is known.
+        """
+        if operation == Note.LOCAL_CREATE:
+            remote.uuid = local.uuid
+            result['local_added'].append(local.name)
+        else:
+            result['local_updated'].append(local.name)
+        self.written_notes[local.uuid or local.name] = local
+        content_hash = NoteState.content_hash(local)
+        if local.uuid:
+            self.synced_states[local.uuid] = NoteState(content_hash, NoteState.modified_key(local_modified),
+                                                       content_hash, NoteState.modified_key(remote.modified_date))
+
+    def _record_state(self, local: Note) -> None:
+        """
+        Records the state of a local note which has been written to remote, so that both notes have its content.
+
+        :param local: the local note.
+        """
+        if local.uuid:
+            content_hash = NoteState.content_hash(local)
+            self.synced_states[local.uuid] = NoteState(content_hash, NoteState.modified_key(local.modified_date),
+                                                       content_hash, None)
+
+    def flush_local_writes(self, result: dict) -> tuple[bool, str]:
+        """
+        Applies all queued local note writes in a single bulk AppleScript invocation.
+
+        :param result: a dictionary where results of sync will be saved.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if all queued notes are successfully written.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        pending = self.pending_local_writes or []
+        self.pending_local_writes = None
+        if len(pending) == 0:
+            return True, 'No local notes to write.'
+
+        remote_by_local = {id(local): remote for operation, local, remote in pending}
+        success, data = Note.upsert_local_bulk(
+            [(operation, self.local_folder.name, local) for operation, local, remote in pending])
+        if not success:
+            return False, data
+
+        operation_by_local = {id(local): operation for operation, local, remote in pending}
+        for local, uuid, modified_date in data['written']:
+            self._local_note_written(operation_by_local[id(local)], local, remote_by_local[id(local)], result,
+                                     modified_date)
+        if len(data['failed']) > 0:
+            return False, 'Failed to write local notes: {}'.format(
+                '; '.join('{0} ({1})'.format(note.name, error) for note, error in data['failed']))
+        return True, '{} local notes written.'.format(len(data['written']))
+
+    def write_pending_notes(self, result: dict) -> tuple[bool, str]:
+        """
+        Writes the queued local notes in bulk, and commits the queued remote notes.
+
+        :param result: a dictionary where results of sync will be saved.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if all queued notes are successfully written.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = self.flush_local_writes(result)
+        remote_write_batch = self.remote_write_batch
+        self.remote_write_batch = None
+        if remote_write_batch is None:
+            return success, data
+        if not success:
+            remote_write_batch.discard()
+            return False, data
+        success, data = remote_write_batch.commit()
+        if not success:
+            return False, 'Failed to write remote notes: {}'.format(data)
+        return True, 'Queued notes written.'
+
+    def classify_note_pair(self, local_note: Note, remote_note: Note | None) -> str | None:
+        """
+        Compares a pair of notes to their ``NoteState`` after the last sync. If neither note changed and the pair was
+        not renamed, the current state is recorded in ``synced_states``.
+
+        :param local_note: the local note.
+        :param remote_note: the remote note, or None if the local note has no remote counterpart.
+
+        :return: the ``NoteState`` classification of the pair, or None if it is not known.
+        """
+        if remote_note is None:
+            return None
+        base = self.note_states.get(local_note.uuid) if local_note.uuid else None
+        current = NoteState.observe(local_note, remote_note, base)
+        state = None
+        if base is not None:
+            state = base.classify(current)
+        elif current.local_hash == current.remote_hash:
+            state = NoteState.UNCHANGED
+        if state == NoteState.UNCHANGED and remote_note.name == local_note.name and local_note.uuid:
+            self.synced_states[local_note.uuid] = current
+        return state
+
+    def sync_note_pair(self, local_note: Note, remote_note: Note | None, result: dict) -> tuple[bool, str]:
+        """
+        Sync a local note with its remote counterpart, if any, depending on the ``sync_direction`` of this folder.
+        Both notes are first compared to their ``NoteState`` after the last sync, and nothing is written if neither
+        changed.
+
+        :param local_note: the local note.
+        :param remote_note: the remote note, or None if the local note has no remote counterpart.
+        :param result: dictionary where results will be saved.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = True, ''
+        state = self.classify_note_pair(local_note, remote_note)
+        if state == NoteState.UNCHANGED and remote_note.name == local_note.name:
+            return True, 'Note {} is unchanged.'.format(local_note.name)
+
+        if self.sync_direction == NoteFolder.SYNC_LOCAL_TO_REMOTE:
+            # Sync Local --> Remote if remote doesn't exist or is outdated
+            success, data = self.sync_local_note_to_remote(local_note, remote_note, result)
+        elif self.sync_direction == NoteFolder.SYNC_REMOTE_TO_LOCAL:
+            # Sync Local <-- Remote if local is outdated
+            success, data = self.sync_remote_note_to_local(local_note, remote_note, result)
+        elif self.sync_direction == NoteFolder.SYNC_BOTH:
+            success, data = self.sync_note_pair_both(local_note, remote_note, state, result)
+        return success, data
+
+    def sync_note_pair_both(self, local_note: Note, remote_note: Note | None, state: str | None, result: dict) \
+            -> tuple[bool, str]:
+        """
+        Sync Local <--> Remote, depending on which note changed since the last sync, or which is newer if this is not
+        known or both changed.
+
+        :param local_note: the local note.
+        :param remote_note: the remote note, or None if the local note has no remote counterpart.
+        :param state: the classification of the pair returned by ``classify_note_pair``.
+        :param result: dictionary where results will be saved.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        if state == NoteState.LOCAL_CHANGED:
+            return self.sync_local_note_to_remote(local_note, remote_note, result, force=True)
+        if state == NoteState.REMOTE_CHANGED:
+            return self.sync_remote_note_to_local(local_note, remote_note, result, force=True)
+        if remote_note is None or local_note.modified_date > remote_note.modified_date:
+            return self.sync_local_note_to_remote(local_note, remote_note, result)
+        if remote_note.modified_date > local_note.modified_date:
+            return self.sync_remote_note_to_local(local_note, remote_note, result)
+        return True, ''
+
+    def create_missing_local(self, remote_note: Note, result: dict, remote_record: Note | None = None) \
+            -> tuple[bool, str]:
+        """
+        Creates the local counterpart of a remote note which is missing locally, if the ``sync_direction`` of this folder
+        allows it.
+
+        :param remote_note: the remote note.
+        :param result: dictionary where results will be saved.
+        :param remote_record: the note in ``remote_notes`` which should be linked to the new local note, if this is not
+            ``remote_note`` itself.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the local note is successfully created or queued.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        if self.sync_direction != NoteFolder.SYNC_REMOTE_TO_LOCAL and self.sync_direction != NoteFolder.SYNC_BOTH:
+            return True, 'Sync skipped since folder is not synchronised to local.'
+        remote_record = remote_record if remote_record is not None else remote_note
+        success, data = self.load_full_remote_note(remote_note)
+        if not success:
+            return False, data
+        local_note = copy.deepcopy(data)
+        if helpers.confirm("Create local note {}".format(local_note.name)):
+            if self.pending_local_writes is not None:
+                self.pending_local_writes.append((Note.LOCAL_CREATE, local_note, remote_record))
+                return True, 'Local note {} queued for creation.'.format(local_note.name)
+            success, data = local_note.create_local(self.local_folder.name)
+            if not success:
+                return False, data
+            self._local_note_written(Note.LOCAL_CREATE, local_note, remote_record, result)
+            return True, data
+        return True, 'Local note {} not created.'.format(local_note.name)
+
+    def sync_local_to_remote(self, result: dict, reconciliation: NoteReconciliation | None = None) -> tuple[bool, str]:
         """
         Sync all the local notes in this folder to remote.
 
         :param result: dictionary where results will be saved.
+        :param reconciliation: the pairing of local and remote notes in this folder. If not given, the notes are
+            reconciled again.
 
         :returns:
 
@@ -203,33 +553,26 @@ class NoteFolder:
         """
         success = True
         data = "Local notes in folder synchronised to remote"
-        for local_note in self.local_notes:                
-            # Get the associated remote note, if any
-            remote_note = next((n for n in self.remote_notes
-                                if n.uuid == local_note.uuid or n.name == local_note.name), None)
-
-            if self.sync_direction == NoteFolder.SYNC_LOCAL_TO_REMOTE:
-                # Sync Local --> Remote if remote doesn't exist or is outdated
-                success, data = self.sync_local_note_to_remote(local_note, remote_note, result)
-            elif self.sync_direction == NoteFolder.SYNC_REMOTE_TO_LOCAL:
-                # Sync Local <-- Remote if local is outdated
-                success, data = self.sync_remote_note_to_local(local_note, remote_note, result)
-            elif self.sync_direction == NoteFolder.SYNC_BOTH:
-                # Sync Local <--> Remote, depending on which is newer
-                if remote_note is None or local_note.modified_date > remote_note.modified_date:
-                    success, data = self.sync_local_note_to_remote(local_note, remote_note, result)
-                elif remote_note.modified_date > local_note.modified_date:
-                    success, data = self.sync_remote_note_to_local(local_note, remote_note, result)
+        if reconciliation is None:
+            reconciliation = NoteReconciliation(self.local_notes, self.remote_notes)
+        for local_note, remote_note in reconciliation.pairs:
+            if remote_note is not None and remote_note.uuid is None:
+                # Remember which local note this remote note belongs to
+                remote_note.uuid = local_note.uuid
+
+            success, data = self.sync_note_pair(local_note, remote_note, result)
             if not success:
                 break
 
         return success, data
 
-    def sync_remote_to_local(self, result) -> tuple[bool, str]:
+    def sync_remote_to_local(self, result: dict, reconciliation: NoteReconciliation | None = None) -> tuple[bool, str]:
         """
         Sync all remote notes in this folder to local.
 
         :param result: dictionary where results will be saved.
+        :param reconciliation: the pairing of local and remote notes in this folder. If not given, the notes are
+            reconciled again.
 
         :returns:
 
@@ -240,27 +583,200 @@ class NoteFolder:
         """
         success = True
         data = "Remote notes in folder synchronised to local"
-        for remote_note in self.remote_notes:
-            local_note = next((n for n in self.local_notes
-                               if n.uuid == remote_note.modified_date or n.name == remote_note.name), None)
-            if ((
-                    self.sync_direction == NoteFolder.SYNC_REMOTE_TO_LOCAL or self.sync_direction == NoteFolder.SYNC_BOTH)
-                    and local_note is None):
-                # Local note is missing and so needs to be created
-                key_change = 'local_added'
-                local_note = copy.deepcopy(remote_note)
-                if helpers.confirm("Create local note {}".format(local_note.name)):
-                    success, data = local_note.create_local(self.local_folder.name)
+        if reconciliation is None:
+            reconciliation = NoteReconciliation(self.local_notes, self.remote_notes)
+        for remote_note in reconciliation.remote_only:
+            # Local note is missing and so needs to be created
+            success, data = self.create_missing_local(remote_note, result)
+            if not success:
+                break
+
+        return success, data
+
+    def sync_notes_in_batches(self, result: dict, note_names: Set[str] | None = None) -> tuple[bool, str]:
+        """
+        Synchronises notes by streaming the remote notes from ``RemoteNoteManifest.iter_notes``, and reconciling them
+        in batches of ``REMOTE_BATCH_SIZE`` against an index of the local notes. Queued notes are written after every
+        batch, so that only one batch of full remote notes is held in memory at a time. Local notes which have no remote
+        counterpart are synchronised once all remote notes have been seen.
+
+        :param result: dictionary where results will be saved.
+        :param note_names: if given, the names of the notes to synchronise.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if notes are successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        paired = set()
+        success, data = self.sync_remote_batches(result, paired, note_names)
+        if not success:
+            return False, data
+
+        # Local notes which have no remote counterpart
+        for local_note in self.local_notes:
+            if local_note.name not in paired and (note_names is None or local_note.name in note_names):
+                success, data = self.sync_note_pair(local_note, None, result)
+                if not success:
+                    return False, data
+        return True, "Notes in folder synchronised in batches"
+
+    def sync_remote_batches(self, result: dict, paired: Set[str], note_names: Set[str] | None = None) \
+            -> tuple[bool, str]:
+        """
+        Streams the remote notes from ``RemoteNoteManifest.iter_notes`` and synchronises them in batches of
+        ``REMOTE_BATCH_SIZE`` with ``sync_remote_batch``.
+
+        :param result: dictionary where results will be saved.
+        :param paired: set to which the names of the local notes which have a remote counterpart are added.
+        :param note_names: if given, the names of the notes to synchronise.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the remote notes are successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        local_index = NoteIndex(self.local_notes)
+        remote_records = {n.name: n for n in self.remote_notes}
+        success, manifest = RemoteNoteManifest.load_manifest(self.remote_folder.path)
+        if not success:
+            return False, manifest
+        remote_batch = []
+        try:
+            for remote_note in RemoteNoteManifest.iter_notes(self.remote_folder.path, manifest, cache=False,
+                                                             names=note_names):
+                remote_batch.append(remote_note)
+                if len(remote_batch) >= NoteFolder.REMOTE_BATCH_SIZE:
+                    success, data = self.sync_remote_batch(remote_batch, local_index, remote_records, paired, result)
                     if not success:
-                        break
-                    result[key_change].append(local_note.name)
+                        return False, data
+                    remote_batch = []
+        except OSError as e:
+            return False, 'Failed to read remote notes in {0}: {1}'.format(self.remote_folder.path, e)
+        return self.sync_remote_batch(remote_batch, local_index, remote_records, paired, result)
+
+    def sync_remote_batch(self, batch: List[Note], local_index: NoteIndex,
+                          remote_records: Dict[str, Note], paired: Set[str], result: dict) -> tuple[bool, str]:
+        """
+        Synchronises a batch of remote notes streamed by ``sync_notes_in_batches`` with their local counterparts, then
+        writes the queued notes.
+
+        :param batch: the full remote notes of the batch.
+        :param local_index: the index of the local notes.
+        :param remote_records: the notes in ``remote_notes``, keyed by name.
+        :param paired: the names of the local notes which have a remote counterpart, to which the notes paired in this
+            batch are added.
+        :param result: dictionary where results will be saved.
 
+        :returns:
+
+            -success (:py:class:`bool`) - true if the batch is successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        for remote_note in batch:
+            remote_record = remote_records.get(remote_note.name)
+            local_note = local_index.find(remote_note.uuid, remote_note.name)
+            if local_note is None:
+                success, data = self.create_missing_local(remote_note, result, remote_record)
+            else:
+                paired.add(local_note.name)
+                success, data = self.sync_streamed_pair(local_note, remote_note, remote_record, result)
+            if not success:
+                return False, data
+        success, data = self.write_pending_notes(result)
+        self.pending_local_writes = []
+        self.remote_write_batch = helpers.AtomicWriteBatch()
+        return success, data
+
+    def sync_streamed_pair(self, local_note: Note, remote_note: Note, remote_record: Note | None, result: dict) \
+            -> tuple[bool, str]:
+        """
+        Synchronises a local note with a remote note streamed by ``sync_notes_in_batches``, keeping the matching note in
+        ``remote_notes`` up to date.
+
+        :param local_note: the local note.
+        :param remote_note: the full remote note.
+        :param remote_record: the note in ``remote_notes`` with the name of the remote note, if any.
+        :param result: dictionary where results will be saved.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        remote_note.uuid = local_note.uuid
+        if remote_record is not None:
+            remote_record.uuid = local_note.uuid
+        success, data = self.sync_note_pair(local_note, remote_note, result)
+        if remote_record is not None:
+            # The remote note may have been moved to the local note's name
+            remote_record.name = remote_note.name
         return success, data
 
-    def sync_notes(self) -> tuple[bool, dict] | tuple[bool, str]:
+    def sync_reconciled_notes(self, result: dict, note_names: Set[str] | None = None) -> tuple[bool, str]:
         """
-        Synchronises notes. This method checks the ``sync_direction`` of this folder to determine what to do. On
-        success, it returns a dictionary with the following keys:
+        Synchronises notes by reconciling all the loaded local and remote notes, once for both directions.
+
+        :param result: dictionary where results will be saved.
+        :param note_names: if given, the names of the notes to synchronise.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if notes are successfully synchronised.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        all_local_notes, all_remote_notes = self.local_notes, self.remote_notes
+        if note_names is not None:
+            self.local_notes = [n for n in all_local_notes if n.name in note_names]
+            self.remote_notes = [n for n in all_remote_notes if n.name in note_names]
+        try:
+            # Pair local and remote notes once for both directions
+            reconciliation = NoteReconciliation(self.local_notes, self.remote_notes)
+
+            # Sync local notes to remote
+            success, data = self.sync_local_to_remote(result, reconciliation)
+
+            # Sync remote notes to local
+            if success:
+                success, data = self.sync_remote_to_local(result, reconciliation)
+        finally:
+            self.local_notes, self.remote_notes = all_local_notes, all_remote_notes
+        return success, data
+
+    def save_note_states(self) -> tuple[bool, str]:
+        """
+        Saves the ``NoteState`` of the notes in this folder which still exist locally, updated with those synchronised
+        during the current sync.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the states are successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        note_states = dict(self.note_states)
+        note_states.update(self.synced_states)
+        local_uuids = {n.uuid for n in self.local_notes if n.uuid}
+        local_uuids.update(self.synced_states)
+        return NoteState.save_states(self.local_folder.name,
+                                     {uuid: state for uuid, state in note_states.items() if uuid in local_uuids})
+
+    def sync_notes(self, note_names: Set[str] | None = None) -> tuple[bool, dict] | tuple[bool, str]:
+        """
+        Synchronises notes. This method checks the ``sync_direction`` of this folder to determine what to do. If
+        ``note_names`` is given, only notes with these names are synchronised. The search index of the folder is then
+        updated; if this fails, a warning is logged. On success, it returns a dictionary with the following keys:
 
         - ``remote_added`` - name of notes added to the remote folder as :py:class:`List[str]`.
         - ``remote_updated`` - name of notes updated in the remote folder as :py:class:`List[str]`.
@@ -269,6 +785,8 @@ class NoteFolder:
 
         Any of the above may be empty if no such changes were made.
 
+        :param note_names: if given, the names of the notes to synchronise.
+
         :returns:
 
             -success (:py:class:`bool`) - true if notes are successfully synchronised.
@@ -285,19 +803,169 @@ class NoteFolder:
         if self.sync_direction == NoteFolder.SYNC_NONE:
             return True, result
 
-        # Sync local notes to remote
-        self.sync_local_to_remote(result)
+        success, data = NoteState.load_states(self.local_folder.name)
+        if not success:
+            return False, 'Failed to load note states: {}'.format(data)
+        self.note_states = data
+        self.synced_states = {}
+        self.written_notes = {}
+
+        # Local notes are written in bulk once both directions have been compared, and remote notes are committed
+        # together
+        self.pending_local_writes = []
+        self.remote_write_batch = helpers.AtomicWriteBatch()
+
+        if NoteFolder.REMOTE_BATCH_SIZE and isinstance(self.remote_folder, RemoteNoteFolder):
+            # Stream remote notes in batches
+            success, data = self.sync_notes_in_batches(result, note_names)
+        else:
+            success, data = self.sync_reconciled_notes(result, note_names)
+        if not success:
+            self.pending_local_writes = None
+            self.remote_write_batch.discard()
+            self.remote_write_batch = None
+            return False, data
 
-        # Sync remote notes to local
-        self.sync_remote_to_local(result)
+        # Write queued notes
+        success, data = self.write_pending_notes(result)
+        if not success:
+            return False, data
+
+        # Take the base state of the notes written without a modification date from Notes
+        success, data = self.reload_written_notes()
+        if not success:
+            return False, 'Failed to reload written notes: {}'.format(data)
 
         # Save current note status
         success, data = NoteFolder.persist_notes()
         if not success:
             return False, 'Failed to save notes to database {}'.format(data)
 
+        # Save the state of the notes which still exist locally
+        success, data = self.save_note_states()
+        if not success:
+            return False, 'Failed to save note states: {}'.format(data)
+
+        # The search index is brought up to date by the next sync, so a failure does not fail this one
+        success, data = self.index_notes()
+        if not success:
+            logging.warning('Failed to update search index: {}'.format(data))
+
         return True, result
 
+    def reload_written_notes(self) -> tuple[bool, str]:
+        """
+        Reloads, in a single export, the local notes written during this sync whose modification date is not known,
+        which happens when they are not written in bulk or when the returned date cannot be parsed. Their content hash
+        and modification date, as Notes stores them, replace their local base state, so that a local edit made before
+        the next sync is seen as a change.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully reloaded.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        uuids = {uuid for uuid, state in self.synced_states.items()
+                 if state.local_modified is None and uuid in self.written_notes}
+        if len(uuids) == 0:
+            return True, 'No written notes to reload'
+        success, data = self.load_local_notes(uuids)
+        if not success:
+            return False, data
+        for note in self.local_notes:
+            if note.uuid in uuids:
+                state = self.synced_states[note.uuid]
+                state.local_hash = NoteState.content_hash(note)
+                state.local_modified = NoteState.modified_key(note.modified_date)
+        return True, '{} written notes reloaded'.format(len(uuids))
+
+    def index_notes(self) -> tuple[bool, str]:
+        """
+        Updates the search index of this folder with its notes as they are after sync, which are the local notes, with
+        those written from remote replaced by what was written.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the search index is successfully updated.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        notes = {note.uuid or note.name: note for note in self.local_notes}
+        notes.update(self.written_notes)
+        return helpers.SearchIndex.update(helpers.SearchIndex.NOTE, self.local_folder.name,
+                                          [(item, note.name, note.body_markdown) for item, note in notes.items()])
+
+    def reload_changed_notes(self, note_names: Set[str]) -> tuple[bool, str]:
+        """
+        Reloads the notes for ``sync_remote_changes``. If the notes of this folder were loaded before and
+        ``note_names`` is not empty, only the remote notes with these names are reloaded, followed by the local notes
+        with these names or with the UUID of a reloaded remote note. Otherwise, every note in the folder is reloaded.
+
+        :param note_names: the names of the remote notes which changed.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully reloaded.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        partial = len(note_names) > 0 and bool(self.local_notes or self.remote_notes)
+        success, data = self.load_remote_notes(set(note_names) if partial else None)
+        if not success:
+            return False, 'Failed to load remote notes: {}'.format(data)
+        local_names = None
+        if partial:
+            local_names = set(note_names)
+            local_names.update(note.uuid for note in self.remote_notes if note.name in note_names and note.uuid)
+        success, data = self.load_local_notes(local_names)
+        if not success:
+            return False, 'Failed to load local notes: {}'.format(data)
+        return True, 'Notes reloaded for {}'.format(self.local_folder.name)
+
+    def sync_remote_changes(self, note_names: Set[str]) -> tuple[bool, dict] | tuple[bool, str]:
+        """
+        Synchronises the changes made to some of the remote notes in this folder, such as those found by
+        ``RemoteNoteWatcher``. Only the changed notes, and the local notes they are linked to, are reloaded, unless the
+        notes of this folder have not been loaded yet. Local notes whose remote counterpart was deleted are deleted, and
+        the changed notes are then synchronised as in ``sync_notes``. If ``note_names`` is empty, every note in the
+        folder is reloaded and synchronised.
+
+        On success, the dictionary returned by ``sync_notes`` is returned, with the ``local_deleted`` and
+        ``local_not_found`` keys of ``sync_note_deletions`` added.
+
+        :param note_names: the names of the remote notes which changed.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the changes are successfully synchronised.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or :py:class:`dict` with results as above.
+
+        """
+        deletions = {
+            'local_deleted': [],
+            'local_not_found': []
+        }
+        if self.sync_direction != NoteFolder.SYNC_NONE:
+            success, data = self.reload_changed_notes(note_names)
+            if not success:
+                return False, data
+
+        if self.sync_direction == NoteFolder.SYNC_REMOTE_TO_LOCAL or self.sync_direction == NoteFolder.SYNC_BOTH:
+            success, data = NoteFolder.delete_local_notes(self, deletions)
+            if not success:
+                return False, 'Failed to delete local notes: {}'.format(data)
+
+        success, data = self.sync_notes(note_names if len(note_names) > 0 else None)
+        if not success:
+            return False, data
+        data.update(deletions)
+        return True, data
+
     def __str__(self):
         if self.sync_direction == NoteFolder.SYNC_BOTH:
             sync_direction = "LOCAL <--> REMOTE"
@@ -340,9 +1008,13 @@ class NoteFolder:
         return False, stderr
 
     @staticmethod
-    def load_remote_folders(remote_notes_path: Path) -> tuple[bool, List[RemoteNoteFolder]]:
+    def load_remote_folders(remote_notes_path: Path) -> tuple[bool, str] | tuple[bool, List[RemoteNoteFolder]]:
         """
-        Loads the list of remote folders by checking the filesystem.
+        Loads the list of remote folders by checking the filesystem. The remote notes folder is indexed once with
+        ``RemoteTreeIndex``, and the index is reused when loading the notes in each folder. Only folders at the top
+        level of the remote notes folder are note folders.
+
+        If ``NOTES_API`` is set, the note categories on the NextCloud server are loaded instead.
 
         :returns:
 
@@ -352,14 +1024,28 @@ class NoteFolder:
             success.
 
         """
-        remote_note_folders = []
-        for root, dirs, files in os.walk(remote_notes_path):
-            for remote_dir in dirs:
-                if not remote_dir.startswith("."):
-                    remote_folder = RemoteNoteFolder(remote_notes_path / remote_dir, remote_dir)
-                    remote_note_folders.append(remote_folder)
+        if NoteFolder.NOTES_API is not None:
+            return NextCloudNoteFolder.load_folders(NoteFolder.NOTES_API)
+        success, data = RemoteTreeIndex.build(remote_notes_path)
+        if not success:
+            return False, data
+        remote_note_folders = [RemoteNoteFolder(folder.path, folder.name) for folder in data.folders.values()]
         return True, remote_note_folders
 
+    @staticmethod
+    def new_remote_folder(remote_notes_path: Path, name: str) -> RemoteNoteFolder | NextCloudNoteFolder:
+        """
+        Creates a new remote folder instance, as a category on the NextCloud server if ``NOTES_API`` is set, or as a
+        folder in the remote notes folder otherwise.
+
+        :param remote_notes_path: path to the remote folders.
+        :param name: the name of the folder.
+        :return: the remote folder instance.
+        """
+        if NoteFolder.NOTES_API is not None:
+            return NextCloudNoteFolder(NoteFolder.NOTES_API, name)
+        return RemoteNoteFolder(remote_notes_path / name, name)
+
     @staticmethod
     def assoc_local_remote(local_folders: List[LocalNoteFolder],
                            remote_folders: List[RemoteNoteFolder],
@@ -390,7 +1076,7 @@ class NoteFolder:
             # Create missing remote folder
             if local_folder.name in associations['bi_directional'] or local_folder.name in associations['local_to_remote']:
                 if remote_folder is None:
-                    remote_folder = RemoteNoteFolder(remote_notes_path / local_folder.name, local_folder.name)
+                    remote_folder = NoteFolder.new_remote_folder(remote_notes_path, local_folder.name)
                     if helpers.confirm('Create remote folder {}'.format(remote_folder.name)):
                         remote_folder.create()
 
@@ -487,7 +1173,7 @@ class NoteFolder:
     @staticmethod
     def seed_folder_table() -> tuple[bool, str]:
         """
-        Creates the initial structure for the table storing folders in SQLite.
+        Creates the initial structure for the table storing folders in SQLite, or migrates it to the current version.
 
         :returns:
 
@@ -496,27 +1182,13 @@ class NoteFolder:
             -data (:py:class:`str`) - error message on failure, or success message.
 
         """
-        try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
-                with closing(connection.cursor()) as cursor:
-                    sql_create_folder_table = """CREATE TABLE IF NOT EXISTS tb_folder (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    local_uuid TEXT,
-                                    local_name TEXT,
-                                    remote_path TEXT,
-                                    remote_name TEXT,
-                                    sync_direction INT
-                                    );"""
-                    cursor.execute(sql_create_folder_table)
-        except sqlite3.OperationalError as e:
-            return False, repr(e)
-        return True, 'tb_folder table created'
+        return helpers.Schema.migrate('tb_folder', NoteFolder.FOLDER_MIGRATIONS)
 
     @staticmethod
     def persist_folders() -> tuple[bool, str]:
         """
-        Save the list of linked note folders to SQLite.
+        Save the list of linked note folders to SQLite, with the current sync generation. Only the rows which changed are
+        written.
 
         :returns:
 
@@ -525,38 +1197,119 @@ class NoteFolder:
             -data (:py:class:`str`) - error message on failure, or success message.
 
         """
+        success, data = helpers.SyncGeneration.current('tb_folder')
+        if not success:
+            return False, data
+        generation = data
+
         folders = []
         for folder in NoteFolder.FOLDER_LIST:
             folders.append((
                 folder.local_folder.uuid if folder.local_folder else None,
-                folder.local_folder.name if folder.local_folder else None,
                 str(folder.remote_folder.path) if folder.remote_folder else None,
+                folder.local_folder.name if folder.local_folder else None,
                 folder.remote_folder.name if folder.remote_folder else None,
-                folder.sync_direction
+                folder.sync_direction,
+                generation
             ))
 
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
+            with helpers.Database.connection() as connection:
                 with closing(connection.cursor()) as cursor:
-                    sql_delete_folders = "DELETE FROM tb_folder"
-                    cursor.execute(sql_delete_folders)
-                    sql_insert_folders = """INSERT INTO tb_folder(local_uuid, local_name, remote_path, remote_name,
-                    sync_direction)
-                                VALUES (?, ?, ?, ?, ?)
-                                """
-                    cursor.executemany(sql_insert_folders, folders)
-                    connection.commit()
+                    helpers.Database.persist_rows(cursor, 'tb_folder', ('local_uuid', 'remote_path'),
+                                                  ('local_name', 'remote_name', 'sync_direction', 'generation'), folders)
         except sqlite3.OperationalError as e:
             return False, repr(e)
         return True, 'Folders stored in tb_folder'
 
     @staticmethod
-    def sync_bidirectional_local_deletions(discovered_local: List[LocalNoteFolder]) -> tuple[bool, str]:
+    def rename_folder_records(row: sqlite3.Row, local_folder: LocalNoteFolder,
+                              remote_folder: RemoteNoteFolder | NextCloudNoteFolder) -> tuple[bool, str]:
+        """
+        Moves the stored folder and the stored state of the notes in a renamed folder to the folder's new name, so that
+        the notes are not seen as deleted and added again on the next sync.
+
+        :param row: the ``tb_folder`` row of the folder before it was renamed.
+        :param local_folder: the renamed local folder.
+        :param remote_folder: the renamed remote folder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the records are successfully updated.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        for seed in (NoteFolder.seed_note_table, NoteState.seed_state_table, RemoteNoteManifest.seed_manifest_table):
+            success, data = seed()
+            if not success:
+                return False, data
+        old_path, new_path = str(row['remote_path']), str(remote_folder.path)
+        try:
+            with helpers.Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    cursor.execute("UPDATE tb_note SET folder = ? WHERE folder = ? AND location = 'local'",
+                                   (local_folder.name, row['local_name']))
+                    cursor.execute("UPDATE tb_note SET folder = ? WHERE folder = ? AND location = 'remote'",
+                                   (remote_folder.name, row['remote_name']))
+                    cursor.execute("UPDATE tb_note_state SET folder = ? WHERE folder = ?",
+                                   (local_folder.name, row['local_name']))
+                    cursor.execute("""UPDATE tb_remote_manifest SET path = ? || substr(path, ?), folder = ?
+                                   WHERE folder = ?""", (new_path, len(old_path) + 1, new_path, old_path))
+                    cursor.execute("UPDATE tb_folder SET local_name = ?, remote_path = ?, remote_name = ? WHERE id = ?",
+                                   (local_folder.name, new_path, remote_folder.name, row['id']))
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, 'Records moved to folder {}'.format(local_folder.name)
+
+    @staticmethod
+    def sync_local_rename(row: sqlite3.Row, local_folder: LocalNoteFolder, discovered_remote: List[RemoteNoteFolder],
+                          associations: dict | None = None) -> tuple[bool, str]:
         """
-        Sync folders that have been marked for bidirectional or local -> remote sync.
+        Renames the remote counterpart of a renamed local folder, instead of deleting it and uploading its notes again
+        under the new name. The folder's associations and stored notes are moved to the new name.
+
+        :param row: the ``tb_folder`` row of the folder before it was renamed.
+        :param local_folder: the renamed local folder, which has the UUID stored in ``row``.
+        :param discovered_remote: list of currently discovered remote note folders.
+        :param associations: the folder associations, which are updated in place.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the folder is successfully renamed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        remote_folder = next((f for f in discovered_remote if f.name == row['remote_name']), None)
+        if remote_folder is None:
+            if NoteFolder.NOTES_API is not None:
+                remote_folder = NextCloudNoteFolder(NoteFolder.NOTES_API, row['remote_name'])
+            else:
+                remote_folder = RemoteNoteFolder(Path(row['remote_path']), row['remote_name'])
+        if not helpers.confirm('Rename remote folder {0} to {1}'.format(row['remote_name'], local_folder.name)):
+            return True, 'Remote folder {} not renamed.'.format(row['remote_name'])
+        success, data = remote_folder.rename(local_folder.name)
+        if not success:
+            return False, data
+
+        if associations:
+            for names in associations.values():
+                if row['local_name'] in names:
+                    names[names.index(row['local_name'])] = local_folder.name
+        return NoteFolder.rename_folder_records(row, local_folder, remote_folder)
+
+    @staticmethod
+    def sync_bidirectional_local_deletions(discovered_local: List[LocalNoteFolder],
+                                           discovered_remote: List[RemoteNoteFolder] | None = None,
+                                           associations: dict | None = None) -> tuple[bool, str]:
+        """
+        Sync folders that have been marked for bidirectional or local -> remote sync. A folder which is gone, but whose
+        UUID is found under another name, was renamed; its remote folder is renamed rather than deleted.
 
         :param discovered_local: list of currently discovered local note folders.
+        :param discovered_remote: list of currently discovered remote note folders.
+        :param associations: the folder associations, which are updated in place for renamed folders.
 
         :returns:
 
@@ -567,17 +1320,29 @@ class NoteFolder:
         """
         folder_filter = (NoteFolder.SYNC_BOTH, NoteFolder.SYNC_LOCAL_TO_REMOTE)
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
                     sql_bi_and_local = "SELECT * FROM tb_folder WHERE sync_direction = ? OR sync_direction = ?"
                     rows = cursor.execute(sql_bi_and_local, folder_filter).fetchall()
                     current_local_names = [f.name for f in discovered_local]
+                    local_by_uuid = {f.uuid: f for f in discovered_local if f.uuid}
                     removed_local = [f for f in rows if f['local_name'] not in current_local_names]
                     for f in removed_local:
+                        if f['local_uuid'] in local_by_uuid:
+                            # Local folder has been renamed, so rename remote
+                            success, data = NoteFolder.sync_local_rename(f, local_by_uuid[f['local_uuid']],
+                                                                         discovered_remote or [], associations)
+                            if not success:
+                                return False, data
+                            continue
                         # Local folder has been deleted, so delete remote
                         if helpers.confirm("Delete remote folder {}".format(f['remote_name'])):
-                            success, data = RemoteNoteFolder(f['remote_path'], f['remote_name']).delete()
+                            if NoteFolder.NOTES_API is not None:
+                                remote_folder = NextCloudNoteFolder(NoteFolder.NOTES_API, f['remote_name'])
+                            else:
+                                remote_folder = RemoteNoteFolder(f['remote_path'], f['remote_name'])
+                            success, data = remote_folder.delete()
                             if not success:
                                 return False, data
         except sqlite3.OperationalError as e:
@@ -601,7 +1366,7 @@ class NoteFolder:
         """
         folder_filter = (NoteFolder.SYNC_REMOTE_TO_LOCAL,)
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
                     sql_remote = "SELECT * FROM tb_folder WHERE sync_direction = ?"
@@ -620,9 +1385,8 @@ class NoteFolder:
         return True, "Remote folder deletions synchronised."
 
     @staticmethod
-    def sync_folder_deletions(discovered_local: List[LocalNoteFolder], discovered_remote: List[RemoteNoteFolder]) -> \
-            tuple[
-                bool, str]:
+    def sync_folder_deletions(discovered_local: List[LocalNoteFolder], discovered_remote: List[RemoteNoteFolder],
+                              associations: dict | None = None) -> tuple[bool, str]:
         """
         Synchronises deletions to folders.
 
@@ -633,8 +1397,17 @@ class NoteFolder:
         Note that folder deletions only apply in the sync direction. In the example above, *foo* will only be deleted if
         ``sync_direction`` is set to ``SYNC_LOCAL_TO_REMOTE`` or ``SYNC_BOTH``.
 
+        Local folders are also matched by UUID, so that a renamed local folder is not seen as a deleted folder and a new
+        one: its remote folder is renamed instead, and the folder's name is replaced in ``associations``.
+
+        The stored folders which are still present are then marked with a new sync generation, and the rows of the
+        deleted folders are removed. The other rows are kept, so that deletions are still detected on the next sync if
+        this one stops before the folders are saved again. If a folder cannot be renamed or deleted, the folders are not
+        swept, so that the change is carried out again on the next sync.
+
         :param discovered_local: List of currently discovered local note folders.
         :param discovered_remote: List of currently discovered remote note folders.
+        :param associations: the folder associations, as passed to ``create_linked_folders``.
 
         :returns:
 
@@ -648,24 +1421,58 @@ class NoteFolder:
             return False, message
 
         # Bi-Directional or Local --> Remote Folders
-        NoteFolder.sync_bidirectional_local_deletions(discovered_local)
+        success, data = NoteFolder.sync_bidirectional_local_deletions(discovered_local, discovered_remote, associations)
+        if not success:
+            return False, data
 
         # Local <-- Remote Folders
-        NoteFolder.sync_remote_deletions(discovered_remote)
+        success, data = NoteFolder.sync_remote_deletions(discovered_remote)
+        if not success:
+            return False, data
 
-        # Empty Table
+        return NoteFolder.sweep_folders(discovered_local, discovered_remote)
+
+    @staticmethod
+    def sweep_folders(discovered_local: List[LocalNoteFolder],
+                      discovered_remote: List[RemoteNoteFolder]) -> tuple[bool, str]:
+        """
+        Marks the stored folders which are still present with a new sync generation, and removes the rows which were not
+        marked. A folder synchronised to remote is present while its local folder exists, a folder synchronised to local
+        while its remote folder exists, and a folder which is not synchronised is always present.
 
-        with closing(sqlite3.connect(helpers.db_folder())) as connection:
-            connection.row_factory = sqlite3.Row
-            with closing(connection.cursor()) as cursor:
-                cursor.execute("DELETE FROM tb_folder")
+        :param discovered_local: List of currently discovered local note folders.
+        :param discovered_remote: List of currently discovered remote note folders.
 
+        :returns:
+
+            -success (:py:class:`bool`) - true if the folders are successfully swept.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, generation = helpers.SyncGeneration.start('tb_folder')
+        if not success:
+            return False, generation
+        try:
+            with helpers.Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_local', (f.name for f in discovered_local))
+                    helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_remote', (f.name for f in discovered_remote))
+                    sql_mark_folders = """UPDATE tb_folder SET generation = ? WHERE sync_direction NOT IN (?, ?, ?)
+                                       OR (sync_direction IN (?, ?) AND local_name IN (SELECT key FROM temp.tb_seen_local))
+                                       OR (sync_direction = ? AND remote_name IN (SELECT key FROM temp.tb_seen_remote))"""
+                    cursor.execute(sql_mark_folders, (generation, NoteFolder.SYNC_BOTH, NoteFolder.SYNC_LOCAL_TO_REMOTE,
+                                                      NoteFolder.SYNC_REMOTE_TO_LOCAL, NoteFolder.SYNC_BOTH,
+                                                      NoteFolder.SYNC_LOCAL_TO_REMOTE, NoteFolder.SYNC_REMOTE_TO_LOCAL))
+                    cursor.execute("DELETE FROM tb_folder WHERE generation < ?", (generation,))
+        except sqlite3.OperationalError as e:
+            return False, 'Error sweeping folders in table: {}'.format(e)
         return True, 'Folder deletions synchronised'
 
     @staticmethod
     def seed_note_table() -> tuple[bool, str]:
         """
-        Creates the initial structure for the table storing notes in SQLite.
+        Creates the initial structure for the table storing notes in SQLite, or migrates it to the current version.
 
         :returns:
 
@@ -674,29 +1481,14 @@ class NoteFolder:
             -data (:py:class:`str`) - error message on failure, or success message.
 
         """
-        try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
-                with closing(connection.cursor()) as cursor:
-                    sql_create_note_table = """CREATE TABLE IF NOT EXISTS tb_note (
-                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                        folder TEXT,
-                                        location TEXT,
-                                        uuid TEXT,
-                                        name TEXT,
-                                        created TEXT,
-                                        modified TEXT
-                                        );"""
-                    cursor.execute(sql_create_note_table)
-        except sqlite3.OperationalError as e:
-            return False, repr(e)
-        return True, 'tb_note table created'
+        return helpers.Schema.migrate('tb_note', NoteFolder.NOTE_MIGRATIONS)
 
     @staticmethod
     def persist_notes() -> tuple[bool, str]:
         """
         Stores a list of notes in SQLite. Note that the only 'sensitive' part of the note which is stored is the note's name.
-        The database is stored locally.
+        The database is stored locally. The notes are stored with the current sync generation. Stored rows are matched to
+        the notes by folder, location, UUID and name, and only the rows which changed are written.
 
         :returns:
 
@@ -705,75 +1497,129 @@ class NoteFolder:
             -data (:py:class:`str`) - error message on failure, or success message.
 
         """
+        success, data = helpers.SyncGeneration.current('tb_note')
+        if not success:
+            return False, data
+        generation = data
+
         notes = []
         for folder in NoteFolder.FOLDER_LIST:
-            if folder.sync_direction == NoteFolder.SYNC_NONE:
-                continue
-            
             if folder.sync_direction == NoteFolder.SYNC_LOCAL_TO_REMOTE or folder.sync_direction == NoteFolder.SYNC_BOTH:
                 # Add notes from local folder
-                for note in folder.local_notes:
-                    if hasattr(note.modified_date, 'timestamp') and callable(note.modified_date.strftime):
-                        moddate = note.modified_date
-                    else:
-                        moddate = datetime.now()
-                    
-                    if hasattr(note.created_date, 'timestamp') and callable(note.created_date.strftime):
-                        createdate = note.created_date
-                    else:
-                        createdate = datetime.now()
-                    notes.append((
-                        folder.local_folder.name,
-                        'local',
-                        note.uuid,
-                        note.name,
-                        helpers.DateUtil.convert('', createdate, helpers.DateUtil.SQLITE_DATETIME),
-                        helpers.DateUtil.convert('', moddate, helpers.DateUtil.SQLITE_DATETIME)
-                    ))
-
+                notes.extend(NoteFolder.note_rows(folder.local_folder.name, 'local', folder.local_notes, generation))
             if folder.sync_direction == NoteFolder.SYNC_REMOTE_TO_LOCAL or folder.sync_direction == NoteFolder.SYNC_BOTH:
                 # Add notes from remote folder
-                for note in folder.remote_notes:
-                    if hasattr(note.modified_date, 'timestamp') and callable(note.modified_date.strftime):
-                        moddate = note.modified_date
-                    else:
-                        moddate = datetime.now()
-                    
-                    if hasattr(note.created_date, 'timestamp') and callable(note.created_date.strftime):
-                        createdate = note.created_date
-                    else:
-                        createdate = datetime.now()
-                    notes.append((
-                        folder.remote_folder.name,
-                        'remote',
-                        note.uuid,
-                        note.name,
-                        helpers.DateUtil.convert('', note.createdate, helpers.DateUtil.SQLITE_DATETIME),
-                        helpers.DateUtil.convert('', note.moddate, helpers.DateUtil.SQLITE_DATETIME)
-                    ))
+                notes.extend(NoteFolder.note_rows(folder.remote_folder.name, 'remote', folder.remote_notes, generation))
 
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
+            with helpers.Database.connection() as connection:
                 with closing(connection.cursor()) as cursor:
-                    sql_delete_folders = "DELETE FROM tb_note"
-                    cursor.execute(sql_delete_folders)
-                    sql_insert_notes = """INSERT INTO tb_note(folder, location, uuid, name, created, modified)
-                                        VALUES (?, ?, ?, ?, ?, ?)
-                                        """
-                    cursor.executemany(sql_insert_notes, notes)
-                    connection.commit()
+                    added, updated, deleted = helpers.Database.persist_rows(
+                        cursor, 'tb_note', ('folder', 'location', 'uuid', 'name'), ('created', 'modified', 'generation'),
+                        notes)
         except sqlite3.OperationalError as e:
             return False, repr(e)
-        return True, 'Notes stored in tb_notes'
+        return True, 'Notes stored in tb_notes ({0} added, {1} updated, {2} deleted)'.format(added, updated, deleted)
+
+    @staticmethod
+    def note_rows(folder_name: str, location: str, notes: List[Note], generation: int) -> List[tuple]:
+        """
+        Builds the ``tb_note`` rows of the notes in a folder for ``persist_notes``. Dates which are not set are stored as
+        the current date.
+
+        :param folder_name: the name of the folder.
+        :param location: ``local`` or ``remote``.
+        :param notes: the notes in the folder.
+        :param generation: the current sync generation.
+
+        :return: the rows, as tuples of folder, location, UUID, name, created date, modified date and generation.
+        """
+        rows = []
+        for note in notes:
+            if hasattr(note.modified_date, 'timestamp') and callable(note.modified_date.strftime):
+                moddate = note.modified_date
+            else:
+                moddate = datetime.now()
+
+            if hasattr(note.created_date, 'timestamp') and callable(note.created_date.strftime):
+                createdate = note.created_date
+            else:
+                createdate = datetime.now()
+            rows.append((
+                folder_name,
+                location,
+                note.uuid,
+                note.name,
+                helpers.DateUtil.convert('', createdate, helpers.DateUtil.SQLITE_DATETIME),
+                helpers.DateUtil.convert('', moddate, helpers.DateUtil.SQLITE_DATETIME),
+                generation
+            ))
+        return rows
 
     @staticmethod
-    def delete_local_notes(folder: NoteFolder, result: dict) -> tuple[bool, str]:
+    def sweep_notes(cursor: sqlite3.Cursor, folder_name: str, location: str, notes: List[Note],
+                    generation: int) -> List[sqlite3.Row]:
+        """
+        Marks the stored rows of the notes seen in a folder with the current generation, and gets the rows which were
+        not marked. These are the notes which were deleted since the last sync. A row is marked if a note has its UUID,
+        or for remote notes, its name.
+
+        :param cursor: the cursor to use.
+        :param folder_name: the name of the folder, as stored in ``tb_note``.
+        :param location: ``local`` or ``remote``.
+        :param notes: the notes currently in the folder.
+        :param generation: the current generation.
+        :return: the rows of the deleted notes.
         """
-        Delete notes from local which were deleted remotely.
+        helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_uuid', (n.uuid for n in notes))
+        helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_name',
+                                         (n.name for n in notes) if location == 'remote' else ())
+        sql_mark_notes = """UPDATE tb_note SET generation = ? WHERE folder = ? AND location = ? AND
+                         (uuid IN (SELECT key FROM temp.tb_seen_uuid) OR name IN (SELECT key FROM temp.tb_seen_name))"""
+        cursor.execute(sql_mark_notes, (generation, folder_name, location))
+        sql_swept_notes = "SELECT * FROM tb_note WHERE folder = ? AND location = ? AND generation < ?"
+        return cursor.execute(sql_swept_notes, (folder_name, location, generation)).fetchall()
+
+    @staticmethod
+    def journal_deletions(scope: str, rows: List[sqlite3.Row]) -> tuple[bool, str] | tuple[bool, Dict[int, int]]:
+        """
+        Records the deletions of notes in the sync journal before they are made. If a sync was interrupted after it
+        deleted some of the notes, the rows of these notes were not removed from ``tb_note``, and are swept again; their
+        deletion is not recorded again.
+
+        :param scope: the location and name of the folder of the rows.
+        :param rows: the rows of the deleted notes, as returned by ``sweep_notes``.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the deletions are successfully recorded.
+
+            -data (:py:class:`str` | :py:class:`Dict[int, int]`) - error message on failure, or the ID of the journal
+            entry of each row still to be deleted, by ``id`` of the row.
+
+        """
+        success, data = helpers.SyncJournal.completed(NoteFolder.DELETE_JOURNAL, scope)
+        if not success:
+            return False, data
+        pending = [row for row in rows if ('delete', row['uuid'] or row['name']) not in data]
+        success, data = helpers.SyncJournal.plan(NoteFolder.DELETE_JOURNAL, scope,
+                                                 [('delete', row['uuid'] or row['name']) for row in pending])
+        if not success:
+            return False, data
+        return True, {id(row): entry_id for row, entry_id in zip(pending, data)}
+
+    @staticmethod
+    def delete_local_notes(folder: NoteFolder, result: dict, generation: int | None = None) -> tuple[bool, str]:
+        """
+        Delete notes from local which were deleted remotely. Local notes are deleted by the UUID stored for them in
+        ``tb_note``, or by name for rows which do not have one. A remote note which still carries the UUID in its
+        metadata trailer was renamed rather than deleted. The rows of the deleted notes are removed from ``tb_note``.
+        Each deletion is recorded in the sync journal, so that a sync resumed after an interruption does not make it
+        again.
 
         :param folder: the folder data.
         :param result: dictionary where results are appended.
+        :param generation: the current sync generation. If not given, a new generation is started.
 
         :returns:
 
@@ -781,39 +1627,86 @@ class NoteFolder:
 
             -data (:py:class:`str`) - error message on failure, or success message.
         """
-        delete_note_script = notescript.delete_note_script
+        if generation is None:
+            success, generation = helpers.SyncGeneration.start('tb_note')
+            if not success:
+                return False, generation
+        scope = 'remote/{}'.format(folder.remote_folder.name)
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
-                    sql_remote_notes = "SELECT * FROM tb_note WHERE folder = ? AND location = ?"
-                    remote_filter = (folder.remote_folder.name, 'remote')
-                    rows = cursor.execute(sql_remote_notes, remote_filter).fetchall()
+                    rows = NoteFolder.sweep_notes(cursor, folder.remote_folder.name, 'remote', folder.remote_notes,
+                                                  generation)
+                    success, entry_ids = NoteFolder.journal_deletions(scope, rows)
+                    if not success:
+                        return False, 'Failed to write sync journal: {}'.format(entry_ids)
+                    local_index = NoteIndex(folder.local_notes)
+                    deleted = set()
                     for row in rows:
-                        if row['name'] not in [n.name for n in folder.remote_notes]:
-                            if helpers.confirm('Delete local note {}'.format(row['name'])):
-                                return_code, stdout, stderr = helpers.run_applescript(delete_note_script,
-                                                                                      folder.local_folder.name,
-                                                                                      row['name'])
-                                note_object = next((n for n in folder.local_notes if n.name == row['name']), None)
-                                if note_object is not None:
-                                    folder.local_notes.remove(note_object)
-                                if return_code != 0:
-                                    result['local_not_found'].append(row['name'])
-                                else:
-                                    result['local_deleted'].append(row['name'])
+                        if id(row) not in entry_ids:
+                            # Deleted by an interrupted sync
+                            result['local_deleted'].append(row['name'])
+                            continue
+                        note_object = NoteFolder.delete_local_note(folder, row, entry_ids[id(row)], local_index, result)
+                        if note_object is not None:
+                            deleted.add(id(note_object))
+                    if deleted:
+                        folder.local_notes[:] = [n for n in folder.local_notes if id(n) not in deleted]
+                    cursor.execute("DELETE FROM tb_note WHERE folder = ? AND location = ? AND generation < ?",
+                                   (folder.remote_folder.name, 'remote', generation))
         except sqlite3.OperationalError as e:
             return False, repr(e)
+        # The journal is kept until the rows of the deleted notes are removed
+        helpers.Database.after_commit(partial(helpers.SyncJournal.finish, NoteFolder.DELETE_JOURNAL, scope))
         return True, "Local notes deleted."
 
     @staticmethod
-    def delete_remote_notes(folder: NoteFolder, remote_folder: Path, result: dict) -> tuple[bool, str]:
+    def delete_local_note(folder: NoteFolder, row: sqlite3.Row, entry_id: int, local_index: NoteIndex, result: dict) \
+            -> Note | None:
+        """
+        Deletes the local note of a ``tb_note`` row for ``delete_local_notes``, once confirmed, and completes its sync
+        journal entry.
+
+        :param folder: the folder data.
+        :param row: the ``tb_note`` row of the remote note which was deleted.
+        :param entry_id: the ID of the sync journal entry of the deletion.
+        :param local_index: the index of the local notes in ``folder``.
+        :param result: dictionary where results are appended.
+
+        :return: the note in ``local_notes`` which was deleted, or None if there is none.
+        """
+        if not helpers.confirm('Delete local note {}'.format(row['name'])):
+            return None
+        # Rows saved before local UUIDs were stored fall back to deleting by name
+        local_uuid = row['uuid'] if row['uuid'] and row['uuid'].startswith('x-coredata') else ''
+        return_code, stdout, stderr = helpers.run_applescript(notescript.delete_note_script, folder.local_folder.name,
+                                                              row['name'], local_uuid)
+        if return_code != 0:
+            result['local_not_found'].append(row['name'])
+        else:
+            result['local_deleted'].append(row['name'])
+            success, data = helpers.SyncJournal.complete([(entry_id, None)])
+            if not success:
+                logging.warning('Failed to complete sync journal entry: {}'.format(data))
+        return local_index.by_uuid.get(local_uuid) if local_uuid else local_index.by_name.get(row['name'])
+
+    @staticmethod
+    def delete_remote_notes(folder: NoteFolder, remote_folder: Path, result: dict, generation: int | None = None) \
+            -> tuple[bool, str]:
         """
-        Delete notes from remote which were deleted locally.
+        Delete notes from remote which were deleted locally. The remote note is found by the UUID in its metadata
+        trailer, so that it is deleted even if it was renamed, or by name otherwise. A remote note is not deleted if a
+        new local note has similar content, since the local note was most likely renamed or recreated; the remote note
+        is then moved to the new name during sync rather than deleted and written again. The rows of the deleted notes
+        are removed from ``tb_note``. Each deletion is recorded in the sync journal, so that a sync resumed after an
+        interruption does not make it again.
 
         :param folder: the folder data.
-        :param remote_folder: the remote folder.
+        :param remote_folder: the remote notes folder. Notes are deleted through the ``delete_note()`` method of the
+            remote folder of ``folder``.
         :param result: dictionary where results are appended.
+        :param generation: the current sync generation. If not given, a new generation is started.
 
         :returns:
 
@@ -821,39 +1714,104 @@ class NoteFolder:
 
             -data (:py:class:`str`) - error message on failure, or success message.
         """
+        if generation is None:
+            success, generation = helpers.SyncGeneration.start('tb_note')
+            if not success:
+                return False, generation
+        scope = 'local/{}'.format(folder.local_folder.name)
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
-                    sql_local_notes = "SELECT * FROM tb_note WHERE folder = ? AND location = ?"
-                    local_filter = (folder.local_folder.name, 'local')
-                    rows = cursor.execute(sql_local_notes, local_filter).fetchall()
-                    for row in rows:
-                        if row['uuid'] not in [n.uuid for n in folder.local_notes]:
-                            try:
-                                remote_note = remote_folder / folder.remote_folder.name / (row['name'] + '.md')
-                                if helpers.confirm('Delete remote note {}'.format(row['name'])):
-                                    Path.unlink(remote_note)
-                                    note_object = next((n for n in folder.remote_notes if n.name == row['name']), None)
-                                    for attachment in note_object.attachments:
-                                        attachment.delete_remote()
-                                    if note_object is not None:
-                                        folder.remote_notes.remove(note_object)
-                                    result['remote_deleted'].append(row['name'])
-                            except FileNotFoundError:
-                                result['remote_not_found'].append(row['name'])
+                    rows = NoteFolder.sweep_notes(cursor, folder.local_folder.name, 'local', folder.local_notes,
+                                                  generation)
+                    success, entry_ids = NoteFolder.journal_deletions(scope, rows)
+                    if not success:
+                        return False, 'Failed to write sync journal: {}'.format(entry_ids)
+                    deleted = set()
+                    for row, note_object in NoteFolder.pending_remote_deletions(folder, rows, entry_ids, result):
+                        if NoteFolder.delete_remote_note(folder, row, note_object, entry_ids[id(row)], result):
+                            deleted.add(id(note_object))
+                    if deleted:
+                        folder.remote_notes[:] = [n for n in folder.remote_notes if id(n) not in deleted]
+                    cursor.execute("DELETE FROM tb_note WHERE folder = ? AND location = ? AND generation < ?",
+                                   (folder.local_folder.name, 'local', generation))
         except sqlite3.OperationalError as e:
             return False, repr(e)
+        # The journal is kept until the rows of the deleted notes are removed
+        helpers.Database.after_commit(partial(helpers.SyncJournal.finish, NoteFolder.DELETE_JOURNAL, scope))
         return True, "Remote notes deleted."
 
+    @staticmethod
+    def pending_remote_deletions(folder: NoteFolder, rows: List[sqlite3.Row], entry_ids: Dict[int, int], result: dict) \
+            -> List[tuple[sqlite3.Row, Note | None]]:
+        """
+        Finds the remote notes to delete for ``delete_remote_notes``. Rows deleted by an interrupted sync are added to
+        the results, and remote notes for which a new local note has similar content are left out, since the local
+        note was most likely renamed or recreated.
+
+        :param folder: the folder data.
+        :param rows: the ``tb_note`` rows of the local notes which were deleted.
+        :param entry_ids: the IDs of the sync journal entries of the deletions, keyed by the ``id()`` of the rows.
+        :param result: dictionary where results are appended.
+
+        :return: the rows to delete, each with its note in ``remote_notes`` if found.
+        """
+        remote_index = NoteIndex(folder.remote_notes)
+        pending = []
+        for row in rows:
+            if id(row) not in entry_ids:
+                # Deleted by an interrupted sync
+                result['remote_deleted'].append(row['name'])
+            else:
+                pending.append((row, remote_index.find(row['uuid'], row['name'])))
+        if all(note_object is None for row, note_object in pending):
+            return pending
+        new_local_notes = [(n, f) for n, f in
+                           ((n, NoteFingerprint.of(n)) for n in folder.local_notes
+                            if remote_index.find(n.uuid, n.name) is None)
+                           if f is not None]
+        return [(row, note_object) for row, note_object in pending
+                if note_object is None
+                or NoteFingerprint.closest(NoteFingerprint.of(note_object), new_local_notes) is None]
+
+    @staticmethod
+    def delete_remote_note(folder: NoteFolder, row: sqlite3.Row, note_object: Note | None, entry_id: int,
+                           result: dict) -> bool:
+        """
+        Deletes the remote note of a ``tb_note`` row for ``delete_remote_notes``, once confirmed, and completes its sync
+        journal entry.
+
+        :param folder: the folder data.
+        :param row: the ``tb_note`` row of the local note which was deleted.
+        :param note_object: the note in ``remote_notes`` for the row, or None if it was not found.
+        :param entry_id: the ID of the sync journal entry of the deletion.
+        :param result: dictionary where results are appended.
+
+        :return: true if the remote note was deleted.
+        """
+        remote_note = note_object if note_object is not None else \
+            Note(name=row['name'], created_date=None, modified_date=None)
+        if not helpers.confirm('Delete remote note {}'.format(remote_note.name)):
+            return False
+        success, data = folder.remote_folder.delete_note(remote_note)
+        if not success:
+            result['remote_not_found'].append(row['name'])
+            return False
+        result['remote_deleted'].append(row['name'])
+        success, data = helpers.SyncJournal.complete([(entry_id, None)])
+        if not success:
+            logging.warning('Failed to complete sync journal entry: {}'.format(data))
+        return True
+
     @staticmethod
     def sync_note_deletions(remote_folder: Path) -> tuple[bool, str] | tuple[bool, dict]:
         """
         Synchronises deletions to notes.
 
-        The list of notes found during the last sync is loaded from SQLite and compared to the local and remote notes
-        found now. Any notes in the database which are no longer present will then have their counterpart deleted. For
-        example, if the local note *foo* is deleted, the remote note *foo* will be deleted during sync.
+        The notes found now are marked in SQLite with a new sync generation. Any notes in the database which were not
+        marked are no longer present, and will then have their counterpart deleted. For example, if the local note *foo*
+        is deleted, the remote note *foo* will be deleted during sync.
 
         Note that note deletions only apply in the sync direction. In the example above, *foo* will only be deleted if
         ``sync_direction`` is set to ``SYNC_LOCAL_TO_REMOTE`` or ``SYNC_BOTH``.
@@ -879,6 +1837,9 @@ class NoteFolder:
         success, message = NoteFolder.seed_note_table()
         if not success:
             return False, message
+        success, generation = helpers.SyncGeneration.start('tb_note')
+        if not success:
+            return False, generation
 
         result = {
             'remote_deleted': [],
@@ -900,11 +1861,11 @@ class NoteFolder:
 
             # Delete remote notes which were deleted locally
             if folder.sync_direction == NoteFolder.SYNC_LOCAL_TO_REMOTE or folder.sync_direction == NoteFolder.SYNC_BOTH:
-                NoteFolder.delete_remote_notes(folder, remote_folder, result)
+                NoteFolder.delete_remote_notes(folder, remote_folder, result, generation)
 
             # Delete local notes which were deleted remotely
             if folder.sync_direction == NoteFolder.SYNC_REMOTE_TO_LOCAL or folder.sync_direction == NoteFolder.SYNC_BOTH:
-                NoteFolder.delete_local_notes(folder, result)
+                NoteFolder.delete_local_notes(folder, result, generation)
 
         return True, result
 
@@ -983,6 +1944,134 @@ class RemoteNoteFolder:
         self.path: Path = path
         self.name: str = name
 
+    def load_notes(self, summary_only: bool = False, names: Set[str] | None = None) \
+            -> tuple[bool, str] | tuple[bool, List[Note]]:
+        """
+        Loads the Markdown notes in this folder. Files which have not changed since the last load are served from the
+        ``RemoteNoteManifest`` rather than parsed again, including on the first load of a run, from the ``NoteSnapshot``
+        of the last sync.
+
+        :param summary_only: if True, the notes are not read. Instead, a ``Note`` with only the name and dates of each
+            note is loaded, together with the UUID in its metadata trailer if ``Note.EMBED_METADATA`` is set.
+        :param names: if given, only the notes with these names are loaded.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the notes are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`List[Note]`) - error message on failure, or the notes.
+
+        """
+        if not summary_only:
+            NoteSnapshot.load()
+            return RemoteNoteManifest.load_notes(self.path, names)
+
+        try:
+            tree_folder = RemoteTreeIndex.get_folder(self.path)
+        except OSError as e:
+            return False, 'Failed to read remote notes in {0}: {1}'.format(self.path, e)
+        notes = []
+        for file_name, remote_file in tree_folder.notes.items():
+            if names is not None and os.path.splitext(file_name)[0] not in names:
+                continue
+            metadata = Note.read_remote_metadata(Path(remote_file.path)) if Note.EMBED_METADATA else {}
+            notes.append(Note(
+                uuid=metadata.get('id'),
+                name=os.path.splitext(file_name)[0],
+                created_date=datetime.fromtimestamp(remote_file.ctime),
+                modified_date=datetime.fromtimestamp(remote_file.mtime)))
+        return True, notes
+
+    def load_full_note(self, remote: Note) -> tuple[bool, str] | tuple[bool, Note]:
+        """
+        Gets a remote note with its content. Notes in a remote folder are always loaded with their content.
+
+        :param remote: the remote note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - always true.
+
+            -data (:py:class:`Note`) - the note with its content.
+
+        """
+        return True, remote
+
+    def is_note_unchanged(self, note: Note) -> bool:
+        """
+        Checks whether the note in this folder already has the content of a local note.
+
+        :param note: the local note.
+        :return: True if the note exists in this folder and its content matches.
+        """
+        return note.is_remote_unchanged(self.path)
+
+    def upsert_note(self, note: Note, batch: helpers.AtomicWriteBatch | None = None) -> tuple[bool, str]:
+        """
+        Creates or updates a note in this folder.
+
+        :param note: the note to save.
+        :param batch: the batch of remote writes to add this note to. The note is only written once the batch is
+            committed.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        return note.upsert_remote(self.path, batch)
+
+    def rename_note(self, remote: Note, name: str) -> tuple[bool, str]:
+        """
+        Renames a note in this folder by moving its file.
+
+        :param remote: the remote note.
+        :param name: the new name of the note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully renamed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        source = self.path / (Note.sanitize_filename(remote.name) + '.md')
+        destination = self.path / (Note.sanitize_filename(name) + '.md')
+        if source == destination or not source.is_file() or destination.exists():
+            return True, 'Remote note {} not moved.'.format(remote.name)
+        if helpers.confirm('Rename remote note {0} to {1}'.format(remote.name, name)):
+            try:
+                os.replace(source, destination)
+            except OSError as e:
+                return False, 'Failed to rename remote note {0}: {1}'.format(remote.name, e)
+            remote.name = name
+        return True, 'Remote note renamed to {}.'.format(name)
+
+    def delete_note(self, remote: Note) -> tuple[bool, str]:
+        """
+        Deletes a note in this folder, together with its image attachments.
+
+        :param remote: the remote note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the note is successfully deleted.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        try:
+            Path.unlink(Path(self.path) / (remote.name + '.md'))
+        except FileNotFoundError:
+            return False, 'Remote note {} not found.'.format(remote.name)
+        except OSError as e:
+            return False, 'Failed to delete remote note {0}: {1}'.format(remote.name, e)
+        for attachment in remote.attachments:
+            attachment.delete_remote()
+        return True, 'Remote note {} deleted.'.format(remote.name)
+
     def create(self) -> tuple[bool, str]:
         """
         Creates the remote folder by adding a folder to the local filesystem which synchronises to remote.
@@ -1020,5 +2109,30 @@ class RemoteNoteFolder:
             return False, 'Error deleting remote folder {0}: {1}'.format(self.name, e)
         return True, 'Remote folder {} deleted.'.format(self.name)
 
+    def rename(self, name: str) -> tuple[bool, str]:
+        """
+        Renames the remote folder. The notes in it are moved with the folder, rather than written again.
+
+        :param name: the new name of the folder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if remote folder is successfully renamed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        new_path = Path(self.path).parent / name
+        if new_path.exists():
+            return False, 'Error renaming remote folder {0}: {1} already exists.'.format(self.name, new_path)
+        try:
+            os.replace(self.path, new_path)
+        except OSError as e:
+            return False, 'Error renaming remote folder {0}: {1}'.format(self.name, e)
+        old_name = self.name
+        self.path = new_path
+        self.name = name
+        return True, 'Remote folder {0} renamed to {1}.'.format(old_name, name)
+
     def __str__(self):
         return "Remote Folder: {}".format(self.name)
@@ -2,9 +2,12 @@
 AppleScript for Apple Notes.
 """
 
-#:  Get the list of notes from a folder and export as a staged file.
+#:  Get the list of notes from a folder and export as a staged file. Any further arguments are the names or IDs of the
+#:  notes to export; if there are none, every note in the folder is exported.
 get_notes_script = """on run argv
 set folder_name to item 1 of argv
+set note_filter to {}
+if (count of argv) > 1 then set note_filter to items 2 thru -1 of argv
 tell application "Finder"
     set save_location to (POSIX path of (path to temporary items folder) as text) & "taskbridge/notesync/" & folder_name
     do shell script "mkdir -p " & quoted form of save_location
@@ -15,118 +18,156 @@ tell application "Notes"
     repeat with theNote in myNotes
         set nId to id of theNote
         set nName to name of theNote
-        set nBody to body of theNote
-        set nCreation to creation date of theNote
-        set nModified to modification date of theNote
-        set attachmentList to "~~START_ATTACHMENTS~~\n"
-        repeat with theAttachment in attachments of theNote
-          set attachmentList to attachmentList & name of theAttachment & "~~" & url of theAttachment & "\n"
-        end repeat
-        set attachmentList to attachmentList & "~~END_ATTACHMENTS~~"
-        set stagedContent to nId & "~~" & nName & "~~" & nCreation & "~~" & nModified
-        set stagedContent to stagedContent & "\n" & attachmentList & "\n" & nBody
-        tell application "Finder"
-            set shell_command to "echo -n " & quoted form of nName & " | shasum -a 256 | awk '{print $1}'"
-            set hashed_name to do shell script shell_command
-            set aPath to "taskbridge:notesync:" & folder_name & ":" & hashed_name & ".staged"
-            set accessRef to (open for access file ((path to temporary items folder as text) & aPath) with write permission)
-            try
-                set eof accessRef to 0
-                write stagedContent to accessRef as «class utf8»
-                close access accessRef
-            on error errMsg
-                close access accessRef
-                log errMsg
-            end try
-        end tell
+        if note_filter is {} or note_filter contains nName or note_filter contains nId then
+            set nBody to body of theNote
+            set nCreation to creation date of theNote
+            set nModified to modification date of theNote
+            set attachmentList to "~~START_ATTACHMENTS~~\n"
+            repeat with theAttachment in attachments of theNote
+              set attachmentList to attachmentList & name of theAttachment & "~~" & url of theAttachment & "\n"
+            end repeat
+            set attachmentList to attachmentList & "~~END_ATTACHMENTS~~"
+            set stagedContent to nId & "~~" & nName & "~~" & nCreation & "~~" & nModified
+            set stagedContent to stagedContent & "\n" & attachmentList & "\n" & nBody
+            tell application "Finder"
+                set shell_command to "echo -n " & quoted form of nName & " | shasum -a 256 | awk '{print $1}'"
+                set hashed_name to do shell script shell_command
+                set aPath to "taskbridge:notesync:" & folder_name & ":" & hashed_name & ".staged"
+                set stagedFile to (path to temporary items folder as text) & aPath
+                set accessRef to (open for access file stagedFile with write permission)
+                try
+                    set eof accessRef to 0
+                    write stagedContent to accessRef as «class utf8»
+                    close access accessRef
+                on error errMsg
+                    close access accessRef
+                    log errMsg
+                end try
+            end tell
+        end if
     end repeat
 end tell
 return save_location
 end run"""
 
-#: Create a new local note.
+#: Create a new local note and return its ID. The body is read from the export file as-is; any further arguments are
+#: paths to files which are attached to the note.
 create_note_script = r"""on run argv
 set {note_folder, note_name, export_file} to {item 1, item 2, item 3} of argv
-set note_folder to note_folder
-
-tell application "Finder"
-  set input_file to my POSIX file export_file
-  set input_lines to read input_file as «class utf8» using delimiter linefeed
-end tell
+set note_body to read (my POSIX file export_file) as «class utf8»
 
 tell application "Notes"
   tell folder note_folder
     set theNote to make new note
-      tell theNote
-        set note_body to "<h1>" & note_name & "</h1>"
-        repeat with note_line in input_lines
-            if note_line contains "<img" then
-              -- Image Attachment
-              set sed_extract to "echo '" & note_line & "' | sed -n 's/.*src=\"\\([^\"]*\\)\".*/\\1/p'"
-              set image_url to do shell script sed_extract
-              set theFile to (image_url) as POSIX file
-              make new attachment at end of attachments with data theFile
-              set note_body to note_body & "<div><img style=\"max-width: 100%; max-height: 100%;\" src=\"" & image_url & "\"/>
-              <div><br></div>"
-            else
-              -- Normal Line
-              set note_body to note_body & note_line
-            end if
-        end repeat
-        set body to note_body
-      end tell
+    tell theNote
+      repeat with idx from 4 to count of argv
+        make new attachment at end of attachments with data (my POSIX file (item idx of argv))
+      end repeat
+      set body to note_body
+    end tell
   end tell
 end tell
-return modification date of theNote
+return id of theNote
 end run"""
 
-#: Update a local note.
+#: Update a local note. The note is found by its ID if one is given, otherwise by its name. The body is read from the
+#: export file as-is; any further arguments are paths to files which are attached to the note.
 update_note_script = r"""on run argv
-set {note_folder, note_name, export_file} to {item 1, item 2, item 3} of argv
-set note_folder to note_folder
-
-tell application "Finder"
-  set input_file to my POSIX file export_file
-  set input_lines to read input_file as «class utf8» using delimiter linefeed
-end tell
+set {note_folder, note_name, export_file, note_id} to {item 1, item 2, item 3, item 4} of argv
+set note_body to read (my POSIX file export_file) as «class utf8»
 
 tell application "Notes"
-  tell folder note_folder
-    set theNote to note note_name
-      tell theNote
-        set note_body to "<h1>" & note_name & "</h1>"
-        repeat with note_line in input_lines
-            if note_line contains "<img" then
-              -- Image Attachment
-              set sed_extract to "echo '" & note_line & "' | sed -n 's/.*src=\"\\([^\"]*\\)\".*/\\1/p'"
-              set image_url to do shell script sed_extract
-              set theFile to (image_url) as POSIX file
-              make new attachment at end of attachments with data theFile
-              set note_body to note_body & "<div><img style=\"max-width: 100%; max-height: 100%;\" src=\"" & image_url & "\"/>
-              <div><br></div>"
-            else
-              -- Normal Line
-              set note_body to note_body & note_line
-            end if
-        end repeat
-        set body to note_body
-      end tell
+  if note_id is not "" then
+    set theNote to note id note_id
+  else
+    set theNote to note note_name of folder note_folder
+  end if
+  tell theNote
+    repeat with idx from 5 to count of argv
+      make new attachment at end of attachments with data (my POSIX file (item idx of argv))
+    end repeat
+    set body to note_body
   end tell
 end tell
 return modification date of theNote
 end run"""
 
-#: Delete a local note.
+#: Delete a local note. The note is found by its ID if one is given as the third argument, otherwise by its name.
 delete_note_script = """on run argv
 set {note_folder, note_name} to {item 1, item 2} of argv
+set note_id to ""
+if (count of argv) > 2 then set note_id to item 3 of argv
 tell application "Notes"
-    tell folder note_folder
-        set theNote to note note_name
-        delete theNote
-    end tell
+    if note_id is not "" then
+        delete note id note_id
+    else
+        tell folder note_folder
+            delete note note_name
+        end tell
+    end if
 end tell
 end run"""
 
+#: Create and update several local notes in one go. The only argument is a manifest file with one note per line, as
+#: ``operation~~folder~~note_id~~note_name~~body_file`` followed by ``~~attachment_path`` for each file to attach, with
+#: each field escaped by ``helpers.manifest_line``. One line is returned per note, as
+#: ``index~~OK~~note_id~~modification_date`` or ``index~~ERROR~~message``.
+upsert_notes_script = r"""on run argv
+set manifest_lines to paragraphs of (read (my POSIX file (item 1 of argv)) as «class utf8»)
+set results to {}
+set AppleScript's text item delimiters to "~~"
+repeat with idx from 1 to count of manifest_lines
+  set manifest_line to item idx of manifest_lines
+  if manifest_line is not "" then
+    set fields to my decode_fields(text items of manifest_line)
+    set {note_op, note_folder, note_id, note_name, export_file} to items 1 thru 5 of fields
+    try
+      set note_body to read (my POSIX file export_file) as «class utf8»
+      tell application "Notes"
+        if note_op is "create" then
+          set theNote to make new note at folder note_folder
+        else if note_id is not "" then
+          set theNote to note id note_id
+        else
+          set theNote to note note_name of folder note_folder
+        end if
+        repeat with att_idx from 6 to count of fields
+          make new attachment at end of attachments of theNote with data (my POSIX file (item att_idx of fields))
+        end repeat
+        set body of theNote to note_body
+        set nModified to (modification date of theNote) as text
+        set end of results to ((idx - 1) as text) & "~~OK~~" & (id of theNote) & "~~" & nModified
+      end tell
+    on error errMsg
+      set end of results to ((idx - 1) as text) & "~~ERROR~~" & errMsg
+    end try
+  end if
+end repeat
+set AppleScript's text item delimiters to linefeed
+set output to results as text
+set AppleScript's text item delimiters to ""
+return output
+end run
+
+on decode_fields(field_list)
+  set saved_delimiters to AppleScript's text item delimiters
+  set escape_pairs to {{"%7E", "~"}, {"%0A", linefeed}, {"%0D", return}, ¬
+    {"%u2028", character id 8232}, {"%u2029", character id 8233}, {"%25", "%"}}
+  set decoded to {}
+  repeat with field_item in field_list
+    set field_text to field_item as text
+    repeat with escape_pair in escape_pairs
+      set AppleScript's text item delimiters to item 1 of escape_pair
+      set field_parts to text items of field_text
+      set AppleScript's text item delimiters to item 2 of escape_pair
+      set field_text to field_parts as text
+    end repeat
+    set end of decoded to field_text
+  end repeat
+  set AppleScript's text item delimiters to saved_delimiters
+  return decoded
+end decode_fields"""
+
 #: Load the list of local folders from the default account.
 load_folders_script = """tell application "Notes"
     set output to ""
@@ -0,0 +1,213 @@
+"""
+Contains the ``NoteSnapshot`` class, which saves the notes parsed during a successful sync to disk, so that the next run
+of TaskBridge starts from them instead of parsing and converting every note again.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Set
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Attachment, Note
+from taskbridgeapp.notes.model.remotemanifest import RemoteNoteManifest
+
+
+class NoteSnapshot:
+    """
+    Compressed on-disk snapshot of the parsed notes, saved after each successful sync and loaded the first time notes are
+    loaded in a run. It holds the parsed remote notes of ``RemoteNoteManifest``, keyed by path alongside the hash of the
+    content they were parsed from, and the parsed local notes, keyed by the hash of their exported content.
+
+    Nothing in the snapshot is trusted as is. Remote notes are only used when the size, modification time and content
+    hash of the file match the manifest, and local notes only when the export of the note is identical, which includes
+    its UUID and modification date. A snapshot of another version is discarded.
+
+    Image data is not saved in the snapshot. Attachments keep their file reference and their UUID, which for local
+    images is derived from the image data. The HTML of a local note, which embeds its images, is not saved either: it is
+    taken again from the export of the note, and its images are staged again from it.
+    """
+
+    #: The version of the snapshot format. Snapshots of other versions are discarded.
+    VERSION: int = 2
+
+    #: Parsed local notes, keyed by the hash of their exported content.
+    LOCAL_NOTES: Dict[str, Note] = {}
+
+    #: Hashes of the local notes parsed or served from the cache since the snapshot was last saved.
+    _USED: Set[str] = set()
+
+    #: Snapshot files already loaded in this run.
+    _LOADED: Set[Path] = set()
+
+    @staticmethod
+    def snapshot_file() -> Path:
+        """
+        Get the location of the snapshot file.
+
+        :return: path to the snapshot file.
+        """
+        return helpers.db_folder().with_name("TaskBridge-notes.snapshot")
+
+    @staticmethod
+    def parse_local(staged_content: str, staging_folder: Path) -> Note:
+        """
+        Creates a Note from a staged file exported locally, as ``Note.create_from_local`` does. If the same content was
+        parsed before, the parsed note is used instead, and only its HTML and images are taken again from the export.
+
+        :param staged_content: the content of the staged file.
+        :param staging_folder: the folder of the staged file.
+        :return: a Note instance representing the content of the staged file.
+        """
+        content_hash = hashlib.sha256(staged_content.encode()).hexdigest()
+        NoteSnapshot._USED.add(content_hash)
+        cached = NoteSnapshot.LOCAL_NOTES.get(content_hash)
+        if cached is None:
+            note = Note.create_from_local(staged_content, staging_folder)
+            NoteSnapshot.LOCAL_NOTES[content_hash] = copy.deepcopy(note)
+            return note
+
+        note = copy.deepcopy(cached)
+        staged_lines = staged_content.splitlines()
+        note.body_html = ''.join(line + '\n' for line in staged_lines[staged_lines.index('~~END_ATTACHMENTS~~') + 1:])
+        images = [attachment for attachment in note.attachments if attachment.file_type == Attachment.TYPE_IMAGE]
+        for image_index, attachment in enumerate(images):
+            attachment.b64_data = Attachment._get_local_image(staged_lines, image_index)
+            if attachment.b64_data:
+                attachment.save_image_to_file(staging_folder / '.attachments')
+        return note
+
+    @staticmethod
+    def load() -> tuple[bool, str]:
+        """
+        Loads the snapshot into the caches of parsed notes, unless it was already loaded in this run. Notes already in
+        the caches are kept.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the snapshot is loaded, discarded or does not exist.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        path = NoteSnapshot.snapshot_file()
+        if path in NoteSnapshot._LOADED:
+            return True, 'Note snapshot already loaded.'
+        NoteSnapshot._LOADED.add(path)
+        try:
+            with open(path, 'rb') as fp:
+                snapshot = json.loads(zlib.decompress(fp.read()))
+        except FileNotFoundError:
+            return True, 'No note snapshot found.'
+        except (OSError, zlib.error, ValueError) as e:
+            return True, 'Note snapshot discarded: {}'.format(e)
+        if not isinstance(snapshot, dict) or snapshot.get('version') != NoteSnapshot.VERSION:
+            return True, 'Note snapshot discarded: version {} is not supported.'.format(
+                snapshot.get('version') if isinstance(snapshot, dict) else None)
+
+        try:
+            remote_notes = {path: (content_hash, NoteSnapshot._note_from_dict(note))
+                            for path, (content_hash, note) in snapshot['remote'].items()}
+            local_notes = {content_hash: NoteSnapshot._note_from_dict(note)
+                           for content_hash, note in snapshot['local'].items()}
+        except (KeyError, TypeError, ValueError) as e:
+            return True, 'Note snapshot discarded: {}'.format(e)
+        for path, cached in remote_notes.items():
+            RemoteNoteManifest.PARSED_NOTES.setdefault(path, cached)
+        for content_hash, note in local_notes.items():
+            NoteSnapshot.LOCAL_NOTES.setdefault(content_hash, note)
+        return True, 'Note snapshot loaded: {0} remote and {1} local notes.'.format(len(remote_notes), len(local_notes))
+
+    @staticmethod
+    def save() -> tuple[bool, str]:
+        """
+        Saves the parsed notes to the snapshot. Local notes which were not seen since the last save are dropped, unless
+        no local notes were loaded at all.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the snapshot is successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        local_notes = NoteSnapshot.LOCAL_NOTES
+        if NoteSnapshot._USED:
+            for content_hash in set(local_notes.keys()) - NoteSnapshot._USED:
+                del local_notes[content_hash]
+            NoteSnapshot._USED.clear()
+        snapshot = {
+            'version': NoteSnapshot.VERSION,
+            'remote': {path: [content_hash, NoteSnapshot._note_to_dict(note)]
+                       for path, (content_hash, note) in RemoteNoteManifest.PARSED_NOTES.items()},
+            'local': {content_hash: NoteSnapshot._note_to_dict(note, keep_html=False)
+                      for content_hash, note in local_notes.items()}
+        }
+        path = NoteSnapshot.snapshot_file()
+        batch = helpers.AtomicWriteBatch()
+        try:
+            batch.write(path, zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode()))
+        except OSError as e:
+            batch.discard()
+            return False, 'Failed to save note snapshot: {}'.format(e)
+        success, data = batch.commit()
+        if not success:
+            return False, 'Failed to save note snapshot: {}'.format(data)
+        NoteSnapshot._LOADED.add(path)
+        return True, 'Note snapshot saved: {0} remote and {1} local notes.'.format(len(snapshot['remote']),
+                                                                                   len(snapshot['local']))
+
+    @staticmethod
+    def reset_cache():
+        """
+        Clears the in-memory cache of parsed local notes, and forgets which snapshots were loaded.
+        """
+        NoteSnapshot.LOCAL_NOTES.clear()
+        NoteSnapshot._USED.clear()
+        NoteSnapshot._LOADED.clear()
+
+    @staticmethod
+    def _note_to_dict(note: Note, keep_html: bool = True) -> dict:
+        """
+        Converts a note to the dictionary saved in the snapshot. Image data is left out.
+
+        :param note: the note.
+        :param keep_html: if false, the HTML of the note is left out, for local notes whose HTML is in their export.
+        :return: the note as a dictionary.
+        """
+        return {
+            'uuid': note.uuid,
+            'name': note.name,
+            'created': note.created_date.isoformat() if isinstance(note.created_date, datetime) else None,
+            'modified': note.modified_date.isoformat() if isinstance(note.modified_date, datetime) else None,
+            'markdown': note.body_markdown,
+            'html': note.body_html if keep_html else None,
+            'metadata': note.remote_metadata,
+            'attachments': [[attachment.file_type, attachment.file_name, attachment.url, attachment.uuid]
+                            for attachment in note.attachments]
+        }
+
+    @staticmethod
+    def _note_from_dict(data: dict) -> Note:
+        """
+        Creates a note from a dictionary saved in the snapshot.
+
+        :param data: the note as a dictionary, as returned by ``_note_to_dict``.
+        :return: the note.
+        """
+        note = Note(
+            uuid=data['uuid'],
+            name=data['name'],
+            created_date=datetime.fromisoformat(data['created']) if data['created'] else None,
+            modified_date=datetime.fromisoformat(data['modified']) if data['modified'] else None,
+            body_markdown=data['markdown'],
+            body_html=data['html'],
+            attachments=[Attachment(file_type=file_type, file_name=file_name, url=url, uuid=uuid)
+                         for file_type, file_name, url, uuid in data['attachments']])
+        note.remote_metadata = data['metadata']
+        return note
@@ -0,0 +1,209 @@
+"""
+Contains the ``NoteState`` class, which holds the state of a note on both sides when it was last synchronised. Comparing
+the current notes to this base state tells which side changed since the last sync.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
+
+
+class NoteState:
+    """
+    The base state of a synchronised note: the hash of the content and the modification date of the local and of the
+    remote note after the last sync. Only hashes are stored, not the content of the note.
+
+    A modification date is None when it was not known after the sync, because that side was just written. The content
+    hash is then compared on the next sync instead. A local note written from remote is converted to HTML and back to
+    Markdown when it is loaded again, which does not give the same text, so its hash is taken from the note as reloaded
+    after it was written.
+    """
+
+    #: Neither note changed since the last sync.
+    UNCHANGED: str = 'unchanged'
+
+    #: Only the local note changed since the last sync.
+    LOCAL_CHANGED: str = 'local_changed'
+
+    #: Only the remote note changed since the last sync.
+    REMOTE_CHANGED: str = 'remote_changed'
+
+    #: Both notes changed since the last sync.
+    CONFLICT: str = 'conflict'
+
+    #: The migrations of ``tb_note_state``.
+    MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_note_state (
+            folder TEXT,
+            uuid TEXT,
+            local_hash TEXT,
+            local_modified TEXT,
+            remote_hash TEXT,
+            remote_modified TEXT,
+            PRIMARY KEY (folder, uuid)
+            );"""
+    ]
+
+    def __init__(self, local_hash: str, local_modified: str | None, remote_hash: str, remote_modified: str | None):
+        """
+        Create a new note state.
+
+        :param local_hash: the content hash of the local note.
+        :param local_modified: the modification date of the local note, as returned by ``modified_key``.
+        :param remote_hash: the content hash of the remote note.
+        :param remote_modified: the modification date of the remote note, as returned by ``modified_key``.
+        """
+        self.local_hash: str = local_hash
+        self.local_modified: str | None = local_modified
+        self.remote_hash: str = remote_hash
+        self.remote_modified: str | None = remote_modified
+
+    @staticmethod
+    def content_hash(note: Note) -> str:
+        """
+        Gets the hash of a note's content. The normalised Markdown body is hashed, so that the same note hashes the same
+        whether it was loaded locally or remotely.
+
+        :param note: the note.
+        :return: the SHA-256 hash of the note's content.
+        """
+        return hashlib.sha256(note.remote_body().encode()).hexdigest()
+
+    @staticmethod
+    def modified_key(modified_date: datetime | None) -> str | None:
+        """
+        Gets the modification date of a note as stored in the base state.
+
+        :param modified_date: the modification date of the note.
+        :return: the date in ISO format, or None if the note has no valid date.
+        """
+        return modified_date.isoformat() if isinstance(modified_date, datetime) else None
+
+    @staticmethod
+    def _side_hash(note: Note, base_hash: str | None, base_modified: str | None) -> str:
+        """
+        Gets the content hash of one side of a note. If the note's modification date is the one in the base state, the
+        note did not change and the stored hash is used without reading the content.
+
+        :param note: the note.
+        :param base_hash: the stored content hash for this side.
+        :param base_modified: the stored modification date for this side.
+        :return: the content hash of the note.
+        """
+        if base_hash and base_modified is not None and NoteState.modified_key(note.modified_date) == base_modified:
+            return base_hash
+        return NoteState.content_hash(note)
+
+    @staticmethod
+    def observe(local: Note, remote: Note, base: NoteState | None = None) -> NoteState:
+        """
+        Gets the current state of a pair of notes.
+
+        :param local: the local note.
+        :param remote: the remote note.
+        :param base: the base state of the notes, if any, whose hashes are reused for sides which did not change.
+        :return: the current state of the notes.
+        """
+        return NoteState(
+            NoteState._side_hash(local, base.local_hash if base else None, base.local_modified if base else None),
+            NoteState.modified_key(local.modified_date),
+            NoteState._side_hash(remote, base.remote_hash if base else None, base.remote_modified if base else None),
+            NoteState.modified_key(remote.modified_date))
+
+    def classify(self, current: NoteState) -> str:
+        """
+        Compares the current state of a pair of notes to this base state. A side whose content hash differs from the base
+        changed.
+
+        :param current: the current state, as returned by ``observe``.
+        :return: one of ``UNCHANGED``, ``LOCAL_CHANGED``, ``REMOTE_CHANGED`` or ``CONFLICT``.
+        """
+        local_changed = current.local_hash != self.local_hash
+        remote_changed = current.remote_hash != self.remote_hash
+        if local_changed and remote_changed:
+            # Both sides may have received the same change
+            return NoteState.UNCHANGED if current.local_hash == current.remote_hash else NoteState.CONFLICT
+        if local_changed:
+            return NoteState.LOCAL_CHANGED
+        if remote_changed:
+            return NoteState.REMOTE_CHANGED
+        return NoteState.UNCHANGED
+
+    @staticmethod
+    def seed_state_table() -> tuple[bool, str]:
+        """
+        Creates the table storing the base state of notes in SQLite, or migrates it to the current version.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the table is successfully created.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        return helpers.Schema.migrate('tb_note_state', NoteState.MIGRATIONS)
+
+    @staticmethod
+    def load_states(folder: str) -> tuple[bool, str] | tuple[bool, Dict[str, NoteState]]:
+        """
+        Loads the base state of the notes in a folder.
+
+        :param folder: the name of the local folder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the states are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`Dict[str, NoteState]`) - error message on failure, or the states keyed
+            by the UUID of the local note.
+
+        """
+        success, data = NoteState.seed_state_table()
+        if not success:
+            return False, data
+        try:
+            with helpers.Database.connection() as connection:
+                connection.row_factory = sqlite3.Row
+                with closing(connection.cursor()) as cursor:
+                    rows = cursor.execute("SELECT * FROM tb_note_state WHERE folder = ?", (folder,)).fetchall()
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, {row['uuid']: NoteState(row['local_hash'], row['local_modified'], row['remote_hash'],
+                                             row['remote_modified']) for row in rows}
+
+    @staticmethod
+    def save_states(folder: str, states: Dict[str, NoteState]) -> tuple[bool, str]:
+        """
+        Replaces the base state of the notes in a folder. Only the states which changed are written.
+
+        :param folder: the name of the local folder.
+        :param states: the states keyed by the UUID of the local note.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the states are successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        success, data = NoteState.seed_state_table()
+        if not success:
+            return False, data
+        rows = [(folder, uuid, state.local_hash, state.local_modified, state.remote_hash, state.remote_modified)
+                for uuid, state in states.items()]
+        try:
+            with helpers.Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    helpers.Database.persist_rows(cursor, 'tb_note_state', ('folder', 'uuid'),
+                                                  ('local_hash', 'local_modified', 'remote_hash', 'remote_modified'),
+                                                  rows, {'folder': folder})
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, 'Note states stored in tb_note_state'
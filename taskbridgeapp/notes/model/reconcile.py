@@ -0,0 +1,216 @@
+"""
+Contains the ``NoteIndex`` class, which indexes a list of notes by UUID and name, the ``NoteFingerprint`` class, which
+finds notes with similar content, and the ``NoteReconciliation`` class, which pairs local and remote notes in linear time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Dict, Iterable, List
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
+
+
+class NoteIndex:
+    """
+    Hash index of a list of notes, by UUID and by name. Notes are found by UUID first, so that renamed notes are still
+    found, and by name otherwise.
+    """
+
+    def __init__(self, notes: Iterable[Note]):
+        """
+        Builds the index.
+
+        :param notes: the notes to index.
+        """
+        self.by_uuid: Dict[str, Note] = {}
+        self.by_name: Dict[str, Note] = {}
+        for note in notes:
+            if note.uuid:
+                self.by_uuid.setdefault(note.uuid, note)
+            self.by_name.setdefault(note.name, note)
+
+    def find(self, uuid: str | None, name: str | None) -> Note | None:
+        """
+        Finds a note by UUID, or by name if no note has the UUID.
+
+        :param uuid: the UUID of the note.
+        :param name: the name of the note.
+        :return: the note, or None if no note has the UUID or name.
+        """
+        note = self.by_uuid.get(uuid) if uuid else None
+        if note is None and name is not None:
+            note = self.by_name.get(name)
+        return note
+
+    def contains(self, uuid: str | None, name: str | None) -> bool:
+        """
+        Checks whether a note with the UUID or name is in the index.
+
+        :param uuid: the UUID of the note.
+        :param name: the name of the note.
+        :return: True if a note has the UUID or name.
+        """
+        return (bool(uuid) and uuid in self.by_uuid) or name in self.by_name
+
+
+class NoteFingerprint:
+    """
+    Fingerprints the content of notes with a simhash of word shingles, so that a note can be recognised after it was
+    renamed, even if its first line or a few words changed with the name.
+    """
+
+    #: Number of words in each shingle.
+    SHINGLE_SIZE: int = 2
+
+    #: Number of bits in a fingerprint.
+    BITS: int = 64
+
+    #: Maximum number of differing bits for two fingerprints to be considered the same note. Unrelated notes differ in
+    #: about half of the bits.
+    MAX_DISTANCE: int = 12
+
+    #: Notes with fewer words than this, apart from their title, are not fingerprinted, since short notes are too
+    #: likely to be similar to unrelated notes.
+    MIN_WORDS: int = 5
+
+    @staticmethod
+    def words(note: Note) -> List[str]:
+        """
+        Gets the normalised words of a note's content. The first line is left out if it is the note's title, since it
+        changes when the note is renamed.
+
+        :param note: the note.
+        :return: the lower case words of the note.
+        """
+        lines = helpers.normalize_markdown(Note.split_remote_metadata(note.body_markdown or '')[0]).splitlines()
+        if len(lines) > 0 and lines[0].lstrip('#').strip() == note.name.strip():
+            lines = lines[1:]
+        return re.findall(r'\w+', '\n'.join(lines).lower())
+
+    @staticmethod
+    def of(note: Note) -> int | None:
+        """
+        Gets the fingerprint of a note.
+
+        :param note: the note.
+        :return: the fingerprint, or None if the note has fewer than ``MIN_WORDS`` words apart from its title.
+        """
+        words = NoteFingerprint.words(note)
+        if len(words) < NoteFingerprint.MIN_WORDS:
+            return None
+        size = min(NoteFingerprint.SHINGLE_SIZE, len(words))
+        weights = [0] * NoteFingerprint.BITS
+        for i in range(len(words) - size + 1):
+            shingle = ' '.join(words[i:i + size]).encode()
+            value = int.from_bytes(hashlib.blake2b(shingle, digest_size=NoteFingerprint.BITS // 8).digest(), 'big')
+            for bit in range(NoteFingerprint.BITS):
+                weights[bit] += 1 if value >> bit & 1 else -1
+        return sum(1 << bit for bit in range(NoteFingerprint.BITS) if weights[bit] > 0)
+
+    @staticmethod
+    def distance(fingerprint: int, other: int) -> int:
+        """
+        Gets the number of bits which differ between two fingerprints.
+
+        :param fingerprint: a fingerprint.
+        :param other: another fingerprint.
+        :return: the Hamming distance between the fingerprints.
+        """
+        return bin(fingerprint ^ other).count('1')
+
+    @staticmethod
+    def closest(fingerprint: int | None, candidates: List[tuple[Note, int]]) -> Note | None:
+        """
+        Finds the note whose fingerprint is closest to a fingerprint.
+
+        :param fingerprint: the fingerprint.
+        :param candidates: the notes which may be similar, with their fingerprints.
+        :return: the closest candidate within ``MAX_DISTANCE`` of the fingerprint, or None if no candidate is close
+            enough or several are equally close.
+        """
+        if fingerprint is None:
+            return None
+        best = None
+        best_distance = NoteFingerprint.MAX_DISTANCE + 1
+        tied = False
+        for candidate, candidate_fingerprint in candidates:
+            distance = NoteFingerprint.distance(fingerprint, candidate_fingerprint)
+            if distance < best_distance:
+                best, best_distance, tied = candidate, distance, False
+            elif distance == best_distance:
+                tied = True
+        return None if tied else best
+
+    @staticmethod
+    def find_similar(note: Note, candidates: List[Note]) -> Note | None:
+        """
+        Finds the note with content similar to that of a note.
+
+        :param note: the note.
+        :param candidates: the notes which may be similar.
+        :return: the closest candidate, as returned by ``closest``.
+        """
+        fingerprints = [(candidate, NoteFingerprint.of(candidate)) for candidate in candidates]
+        return NoteFingerprint.closest(NoteFingerprint.of(note), [(c, f) for c, f in fingerprints if f is not None])
+
+
+class NoteReconciliation:
+    """
+    Pairs the local and remote notes of a folder. Each index is built once, so reconciling a folder takes linear time in
+    the number of notes. The result is split into:
+
+    - ``pairs`` - local notes with their remote counterpart, or None if the local note has no remote counterpart, as
+      :py:class:`List[tuple[Note, Note | None]]`.
+    - ``remote_only`` - remote notes which have no local counterpart, as :py:class:`List[Note]`.
+
+    A remote note is paired to the local note with the same UUID, or with the same name if no local note has its UUID.
+    Local and remote notes which are still unpaired are then paired if their content is similar, since the note was
+    most likely renamed. These pairs are also listed in ``renamed``.
+    """
+
+    def __init__(self, local_notes: List[Note], remote_notes: List[Note]):
+        """
+        Reconciles local and remote notes.
+
+        :param local_notes: the local notes.
+        :param remote_notes: the remote notes.
+        """
+        self.local_index: NoteIndex = NoteIndex(local_notes)
+        self.remote_index: NoteIndex = NoteIndex(remote_notes)
+        self.pairs: List[tuple[Note, Note | None]] = []
+        self.remote_only: List[Note] = []
+        self.renamed: List[tuple[Note, Note]] = []
+
+        paired = set()
+        for local_note in local_notes:
+            remote_note = self.remote_index.find(local_note.uuid, local_note.name)
+            if remote_note is not None and id(remote_note) in paired:
+                remote_note = None
+            if remote_note is not None:
+                paired.add(id(remote_note))
+            self.pairs.append((local_note, remote_note))
+        for remote_note in remote_notes:
+            if id(remote_note) not in paired and not self.local_index.contains(remote_note.uuid, remote_note.name):
+                self.remote_only.append(remote_note)
+        self.pair_renamed()
+
+    def pair_renamed(self) -> None:
+        """
+        Pairs local notes without a remote counterpart to remote notes without a local counterpart, if their content
+        is similar. Only notes left unpaired are compared, so this is cheap when few notes were added or renamed.
+        """
+        if len(self.remote_only) == 0:
+            return
+        candidates = [(n, f) for n, f in ((n, NoteFingerprint.of(n)) for n in self.remote_only) if f is not None]
+        for i, (local_note, remote_note) in enumerate(self.pairs):
+            if remote_note is not None or len(candidates) == 0:
+                continue
+            remote_note = NoteFingerprint.closest(NoteFingerprint.of(local_note), candidates)
+            if remote_note is not None:
+                self.pairs[i] = (local_note, remote_note)
+                self.remote_only.remove(remote_note)
+                candidates = [(n, f) for n, f in candidates if n is not remote_note]
+                self.renamed.append((local_note, remote_note))
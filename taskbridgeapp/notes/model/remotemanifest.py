@@ -0,0 +1,222 @@
+"""
+Contains the ``RemoteNoteManifest`` class, which keeps track of the Markdown files in remote note folders so that
+unchanged files do not need to be read and parsed again on every sync.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Set
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.remotetree import RemoteFile, RemoteTreeIndex
+
+
+class RemoteNoteManifest:
+    """
+    Index of the Markdown files in remote note folders. For each file, the size, modification time (in nanoseconds) and
+    a hash of the content are stored in SQLite. Only these are persisted, as no note content is stored in the database.
+
+    Parsed notes are kept in memory, keyed by path alongside the hash of the content they were parsed from. A file whose
+    size and modification time match the manifest is served from this cache without being opened. A file whose
+    content hash matches the manifest is parsed again, but the images it references are not read.
+    """
+
+    #: Parsed remote notes, keyed by path, as (content hash, note).
+    PARSED_NOTES: Dict[str, tuple[str, Note]] = {}
+
+    #: The migrations of ``tb_remote_manifest``.
+    MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_remote_manifest (
+            path TEXT PRIMARY KEY,
+            folder TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            hash TEXT
+            );""",
+        "CREATE INDEX IF NOT EXISTS tb_remote_manifest_folder ON tb_remote_manifest(folder)"
+    ]
+
+    @staticmethod
+    def seed_manifest_table() -> tuple[bool, str]:
+        """
+        Creates the initial structure for the table storing the remote note manifest in SQLite, or migrates it to the
+        current version.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if table is successfully created.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        return helpers.Schema.migrate('tb_remote_manifest', RemoteNoteManifest.MIGRATIONS)
+
+    @staticmethod
+    def load_manifest(folder: Path) -> tuple[bool, str] | tuple[bool, Dict[str, sqlite3.Row]]:
+        """
+        Loads the manifest entries for a remote folder.
+
+        :param folder: the path to the remote folder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the manifest is successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or manifest rows keyed by path.
+
+        """
+        success, data = RemoteNoteManifest.seed_manifest_table()
+        if not success:
+            return False, data
+        try:
+            with helpers.Database.connection() as connection:
+                connection.row_factory = sqlite3.Row
+                with closing(connection.cursor()) as cursor:
+                    sql_get_entries = "SELECT * FROM tb_remote_manifest WHERE folder = ?"
+                    rows = cursor.execute(sql_get_entries, (str(folder),)).fetchall()
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, {row['path']: row for row in rows}
+
+    @staticmethod
+    def save_manifest(folder: Path, entries: List[tuple[str, int, int, str]]) -> tuple[bool, str]:
+        """
+        Replaces the manifest entries for a remote folder. Only the entries which changed are written.
+
+        :param folder: the path to the remote folder.
+        :param entries: the entries to save, as (path, size, mtime_ns, hash).
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the manifest is successfully saved.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        try:
+            with helpers.Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    helpers.Database.persist_rows(cursor, 'tb_remote_manifest', ('path', 'folder'),
+                                                  ('size', 'mtime_ns', 'hash'),
+                                                  [(path, str(folder), size, mtime_ns, content_hash)
+                                                   for path, size, mtime_ns, content_hash in entries],
+                                                  {'folder': str(folder)})
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        return True, 'Remote manifest saved for {}'.format(folder)
+
+    @staticmethod
+    def _read_note(folder: Path, file_name: str, remote_file: RemoteFile, row: sqlite3.Row | None,
+                   cache: bool) -> tuple[str, Note]:
+        """
+        Reads a remote note for ``iter_notes``. The note is served from ``PARSED_NOTES`` if the file did not change,
+        otherwise it is read and parsed.
+
+        :param folder: the path to the remote folder.
+        :param file_name: the name of the note file.
+        :param remote_file: the indexed note file.
+        :param row: the manifest entry for the file, or None if it has none.
+        :param cache: if False, the parsed note is not kept in memory.
+
+        :raises FileNotFoundError: if the file was removed since the folder was indexed.
+
+        :return: the hash of the file content, and the note.
+        """
+        cached = RemoteNoteManifest.PARSED_NOTES.get(remote_file.path)
+        if (row is not None and cached is not None and cached[0] == row['hash']
+                and row['size'] == remote_file.size and row['mtime_ns'] == remote_file.mtime_ns):
+            return row['hash'], copy.deepcopy(cached[1])
+        with open(remote_file.path, 'rb') as fp:
+            raw_content = fp.read()
+        content_hash = hashlib.sha256(raw_content).hexdigest()
+        if cached is not None and cached[0] == content_hash:
+            return content_hash, copy.deepcopy(cached[1])
+        unchanged = row is not None and row['hash'] == content_hash
+        note = Note.create_from_remote(raw_content.decode(), folder, file_name, load_images=not unchanged)
+        if cache:
+            RemoteNoteManifest.PARSED_NOTES[remote_file.path] = (content_hash, copy.deepcopy(note))
+        return content_hash, note
+
+    @staticmethod
+    def iter_notes(folder: Path, manifest: Dict[str, sqlite3.Row], cache: bool = True,
+                   names: Set[str] | None = None) -> Iterator[Note]:
+        """
+        Generates the Markdown notes in a remote folder one at a time, re-reading only the files which changed since
+        the manifest was last saved. The files in the folder are taken from the current ``RemoteTreeIndex``. Once all
+        notes have been generated, the manifest is updated with the files found.
+
+        :param folder: the path to the remote folder.
+        :param manifest: the manifest entries for the folder, as returned by ``load_manifest``.
+        :param cache: if False, parsed notes are not kept in memory, so that only the note being generated is held.
+        :param names: if given, only the notes with these names are generated. The manifest entries of the other files
+            are kept as they are.
+
+        :raises OSError: if the folder cannot be read or the manifest cannot be saved.
+
+        :return: a generator of the notes in the folder.
+        """
+        entries = []
+        tree_folder = RemoteTreeIndex.get_folder(folder)
+        for file_name, remote_file in tree_folder.notes.items():
+            row = manifest.get(remote_file.path)
+            if names is not None and file_name[:-len('.md')] not in names:
+                if row is not None:
+                    entries.append((remote_file.path, row['size'], row['mtime_ns'], row['hash']))
+                continue
+            try:
+                content_hash, note = RemoteNoteManifest._read_note(folder, file_name, remote_file, row, cache)
+            except FileNotFoundError:
+                # Removed since the folder was indexed
+                continue
+            note.created_date = datetime.fromtimestamp(remote_file.ctime)
+            note.modified_date = datetime.fromtimestamp(remote_file.mtime)
+            entries.append((remote_file.path, remote_file.size, remote_file.mtime_ns, content_hash))
+            yield note
+
+        # Forget parsed notes whose files no longer exist
+        found = {path for path, size, mtime_ns, content_hash in entries}
+        for path in manifest:
+            if path not in found:
+                RemoteNoteManifest.PARSED_NOTES.pop(path, None)
+
+        success, data = RemoteNoteManifest.save_manifest(folder, entries)
+        if not success:
+            raise OSError(data)
+
+    @staticmethod
+    def load_notes(folder: Path, names: Set[str] | None = None) -> tuple[bool, str] | tuple[bool, List[Note]]:
+        """
+        Loads the Markdown notes in a remote folder. See ``iter_notes``.
+
+        :param folder: the path to the remote folder.
+        :param names: if given, only the notes with these names are loaded.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if notes are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`List[Note]`) - error message on failure, or the notes in the folder.
+
+        """
+        success, manifest = RemoteNoteManifest.load_manifest(folder)
+        if not success:
+            return False, manifest
+        try:
+            notes = list(RemoteNoteManifest.iter_notes(folder, manifest, names=names))
+        except OSError as e:
+            return False, 'Failed to read remote notes in {0}: {1}'.format(folder, e)
+        return True, notes
+
+    @staticmethod
+    def reset_cache():
+        """
+        Clears the in-memory cache of parsed remote notes.
+        """
+        RemoteNoteManifest.PARSED_NOTES.clear()
@@ -0,0 +1,165 @@
+"""
+Contains the ``RemoteTreeIndex`` class, which indexes the remote notes folder in a single pass, and the
+``RemoteTreeFolder`` and ``RemoteFile`` classes which make up the index.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict
+
+
+class RemoteFile:
+    """
+    Represents a file in the remote notes folder, with the stat information gathered while indexing.
+    """
+
+    def __init__(self, path: str, size: int, mtime_ns: int, ctime: float, mtime: float):
+        """
+        Creates a new instance of RemoteFile.
+
+        :param path: the full path to the file.
+        :param size: the size of the file in bytes.
+        :param mtime_ns: the modification time of the file in nanoseconds.
+        :param ctime: the creation (metadata change) time of the file in seconds.
+        :param mtime: the modification time of the file in seconds.
+        """
+        self.path: str = path
+        self.size: int = size
+        self.mtime_ns: int = mtime_ns
+        self.ctime: float = ctime
+        self.mtime: float = mtime
+
+    @staticmethod
+    def from_entry(entry: os.DirEntry) -> RemoteFile:
+        """
+        Creates a RemoteFile from a directory entry returned by ``os.scandir``.
+
+        :param entry: the directory entry.
+        :return: a RemoteFile instance for the entry.
+        """
+        stat = entry.stat()
+        return RemoteFile(entry.path, stat.st_size, stat.st_mtime_ns, stat.st_ctime, stat.st_mtime)
+
+
+class RemoteTreeFolder:
+    """
+    Represents a folder in the remote notes folder, with its Markdown notes and attachment files.
+    """
+
+    def __init__(self, path: Path, name: str):
+        """
+        Creates a new instance of RemoteTreeFolder.
+
+        :param path: the path to the folder.
+        :param name: the name of the folder.
+        """
+        self.path: Path = path
+        self.name: str = name
+        #: Markdown notes in this folder, keyed by file name.
+        self.notes: Dict[str, RemoteFile] = {}
+        #: Attachment files in this folder, keyed by path relative to this folder.
+        self.attachments: Dict[str, RemoteFile] = {}
+
+    @staticmethod
+    def scan(path: Path, name: str) -> RemoteTreeFolder:
+        """
+        Indexes a single remote folder. Markdown files in the folder are added as notes, and files in its hidden
+        ``.attachments`` folders are added as attachments. Each file is only stat'ed once.
+
+        :param path: the path to the folder.
+        :param name: the name of the folder.
+        :return: the indexed folder.
+        """
+        folder = RemoteTreeFolder(path, name)
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_file():
+                    if os.path.splitext(entry.name)[1] == '.md' and not entry.name.startswith('.'):
+                        folder.notes[entry.name] = RemoteFile.from_entry(entry)
+                elif entry.is_dir() and entry.name.startswith('.attachments'):
+                    with os.scandir(entry.path) as att_it:
+                        for att_entry in att_it:
+                            if att_entry.is_file():
+                                folder.attachments[entry.name + '/' + att_entry.name] = RemoteFile.from_entry(att_entry)
+        return folder
+
+
+class RemoteTreeIndex:
+    """
+    Index of the remote notes folder, built with ``os.scandir`` in a single pass. The index lists the note folders at
+    the top level of the remote notes folder, together with their Markdown notes and attachments.
+
+    The index built for the current sync is kept in ``CURRENT``, so that every stage of the sync can reuse it rather than
+    scanning the filesystem again.
+    """
+
+    #: The index built for the current sync.
+    CURRENT: RemoteTreeIndex | None = None
+
+    def __init__(self, root: Path):
+        """
+        Creates a new, empty, instance of RemoteTreeIndex.
+
+        :param root: the remote notes folder.
+        """
+        self.root: Path = root
+        #: Note folders, keyed by name.
+        self.folders: Dict[str, RemoteTreeFolder] = {}
+
+    @staticmethod
+    def scan(root: Path) -> tuple[bool, str] | tuple[bool, RemoteTreeIndex]:
+        """
+        Builds an index of the remote notes folder.
+
+        :param root: the remote notes folder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the index is successfully built.
+
+            -data (:py:class:`str` | :py:class:`RemoteTreeIndex`) - error message on failure, or the index.
+
+        """
+        index = RemoteTreeIndex(root)
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.is_dir() and not entry.name.startswith('.'):
+                        index.folders[entry.name] = RemoteTreeFolder.scan(root / entry.name, entry.name)
+        except OSError as e:
+            return False, 'Failed to index remote notes folder {0}: {1}'.format(root, e)
+        return True, index
+
+    @staticmethod
+    def build(root: Path) -> tuple[bool, str] | tuple[bool, RemoteTreeIndex]:
+        """
+        Builds the index of the remote notes folder for the current sync, and makes it the ``CURRENT`` index.
+
+        :param root: the remote notes folder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the index is successfully built.
+
+            -data (:py:class:`str` | :py:class:`RemoteTreeIndex`) - error message on failure, or the index.
+
+        """
+        success, data = RemoteTreeIndex.scan(root)
+        if success:
+            RemoteTreeIndex.CURRENT = data
+        return success, data
+
+    @staticmethod
+    def get_folder(path: Path) -> RemoteTreeFolder:
+        """
+        Gets a remote folder from the ``CURRENT`` index. If the folder is not in the index, it is scanned instead.
+
+        :param path: the path to the folder.
+        :return: the indexed folder.
+        """
+        index = RemoteTreeIndex.CURRENT
+        if index is not None and path.parent == index.root and path.name in index.folders:
+            return index.folders[path.name]
+        return RemoteTreeFolder.scan(path, path.name)
@@ -0,0 +1,203 @@
+"""
+Contains the ``RemoteNoteWatcher`` class, which watches the remote notes folder for changes so that only the folders and
+notes which changed need to be synchronised.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Set
+
+from taskbridgeapp.notes.model.remotetree import RemoteTreeIndex
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+
+class RemoteNoteWatcher:
+    """
+    Watches the remote notes folder. Filesystem events are received from ``watchdog`` (which uses inotify on Linux) if
+    it is installed, otherwise the folder is polled. Events are coalesced into a set of dirty folders and notes, which is
+    handed to a callback once no further events have been received for the debounce period.
+
+    The dirty set is a dictionary keyed by remote folder name, with the set of changed note names as value. An empty
+    set means that the whole folder should be synchronised, such as when the folder itself or an attachment changed.
+
+    Events received while the callback is running are queued, and handed to the callback once it returns, so that
+    changes made during a synchronisation are not lost. The writes of the synchronisation itself are among them, but
+    the next run finds these notes unchanged, and writes nothing.
+    """
+
+    def __init__(self, remote_path: Path, callback: Callable[[Dict[str, Set[str]]], None], debounce: float = 2.0,
+                 poll_interval: float = 2.0, use_polling: bool = False):
+        """
+        Creates a new watcher.
+
+        :param remote_path: the remote notes folder.
+        :param callback: function which is called with the dirty set once changes settle.
+        :param debounce: number of seconds without events to wait before calling ``callback``.
+        :param poll_interval: number of seconds between scans when polling.
+        :param use_polling: if True, the folder is polled even if ``watchdog`` is available.
+        """
+        self.remote_path: Path = remote_path
+        self.callback: Callable[[Dict[str, Set[str]]], None] = callback
+        self.debounce: float = debounce
+        self.poll_interval: float = poll_interval
+        self.use_polling: bool = use_polling or Observer is None
+        self.dirty: Dict[str, Set[str]] = {}
+        self.pending: Dict[str, Set[str]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._observer = None
+        self._poll_thread: threading.Thread | None = None
+        self._stop: threading.Event = threading.Event()
+        self._syncing: threading.Event = threading.Event()
+        self._snapshot: Dict[str, tuple[int, int, bool]] = {}
+
+    def start(self) -> None:
+        """
+        Starts watching the remote notes folder.
+        """
+        self._stop.clear()
+        if self.use_polling:
+            self._snapshot = self.scan()
+            self._poll_thread = threading.Thread(target=self._poll, daemon=True)
+            self._poll_thread.start()
+            logging.debug('Polling remote notes folder {} for changes.'.format(self.remote_path))
+        else:
+            self._observer = Observer()
+            self._observer.schedule(self, str(self.remote_path), recursive=True)
+            self._observer.start()
+            logging.debug('Watching remote notes folder {} for changes.'.format(self.remote_path))
+
+    def stop(self) -> None:
+        """
+        Stops watching the remote notes folder. Any pending changes are discarded.
+        """
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+            self._poll_thread = None
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.dirty = {}
+            self.pending = {}
+
+    def dispatch(self, event) -> None:
+        """
+        Receives a ``watchdog`` event and marks the affected paths as dirty.
+
+        :param event: the filesystem event.
+        """
+        if event.is_directory and event.event_type == 'modified':
+            # Changes within a folder are reported for the files themselves
+            return
+        self.mark_dirty(event.src_path)
+        if getattr(event, 'dest_path', ''):
+            self.mark_dirty(event.dest_path)
+
+    def mark_dirty(self, path: str) -> None:
+        """
+        Marks the folder and note at the given path as dirty, and restarts the debounce timer. While the callback is
+        running, the change is queued instead.
+
+        :param path: the path which changed.
+        """
+        try:
+            parts = Path(path).relative_to(self.remote_path).parts
+        except ValueError:
+            return
+        if len(parts) == 0 or parts[0].startswith('.'):
+            return
+
+        f_name, f_ext = os.path.splitext(parts[1] if len(parts) > 1 else '')
+        if len(parts) == 2 and f_ext == '.md' and not f_name.startswith('.'):
+            note = f_name
+        elif len(parts) == 1 or parts[1] == '.attachments':
+            # Folders and attachments trigger a sync of the whole folder
+            note = ''
+        else:
+            return
+
+        with self._lock:
+            if self._syncing.is_set():
+                self.pending.setdefault(parts[0], set()).add(note)
+                return
+            self.dirty.setdefault(parts[0], set()).add(note)
+            self._restart_timer()
+
+    def _restart_timer(self) -> None:
+        """
+        Restarts the debounce timer. Must be called with the lock held.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.debounce, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Hands the current dirty set to the callback, and starts a new one. Changes queued while the callback was running
+        are then marked as dirty.
+        """
+        with self._lock:
+            dirty = self.dirty
+            self.dirty = {}
+            self._timer = None
+        if len(dirty) == 0:
+            return
+        for folder, notes in dirty.items():
+            if '' in notes:
+                notes.clear()
+        self._syncing.set()
+        try:
+            self.callback(dirty)
+        finally:
+            with self._lock:
+                self._syncing.clear()
+                for folder, notes in self.pending.items():
+                    self.dirty.setdefault(folder, set()).update(notes)
+                if len(self.pending) > 0 and not self._stop.is_set():
+                    self._restart_timer()
+                self.pending = {}
+
+    def scan(self) -> Dict[str, tuple[int, int, bool]]:
+        """
+        Scans the remote notes folder with ``RemoteTreeIndex``.
+
+        :return: the size, modification time in nanoseconds and whether it is a folder for each path, keyed by path.
+        """
+        snapshot = {}
+        success, index = RemoteTreeIndex.scan(self.remote_path)
+        if not success:
+            return snapshot
+        for folder in index.folders.values():
+            snapshot[str(folder.path)] = (0, 0, True)
+            for remote_file in list(folder.notes.values()) + list(folder.attachments.values()):
+                snapshot[remote_file.path] = (remote_file.size, remote_file.mtime_ns, False)
+        return snapshot
+
+    def _poll(self) -> None:
+        """
+        Scans the remote notes folder every ``poll_interval`` seconds, marking changed paths as dirty.
+        """
+        while not self._stop.wait(self.poll_interval):
+            snapshot = self.scan()
+            for path in snapshot.keys() | self._snapshot.keys():
+                current, previous = snapshot.get(path), self._snapshot.get(path)
+                # Folders are only dirty when added or removed, changes within them are reported for the files
+                if current != previous and (current is None or previous is None or not current[2]):
+                    self.mark_dirty(path)
+            self._snapshot = snapshot
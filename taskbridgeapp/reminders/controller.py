@@ -11,6 +11,7 @@ import caldav
 
 
 from taskbridgeapp import helpers
+from taskbridgeapp.reminders.model.changeplan import ReminderChangePlan
 from taskbridgeapp.reminders.model.remindercontainer import ReminderContainer
 
 
@@ -33,6 +34,8 @@ class ReminderController:
     CALDAV_HEADERS = {}
     #: List of reminder lists to be synchronised
     TO_SYNC = []
+    #: If set, the change plans of every container are exported to this JSON file after sync
+    PLAN_FILE = None
 
     @staticmethod
     def fetch_local_reminders() -> tuple[bool, str]:
@@ -103,6 +106,7 @@ class ReminderController:
         return True, debug_msg
 
     @staticmethod
+    @helpers.Database.stage
     def sync_deleted_containers() -> tuple[bool, str]:
         """
         Synchronise deleted local reminder lists / remote task calendars.
@@ -132,6 +136,7 @@ class ReminderController:
         return True, debug_msg
 
     @staticmethod
+    @helpers.Database.stage
     def associate_containers() -> tuple[bool, str] | tuple[bool, List[ReminderContainer]]:
         """
         Associate local reminder lists with remote task calendars.
@@ -158,6 +163,7 @@ class ReminderController:
         return True, ReminderContainer.CONTAINER_LIST
 
     @staticmethod
+    @helpers.Database.stage
     def sync_deleted_reminders() -> tuple[bool, str]:
         """
         Synchronise deleted reminders.
@@ -181,6 +187,7 @@ class ReminderController:
         return True, debug_msg
 
     @staticmethod
+    @helpers.Database.stage
     def sync_reminders() -> tuple[bool, str] | tuple[bool, dict]:
         """
         Synchronise reminders. Returns a dictionary with the following keys:
@@ -208,6 +215,17 @@ class ReminderController:
                 error = 'Failed to sync reminders {}'.format(data)
                 logging.critical(error)
                 return False, error
+        success, message = helpers.SearchIndex.retain(
+            helpers.SearchIndex.REMINDER,
+            [container.local_list.name for container in ReminderContainer.CONTAINER_LIST if container.sync])
+        if not success:
+            logging.warning(message)
+        if ReminderController.PLAN_FILE:
+            success, message = ReminderChangePlan.export(
+                [plan for container in ReminderContainer.CONTAINER_LIST for plan in container.plans],
+                ReminderController.PLAN_FILE)
+            if not success:
+                logging.warning(message)
         debug_msg = ("Reminder synchronisation:: Remote Added: {} | Remote Updated: {} | Local Added: {} | Local Updated: {"
                      "}").format(
             ','.join(data['remote_added'] if 'remote_added' in data else ['No remote reminders added']),
@@ -218,6 +236,7 @@ class ReminderController:
         return True, data
 
     @staticmethod
+    @helpers.Database.stage
     def sync_reminders_to_db() -> tuple[bool, str]:
         """
         Save list of reminders to SQLite database.
@@ -0,0 +1,526 @@
+"""
+Contains the ``ReminderChangePlan`` class, which lists the changes to be made to the reminders of a container, and the
+``ReminderPlanExecutor`` class, which carries them out. Reminders are compared first, and all the changes are then
+written together: local changes in bulk AppleScript invocations, and remote changes concurrently.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, List
+
+import taskbridgeapp.reminders.model.remindercontainer as container_model
+import taskbridgeapp.reminders.model.reminder as model
+from taskbridgeapp import helpers
+
+
+class ReminderChange:
+    """
+    A change to one reminder, on one side of a container.
+    """
+
+    #: The change is made to the local list.
+    LOCAL: str = 'local'
+
+    #: The change is made to the remote calendar.
+    REMOTE: str = 'remote'
+
+    #: The reminder is added.
+    CREATE: str = 'create'
+
+    #: The reminder is updated.
+    UPDATE: str = 'update'
+
+    #: The reminder is deleted.
+    DELETE: str = 'delete'
+
+    def __init__(self, side: str, operation: str, reminder: model.Reminder, source: model.Reminder | None = None,
+                 field_hash: str | None = None, modified: tuple[float | None, float | None] = (None, None)):
+        """
+        Create a new change.
+
+        :param side: ``LOCAL`` or ``REMOTE``.
+        :param operation: ``CREATE``, ``UPDATE`` or ``DELETE``.
+        :param reminder: the reminder to write, or to delete.
+        :param source: the reminder on the other side which is written, if any. When a local reminder is written, the
+            UID of this remote reminder is then set to the UUID of the local reminder.
+        :param field_hash: the field hash of the pair once the change is made.
+        :param modified: the local and remote modification timestamp of the pair once the change is made.
+        """
+        self.side: str = side
+        self.operation: str = operation
+        self.reminder: model.Reminder = reminder
+        self.source: model.Reminder | None = source
+        self.field_hash: str | None = field_hash
+        self.modified: tuple[float | None, float | None] = modified
+
+    def result_key(self) -> str:
+        """
+        Gets the key of the sync results where this change is reported.
+
+        :return: the key, such as ``remote_added`` or ``deleted_local_reminders``.
+        """
+        if self.operation == ReminderChange.DELETE:
+            return 'deleted_{}_reminders'.format(self.side)
+        return '{0}_{1}'.format(self.side, 'added' if self.operation == ReminderChange.CREATE else 'updated')
+
+    def journal_entry(self) -> tuple[str, str]:
+        """
+        Gets this change as an operation of the sync journal.
+
+        :return: the side and operation, and the UUID of the reminder, or its name if it has none.
+        """
+        return '{0}_{1}'.format(self.side, self.operation), self.reminder.uuid or self.reminder.name
+
+    def to_dict(self) -> dict:
+        """
+        Gets this change as a dictionary which can be exported as JSON.
+
+        :return: the side, operation, name and UUID of the reminder, and the UUID of the reminder it is written from.
+        """
+        return {
+            'side': self.side,
+            'operation': self.operation,
+            'name': self.reminder.name,
+            'uuid': self.reminder.uuid,
+            'source_uuid': self.source.uuid if self.source is not None else None
+        }
+
+
+class ReminderChangePlan:
+    """
+    The complete list of changes to be made to the reminders of a container, on both sides. A plan is built without
+    writing anything, and is then carried out by ``ReminderPlanExecutor``.
+    """
+
+    def __init__(self, local_name: str | None, remote_name: str | None):
+        """
+        Create a new, empty, plan.
+
+        :param local_name: the name of the local list of the container.
+        :param remote_name: the name of the remote calendar of the container.
+        """
+        self.local_name: str | None = local_name
+        self.remote_name: str | None = remote_name
+        self.changes: List[ReminderChange] = []
+
+    def add(self, change: ReminderChange) -> None:
+        """
+        Adds a change to this plan.
+
+        :param change: the change to add.
+        """
+        self.changes.append(change)
+
+    def changes_for(self, side: str, *operations: str) -> List[ReminderChange]:
+        """
+        Gets the changes made to one side, in the order they were planned.
+
+        :param side: ``ReminderChange.LOCAL`` or ``ReminderChange.REMOTE``.
+        :param operations: if given, only changes with these operations are returned.
+        :return: the changes.
+        """
+        return [change for change in self.changes
+                if change.side == side and (len(operations) == 0 or change.operation in operations)]
+
+    def to_dict(self) -> dict:
+        """
+        Gets this plan as a dictionary which can be exported as JSON.
+
+        :return: the names of the container and its changes.
+        """
+        return {
+            'local': self.local_name,
+            'remote': self.remote_name,
+            'changes': [change.to_dict() for change in self.changes]
+        }
+
+    def to_json(self) -> str:
+        """
+        Gets this plan as JSON.
+
+        :return: the plan as a JSON string.
+        """
+        return json.dumps(self.to_dict(), indent=2)
+
+    @staticmethod
+    def export(plans: List[ReminderChangePlan], path: Path) -> tuple[bool, str]:
+        """
+        Writes several plans to a JSON file, for inspection.
+
+        :param plans: the plans to export.
+        :param path: the file to write.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the plans are successfully exported.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        try:
+            with open(path, 'w') as fp:
+                json.dump([plan.to_dict() for plan in plans], fp, indent=2)
+        except OSError as e:
+            return False, 'Failed to export reminder change plan to {0}: {1}'.format(path, e)
+        return True, 'Reminder change plan exported to {}'.format(path)
+
+    def __len__(self):
+        return len(self.changes)
+
+
+class ReminderPlanExecutor:
+    """
+    Carries out a ``ReminderChangePlan``. Local writes are made in one bulk AppleScript invocation, as are local
+    deletions. Remote writes and deletions, and the UID updates of remote reminders which were written locally, are then
+    made concurrently, in up to ``MAX_REMOTE_WORKERS`` threads.
+
+    Changes are recorded in the ``SyncJournal`` as they are made. If a sync is interrupted, deletions which were made
+    are not made again, and the field hashes of the pairs which were written are restored by
+    ``ReminderContainer.load_synced_hashes``.
+    """
+
+    #: The maximum number of remote changes made at the same time.
+    MAX_REMOTE_WORKERS: int = 8
+
+    #: The journal stage of reminder writes.
+    WRITE_JOURNAL: str = 'reminder_writes'
+
+    #: The journal stage of reminder deletions.
+    DELETE_JOURNAL: str = 'reminder_deletions'
+
+    @staticmethod
+    def _delete_remote(container: container_model.ReminderContainer, reminder: model.Reminder) -> tuple[bool, str]:
+        """
+        Deletes a remote reminder.
+
+        :param container: the reminder container.
+        :param reminder: the remote reminder.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the reminder is successfully deleted.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        to_delete = container.remote_calendar.cal_obj.search(todo=True, uid=reminder.uuid)
+        if len(to_delete) == 0:
+            return False, 'Failed to delete remote reminder {0} ({1})'.format(reminder.uuid, reminder.name)
+        to_delete[0].delete()
+        return True, 'Remote reminder deleted: {}'.format(reminder.name)
+
+    @staticmethod
+    def _fail(message: str) -> tuple[bool, str]:
+        """
+        Stands in for a change which is intentionally failed (used for test coverage).
+
+        :param message: the error message.
+        :return: failure, with the error message.
+        """
+        return False, message
+
+    @staticmethod
+    def _complete_journal(entries: List[tuple[int, dict | None]]) -> None:
+        """
+        Marks the journal entries of changes which were made as done. The changes are made whether or not this succeeds,
+        so a failure is logged rather than reported as the outcome of the changes; their entries are then still planned
+        if this sync is interrupted, and the changes are made again when it is resumed.
+
+        :param entries: the ID of the journal entry of each change, and what the change records in the journal.
+        """
+        success, data = helpers.SyncJournal.complete(entries)
+        if not success:
+            logging.warning('Failed to complete sync journal entries: {}'.format(data))
+
+    @staticmethod
+    def _journalled(task: Callable[[], tuple[bool, str]], entry_id: int, data: dict | None) -> tuple[bool, str]:
+        """
+        Makes a change, and marks its journal entry as done if it succeeds.
+
+        :param task: the change.
+        :param entry_id: the ID of the journal entry of the change.
+        :param data: what the change records in the journal.
+        :return: the result of the change.
+        """
+        success, message = task()
+        if success:
+            ReminderPlanExecutor._complete_journal([(entry_id, data)])
+        return success, message
+
+    @staticmethod
+    def _journal_data(change: ReminderChange, uuid: str) -> dict | None:
+        """
+        Gets what a change records in the journal, which is the field hash of the pair once it is written.
+
+        :param change: the change.
+        :param uuid: the UUID of the local reminder of the pair.
+        :return: the UUID, field hash and modification timestamps, or None for deletions.
+        """
+        if change.operation == ReminderChange.DELETE or change.field_hash is None:
+            return None
+        return {'uuid': uuid, 'hash': change.field_hash, 'modified': list(change.modified)}
+
+    @staticmethod
+    def _run_remote(tasks: List[Callable[[], tuple[bool, str]]]) -> List[tuple[bool, str]]:
+        """
+        Runs remote changes concurrently.
+
+        :param tasks: the remote changes.
+        :return: the result of each change, in the same order.
+        """
+        if len(tasks) <= 1:
+            return [task() for task in tasks]
+        with ThreadPoolExecutor(max_workers=min(len(tasks), ReminderPlanExecutor.MAX_REMOTE_WORKERS)) as pool:
+            futures = [pool.submit(task) for task in tasks]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _record(container: container_model.ReminderContainer, change: ReminderChange, uuid: str, result: dict) -> None:
+        """
+        Records a change which was made.
+
+        :param container: the reminder container.
+        :param change: the change.
+        :param uuid: the UUID of the local reminder of the pair.
+        :param result: dictionary where changes are appended.
+        """
+        if change.operation == ReminderChange.DELETE:
+            reminders, index = ((container.local_reminders, container.local_index)
+                                if change.side == ReminderChange.LOCAL else
+                                (container.remote_reminders, container.remote_index))
+            if change.reminder in reminders:
+                reminders.remove(change.reminder)
+            index.remove(change.reminder)
+            result[change.result_key()].append(change.reminder)
+            return
+        if change.field_hash is not None:
+            container.recorded_hashes[uuid] = change.field_hash
+            container.recorded_modified[uuid] = change.modified
+        if change.side == ReminderChange.LOCAL:
+            container.written_reminders[uuid] = change.reminder
+        result[change.result_key()].append(change.reminder.name)
+
+    @staticmethod
+    def _journal_plan(plan: ReminderChangePlan, scope: str,
+                      outcomes: dict) -> tuple[bool, str] | tuple[bool, tuple[dict, List[str]]]:
+        """
+        Journals the changes of a plan before they are made. Deletions made by an interrupted sync are not journalled
+        again: they are reported as made in ``outcomes`` instead.
+
+        :param plan: the plan to carry out.
+        :param scope: the journal scope of the plan.
+        :param outcomes: the outcome of each change, by ID of its reminder, which is updated in place.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the changes are successfully journalled.
+
+            -data (:py:class:`str` | :py:class:`tuple`) - error message on failure, or the journal entry ID of each
+            change, by ID of its reminder, and the journals which were written.
+
+        """
+        success, data = helpers.SyncJournal.completed(ReminderPlanExecutor.DELETE_JOURNAL, scope)
+        if not success:
+            return False, 'Failed to read sync journal: {}'.format(data)
+        for change in plan.changes:
+            if change.operation == ReminderChange.DELETE and change.journal_entry() in data:
+                outcomes[id(change.reminder)] = (True, change.reminder.uuid)
+
+        entry_ids = {}
+        journals = []
+        for journal, deletions in ((ReminderPlanExecutor.DELETE_JOURNAL, True),
+                                   (ReminderPlanExecutor.WRITE_JOURNAL, False)):
+            changes = [change for change in plan.changes if (change.operation == ReminderChange.DELETE) == deletions]
+            if len(changes) == 0:
+                continue
+            journals.append(journal)
+            changes = [change for change in changes if id(change.reminder) not in outcomes]
+            success, data = helpers.SyncJournal.plan(journal, scope, [change.journal_entry() for change in changes])
+            if not success:
+                return False, 'Failed to write sync journal: {}'.format(data)
+            entry_ids.update(zip((id(change.reminder) for change in changes), data))
+        return True, (entry_ids, journals)
+
+    @staticmethod
+    def _apply_local_writes(container: container_model.ReminderContainer, plan: ReminderChangePlan, outcomes: dict,
+                            entry_ids: dict, fail: str = None) -> tuple[bool, str]:
+        """
+        Makes the local writes of a plan, in one invocation.
+
+        :param container: the reminder container.
+        :param plan: the plan to carry out.
+        :param outcomes: the outcome of each change, by ID of its reminder, which is updated in place.
+        :param entry_ids: the journal entry ID of each change, by ID of its reminder.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the writes are made, even if some reminders failed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        local_writes = plan.changes_for(ReminderChange.LOCAL, ReminderChange.CREATE, ReminderChange.UPDATE)
+        if len(local_writes) == 0:
+            return True, 'No local writes.'
+        success, data = model.Reminder.upsert_local_bulk(container.local_list.name,
+                                                         [change.reminder for change in local_writes])
+        if not success or fail in ['fail_upsert_local', 'fail_upsert']:
+            return False, data
+        written = {id(reminder): uuid for reminder, uuid in data['written']}
+        for reminder, error in data['failed']:
+            outcomes[id(reminder)] = (False, error)
+        for change in local_writes:
+            if id(change.reminder) in written:
+                outcomes[id(change.reminder)] = (True, written[id(change.reminder)])
+        ReminderPlanExecutor._complete_journal([(entry_ids[id(change.reminder)], ReminderPlanExecutor._journal_data(
+            change, written[id(change.reminder)])) for change in local_writes if id(change.reminder) in written])
+        return True, '{} local reminders written.'.format(len(written))
+
+    @staticmethod
+    def _apply_local_deletions(plan: ReminderChangePlan, outcomes: dict, entry_ids: dict,
+                               fail: str = None) -> tuple[bool, str]:
+        """
+        Makes the local deletions of a plan which were not made by an interrupted sync, in one invocation.
+
+        :param plan: the plan to carry out.
+        :param outcomes: the outcome of each change, by ID of its reminder, which is updated in place.
+        :param entry_ids: the journal entry ID of each change, by ID of its reminder.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the deletions are made, even if some reminders failed.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        local_deletions = [change for change in plan.changes_for(ReminderChange.LOCAL, ReminderChange.DELETE)
+                           if id(change.reminder) not in outcomes]
+        if len(local_deletions) == 0:
+            return True, 'No local deletions.'
+        success, data = model.Reminder.delete_local_bulk([change.reminder for change in local_deletions])
+        if not success or fail == 'fail_delete_local':
+            return False, 'Failed to delete local reminders: {}'.format(data)
+        for reminder in data['deleted']:
+            outcomes[id(reminder)] = (True, reminder.uuid)
+        ReminderPlanExecutor._complete_journal([(entry_ids[id(reminder)], None) for reminder in data['deleted']])
+        for reminder, error in data['failed']:
+            outcomes[id(reminder)] = (False, 'Failed to delete local reminder {0} ({1}): {2}'.format(
+                reminder.uuid, reminder.name, error))
+        return True, '{} local reminders deleted.'.format(len(data['deleted']))
+
+    @staticmethod
+    def _remote_task(container: container_model.ReminderContainer, change: ReminderChange, outcomes: dict,
+                     entry_ids: dict, fail: str = None) -> Callable[[], tuple[bool, str]] | None:
+        """
+        Gets the remote part of a change: the remote write or deletion, or the UID update of a remote reminder which was
+        written locally.
+
+        :param container: the reminder container.
+        :param change: the change.
+        :param outcomes: the outcome of each change, by ID of its reminder.
+        :param entry_ids: the journal entry ID of each change, by ID of its reminder.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+        :return: the remote part of the change, or None if it has none, or was already made.
+        """
+        outcome = outcomes.get(id(change.reminder))
+        if change.side == ReminderChange.REMOTE:
+            if outcome is not None:
+                return None
+            if change.operation == ReminderChange.DELETE:
+                task = partial(ReminderPlanExecutor._delete_remote, container, change.reminder)
+            elif fail != 'fail_upsert_remote':
+                task = partial(change.reminder.upsert_remote, container)
+            else:
+                task = partial(ReminderPlanExecutor._fail, 'Failed to upsert remote reminder')
+            return partial(ReminderPlanExecutor._journalled, task, entry_ids[id(change.reminder)],
+                           ReminderPlanExecutor._journal_data(change, change.reminder.uuid))
+        if change.operation == ReminderChange.DELETE or outcome is None or not outcome[0]:
+            return None
+        if fail in ['fail_update_uuid', 'fail_uuid']:
+            return partial(ReminderPlanExecutor._fail, 'Failed to update remote reminder UID')
+        return partial(change.source.update_uuid, container, outcome[1])
+
+    @staticmethod
+    def _run_remote_changes(container: container_model.ReminderContainer, plan: ReminderChangePlan, outcomes: dict,
+                            entry_ids: dict, fail: str = None) -> None:
+        """
+        Makes the remote changes of a plan, and updates the UIDs of remote reminders written locally, concurrently.
+
+        :param container: the reminder container.
+        :param plan: the plan to carry out.
+        :param outcomes: the outcome of each change, by ID of its reminder, which is updated in place.
+        :param entry_ids: the journal entry ID of each change, by ID of its reminder.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+        """
+        remote_changes = []
+        tasks = []
+        for change in plan.changes:
+            task = ReminderPlanExecutor._remote_task(container, change, outcomes, entry_ids, fail)
+            if task is not None:
+                remote_changes.append(change)
+                tasks.append(task)
+        for change, outcome in zip(remote_changes, ReminderPlanExecutor._run_remote(tasks)):
+            if change.side == ReminderChange.REMOTE or not outcome[0]:
+                outcomes[id(change.reminder)] = outcome
+
+    @staticmethod
+    def execute(container: container_model.ReminderContainer, plan: ReminderChangePlan, result: dict,
+                fail: str = None) -> tuple[bool, str]:
+        """
+        Carries out a plan. Changes which are made are reported in ``result``, and the field hashes of the pairs which
+        are written are recorded in the container. If a change fails, the other changes are still made, and the first
+        error, in the order of the plan, is returned. A change without an outcome is a failure.
+
+        :param container: the reminder container.
+        :param plan: the plan to carry out.
+        :param result: dictionary where changes are appended.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if all changes are successfully made.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        outcomes = {}
+        scope = plan.local_name or ''
+
+        # Changes are journalled before they are made
+        success, data = ReminderPlanExecutor._journal_plan(plan, scope, outcomes)
+        if not success:
+            return False, data
+        entry_ids, journals = data
+
+        success, data = ReminderPlanExecutor._apply_local_writes(container, plan, outcomes, entry_ids, fail)
+        if not success:
+            return False, data
+        success, data = ReminderPlanExecutor._apply_local_deletions(plan, outcomes, entry_ids, fail)
+        if not success:
+            return False, data
+        ReminderPlanExecutor._run_remote_changes(container, plan, outcomes, entry_ids, fail)
+
+        errors = []
+        for change in plan.changes:
+            success, data = outcomes.get(id(change.reminder), (False, 'No outcome for reminder change: {}'.format(
+                change.reminder.name)))
+            if not success:
+                errors.append(data)
+            elif change.side == ReminderChange.LOCAL:
+                ReminderPlanExecutor._record(container, change, data, result)
+            else:
+                ReminderPlanExecutor._record(container, change, change.reminder.uuid, result)
+        if len(errors) > 0:
+            return False, errors[0]
+
+        # The journal is kept until the changes are recorded
+        for journal in journals:
+            helpers.Database.after_commit(partial(helpers.SyncJournal.finish, journal, scope))
+        return True, '{} reminder changes made.'.format(len(plan))
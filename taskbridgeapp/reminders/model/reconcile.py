@@ -0,0 +1,228 @@
+"""
+Contains the ``ReminderIndex`` class, which indexes the reminders of one side of a container by UUID and name, and the
+``ReminderColumns`` class, which holds the metadata of one side of a container in columns.
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+from array import array
+from typing import Dict, Iterable, List
+
+import taskbridgeapp.reminders.model.reminder as model
+
+
+class ReminderIndex:
+    """
+    Hash index of a list of reminders, by UUID and by name. Reminders are found by UUID first, so that renamed
+    reminders are still found, and by name otherwise.
+
+    The index is built once after the reminders of a container are loaded, and is kept up to date as reminders are
+    added to or removed from the container during sync.
+    """
+
+    def __init__(self, reminders: Iterable[model.Reminder]):
+        """
+        Builds the index.
+
+        :param reminders: the reminders to index.
+        """
+        self.by_uuid: Dict[str, model.Reminder] = {}
+        self.by_name: Dict[str, model.Reminder] = {}
+        for reminder in reminders:
+            self.add(reminder)
+
+    def add(self, reminder: model.Reminder) -> None:
+        """
+        Adds a reminder to the index. If another reminder already has the UUID or name, that reminder is kept.
+
+        :param reminder: the reminder to add.
+        """
+        if reminder.uuid:
+            self.by_uuid.setdefault(reminder.uuid, reminder)
+        self.by_name.setdefault(reminder.name, reminder)
+
+    def remove(self, reminder: model.Reminder) -> None:
+        """
+        Removes a reminder from the index.
+
+        :param reminder: the reminder to remove.
+        """
+        if reminder.uuid and self.by_uuid.get(reminder.uuid) is reminder:
+            del self.by_uuid[reminder.uuid]
+        if self.by_name.get(reminder.name) is reminder:
+            del self.by_name[reminder.name]
+
+    def find(self, uuid: str | None, name: str | None) -> model.Reminder | None:
+        """
+        Finds a reminder by UUID, or by name if no reminder has the UUID.
+
+        :param uuid: the UUID of the reminder.
+        :param name: the name of the reminder.
+        :return: the reminder, or None if no reminder has the UUID or name.
+        """
+        reminder = self.by_uuid.get(uuid) if uuid else None
+        if reminder is None and name:
+            reminder = self.by_name.get(name)
+        return reminder
+
+    def contains(self, uuid: str | None, name: str | None) -> bool:
+        """
+        Checks whether a reminder with the UUID or name is in the index.
+
+        :param uuid: the UUID of the reminder.
+        :param name: the name of the reminder.
+        :return: True if a reminder has the UUID or name.
+        """
+        return (bool(uuid) and uuid in self.by_uuid) or (bool(name) and name in self.by_name)
+
+
+class ReminderColumns:
+    """
+    Columnar snapshot of the metadata of one side of a container: the UUID, name, modification timestamp and field hash
+    of each reminder, in lists which follow the order of the reminders. Pairing the two sides and deciding which side of
+    each pair to write are done in single passes over the columns, and the reminder objects themselves are only used
+    for the pairs which need to be written.
+
+    Field hashes are only computed when needed. A reminder whose modification time is the one recorded after the last
+    sync has not changed since, so the hash recorded then is used instead.
+    """
+
+    #: Both reminders have the same fields, so nothing is written.
+    EQUAL: int = 0
+
+    #: The local reminder is written to remote.
+    PUSH: int = 1
+
+    #: The remote reminder is written to local.
+    PULL: int = 2
+
+    #: Both reminders changed at the same time, so nothing is written.
+    NONE: int = 3
+
+    def __init__(self, reminders: List[model.Reminder]):
+        """
+        Builds the columns.
+
+        :param reminders: the reminders of one side of a container.
+        """
+        self.reminders: List[model.Reminder] = reminders
+        self.uuids: List[str | None] = [reminder.uuid for reminder in reminders]
+        self.names: List[str] = [reminder.name for reminder in reminders]
+        self.modified: array = array('d', [ReminderColumns.timestamp(reminder.modified_date) for reminder in reminders])
+        self.hashes: List[str | None] = [None] * len(reminders)
+
+    @staticmethod
+    def timestamp(date: datetime.datetime | None) -> float:
+        """
+        Gets a modification date as a timestamp, which is compared to the one recorded after the last sync to tell
+        whether a reminder changed since.
+
+        :param date: the modification date.
+        :return: the timestamp, or NaN if there is no date, which never matches a recorded timestamp.
+        """
+        return date.timestamp() if isinstance(date, datetime.datetime) else math.nan
+
+    @staticmethod
+    def stored_time(modified: float) -> float | None:
+        """
+        Gets a modification time as it is recorded after sync.
+
+        :param modified: the modification time, as returned by ``timestamp``.
+        :return: the modification time, or None if there is no date.
+        """
+        return None if math.isnan(modified) else modified
+
+    def field_hash(self, position: int) -> str:
+        """
+        Gets the field hash of a reminder, computing it the first time it is needed.
+
+        :param position: the position of the reminder.
+        :return: the field hash of the reminder.
+        """
+        field_hash = self.hashes[position]
+        if field_hash is None:
+            field_hash = self.hashes[position] = self.reminders[position].field_hash()
+        return field_hash
+
+    def pair(self, other: ReminderColumns) -> List[int]:
+        """
+        Pairs each reminder on this side with one on the other side, by UUID first and by name otherwise, as
+        ``ReminderIndex.find`` does.
+
+        :param other: the columns of the other side.
+        :return: for each reminder on this side, the position of its counterpart in ``other``, or -1 if there is none.
+        """
+        # Positions are added last to first, so that the first reminder with a UUID or name is kept
+        by_uuid = {uuid: position for position, uuid in reversed(list(enumerate(other.uuids))) if uuid}
+        by_name = {name: position for position, name in reversed(list(enumerate(other.names)))}
+        pairs = [by_uuid.get(uuid, -1) if uuid else -1 for uuid in self.uuids]
+        return [by_name.get(name, -1) if position < 0 and name else position
+                for position, name in zip(pairs, self.names)]
+
+    def decide(self, remote: ReminderColumns, pairs: List[int], synced_hashes: Dict[str, str],
+               synced_modified: Dict[str, tuple[float | None, float | None]],
+               skip_equal: bool = True) -> List[int]:
+        """
+        Decides which side of each pair of reminders is written. This side is the local side. The field hashes are
+        compared to the one recorded after the last sync, so that only the side which changed is written; if there is
+        no recorded hash, or both sides changed, the newer reminder is written.
+
+        :param remote: the columns of the remote side.
+        :param pairs: the pairs, as returned by ``pair``.
+        :param synced_hashes: the field hash of each pair after the last sync, by local UUID.
+        :param synced_modified: the local and remote modification timestamp of each pair after the last sync, by local
+            UUID.
+        :param skip_equal: if False, pairs with the same fields are decided as any other pair instead of ``EQUAL``.
+        :return: for each local reminder, one of ``EQUAL``, ``PUSH``, ``PULL`` or ``NONE``.
+        """
+        no_times = (None, None)
+        local_hashes, local_modified = self.hashes, self.modified
+        remote_hashes, remote_modified = remote.hashes, remote.modified
+        decisions = []
+        for position, (uuid, remote_position) in enumerate(zip(self.uuids, pairs)):
+            if remote_position < 0:
+                decisions.append(ReminderColumns.PUSH)
+                continue
+
+            # A side whose timestamp is the one recorded after the last sync still has the recorded hash
+            synced_hash = synced_hashes.get(uuid)
+            synced_local, synced_remote = synced_modified.get(uuid, no_times) if synced_hash else no_times
+            if synced_local is not None and local_modified[position] == synced_local:
+                local_hash = local_hashes[position] = synced_hash
+            else:
+                local_hash = self.field_hash(position)
+            if synced_remote is not None and remote_modified[remote_position] == synced_remote:
+                remote_hash = remote_hashes[remote_position] = synced_hash
+            else:
+                remote_hash = remote.field_hash(remote_position)
+
+            if skip_equal and local_hash == remote_hash:
+                decisions.append(ReminderColumns.EQUAL)
+            elif synced_hash == remote_hash:
+                decisions.append(ReminderColumns.PUSH)
+            elif synced_hash == local_hash:
+                decisions.append(ReminderColumns.PULL)
+            else:
+                decisions.append(ReminderColumns.newer(self.reminders[position].modified_date,
+                                                       remote.reminders[remote_position].modified_date))
+        return decisions
+
+    @staticmethod
+    def newer(local_date: datetime.datetime | None, remote_date: datetime.datetime | None) -> int:
+        """
+        Decides which side of a pair is written from the modification dates alone. Time zones are ignored.
+
+        :param local_date: the modification date of the local reminder.
+        :param remote_date: the modification date of the remote reminder.
+        :return: ``PUSH`` if the local reminder is newer, ``PULL`` if the remote reminder is newer, or ``NONE``.
+        """
+        if not isinstance(local_date, datetime.datetime) or not isinstance(remote_date, datetime.datetime):
+            return ReminderColumns.NONE
+        local_date, remote_date = local_date.replace(tzinfo=None), remote_date.replace(tzinfo=None)
+        if local_date > remote_date:
+            return ReminderColumns.PUSH
+        if local_date < remote_date:
+            return ReminderColumns.PULL
+        return ReminderColumns.NONE
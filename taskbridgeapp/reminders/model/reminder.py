@@ -5,6 +5,9 @@ Contains the ``Reminder`` class, which represents a reminder (whether local or r
 from __future__ import annotations
 
 import datetime
+import hashlib
+import shutil
+from pathlib import Path
 from typing import List
 
 import caldav
@@ -158,6 +161,159 @@ class Reminder:
             return True, stdout.strip()
         return False, "Failed to upsert local reminder {0}: {1}".format(self.name, stderr)
 
+    def _local_fields(self) -> List[str]:
+        """
+        Gets the fields of this reminder which are passed to AppleScript when it is written locally, in the order of
+        the arguments of ``add_reminder_script``, without the body and the list.
+
+        :return: the fields of this reminder.
+        """
+        return [
+            self.uuid if self.uuid and self.uuid.startswith('x-coredata') else '',
+            self.name,
+            'true' if self.completed else 'false',
+            DateUtil.convert('', self.completed_date, DateUtil.APPLE_DATETIME) if self.completed_date else '',
+            DateUtil.convert('', self.due_date, DateUtil.APPLE_DATETIME) if self.due_date else '',
+            'true' if self.all_day else 'false',
+            DateUtil.convert('', self.remind_me_date, DateUtil.APPLE_DATETIME) if self.remind_me_date else ''
+        ]
+
+    @staticmethod
+    def upsert_local_bulk(list_name: str, reminders: List[Reminder]) -> tuple[bool, str] | tuple[bool, dict]:
+        """
+        Creates and updates several local reminders in a single AppleScript invocation. The body of each reminder is
+        exported to a temporary file, and a manifest listing every reminder is passed to AppleScript, which applies all
+        changes in one Reminders session. The files are written to a folder of their own, so that concurrent writes do
+        not remove each other's files.
+
+        Reminders which are written successfully have their UUID set to that of the local reminder. On success, a
+        dictionary with the following keys is returned:
+
+        - ``written`` - reminders written, with their local UUID, as :py:class:`List[tuple[Reminder, str]]`.
+        - ``failed`` - reminders which could not be written, with the error message, as
+          :py:class:`List[tuple[Reminder, str]]`.
+
+        :param list_name: the name of the local list where the reminders are written.
+        :param reminders: the reminders to write.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the bulk write is carried out, even if some reminders failed.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or :py:class:`dict` as above.
+
+        """
+        result = {'written': [], 'failed': []}
+        if len(reminders) == 0:
+            return True, result
+
+        bulk_folder = helpers.temp_folder() / 'reminders-bulk-{}'.format(helpers.get_uuid())
+        manifest_file = bulk_folder / 'manifest.txt'
+        try:
+            Reminder._export_bulk_manifest(reminders, bulk_folder, manifest_file)
+        except OSError as e:
+            shutil.rmtree(bulk_folder, ignore_errors=True)
+            return False, 'Failed to export data for local reminders: {}'.format(e)
+
+        upsert_reminders_script = reminderscript.upsert_reminders_script
+        return_code, stdout, stderr = helpers.run_applescript(upsert_reminders_script, str(manifest_file), list_name)
+        shutil.rmtree(bulk_folder, ignore_errors=True)
+        if return_code != 0:
+            return False, 'Error writing local reminders: {}'.format(stderr)
+
+        reported = set()
+        for line in stdout.splitlines():
+            fields = line.strip().split('~~', 2)
+            if len(fields) == 3 and fields[0].isdigit() and int(fields[0]) < len(reminders):
+                reported.add(int(fields[0]))
+                Reminder._read_bulk_result(reminders[int(fields[0])], fields, result)
+        for idx, reminder in enumerate(reminders):
+            if idx not in reported:
+                result['failed'].append((reminder, 'No result returned for local reminder {}'.format(reminder.name)))
+        return True, result
+
+    @staticmethod
+    def _export_bulk_manifest(reminders: List[Reminder], bulk_folder: Path, manifest_file: Path) -> None:
+        """
+        Exports the body of each reminder of ``upsert_local_bulk`` to a file in ``bulk_folder``, and writes the manifest
+        listing every reminder to ``manifest_file``.
+
+        :param reminders: the reminders to write.
+        :param bulk_folder: the folder where the bodies are exported.
+        :param manifest_file: the path of the manifest.
+
+        :raises OSError: if a file cannot be written.
+        """
+        manifest = []
+        bulk_folder.mkdir(parents=True, exist_ok=True)
+        for idx, reminder in enumerate(reminders):
+            body_file = ''
+            if reminder.body:
+                body_file = str(bulk_folder / '{}.txt'.format(idx))
+                with open(body_file, 'w') as fp:
+                    fp.write(reminder.body)
+            manifest.append(helpers.manifest_line(reminder._local_fields() + [body_file]))
+        with open(manifest_file, 'w') as fp:
+            fp.write('\n'.join(manifest) + '\n')
+
+    @staticmethod
+    def _read_bulk_result(reminder: Reminder, fields: List[str], result: dict) -> None:
+        """
+        Reads the result line returned by ``upsert_reminders_script`` for a reminder, and adds the reminder to the
+        ``written`` or ``failed`` results of ``upsert_local_bulk``.
+
+        :param reminder: the reminder written.
+        :param fields: the fields of the result line.
+        :param result: dictionary where results are appended.
+        """
+        if fields[1] == 'OK':
+            if reminder.uuid is None:
+                reminder.uuid = fields[2]
+            result['written'].append((reminder, fields[2]))
+        else:
+            result['failed'].append((reminder, fields[2]))
+
+    @staticmethod
+    def delete_local_bulk(reminders: List[Reminder]) -> tuple[bool, str] | tuple[bool, dict]:
+        """
+        Deletes several local reminders in a single AppleScript invocation. On success, a dictionary with the following
+        keys is returned:
+
+        - ``deleted`` - reminders deleted as :py:class:`List[Reminder]`.
+        - ``failed`` - reminders which could not be deleted, with the error message, as
+          :py:class:`List[tuple[Reminder, str]]`.
+
+        :param reminders: the reminders to delete.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the bulk deletion is carried out, even if some reminders failed.
+
+            -data (:py:class:`str` | :py:class:`dict`) - error message on failure, or :py:class:`dict` as above.
+
+        """
+        result = {'deleted': [], 'failed': []}
+        if len(reminders) == 0:
+            return True, result
+
+        delete_reminders_script = reminderscript.delete_reminders_script
+        return_code, stdout, stderr = helpers.run_applescript(delete_reminders_script,
+                                                              *[reminder.uuid for reminder in reminders])
+        if return_code != 0:
+            return False, 'Error deleting local reminders: {}'.format(stderr)
+
+        errors = {}
+        for line in stdout.splitlines():
+            fields = line.strip().split('~~', 2)
+            if len(fields) == 3:
+                errors[fields[0]] = fields[2]
+        for reminder in reminders:
+            if reminder.uuid in errors:
+                result['failed'].append((reminder, errors[reminder.uuid]))
+            else:
+                result['deleted'].append(reminder)
+        return True, result
+
     def __get_tasks_in_caldav(self, container: model.ReminderContainer) -> caldav.CalendarObjectResource | None:
         """
         Fetch an existing remote task in CalDav
@@ -198,6 +354,19 @@ class Reminder:
             return False, "Invalid due date."
         return True, due_date
 
+    def __get_alarm_trigger(self) -> str | None:
+        """
+        Get the alarm trigger for this task in string format. An alarm with no time is set to ``default_alarm_hour``.
+
+        :return: the alarm trigger, or None if this task has no alarm.
+        """
+        if not self.remind_me_date:
+            return None
+        if self.remind_me_date.strftime("%H:%M:%S") == "00:00:00":
+            # Alarm with no time
+            self.remind_me_date = self.remind_me_date.replace(hour=self.default_alarm_hour, minute=0)
+        return DateUtil.convert('', self.remind_me_date, DateUtil.CALDAV_DATETIME)
+
     def upsert_remote(self, container: model.ReminderContainer) -> tuple[bool, str]:
         """
         Creates or updates a remote reminder.
@@ -227,17 +396,14 @@ class Reminder:
             if not success:
                 return success, data
             due_date = data
-
-            if not self.remind_me_date:
-                alarm_trigger = None
-            else:
-                if self.remind_me_date.strftime("%H:%M:%S") == "00:00:00":
-                    # Alarm with no time
-                    self.remind_me_date = self.remind_me_date.replace(hour=self.default_alarm_hour, minute=0)
-                alarm_trigger = DateUtil.convert('', self.remind_me_date, DateUtil.CALDAV_DATETIME)
+            alarm_trigger = self.__get_alarm_trigger()
 
             remote.icalendar_component["uid"] = self.uuid
             remote.icalendar_component["summary"] = self.name
+            if self.body:
+                remote.icalendar_component["description"] = self.body
+            elif 'DESCRIPTION' in remote.icalendar_component:
+                del remote.icalendar_component["description"]
             if due_date:
                 remote.icalendar_component["due"] = due_date
             remote.icalendar_component["status"] = 'COMPLETED' if self.completed else 'NEEDS-ACTION'
@@ -386,6 +552,43 @@ END:VALARM""".format(alarm_trigger=alarm_trigger, summary=self.name)
                                                                                               e)
         return True, alarm_string
 
+    @staticmethod
+    def _normalize_date(date: datetime.datetime | datetime.date | datetime.timedelta | None) -> str:
+        """
+        Gets a date of a reminder as a string which is the same whether the reminder was loaded locally or remotely.
+        Aware datetimes are converted to local time, and dates at midnight are treated as all day dates.
+
+        :param date: the date to normalise.
+        :return: the normalised date, or an empty string if there is no date.
+        """
+        if date is None:
+            return ''
+        if isinstance(date, datetime.timedelta):
+            return str(int(date.total_seconds()))
+        if not isinstance(date, datetime.datetime):
+            return date.isoformat()
+        if date.tzinfo is not None:
+            date = date.astimezone().replace(tzinfo=None)
+        if date.strftime("%H:%M:%S") == "00:00:00":
+            return date.date().isoformat()
+        return date.isoformat(timespec='minutes')
+
+    def field_hash(self) -> str:
+        """
+        Gets a hash of the fields of this reminder which are synchronised: the summary, body, due date, alarm and
+        completion. Local and remote reminders with the same fields have the same hash.
+
+        :return: the SHA-256 hash of the synchronised fields.
+        """
+        fields = [
+            self.name.strip() if self.name else '',
+            '\n'.join((self.body or '').strip().splitlines()),
+            Reminder._normalize_date(self.due_date),
+            Reminder._normalize_date(self.remind_me_date),
+            'completed' if self.completed else ''
+        ]
+        return hashlib.sha256('\x1f'.join(fields).encode()).hexdigest()
+
     def __str__(self):
         return self.name
 
@@ -7,20 +7,23 @@ Many of the synchronisation methods are here.
 from __future__ import annotations
 
 import copy
-import glob
+import logging
 import os
 import sqlite3
 from contextlib import closing
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, List
 
 import caldav
 from caldav import Calendar
+from caldav.elements import dav
 from caldav.lib import error
 
 import taskbridgeapp.reminders.model.reminder as model
 from taskbridgeapp import helpers
 from taskbridgeapp.reminders.model import reminderscript
+from taskbridgeapp.reminders.model.changeplan import ReminderChange, ReminderChangePlan, ReminderPlanExecutor
+from taskbridgeapp.reminders.model.reconcile import ReminderColumns, ReminderIndex
 
 
 class ReminderContainer:
@@ -33,6 +36,54 @@ class ReminderContainer:
     #: List of all found reminder containers
     CONTAINER_LIST: List[ReminderContainer] = []
 
+    #: The migrations of ``tb_container``.
+    CONTAINER_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_container (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            local_name TEXT,
+            remote_name TEXT,
+            sync INT,
+            local_id TEXT,
+            generation INT DEFAULT 0
+            );""",
+        helpers.Schema.add_columns('tb_container', {'local_id': 'TEXT'}),
+        helpers.Schema.add_columns('tb_container', {'generation': 'INT DEFAULT 0'})
+    ]
+
+    #: The migrations of ``tb_reminder``.
+    REMINDER_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_reminder (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            local_uuid TEXT,
+            local_name TEXT,
+            remote_uuid TEXT,
+            remote_name TEXT,
+            local_container TEXT,
+            remote_container TEXT,
+            local_generation INT DEFAULT 0,
+            remote_generation INT DEFAULT 0
+            );""",
+        helpers.Schema.add_columns('tb_reminder', {'local_generation': 'INT DEFAULT 0',
+                                                   'remote_generation': 'INT DEFAULT 0'}),
+        "CREATE INDEX IF NOT EXISTS tb_reminder_local_generation ON tb_reminder(local_container, local_generation)",
+        "CREATE INDEX IF NOT EXISTS tb_reminder_remote_generation ON tb_reminder(remote_container, remote_generation)",
+        "CREATE INDEX IF NOT EXISTS tb_reminder_local_uuid ON tb_reminder(local_container, local_uuid)",
+        "CREATE INDEX IF NOT EXISTS tb_reminder_remote_uuid ON tb_reminder(remote_container, remote_uuid)"
+    ]
+
+    #: The migrations of ``tb_reminder_hash``.
+    REMINDER_HASH_MIGRATIONS: List[str | Callable[[sqlite3.Cursor], None]] = [
+        """CREATE TABLE IF NOT EXISTS tb_reminder_hash (
+            local_container TEXT,
+            uuid TEXT,
+            hash TEXT,
+            local_modified REAL,
+            remote_modified REAL,
+            PRIMARY KEY (local_container, uuid)
+            );""",
+        helpers.Schema.add_columns('tb_reminder_hash', {'local_modified': 'REAL', 'remote_modified': 'REAL'})
+    ]
+
     def __init__(self, local_list: LocalList | None, remote_calendar: RemoteCalendar | None, sync: bool):
         """
         Create a new reminder container.
@@ -46,6 +97,21 @@ class ReminderContainer:
         self.sync: bool = sync
         self.local_reminders: List[model.Reminder] = []
         self.remote_reminders: List[model.Reminder] = []
+        self.local_index: ReminderIndex = ReminderIndex([])
+        self.remote_index: ReminderIndex = ReminderIndex([])
+        #: The field hash of each reminder pair after the last sync, keyed by the UUID of the local reminder.
+        self.synced_hashes: Dict[str, str] = {}
+        #: The field hash of each reminder pair synchronised during the current sync.
+        self.recorded_hashes: Dict[str, str] = {}
+        #: The local and remote modification timestamp of each reminder pair after the last sync, keyed by the UUID of the
+        #: local reminder. A timestamp is None if it was not known after the sync.
+        self.synced_modified: Dict[str, tuple[float | None, float | None]] = {}
+        #: The local and remote modification timestamp of each reminder pair synchronised during the current sync.
+        self.recorded_modified: Dict[str, tuple[float | None, float | None]] = {}
+        #: The change plans carried out for this container, in order.
+        self.plans: List[ReminderChangePlan] = []
+        #: The reminders written locally during the current sync, keyed by the UUID of the local reminder.
+        self.written_reminders: Dict[str, model.Reminder] = {}
         ReminderContainer.CONTAINER_LIST.append(self)
 
     @staticmethod
@@ -252,7 +318,7 @@ class ReminderContainer:
     @staticmethod
     def seed_container_table() -> tuple[bool, str]:
         """
-        Creates the initial structure for the table storing containers in SQLite.
+        Creates the initial structure for the table storing containers in SQLite, or migrates it to the current version.
 
         :returns:
 
@@ -261,25 +327,12 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
-        try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
-                with closing(connection.cursor()) as cursor:
-                    sql_create_container_table = """CREATE TABLE IF NOT EXISTS tb_container (
-                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                        local_name TEXT,
-                                        remote_name TEXT,
-                                        sync INT
-                                        );"""
-                    cursor.execute(sql_create_container_table)
-        except sqlite3.OperationalError as e:
-            return False, repr(e)
-        return True, 'tb_container table created'
+        return helpers.Schema.migrate('tb_container', ReminderContainer.CONTAINER_MIGRATIONS)
 
     @staticmethod
     def persist_containers() -> tuple[bool, str]:
         """
-        Save the list of containers to SQLite.
+        Save the list of containers to SQLite, with the current sync generation. Only the rows which changed are written.
 
         :returns:
 
@@ -288,23 +341,26 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
+        success, data = helpers.SyncGeneration.current('tb_container')
+        if not success:
+            return False, data
+        generation = data
+
         containers = []
         for container in ReminderContainer.CONTAINER_LIST:
             containers.append((
                 container.local_list.name if container.local_list else '',
                 container.remote_calendar.name if container.remote_calendar else '',
-                1 if container.sync else 0
+                1 if container.sync else 0,
+                container.local_list.id if container.local_list else None,
+                generation
             ))
 
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
+            with helpers.Database.connection() as connection:
                 with closing(connection.cursor()) as cursor:
-                    sql_delete_containers = "DELETE FROM tb_container"
-                    cursor.execute(sql_delete_containers)
-                    sql_insert_containers = "INSERT INTO tb_container(local_name, remote_name, sync) VALUES (?, ?, ?)"
-                    cursor.executemany(sql_insert_containers, containers)
-                    connection.commit()
+                    helpers.Database.persist_rows(cursor, 'tb_container', ('local_name', 'remote_name'),
+                                                  ('sync', 'local_id', 'generation'), containers)
         except sqlite3.OperationalError as e:
             return False, repr(e)
         return True, 'Containers stored tb_container'
@@ -312,7 +368,22 @@ class ReminderContainer:
     @staticmethod
     def seed_reminder_table() -> tuple[bool, str]:
         """
-        Creates the initial structure for the table storing reminders in SQLite.
+        Creates the initial structure for the table storing reminders in SQLite, or migrates it to the current version.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the table is successfully seeded.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
+        return helpers.Schema.migrate('tb_reminder', ReminderContainer.REMINDER_MIGRATIONS)
+
+    @staticmethod
+    def seed_reminder_hash_table() -> tuple[bool, str]:
+        """
+        Creates the table storing the field hash of each reminder pair after the last sync in SQLite, or migrates it to
+        the current version.
 
         :returns:
 
@@ -321,22 +392,73 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
+        return helpers.Schema.migrate('tb_reminder_hash', ReminderContainer.REMINDER_HASH_MIGRATIONS)
+
+    def load_synced_hashes(self) -> tuple[bool, str] | tuple[bool, int]:
+        """
+        Loads the field hash and modification times of each reminder pair in this container after the last sync into
+        ``synced_hashes`` and ``synced_modified``. If the last sync was interrupted, the pairs it wrote are recorded in
+        the sync journal rather than in SQLite, and their hashes are taken from the journal.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the hashes are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`int`) - error message on failure or number of loaded hashes on success.
+
+        """
+        success, data = ReminderContainer.seed_reminder_hash_table()
+        if not success:
+            return False, data
+        try:
+            with helpers.Database.connection() as connection:
+                connection.row_factory = sqlite3.Row
+                with closing(connection.cursor()) as cursor:
+                    rows = cursor.execute("""SELECT uuid, hash, local_modified, remote_modified FROM tb_reminder_hash
+                                          WHERE local_container = ?""", (self.local_list.name,)).fetchall()
+        except sqlite3.OperationalError as e:
+            return False, repr(e)
+        self.synced_hashes = {row['uuid']: row['hash'] for row in rows}
+        self.synced_modified = {row['uuid']: (row['local_modified'], row['remote_modified']) for row in rows}
+
+        success, data = helpers.SyncJournal.completed(ReminderPlanExecutor.WRITE_JOURNAL, self.local_list.name)
+        if not success:
+            return False, 'Failed to read sync journal: {}'.format(data)
+        for written in data.values():
+            if written is not None:
+                self.synced_hashes[written['uuid']] = written['hash']
+                self.synced_modified[written['uuid']] = tuple(written['modified'])
+        return True, len(self.synced_hashes)
+
+    def persist_synced_hashes(self) -> tuple[bool, str]:
+        """
+        Saves the hashes recorded during this sync, together with those in ``synced_hashes`` for other reminders, to
+        SQLite. Hashes of local reminders which no longer exist are dropped, and only the hashes which changed are
+        written.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the hashes are successfully saved.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
+        synced_hashes = {uuid: field_hash for uuid, field_hash in self.synced_hashes.items()
+                         if uuid in self.local_index.by_uuid}
+        synced_hashes.update(self.recorded_hashes)
+        synced_modified = dict(self.synced_modified)
+        synced_modified.update(self.recorded_modified)
+        hashes = [(self.local_list.name, uuid, field_hash) + synced_modified.get(uuid, (None, None))
+                  for uuid, field_hash in synced_hashes.items()]
         try:
-            con = sqlite3.connect(helpers.db_folder())
-            cur = con.cursor()
-            sql_create_reminder_table = """CREATE TABLE IF NOT EXISTS tb_reminder (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        local_uuid TEXT,
-                        local_name TEXT,
-                        remote_uuid TEXT,
-                        remote_name TEXT,
-                        local_container TEXT,
-                        remote_container TEXT
-                        );"""
-            cur.execute(sql_create_reminder_table)
+            with helpers.Database.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    helpers.Database.persist_rows(cursor, 'tb_reminder_hash', ('local_container', 'uuid'),
+                                                  ('hash', 'local_modified', 'remote_modified'), hashes,
+                                                  {'local_container': self.local_list.name})
         except sqlite3.OperationalError as e:
             return False, repr(e)
-        return True, 'tb_reminder table created'
+        return True, 'Reminder hashes stored in tb_reminder_hash'
 
     @staticmethod
     def persist_reminders() -> tuple[bool, str]:
@@ -346,6 +468,11 @@ class ReminderContainer:
         remote UID. For this reason, the reminder's summary (which is typically the only text content) has to be saved to
         the database. Without this, many reminders couldn't be matched. The database is stored locally.
 
+        A local reminder and the remote task it is paired with are saved in the same row, so that the pairing can be
+        used to find the counterpart of a deleted reminder even if the counterpart has since been renamed. Both sides
+        are stored with the current sync generation. Stored rows are matched by the container and UUID of both sides,
+        and only the rows which changed are written.
+
         :returns:
 
             -success (:py:class:`bool`) - true if the reminders as successfully saved.
@@ -353,43 +480,106 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
+        success, data = helpers.SyncGeneration.current('tb_reminder')
+        if not success:
+            return False, data
+        generation = data
+
         reminders = []
         for container in ReminderContainer.CONTAINER_LIST:
+            paired = set()
             for reminder in container.local_reminders:
+                remote_reminder = container.remote_index.find(reminder.uuid, reminder.name)
+                if remote_reminder is not None and id(remote_reminder) in paired:
+                    remote_reminder = None
+                if remote_reminder is not None:
+                    paired.add(id(remote_reminder))
                 reminders.append((
+                    container.local_list.name,
                     reminder.uuid,
+                    container.remote_calendar.name if remote_reminder is not None else '',
+                    remote_reminder.uuid if remote_reminder is not None else '',
                     reminder.name,
-                    '',
-                    '',
-                    container.local_list.name,
-                    ''
+                    remote_reminder.name if remote_reminder is not None else '',
+                    generation,
+                    generation
                 ))
 
             for reminder in container.remote_reminders:
+                if id(reminder) in paired:
+                    continue
                 reminders.append((
                     '',
                     '',
+                    container.remote_calendar.name,
                     reminder.uuid,
-                    reminder.name,
                     '',
-                    container.remote_calendar.name
+                    reminder.name,
+                    generation,
+                    generation
                 ))
 
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
+            with helpers.Database.connection() as connection:
                 with closing(connection.cursor()) as cursor:
-                    sql_delete_reminders = "DELETE FROM tb_reminder"
-                    cursor.execute(sql_delete_reminders)
-                    sql_insert_containers = """
-                    INSERT INTO tb_reminder(local_uuid, local_name, remote_uuid, remote_name, local_container,
-                    remote_container)
-                    VALUES (?, ?, ?, ?, ?, ?)"""
-                    cursor.executemany(sql_insert_containers, reminders)
-                    connection.commit()
+                    added, updated, deleted = helpers.Database.persist_rows(
+                        cursor, 'tb_reminder', ('local_container', 'local_uuid', 'remote_container', 'remote_uuid'),
+                        ('local_name', 'remote_name', 'local_generation', 'remote_generation'), reminders)
         except sqlite3.OperationalError as e:
             return False, repr(e)
-        return True, 'Reminders stored in tb_reminder'
+        return True, 'Reminders stored in tb_reminder ({0} added, {1} updated, {2} deleted)'.format(
+            added, updated, deleted)
+
+    @staticmethod
+    def _rename_remote_containers(renamed_local_containers: List[tuple[sqlite3.Row, LocalList]],
+                                  discovered_remote: List[RemoteCalendar],
+                                  to_sync: List[str]) -> tuple[bool, str]:
+        """
+        Renames remote reminder containers whose local list has been renamed, instead of deleting the calendar and
+        creating it again under the new name. The list's name is replaced in ``to_sync``, and the stored container and
+        its stored reminders are moved to the new name.
+
+        :param renamed_local_containers: the containers which have been renamed locally, with their renamed local list.
+        :param discovered_remote: the list of remote task calendars.
+        :param to_sync: the list of lists/calendars which should be synchronised, which is updated in place.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if container renames are successfully carried out.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
+        success, data = ReminderContainer.seed_reminder_table()
+        if not success:
+            return False, data
+        success, data = ReminderContainer.seed_reminder_hash_table()
+        if not success:
+            return False, data
+        for saved, local_list in renamed_local_containers:
+            if saved['local_name'] not in to_sync:
+                continue
+            remote_name = "Tasks" if local_list.name == "Reminders" else local_list.name
+            if helpers.confirm('Rename remote container {0} to {1}'.format(saved['remote_name'], remote_name)):
+                remote_calendar = next((rc for rc in discovered_remote if rc.name == saved['remote_name']),
+                                       RemoteCalendar(calendar_name=saved['remote_name']))
+                success, data = remote_calendar.rename(remote_name)
+                if not success:
+                    return False, data
+                to_sync[to_sync.index(saved['local_name'])] = local_list.name
+                try:
+                    with helpers.Database.connection() as connection:
+                        with closing(connection.cursor()) as cursor:
+                            cursor.execute("""UPDATE tb_reminder SET local_container = ?, remote_container = ?
+                                           WHERE local_container = ?""",
+                                           (local_list.name, remote_name, saved['local_name']))
+                            cursor.execute("UPDATE tb_reminder_hash SET local_container = ? WHERE local_container = ?",
+                                           (local_list.name, saved['local_name']))
+                            cursor.execute("UPDATE tb_container SET local_name = ?, remote_name = ? WHERE id = ?",
+                                           (local_list.name, remote_name, saved['id']))
+                except sqlite3.OperationalError as e:
+                    return False, repr(e)
+        return True, "Remote containers renamed."
 
     @staticmethod
     def _delete_remote_containers(removed_local_containers: List[sqlite3.Row],
@@ -474,6 +664,14 @@ class ReminderContainer:
 
         Note that container deletions only apply if the list/calendar is found in the ``to_sync`` argument.
 
+        Local lists are also matched by their ID, so that a renamed local list is not seen as a deleted list and a new
+        one: its remote calendar is renamed instead, and the list's name is replaced in ``to_sync``. If a calendar
+        cannot be renamed, the error is returned and the containers are not swept.
+
+        The stored containers which are still present are then marked with a new sync generation, and the rows of the
+        deleted containers are removed. The other rows are kept, so that deletions are still detected on the next sync
+        if this one stops before the containers are saved again.
+
         On success, this method returns a dictionary with changes, containing the following keys:
 
         - ``updated_local_list`` - the list of local reminder lists, taking into account deleted lists.
@@ -506,7 +704,7 @@ class ReminderContainer:
         else:
             helpers.DATA_LOCATION = Path.home() / "Library" / "Application Support" / "TaskBridge"
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
                     sql_get_containers = "SELECT * FROM tb_container WHERE sync = ?"
@@ -518,30 +716,112 @@ class ReminderContainer:
             return True, result
 
         current_local_containers = [ll.name for ll in discovered_local]
+        local_by_id = {ll.id: ll for ll in discovered_local if ll.id}
         removed_local_containers = [ll for ll in saved_containers if ll['local_name'] not in current_local_containers]
+        renamed_local_containers = [(ll, local_by_id[ll['local_id']]) for ll in removed_local_containers
+                                    if ll['local_id'] in local_by_id]
+        removed_local_containers = [ll for ll in removed_local_containers if ll['local_id'] not in local_by_id]
+        current_remote_containers = [rc.name for rc in discovered_remote]
+        success, data = ReminderContainer._rename_remote_containers(renamed_local_containers, discovered_remote, to_sync)
+        if not success:
+            return False, data
         ReminderContainer._delete_remote_containers(removed_local_containers, discovered_remote, to_sync, result)
 
         # Sync remote deletions to local
-        current_remote_containers = [rc.name for rc in discovered_remote]
+        renamed_ids = [ll['id'] for ll, local_list in renamed_local_containers]
         removed_remote_containers = [rc for rc in saved_containers if
-                                     rc['remote_name'] not in current_remote_containers]
+                                     rc['remote_name'] not in current_remote_containers and rc['id'] not in renamed_ids]
         ReminderContainer._delete_local_containers(removed_remote_containers, removed_local_containers, discovered_local,
                                                    to_sync, result)
 
-        # Empty table
+        # Sweep deleted containers
         if fail == "fail_delete":
             helpers.DATA_LOCATION = Path("/")
         else:
             helpers.DATA_LOCATION = Path.home() / "Library" / "Application Support" / "TaskBridge"
+        success, data = ReminderContainer.sweep_containers(discovered_local, discovered_remote)
+        if not success:
+            return False, data
+
+        return True, result
+
+    @staticmethod
+    def sweep_containers(discovered_local: List[LocalList], discovered_remote: List[RemoteCalendar]) -> tuple[bool, str]:
+        """
+        Marks the stored containers which are still present with a new sync generation, and removes the rows which were
+        not marked. A synchronised container is present while both its local list and its remote calendar exist, and a
+        container which is not synchronised is always present.
+
+        :param discovered_local: the list of local reminder lists.
+        :param discovered_remote: the list of remote task calendars.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the containers are successfully swept.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
+        success, generation = helpers.SyncGeneration.start('tb_container')
+        if not success:
+            return False, generation
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
-                connection.row_factory = sqlite3.Row
+            with helpers.Database.connection() as connection:
                 with closing(connection.cursor()) as cursor:
-                    cursor.execute("DELETE FROM tb_container")
+                    helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_list', (ll.name for ll in discovered_local))
+                    helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_calendar', (rc.name for rc in discovered_remote))
+                    sql_mark_containers = """UPDATE tb_container SET generation = ? WHERE sync = 0
+                                          OR (local_name IN (SELECT key FROM temp.tb_seen_list)
+                                          AND remote_name IN (SELECT key FROM temp.tb_seen_calendar))"""
+                    cursor.execute(sql_mark_containers, (generation,))
+                    cursor.execute("DELETE FROM tb_container WHERE generation < ?", (generation,))
         except sqlite3.OperationalError as e:
-            return False, 'Error deleting container table: {}'.format(e)
+            return False, 'Error sweeping containers in table: {}'.format(e)
+        return True, 'Container deletions synchronised'
 
-        return True, result
+    @staticmethod
+    def _plan_remote_deletions(container_saved_local: List[sqlite3.Row],
+                               container: ReminderContainer,
+                               plan: ReminderChangePlan) -> None:
+        """
+        Plans the deletion of remote reminders which have been deleted locally.
+
+        :param container_saved_local: list of reminders from last sync.
+        :param container: the reminder container
+        :param plan: the plan where deletions are added.
+        """
+        local_deleted = [r for r in container_saved_local if
+                         not container.local_index.contains(r['local_uuid'], r['local_name'])]
+        for deleted in local_deleted:
+            # Use the stored pairing first, in case the remote task was renamed since the last sync
+            remote_reminder = container.remote_index.find(deleted['remote_uuid'], None)
+            if remote_reminder is None:
+                remote_reminder = container.remote_index.find(deleted['local_uuid'], deleted['local_name'])
+            if remote_reminder is not None:
+                if helpers.confirm("Delete remote reminder {}".format(remote_reminder.name)):
+                    plan.add(ReminderChange(ReminderChange.REMOTE, ReminderChange.DELETE, remote_reminder))
+
+    @staticmethod
+    def _plan_local_deletions(container_saved_remote: List[sqlite3.Row],
+                              container: ReminderContainer,
+                              plan: ReminderChangePlan) -> None:
+        """
+        Plans the deletion of local reminders which have been deleted remotely.
+
+        :param container_saved_remote: list of reminders from last sync.
+        :param container: the reminder container.
+        :param plan: the plan where deletions are added.
+        """
+        remote_deleted = [r for r in container_saved_remote if
+                          not container.remote_index.contains(r['remote_uuid'], r['remote_name'])]
+        for deleted in remote_deleted:
+            # Use the stored pairing first, in case the local reminder was renamed since the last sync
+            local_reminder = container.local_index.find(deleted['local_uuid'], None)
+            if local_reminder is None:
+                local_reminder = container.local_index.find(deleted['remote_uuid'], deleted['remote_name'])
+            if local_reminder is not None:
+                if helpers.confirm("Delete local reminder {}".format(local_reminder.name)):
+                    plan.add(ReminderChange(ReminderChange.LOCAL, ReminderChange.DELETE, local_reminder))
 
     @staticmethod
     def _delete_remote_reminders(container_saved_local: List[sqlite3.Row],
@@ -561,21 +841,11 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
-        local_deleted = [r for r in container_saved_local if
-                         r['local_name'] not in [lr.name for lr in container.local_reminders]]
-        for deleted in local_deleted:
-            remote_reminder = next((r for r in container.remote_reminders
-                                    if r.uuid == deleted['local_uuid'] or r.name == deleted['local_name']), None)
-            if remote_reminder is not None:
-                if helpers.confirm("Delete remote reminder {}".format(remote_reminder.name)):
-                    to_delete = container.remote_calendar.cal_obj.search(todo=True, uid=remote_reminder.uuid)
-                    if len(to_delete) > 0:
-                        to_delete[0].delete()
-                        container.remote_reminders.remove(remote_reminder)
-                        result['deleted_remote_reminders'].append(remote_reminder)
-                    else:
-                        return False, 'Failed to delete remote reminder {0} ({1})'.format(remote_reminder.uuid,
-                                                                                          remote_reminder.name)
+        plan = container.new_plan()
+        ReminderContainer._plan_remote_deletions(container_saved_local, container, plan)
+        success, data = container.execute_plan(plan, result)
+        if not success:
+            return False, data
         return True, "Remote reminders deleted."
 
     @staticmethod
@@ -598,20 +868,11 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
-        remote_deleted = [r for r in container_saved_remote if
-                          r['remote_name'] not in [rr.name for rr in container.remote_reminders]]
-        for deleted in remote_deleted:
-            local_reminder = next((r for r in container.local_reminders
-                                   if r.uuid == deleted['remote_uuid'] or r.name == deleted['remote_name']), None)
-            if local_reminder is not None:
-                if helpers.confirm("Delete local reminder {}".format(local_reminder.name)):
-                    delete_reminder_script = reminderscript.delete_reminder_script
-                    return_code, stdout, stderr = helpers.run_applescript(delete_reminder_script, local_reminder.uuid)
-                    if return_code != 0 or fail:
-                        return False, 'Failed to delete local reminder {0} ({1})'.format(local_reminder.uuid,
-                                                                                         local_reminder.name)
-                    container.local_reminders.remove(local_reminder)
-                    result['deleted_local_reminders'].append(local_reminder)
+        plan = container.new_plan()
+        ReminderContainer._plan_local_deletions(container_saved_remote, container, plan)
+        success, data = container.execute_plan(plan, result, 'fail_delete_local' if fail else None)
+        if not success:
+            return False, data
         return True, "Local reminders deleted."
 
     @staticmethod
@@ -627,7 +888,7 @@ class ReminderContainer:
 
         """
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
                     sql_get_reminders = "SELECT * FROM tb_reminder"
@@ -637,11 +898,50 @@ class ReminderContainer:
         return True, saved_reminders
 
     @staticmethod
-    def __get_current_reminders(container: ReminderContainer, fail: str) -> tuple[bool, str]:
+    def sweep_reminders(container: ReminderContainer, generation: int) \
+            -> tuple[bool, str] | tuple[bool, tuple[List[sqlite3.Row], List[sqlite3.Row]]]:
         """
-        Get the current local and remote reminders for this container
+        Marks the stored rows of the reminders seen in a container with the current generation, and gets the rows which
+        were not marked. These are the reminders which were deleted since the last sync. A side of a row is marked if a
+        reminder on that side has its UUID or name.
 
-        :param container: the container to fetch reminders for.
+        :param container: the reminder container, with its current reminders loaded.
+        :param generation: the current generation.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the reminders are successfully marked.
+
+            -data (:py:class:`str` | :py:class:`tuple`) - error message on failure, or the rows of the reminders deleted
+            locally and of those deleted remotely.
+
+        """
+        sql_mark = """UPDATE tb_reminder SET {0}_generation = ? WHERE {0}_container = ? AND
+                   ({0}_uuid IN (SELECT key FROM temp.tb_seen_uuid) OR {0}_name IN (SELECT key FROM temp.tb_seen_name))"""
+        sql_sweep = "SELECT * FROM tb_reminder WHERE {0}_container = ? AND {0}_generation < ?"
+        swept = []
+        try:
+            with helpers.Database.connection() as connection:
+                connection.row_factory = sqlite3.Row
+                with closing(connection.cursor()) as cursor:
+                    for side, container_name, index in (
+                            ('local', container.local_list.name, container.local_index),
+                            ('remote', container.remote_calendar.name, container.remote_index)):
+                        helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_uuid', index.by_uuid.keys())
+                        helpers.SyncGeneration.seen_keys(cursor, 'tb_seen_name', index.by_name.keys())
+                        cursor.execute(sql_mark.format(side), (generation, container_name))
+                        swept.append(cursor.execute(sql_sweep.format(side), (container_name, generation)).fetchall())
+        except sqlite3.OperationalError as e:
+            return False, 'Error marking reminders in table: {}'.format(e)
+        return True, (swept[0], swept[1])
+
+    @staticmethod
+    def __get_current_reminders(containers: List[ReminderContainer], fail: str) -> tuple[bool, str]:
+        """
+        Get the current local and remote reminders for these containers. The local reminders of all the containers are
+        loaded at once.
+
+        :param containers: the containers to fetch reminders for.
         :param fail: the part of the process to intentionally fail (used for test coverage).
 
         :returns:
@@ -651,9 +951,30 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
-        success, data = container.load_local_reminders()
+        success, data = ReminderContainer.load_local_reminders_bulk(containers)
         if not success or fail == "fail_load_local":
             return False, 'Failed to load local reminders: {}'.format(data)
+        for container in containers:
+            success, data = ReminderContainer.__get_remote_reminders(container, fail)
+            if not success:
+                return False, data
+        return True, "Current reminders loaded."
+
+    @staticmethod
+    def __get_remote_reminders(container: ReminderContainer, fail: str) -> tuple[bool, str]:
+        """
+        Get the current remote reminders for this container
+
+        :param container: the container to fetch reminders for.
+        :param fail: the part of the process to intentionally fail (used for test coverage).
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the remote reminders are loaded successfully.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
         if not fail == "fail_load_remote":
             success, data = container.load_remote_reminders()
         else:
@@ -661,18 +982,19 @@ class ReminderContainer:
             data = "Explicitly set to fail to load reminders"
         if not success or fail == "fail_load_remote":
             return False, 'Failed to load remote reminders: {}'.format(data)
-        return success, "Current reminders loaded."
+        return success, "Remote reminders loaded."
 
     @staticmethod
-    def __empty_reminder_table(fail: str) -> tuple[bool, str]:
+    def __sweep_reminder_table(generation: int, fail: str) -> tuple[bool, str]:
         """
-        Empties the reminder table
+        Removes the rows of the reminders which were not seen in this generation from the reminder table.
 
+        :param generation: the current generation.
         :param fail: the part of the process to intentionally fail (used for test coverage).
 
         :returns:
 
-            -success (:py:class:`bool`) - true if reminder table is successfully emptied.
+            -success (:py:class:`bool`) - true if reminder table is successfully swept.
 
             -data (:py:class:`str`) - error message on failure or success message.
 
@@ -682,22 +1004,23 @@ class ReminderContainer:
         else:
             helpers.DATA_LOCATION = Path.home() / "Library" / "Application Support" / "TaskBridge"
         try:
-            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            with helpers.Database.connection() as connection:
                 connection.row_factory = sqlite3.Row
                 with closing(connection.cursor()) as cursor:
-                    cursor.execute("DELETE FROM tb_reminder")
+                    cursor.execute("""DELETE FROM tb_reminder WHERE (local_container != '' AND local_generation < ?)
+                                   OR (remote_container != '' AND remote_generation < ?)""", (generation, generation))
         except sqlite3.OperationalError as e:
-            return False, 'Error deleting reminder table: {}'.format(e)
-        return True, "Reminder table emptied."
+            return False, 'Error sweeping reminder table: {}'.format(e)
+        return True, "Reminder table swept."
 
     @staticmethod
     def sync_reminder_deletions(fail: str = None) -> tuple[bool, str] | tuple[bool, dict]:
         """
         Synchronises deletions to reminders.
 
-        The list of reminders found during the last sync is loaded from SQLite and compared to the local and remote reminders
-        found now. Any reminders in the database which are no longer present will have their counterpart deleted. For
-        example, if the local reminder *foo* is deleted, the remote reminder *foo* will be deleted during sync.
+        The reminders found now are marked in SQLite with a new sync generation. Any reminders in the database which were
+        not marked are no longer present, and will have their counterpart deleted. For example, if the local reminder
+        *foo* is deleted, the remote reminder *foo* will be deleted during sync.
 
         Note that reminder deletion only applies to those containers with ``sync`` set to True.
 
@@ -723,41 +1046,41 @@ class ReminderContainer:
         if not success or fail == "fail_seed":
             return False, message
 
-        for container in ReminderContainer.CONTAINER_LIST:
-            if not container.sync:
-                continue
-            success, data = ReminderContainer.__get_current_reminders(container, fail)
-            if not success:
-                return success, data
+        success, data = ReminderContainer.__get_current_reminders(
+            [container for container in ReminderContainer.CONTAINER_LIST if container.sync], fail)
+        if not success:
+            return success, data
 
         result = {
             'deleted_local_reminders': [],
             'deleted_remote_reminders': []
         }
 
-        success, data = ReminderContainer.get_saved_reminders()
+        success, data = helpers.SyncGeneration.start('tb_reminder')
         if not success or fail == "fail_get_saved":
             return False, data
-        saved_reminders = data
+        generation = data
 
-        if not len(saved_reminders) > 0 or fail == "fail_already_deleted":
+        if fail == "fail_already_deleted":
             return True, result
 
         for container in ReminderContainer.CONTAINER_LIST:
             if container.local_list is None or container.remote_calendar is None:
                 continue
-            container_saved_local = [r for r in saved_reminders if r['local_container'] == container.local_list.name]
-            container_saved_remote = [r for r in saved_reminders if
-                                      r['remote_container'] == container.remote_calendar.name]
-
-            # Reminders deleted locally need to be deleted from CalDav
-            ReminderContainer._delete_remote_reminders(container_saved_local, container, result)
-
-            # Reminders deleted remotely need to be deleted from local
-            ReminderContainer._delete_local_reminders(container_saved_remote, container, result)
-
-        # Empty table
-        success, data = ReminderContainer.__empty_reminder_table(fail)
+            success, data = ReminderContainer.sweep_reminders(container, generation)
+            if not success:
+                return False, data
+            container_saved_local, container_saved_remote = data
+
+            # Reminders deleted locally need to be deleted from CalDav, and reminders deleted remotely need to be
+            # deleted from local
+            plan = container.new_plan()
+            ReminderContainer._plan_remote_deletions(container_saved_local, container, plan)
+            ReminderContainer._plan_local_deletions(container_saved_remote, container, plan)
+            container.execute_plan(plan, result)
+
+        # Remove the rows of deleted reminders
+        success, data = ReminderContainer.__sweep_reminder_table(generation, fail)
         if not success:
             return success, data
 
@@ -765,9 +1088,31 @@ class ReminderContainer:
 
     def load_local_reminders(self, fail: str = None) -> tuple[bool, str] | tuple[bool, int]:
         """
-        Load the list of local reminders in this local container (list) via an AppleScript script.
-        The reminders are saved in a pipe-separated *.psv* file in a temporary folder, and then parsed from there.
+        Load the list of local reminders in this local container (list) via an AppleScript script. See
+        ``load_local_reminders_bulk``.
+
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the reminders are successfully loaded.
+
+            -data (:py:class:`str` | :py:class:`int`) - error message on failure or number of loaded reminders on success.
+
+        """
+        return ReminderContainer.load_local_reminders_bulk([self], fail)
+
+    @staticmethod
+    def load_local_reminders_bulk(containers: List[ReminderContainer], fail: str = None) \
+            -> tuple[bool, str] | tuple[bool, int]:
+        """
+        Load the local reminders of several containers with a single invocation of an AppleScript script, which fetches
+        each property of the reminders of a list at once. The reminders are saved in a pipe-separated *.psv* file with a
+        unique name in TaskBridge's temporary folder, so that several instances can load reminders at the same time.
+        Each line starts with the position of the container, and the file is then parsed from there. A body with several
+        lines continues on the lines which follow its reminder.
 
+        :param containers: the containers to load. Containers without a local list are skipped.
         :param fail: the part of the process to intentionally fail (used for test coverage)
 
         :returns:
@@ -777,31 +1122,45 @@ class ReminderContainer:
             -data (:py:class:`str` | :py:class:`int`) - error message on failure or number of loaded reminders on success.
 
         """
-        get_reminders_in_list_script = reminderscript.get_reminders_in_list_script
-        return_code, stdout, stderr = helpers.run_applescript(get_reminders_in_list_script, self.local_list.name)
+        containers = [container for container in containers if container.local_list is not None]
+        if len(containers) == 0:
+            return True, 0
+        export_path = helpers.temp_folder() / 'reminders-{}.psv'.format(helpers.get_uuid())
+        get_reminders_in_lists_script = reminderscript.get_reminders_in_lists_script
+        return_code, stdout, stderr = helpers.run_applescript(get_reminders_in_lists_script, str(export_path),
+                                                              *[container.local_list.name for container in containers])
 
         if return_code != 0 or fail == "fail_load":
+            export_path.unlink(missing_ok=True)
             return False, stderr
 
-        export_path = Path(stdout.strip()) / (self.local_list.name + '.psv')
         if fail == "fail_psv":
-            export_path = "BOGUS"
+            export_path.unlink(missing_ok=True)
+            export_path = Path("BOGUS")
         try:
             with open(export_path) as fp:
                 file_data = fp.read()
-                fp.close()
         except FileNotFoundError as e:
             return False, 'Could not open exported reminder file {0}: {1}'.format(export_path, e)
-        for local_reminder in file_data.split('\n'):
-            values = local_reminder.split('|')
-            if len(values) > 0 and values[0] != '':
-                self.local_reminders.append(model.Reminder.create_from_local(values))
-
-        psv_files = glob.glob(stdout.strip() + '/*.psv')
-        for psv in psv_files:
-            os.remove(psv)
-
-        return True, len(self.local_reminders)
+        os.remove(export_path)
+
+        exported = [[] for _ in containers]
+        values = None
+        for line in file_data.split('\n'):
+            fields = line.split('|', 10)
+            if (len(fields) == 11 and fields[0].isdigit() and 0 < int(fields[0]) <= len(containers)
+                    and fields[1].startswith('x-apple-reminder://')):
+                values = fields[1:]
+                exported[int(fields[0]) - 1].append(values)
+            elif values is not None:
+                values[9] += '\n' + line
+
+        loaded = 0
+        for container, container_values in zip(containers, exported):
+            container.local_reminders.extend(model.Reminder.create_from_local(values) for values in container_values)
+            container.local_index = ReminderIndex(container.local_reminders)
+            loaded += len(container_values)
+        return True, loaded
 
     def load_remote_reminders(self) -> tuple[bool, str] | tuple[bool, int]:
         """
@@ -817,12 +1176,100 @@ class ReminderContainer:
         caldav_tasks = self.remote_calendar.cal_obj.todos()
         for task in caldav_tasks:
             self.remote_reminders.append(model.Reminder.create_from_remote(task))
+        self.remote_index = ReminderIndex(self.remote_reminders)
 
         return True, len(self.remote_reminders)
 
+    def new_plan(self) -> ReminderChangePlan:
+        """
+        Creates an empty change plan for this container.
+
+        :return: the plan.
+        """
+        return ReminderChangePlan(self.local_list.name if self.local_list else None,
+                                  self.remote_calendar.name if self.remote_calendar else None)
+
+    def execute_plan(self, plan: ReminderChangePlan, result: dict, fail: str = None) -> tuple[bool, str]:
+        """
+        Carries out a change plan for this container with ``ReminderPlanExecutor``, and keeps it in ``plans``.
+
+        :param plan: the plan to carry out.
+        :param result: dictionary where changes are appended.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if all changes are successfully made.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
+        self.plans.append(plan)
+        return ReminderPlanExecutor.execute(self, plan, result, fail)
+
+    def plan_local_reminders_to_remote(self, plan: ReminderChangePlan, fail: str = None) -> None:
+        """
+        Plans the changes which sync local reminders to remote tasks.
+
+        The field hash of each reminder pair is compared to the one recorded after the last sync, so that only the side
+        whose fields changed is written. Pairs whose fields are the same on both sides are not written at all. If there
+        is no recorded hash, or both sides changed, the newer reminder is used. The pairs and the decisions are worked
+        out on ``ReminderColumns`` snapshots of both sides, and only the reminders to be written are then looked at.
+
+        :param plan: the plan where changes are added.
+        :param fail: the part of the process to intentionally fail (used for test coverage)
+        """
+        forced = fail in ["local_older", "fail_upsert_local", "fail_update_uuid"]
+        local_columns = ReminderColumns(self.local_reminders)
+        remote_columns = ReminderColumns(self.remote_reminders)
+        pairs = local_columns.pair(remote_columns)
+        decisions = local_columns.decide(remote_columns, pairs, self.synced_hashes, self.synced_modified,
+                                         skip_equal=not forced)
+
+        for position, decision in enumerate(decisions):
+            if decision == ReminderColumns.EQUAL:
+                # Nothing to synchronise for pairs with the same fields
+                uuid = local_columns.uuids[position]
+                self.recorded_hashes[uuid] = local_columns.hashes[position]
+                self.recorded_modified[uuid] = (
+                    ReminderColumns.stored_time(local_columns.modified[position]),
+                    ReminderColumns.stored_time(remote_columns.modified[pairs[position]]))
+                continue
+            if decision == ReminderColumns.NONE and not forced:
+                continue
+            local_reminder = self.local_reminders[position]
+            remote_reminder = self.remote_reminders[pairs[position]] if pairs[position] >= 0 else None
+            if decision == ReminderColumns.PUSH:
+                if helpers.confirm("Upsert remote reminder {}".format(local_reminder.name)):
+                    plan.add(ReminderChange(
+                        ReminderChange.REMOTE,
+                        ReminderChange.CREATE if remote_reminder is None else ReminderChange.UPDATE,
+                        copy.deepcopy(local_reminder), local_reminder, local_columns.field_hash(position),
+                        (ReminderColumns.stored_time(local_columns.modified[position]), None)))
+            elif helpers.confirm("Update local reminder {}".format(remote_reminder.name)):
+                plan.add(ReminderChange(
+                    ReminderChange.LOCAL, ReminderChange.UPDATE, copy.deepcopy(remote_reminder), remote_reminder,
+                    remote_columns.field_hash(pairs[position]),
+                    (None, ReminderColumns.stored_time(remote_columns.modified[pairs[position]]))))
+
+    def plan_remote_reminders_to_local(self, plan: ReminderChangePlan) -> None:
+        """
+        Plans the changes which add remote tasks missing from the local list.
+
+        :param plan: the plan where changes are added.
+        """
+        for remote_reminder in self.remote_reminders:
+            # Get the associated local reminder, if any
+            if not self.local_index.contains(remote_reminder.uuid, remote_reminder.name):
+                if helpers.confirm("Add local reminder {}".format(remote_reminder.name)):
+                    plan.add(ReminderChange(
+                        ReminderChange.LOCAL, ReminderChange.CREATE, copy.deepcopy(remote_reminder), remote_reminder,
+                        remote_reminder.field_hash(),
+                        (None, ReminderColumns.stored_time(ReminderColumns.timestamp(remote_reminder.modified_date)))))
+
     def sync_local_reminders_to_remote(self, result: dict, fail: str = None) -> tuple[bool, str]:
         """
-        Sync local reminders to remote tasks.
+        Sync local reminders to remote tasks, as planned by ``plan_local_reminders_to_remote``.
 
         :param result: dictionary where actions are appended
         :param fail: the part of the process to intentionally fail (used for test coverage)
@@ -834,39 +1281,16 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
-        for local_reminder in self.local_reminders:
-            # Get the associated remote reminder, if any
-            remote_reminder = next((r for r in self.remote_reminders
-                                    if r.uuid == local_reminder.uuid or r.name == local_reminder.name), None)
-            if (remote_reminder is None or
-                    local_reminder.modified_date.replace(tzinfo=None) > remote_reminder.modified_date.replace(tzinfo=None)):
-                key = 'remote_added' if remote_reminder is None else 'remote_updated'
-                remote_reminder = copy.deepcopy(local_reminder)
-                if helpers.confirm("Upsert remote reminder {}".format(remote_reminder.name)):
-                    success, data = remote_reminder.upsert_remote(self)
-                    if not success or fail == "fail_upsert_remote":
-                        return False, data
-                    result[key].append(remote_reminder.name)
-            elif ((local_reminder.modified_date.replace(tzinfo=None) < remote_reminder.modified_date.replace(tzinfo=None)) or
-                  fail in ["local_older", "fail_upsert_local", "fail_update_uuid"]):
-                key = 'local_updated'
-                if fail in ["local_older", "fail_upsert_local", "fail_update_uuid"]:
-                    remote_reminder.upsert_remote(self)
-                local_reminder = copy.deepcopy(remote_reminder)
-                if helpers.confirm("Update local reminder {}".format(local_reminder.name)):
-                    success, data = local_reminder.upsert_local(self)
-                    if not success or fail == "fail_upsert_local":
-                        return False, data
-                    else:
-                        u_success, u_data = remote_reminder.update_uuid(self, data)
-                        if not u_success or fail == "fail_update_uuid":
-                            return False, u_data
-                    result[key].append(local_reminder.name)
+        plan = self.new_plan()
+        self.plan_local_reminders_to_remote(plan, fail)
+        success, data = self.execute_plan(plan, result, fail)
+        if not success:
+            return False, data
         return True, 'Local reminder synced with remote'
 
     def sync_remote_reminders_to_local(self, result: dict, fail: str = None) -> tuple[bool, str]:
         """
-        Sync remote tasks to local reminders.
+        Sync remote tasks to local reminders, as planned by ``plan_remote_reminders_to_local``.
 
         :param result: dictionary where actions are appended
         :param fail: the part of the process to intentionally fail (used for test coverage)
@@ -878,28 +1302,19 @@ class ReminderContainer:
             -data (:py:class:`str`) - error message on failure or success message.
 
         """
-        for remote_reminder in self.remote_reminders:
-            # Get the associated local reminder, if any
-            local_reminder = next((r for r in self.local_reminders
-                                   if r.uuid == remote_reminder.uuid or r.name == remote_reminder.name), None)
-            if local_reminder is None:
-                key = 'local_added'
-                local_reminder = copy.deepcopy(remote_reminder)
-                if helpers.confirm("Add local reminder {}".format(local_reminder.name)):
-                    success, data = local_reminder.upsert_local(self)
-                    if not success or fail == "fail_upsert":
-                        return False, data
-                    else:
-                        u_success, u_data = remote_reminder.update_uuid(self, data)
-                        if not u_success or fail == "fail_uuid":
-                            return False, u_data
-                    result[key].append(local_reminder.name)
+        plan = self.new_plan()
+        self.plan_remote_reminders_to_local(plan)
+        success, data = self.execute_plan(plan, result, fail)
+        if not success:
+            return False, data
         return True, "Remote reminder synced with local"
 
     def sync_reminders(self, fail: str = None) -> tuple[bool, str] | tuple[bool, dict]:
         """
         Synchronises reminders. This method only synchronises reminders for containers with ``sync`` set to True.
-        On success, the method returns a dictionary with the following keys:
+        The changes in both directions are planned first, and are then made together by ``ReminderPlanExecutor``. The
+        search index of the container is then updated; if this fails, a warning is logged. On success, the method
+        returns a dictionary with the following keys:
 
         - ``remote_added`` - name of reminders added to the remote calendar as :py:class:`List[str]`.
         - ``remote_updated`` - name of reminders updated in the remote calendar as :py:class:`List[str]`.
@@ -929,18 +1344,49 @@ class ReminderContainer:
             'local_updated': []
         }
 
-        # Sync local reminders to remote
-        success, data = self.sync_local_reminders_to_remote(result, fail)
+        success, data = self.load_synced_hashes()
+        if not success:
+            return False, 'Failed to load reminder hashes: {}'.format(data)
+        self.recorded_hashes = {}
+        self.recorded_modified = {}
+        self.written_reminders = {}
+
+        # Plan the changes in both directions, then make them together
+        plan = self.new_plan()
+        self.plan_local_reminders_to_remote(plan, fail)
+        self.plan_remote_reminders_to_local(plan)
+        success, data = self.execute_plan(plan, result, fail)
         if not success:
             return success, data
 
-        # Sync remote reminders to local
-        success, data = self.sync_remote_reminders_to_local(result, fail)
+        success, data = self.persist_synced_hashes()
         if not success:
-            return success, data
+            return False, 'Failed to save reminder hashes: {}'.format(data)
+
+        # The search index is brought up to date by the next sync, so a failure does not fail this one
+        success, data = self.index_reminders()
+        if not success:
+            logging.warning('Failed to update search index: {}'.format(data))
 
         return True, result
 
+    def index_reminders(self) -> tuple[bool, str]:
+        """
+        Updates the search index of this container with its reminders as they are after sync, which are the local
+        reminders, with those written from remote replaced by what was written.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the search index is successfully updated.
+
+            -data (:py:class:`str`) - error message on failure, or success message.
+
+        """
+        reminders = {reminder.uuid: reminder for reminder in self.local_reminders if reminder.uuid}
+        reminders.update(self.written_reminders)
+        return helpers.SearchIndex.update(helpers.SearchIndex.REMINDER, self.local_list.name,
+                                          [(uuid, reminder.name, reminder.body) for uuid, reminder in reminders.items()])
+
     def __str__(self):
         return "<Local: {local}, Remote: {remote}, Sync: {sync}>".format(
             local=self.local_list.name,
@@ -1016,6 +1462,30 @@ class RemoteCalendar:
             return False, 'Failed to find remote calendar to delete {0}: {1}'.format(self.name, e)
         return True, 'Remote calendar {} deleted'.format(self.name)
 
+    def rename(self, name: str) -> tuple[bool, str]:
+        """
+        Renames this calendar by setting its display name using CalDav. The tasks in the calendar are kept.
+
+        :param name: the new name of the calendar.
+
+        :returns:
+
+            -success (:py:class:`bool`) - true if the calendar is successfully renamed.
+
+            -data (:py:class:`str`) - error message on failure or success message.
+
+        """
+        try:
+            cal = getattr(self, 'cal_obj', None) or helpers.CALDAV_PRINCIPAL.calendar(name=self.name)
+            cal.set_properties([dav.DisplayName(name)])
+        except (error.PropsetError, AttributeError) as e:
+            return False, 'Failed to rename remote calendar {0}: {1}'.format(self.name, e)
+        except error.NotFoundError as e:
+            return False, 'Failed to find remote calendar to rename {0}: {1}'.format(self.name, e)
+        old_name = self.name
+        self.name = name
+        return True, 'Remote calendar {0} renamed to {1}'.format(old_name, name)
+
     def __str__(self):
         return self.name
 
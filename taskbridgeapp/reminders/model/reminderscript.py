@@ -29,39 +29,55 @@ tell application "Reminders"
 end tell
 end run'''
 
-#: Get the list of reminders in a reminder list.
-get_reminders_in_list_script = '''on run argv
-set list_name to item 1 of argv
-tell application "Reminders"
-    set upcomingReminders to every reminder of list list_name whose completed is false
-    set fileContent to ""
-    repeat with currentRem in upcomingReminders
-        set rId to id of currentRem
-        set rName to name of currentRem
-        set rCreationDate to creation date of currentRem
-        set rBody to body of currentRem
-        set rCompleted to completed of currentRem
-        set rDueDate to due date of currentRem
-        set rAllDay to allday due date of currentRem
-        set rRemindMeDate to remind me date of currentRem
-        set rModificationDate to modification date of currentRem
-        set rCompletionDate to completion date of currentRem
-        set csvLine to rId & "|" & rName & "|" & rCreationDate & "|" & rCompleted & "|" & rDueDate & "|" & rAllDay & "|"
-        set csvLine to csvLine & rRemindMeDate & "|" & rModificationDate & "|" & rCompletionDate & "|" & rBody & linefeed
-        set fileContent to fileContent & csvLine
+#: Get the incomplete reminders in the given reminder lists, writing them to the export file given as the first argument.
+#: Each property is fetched for every reminder of a list in one Apple Event, and the IDs are fetched again at the end:
+#: if the reminders of the list changed in between, so that the properties would not line up, the list is read again,
+#: up to three times. Each reminder is written to the export file on a line starting with the position of its list in
+#: the list arguments.
+get_reminders_in_lists_script = '''on run argv
+set export_file to POSIX file (item 1 of argv)
+set accessRef to (open for access export_file with write permission)
+try
+    set eof accessRef to 0
+    repeat with list_index from 2 to count of argv
+        set list_name to item list_index of argv
+        repeat with attempt from 1 to 3
+            tell application "Reminders"
+                set rIds to id of (every reminder of list list_name whose completed is false)
+                set rNames to name of (every reminder of list list_name whose completed is false)
+                set rCreationDates to creation date of (every reminder of list list_name whose completed is false)
+                set rBodies to body of (every reminder of list list_name whose completed is false)
+                set rCompleteds to completed of (every reminder of list list_name whose completed is false)
+                set rDueDates to due date of (every reminder of list list_name whose completed is false)
+                set rAllDays to allday due date of (every reminder of list list_name whose completed is false)
+                set rRemindMeDates to remind me date of (every reminder of list list_name whose completed is false)
+                set rModificationDates to modification date of (every reminder of list list_name whose completed is false)
+                set rCompletionDates to completion date of (every reminder of list list_name whose completed is false)
+                set rIdsAfter to id of (every reminder of list list_name whose completed is false)
+            end tell
+            set consistent to (rIdsAfter is equal to rIds)
+            repeat with rValues in {rNames, rCreationDates, rBodies, rCompleteds, rDueDates, rAllDays, ¬
+                rRemindMeDates, rModificationDates, rCompletionDates}
+                if (count of rValues) is not equal to (count of rIds) then set consistent to false
+            end repeat
+            if consistent then exit repeat
+            if attempt is 3 then error "Reminders in list " & list_name & " changed while they were read"
+        end repeat
+        repeat with idx from 1 to count of rIds
+            set csvLine to ((list_index - 1) as text) & "|" & item idx of rIds & "|" & item idx of rNames & "|"
+            set csvLine to csvLine & item idx of rCreationDates & "|" & item idx of rCompleteds & "|"
+            set csvLine to csvLine & item idx of rDueDates & "|" & item idx of rAllDays & "|"
+            set csvLine to csvLine & item idx of rRemindMeDates & "|" & item idx of rModificationDates & "|"
+            set csvLine to csvLine & item idx of rCompletionDates & "|" & item idx of rBodies & linefeed
+            write csvLine to accessRef as «class utf8»
+        end repeat
     end repeat
-end tell
-set accessRef to (open for access file ((path to temporary items folder as text) & list_name & ".psv") with write permission)
-    try
-        set eof accessRef to 0
-        write fileContent to accessRef
-        close access accessRef
-        set save_location to POSIX path of (path to temporary items folder) as text
-        return save_location
-    on error errMsg
-        close access accessRef
-        log errMsg
-    end try
+    close access accessRef
+    return POSIX path of export_file
+on error errMsg
+    close access accessRef
+    error errMsg
+end try
 end run'''
 
 #: Add a new reminder to the given list in the default account.
@@ -105,6 +121,79 @@ on stringToDate(theDateStr)
 end stringToDate
 '''
 
+#: Add or update several reminders in the given list, from a manifest file with one reminder per line. Each line holds
+#: the fields of ``add_reminder_script`` escaped and separated by ``~~`` by ``helpers.manifest_line``, with the body read
+#: from a file. One result line is returned per reminder, as ``index~~OK~~id`` or ``index~~ERROR~~message``.
+upsert_reminders_script = '''on run argv
+set manifest_lines to paragraphs of (read (my POSIX file (item 1 of argv)) as «class utf8»)
+set r_list to item 2 of argv
+set results to {}
+set AppleScript's text item delimiters to "~~"
+repeat with idx from 1 to count of manifest_lines
+  set manifest_line to item idx of manifest_lines
+  if manifest_line is not "" then
+    set fields to my decode_fields(text items of manifest_line)
+    set {r_id, r_name, r_completed, r_completed_date} to items 1 thru 4 of fields
+    set {r_due_date, r_allday_due, r_remind_date, body_file} to items 5 thru 8 of fields
+    try
+      tell application "Reminders"
+        tell list r_list
+          if r_id is equal to "" then
+            set theReminder to make new reminder at end
+          else
+            set theReminder to reminder id r_id
+          end if
+          set name of theReminder to r_name
+          if body_file is not equal to "" then
+            set body of theReminder to (read (my POSIX file body_file) as «class utf8»)
+          end if
+          set completed of theReminder to (r_completed is "true")
+          if r_completed_date is not equal to "" then
+            set completion date of theReminder to date r_completed_date
+          end if
+          if r_remind_date is not equal to "" then
+            set remind me date of theReminder to date r_remind_date
+          end if
+          if r_due_date is not equal to "" then
+            if r_allday_due is "true" then
+              set allday due date of theReminder to date r_due_date
+            else
+              set due date of theReminder to date r_due_date
+            end if
+          end if
+          set end of results to ((idx - 1) as text) & "~~OK~~" & (id of theReminder)
+        end tell
+      end tell
+    on error errMsg
+      set end of results to ((idx - 1) as text) & "~~ERROR~~" & errMsg
+    end try
+  end if
+end repeat
+set AppleScript's text item delimiters to linefeed
+set output to results as text
+set AppleScript's text item delimiters to ""
+return output
+end run
+
+on decode_fields(field_list)
+  set saved_delimiters to AppleScript's text item delimiters
+  set escape_pairs to {{"%7E", "~"}, {"%0A", linefeed}, {"%0D", return}, ¬
+    {"%u2028", character id 8232}, {"%u2029", character id 8233}, {"%25", "%"}}
+  set decoded to {}
+  repeat with field_item in field_list
+    set field_text to field_item as text
+    repeat with escape_pair in escape_pairs
+      set AppleScript's text item delimiters to item 1 of escape_pair
+      set field_parts to text items of field_text
+      set AppleScript's text item delimiters to item 2 of escape_pair
+      set field_text to field_parts as text
+    end repeat
+    set end of decoded to field_text
+  end repeat
+  set AppleScript's text item delimiters to saved_delimiters
+  return decoded
+end decode_fields'''
+
 #: Delete the reminder with the given UUID.
 delete_reminder_script = '''on run argv
 set r_id to item 1 of argv
@@ -113,6 +202,25 @@ tell application "Reminders"
 end tell
 end run'''
 
+#: Delete the reminders with the given UUIDs. One line is returned per reminder which could not be deleted, as
+#: ``id~~ERROR~~message``.
+delete_reminders_script = '''on run argv
+set results to {}
+tell application "Reminders"
+    repeat with r_id in argv
+        try
+            delete reminder id (r_id as text)
+        on error errMsg
+            set end of results to (r_id as text) & "~~ERROR~~" & errMsg
+        end try
+    end repeat
+end tell
+set AppleScript's text item delimiters to linefeed
+set output to results as text
+set AppleScript's text item delimiters to ""
+return output
+end run'''
+
 #: Delete the list with the given name in the default account.
 delete_list_script = '''on run argv
 set r_list to item 1 of argv
@@ -0,0 +1,39 @@
+import datetime
+
+import pytest
+
+from taskbridgeapp import helpers
+from taskbridgeapp.reminders.model.reconcile import ReminderIndex
+from taskbridgeapp.reminders.model.reminder import Reminder
+from taskbridgeapp.reminders.model.remindercontainer import LocalList, ReminderContainer, RemoteCalendar
+
+
+@pytest.fixture
+def container_list(tmp_path):
+    data_location = helpers.DATA_LOCATION
+    helpers.DATA_LOCATION = tmp_path
+    saved_containers = list(ReminderContainer.CONTAINER_LIST)
+    ReminderContainer.CONTAINER_LIST.clear()
+    yield ReminderContainer.CONTAINER_LIST
+    ReminderContainer.CONTAINER_LIST[:] = saved_containers
+    helpers.DATA_LOCATION = data_location
+
+
+@pytest.fixture
+def make_reminder():
+    def _make_reminder(name, uuid=None, modified_date=datetime.datetime(2024, 1, 1, 8, 0, 0), body=None):
+        return Reminder(uuid, name, None, modified_date, None, body, None, None)
+    return _make_reminder
+
+
+@pytest.fixture
+def make_container():
+    def _make_container(local_reminders, remote_reminders):
+        container = ReminderContainer(LocalList('Sync', 'x-apple-reminder://list'), RemoteCalendar(calendar_name='Sync'),
+                                      True)
+        container.local_reminders = local_reminders
+        container.remote_reminders = remote_reminders
+        container.local_index = ReminderIndex(local_reminders)
+        container.remote_index = ReminderIndex(remote_reminders)
+        return container
+    return _make_container
@@ -2,6 +2,7 @@ import datetime
 import logging
 import pathlib
 import sys
+import time
 from pathlib import Path
 
 import pytest
@@ -9,6 +10,7 @@ from decouple import config
 
 from taskbridgeapp import helpers
 from taskbridgeapp.helpers import DateUtil
+from taskbridgeapp.notes.model.notestate import NoteState
 
 TEST_ENV = config('TEST_ENV', default='remote')
 
@@ -44,6 +46,273 @@ class TestHelpers:
         uuid = helpers.get_uuid()
         assert len(uuid) == 36
 
+        # Seeded UUIDs are stable
+        assert helpers.get_uuid('image data') == helpers.get_uuid('image data')
+        assert helpers.get_uuid('image data') != helpers.get_uuid('other data')
+
+    def test_manifest_line(self):
+        fields = ['update', 'Plan ~~ v2', 'a%7E\nb\u2028']
+        line = helpers.manifest_line(fields)
+        assert line == 'update~~Plan %7E%7E v2~~a%257E%0Ab%u2028'
+        assert len(line.splitlines()) == 1
+
+        # Decoded as the decode_fields handler of the scripts does
+        decoded = []
+        for field in line.split('~~'):
+            for sequence, character in [('%7E', '~'), ('%0A', '\n'), ('%0D', '\r'), ('%u2028', '\u2028'),
+                                        ('%u2029', '\u2029'), ('%25', '%')]:
+                field = field.replace(sequence, character)
+            decoded.append(field)
+        assert decoded == fields
+
+    def test_normalize_markdown(self):
+        markdown = "# Title  \r\nLine with break    \nLine with space \n    \n  \nEnd\n\n\n"
+        result = helpers.normalize_markdown(markdown)
+        assert result == "# Title  \nLine with break  \nLine with space\n\n\nEnd\n"
+        assert helpers.normalize_markdown(result) == result
+
+    def test_atomic_write_batch(self, tmp_path):
+        existing = tmp_path / 'existing.md'
+        with open(existing, 'w') as fp:
+            fp.write('old')
+
+        batch = helpers.AtomicWriteBatch()
+        batch.write(existing, b'new', (1000000000, 1000000000))
+        batch.write(tmp_path / 'created.md', b'created')
+
+        # Nothing is replaced until the batch is committed
+        with open(existing) as fp:
+            assert fp.read() == 'old'
+        assert not (tmp_path / 'created.md').exists()
+
+        success, data = batch.commit()
+        assert success is True
+        with open(existing) as fp:
+            assert fp.read() == 'new'
+        assert existing.stat().st_mtime == 1000000000
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['created.md', 'existing.md']
+
+        # Discarded writes are removed
+        batch.write(existing, b'discarded')
+        batch.discard()
+        with open(existing) as fp:
+            assert fp.read() == 'new'
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['created.md', 'existing.md']
+
+    @staticmethod
+    def _count_rows():
+        with helpers.Database.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM tb_test").fetchone()[0]
+
+    def test_database_session(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+
+        # Outside a session, each connection is new and committed at the end
+        with helpers.Database.connection() as connection:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            connection.execute("CREATE TABLE tb_test (value TEXT)")
+            connection.execute("INSERT INTO tb_test VALUES ('outside')")
+        with helpers.Database.connection() as other:
+            assert other is not connection
+        assert TestHelpers._count_rows() == 1
+
+        # Within a session, the connection is shared
+        with helpers.Database.session():
+            with helpers.Database.connection() as first:
+                first.execute("INSERT INTO tb_test VALUES ('inside')")
+            with helpers.Database.connection() as second:
+                assert second is first
+                assert second.in_transaction is False
+        assert TestHelpers._count_rows() == 2
+        helpers.DATA_LOCATION = data_location
+
+    def test_database_stage(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        with helpers.Database.connection() as connection:
+            connection.execute("CREATE TABLE tb_test (value TEXT)")
+
+        @helpers.Database.stage
+        def stage(succeed):
+            with helpers.Database.connection() as stage_connection:
+                stage_connection.execute("INSERT INTO tb_test VALUES ('one')")
+            with helpers.Database.connection() as stage_connection:
+                stage_connection.execute("INSERT INTO tb_test VALUES ('two')")
+                assert stage_connection.in_transaction is True
+            return succeed, 'Stage finished'
+
+        # Every change of a stage is committed together, or rolled back if the stage fails
+        assert stage(True) == (True, 'Stage finished')
+        assert TestHelpers._count_rows() == 2
+        assert stage(False) == (False, 'Stage finished')
+        assert TestHelpers._count_rows() == 2
+        with helpers.Database.session():
+            assert stage(True)[0] is True
+            assert stage(False)[0] is False
+        assert TestHelpers._count_rows() == 4
+        helpers.DATA_LOCATION = data_location
+
+    def test_schema_migrate(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+
+        # A table created before migrations is brought up to date
+        with helpers.Database.connection() as connection:
+            connection.execute("CREATE TABLE tb_test (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT)")
+        migrations = ["CREATE TABLE IF NOT EXISTS tb_test (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, size INT)",
+                      helpers.Schema.add_columns('tb_test', {'size': 'INT'}),
+                      "CREATE INDEX IF NOT EXISTS tb_test_name ON tb_test(name)"]
+        success, data = helpers.Schema.migrate('tb_test', migrations)
+        assert success is True
+        with helpers.Database.connection() as connection:
+            assert [col[1] for col in connection.execute("PRAGMA table_info('tb_test')")] == ['id', 'name', 'size']
+            assert connection.execute("SELECT version FROM tb_schema WHERE item_table = 'tb_test'").fetchone()[0] == 3
+
+        # Only new migrations are applied, and a failed migration leaves the table at its last version
+        helpers.Schema._MIGRATED.clear()
+        success, data = helpers.Schema.migrate('tb_test', migrations + ["ALTER TABLE tb_test ADD COLUMN hash TEXT",
+                                                                        "ALTER TABLE tb_missing ADD COLUMN hash TEXT"])
+        assert success is False
+        with helpers.Database.connection() as connection:
+            assert 'hash' not in [col[1] for col in connection.execute("PRAGMA table_info('tb_test')")]
+            assert connection.execute("SELECT version FROM tb_schema WHERE item_table = 'tb_test'").fetchone()[0] == 3
+        helpers.DATA_LOCATION = data_location
+
+    def test_persist_rows(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        with helpers.Database.connection() as connection:
+            connection.execute("CREATE TABLE tb_test (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, size INT)")
+            cursor = connection.cursor()
+            assert helpers.Database.persist_rows(cursor, 'tb_test', ('name',), ('size',),
+                                                 [('one', 1), ('two', 2), ('two', 2), ('three', 3)]) == (4, 0, 0)
+            ids = {row[1]: row[0] for row in connection.execute("SELECT id, name FROM tb_test")}
+
+            # Unchanged rows are not written, and rows with the same key are matched in order
+            assert helpers.Database.persist_rows(cursor, 'tb_test', ('name',), ('size',),
+                                                 [('one', 1), ('two', 2), ('three', 4), ('four', 4)]) == (1, 1, 1)
+            rows = connection.execute("SELECT id, name, size FROM tb_test ORDER BY id").fetchall()
+            assert rows[0] == (ids['one'], 'one', 1)
+            assert [(name, size) for row_id, name, size in rows] == [('one', 1), ('two', 2), ('three', 4), ('four', 4)]
+
+            # Only the rows of the scope are replaced, in a table without an id column
+            connection.execute("CREATE TABLE tb_scoped (folder TEXT, uuid TEXT, hash TEXT, PRIMARY KEY (folder, uuid))")
+            connection.executemany("INSERT INTO tb_scoped VALUES (?, ?, ?)",
+                                   [('a', '1', 'x'), ('a', '2', 'x'), ('b', '1', 'x')])
+            assert helpers.Database.persist_rows(cursor, 'tb_scoped', ('folder', 'uuid'), ('hash',),
+                                                 [('a', '1', 'x'), ('a', '3', 'y')], {'folder': 'a'}) == (1, 0, 1)
+            assert connection.execute("SELECT * FROM tb_scoped ORDER BY folder, uuid").fetchall() == [
+                ('a', '1', 'x'), ('a', '3', 'y'), ('b', '1', 'x')]
+            cursor.close()
+        helpers.DATA_LOCATION = data_location
+
+    def test_sync_journal(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        success, entry_ids = helpers.SyncJournal.plan('stage', 'scope', [('delete', 'one'), ('delete', 'two')])
+        assert success is True and len(entry_ids) == 2
+        helpers.SyncJournal.complete([(entry_ids[1], {'hash': 'abc'})])
+        assert helpers.SyncJournal.completed('stage', 'scope') == (True, {('delete', 'two'): {'hash': 'abc'}})
+        assert helpers.SyncJournal.completed('stage', 'other') == (True, {})
+
+        # The journal is only finished once the stage is committed
+        @helpers.Database.stage
+        def stage(succeed):
+            helpers.Database.after_commit(lambda: helpers.SyncJournal.finish('stage', 'scope'))
+            return succeed, 'Stage finished'
+
+        stage(False)
+        assert len(helpers.SyncJournal.completed('stage', 'scope')[1]) == 1
+        stage(True)
+        assert helpers.SyncJournal.completed('stage', 'scope') == (True, {})
+        helpers.DATA_LOCATION = data_location
+
+    def test_search_index(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        notes = [('x-coredata://1', 'Groceries', 'Milk, eggs and flour for the pancakes.'),
+                 ('x-coredata://2', 'Weekend', 'Make pancakes on Sunday morning.'),
+                 ('x-coredata://3', 'Work', 'Quarterly report due on Friday.')]
+        assert helpers.SearchIndex.update(helpers.SearchIndex.NOTE, 'Notes', notes) == (
+            True, 'Search index of note Notes updated: 3 documents written, 0 removed')
+        assert helpers.SearchIndex.update(helpers.SearchIndex.REMINDER, 'Tasks', [
+            ('x-apple-reminder://1', 'Buy pancake mix', None)])[0] is True
+
+        # Matches in the title rank first, and the last word may be the start of a longer one
+        success, data = helpers.SearchIndex.search('pancake')
+        assert success is True
+        assert [row['title'] for row in data] == ['Buy pancake mix', 'Weekend', 'Groceries']
+        assert data[1]['kind'] == 'note' and data[1]['item'] == 'x-coredata://2'
+        assert data[1]['snippet'] == 'Make [pancakes] on Sunday morning.'
+        assert [row['title'] for row in helpers.SearchIndex.search('SUNDAY pancakes')[1]] == ['Weekend']
+        assert [row['title'] for row in helpers.SearchIndex.search('("report*')[1]] == ['Work']
+        assert helpers.SearchIndex.search('?!') == (True, [])
+
+        # Only changed documents are written again
+        notes[2] = ('x-coredata://3', 'Work', 'Annual report due on Friday.')
+        assert helpers.SearchIndex.update(helpers.SearchIndex.NOTE, 'Notes', notes[1:]) == (
+            True, 'Search index of note Notes updated: 1 documents written, 2 removed')
+        assert [row['title'] for row in helpers.SearchIndex.search('pancake')[1]] == ['Buy pancake mix', 'Weekend']
+        assert helpers.SearchIndex.search('quarterly') == (True, [])
+
+        # Documents of scopes which are no longer synchronised are removed
+        assert helpers.SearchIndex.retain(helpers.SearchIndex.NOTE, []) == (
+            True, '2 note documents removed from the search index')
+        assert [row['kind'] for row in helpers.SearchIndex.search('pancake')[1]] == ['reminder']
+        helpers.DATA_LOCATION = data_location
+
+    @pytest.mark.skipif(TEST_ENV != 'benchmark', reason="Benchmark")
+    def test_search_index_benchmark(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        words = ['budget', 'roadmap', 'venue', 'garden', 'invoice', 'recipe', 'holiday', 'meeting', 'plants', 'review']
+        notes = [('x-coredata://{}'.format(i), 'Note {}'.format(i),
+                  ' '.join(words[(i * j) % len(words)] for j in range(1, 200)) + ' ref{}'.format(i))
+                 for i in range(10000)]
+        start = time.perf_counter()
+        assert helpers.SearchIndex.update(helpers.SearchIndex.NOTE, 'Notes', notes)[0] is True
+        indexed = time.perf_counter() - start
+
+        notes[0] = ('x-coredata://0', 'Note 0', 'Changed')
+        start = time.perf_counter()
+        assert helpers.SearchIndex.update(helpers.SearchIndex.NOTE, 'Notes', notes)[1].endswith(
+            '1 documents written, 1 removed')
+        updated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(100):
+            success, data = helpers.SearchIndex.search('ref{} budget'.format(i + 1))
+            assert success is True and len(data) == 1
+        searched = (time.perf_counter() - start) / 100
+        print('Search index of 10k notes: {0:.3f}s to build, {1:.3f}s to update one, {2:.2f}ms per search'.format(
+            indexed, updated, searched * 1000))
+        helpers.DATA_LOCATION = data_location
+        assert searched < 0.05
+
+    @pytest.mark.skipif(TEST_ENV != 'benchmark', reason="Benchmark")
+    def test_database_benchmark(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        states = {'x-coredata://{}'.format(i): NoteState('hash', 1.0, 'hash', 1.0) for i in range(100)}
+        folders = ['Folder {}'.format(i) for i in range(1000)]
+
+        # 100k rows, saved by a thousand calls with a connection each, then by the same calls in one stage
+        start = time.perf_counter()
+        for folder in folders:
+            assert NoteState.save_states(folder, states)[0] is True
+        separate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with helpers.Database.transaction():
+            for folder in folders:
+                assert NoteState.save_states(folder, states)[0] is True
+        shared = time.perf_counter() - start
+        print('Persisting 100k rows: {0:.3f}s with a connection per call, {1:.3f}s in one stage'.format(
+            separate, shared))
+        helpers.DATA_LOCATION = data_location
+        assert shared < separate
+
     @pytest.mark.skipif(TEST_ENV != 'local', reason="Requires local filesystem")
     def test_html_to_markdown(self):
         with open(TestHelpers.RES_DIR / 'mock_testnote2_html.html') as fp:
@@ -84,6 +353,40 @@ class TestHelpers:
         assert result == data_location
         assert data_location.is_dir()
 
+    @pytest.mark.skipif(TEST_ENV != 'benchmark', reason="Benchmark")
+    def test_persist_rows_benchmark(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        rows = [('Folder {}'.format(i // 100), 'x-coredata://{}'.format(i), 'Note {}'.format(i), 1) for i in range(100000)]
+        changed = [row[:3] + (2,) if i % 100 == 0 else row for i, row in enumerate(rows)]
+        timings = {}
+        with helpers.Database.connection() as connection:
+            connection.execute("""CREATE TABLE tb_test (id INTEGER PRIMARY KEY AUTOINCREMENT, folder TEXT, uuid TEXT,
+                               name TEXT, generation INT)""")
+            cursor = connection.cursor()
+            helpers.Database.persist_rows(cursor, 'tb_test', ('folder', 'uuid', 'name'), ('generation',), rows)
+            connection.commit()
+
+            # 1% of 100k rows changed, written again in full, then as a diff
+            changes = connection.total_changes
+            start = time.perf_counter()
+            cursor.execute("DELETE FROM tb_test")
+            cursor.executemany("INSERT INTO tb_test(folder, uuid, name, generation) VALUES (?, ?, ?, ?)", changed)
+            connection.commit()
+            timings['rewrite'] = (time.perf_counter() - start, connection.total_changes - changes)
+            changes = connection.total_changes
+            start = time.perf_counter()
+            assert helpers.Database.persist_rows(cursor, 'tb_test', ('folder', 'uuid', 'name'), ('generation',),
+                                                 rows) == (0, 1000, 0)
+            connection.commit()
+            timings['diff'] = (time.perf_counter() - start, connection.total_changes - changes)
+            cursor.close()
+        print('Persisting 100k rows with 1% changed: {0}'.format(', '.join(
+            '{0} in {1:.3f}s, {2} rows written'.format(name, timing, written)
+            for name, (timing, written) in timings.items())))
+        helpers.DATA_LOCATION = data_location
+        assert timings['diff'][1] * 100 <= timings['rewrite'][1]
+
     def test_convert(self):
         apple_datetime = "Friday, 24 May 2024 at 09:54:59"
         apple_datetime_alt = "Friday 24 May 2024 at 09:54:59"
@@ -0,0 +1,246 @@
+import datetime
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.nextcloudnotes import NextCloudNoteFolder, NextCloudNotesApi
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.notefolder import LocalNoteFolder, NoteFolder
+
+
+class NotesServer(ThreadingHTTPServer):
+    """
+    Stand-in for the NextCloud Notes API, implementing ETags, ``pruneBefore`` and ``If-Match``.
+    """
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), NotesHandler)
+        self.notes = {}
+        self.next_id = 1
+        self.clock = 1000
+        self.requests = []
+
+    def add_note(self, title, content, category, modified=None):
+        note = {'id': self.next_id, 'title': title, 'content': content, 'category': category,
+                'modified': modified or self.clock, 'favorite': False, 'readonly': False}
+        note['etag'] = hashlib.md5(json.dumps(note, sort_keys=True).encode()).hexdigest()
+        self.notes[note['id']] = note
+        self.next_id += 1
+        return note
+
+    def list_etag(self):
+        return '"{}"'.format(hashlib.md5(json.dumps(self.notes, sort_keys=True).encode()).hexdigest())
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+
+class NotesHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        content = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _route(self):
+        url = urlparse(self.path)
+        assert url.path.startswith(NextCloudNotesApi.API_PATH + '/notes')
+        assert self.headers['Authorization'].startswith('Basic ')
+        note_id = url.path[len(NextCloudNotesApi.API_PATH + '/notes/'):]
+        return (int(note_id) if note_id else None), parse_qs(url.query)
+
+    def _body(self):
+        return json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+    def do_GET(self):
+        server = self.server
+        note_id, query = self._route()
+        server.requests.append(('GET', self.path))
+        if note_id is not None:
+            if note_id not in server.notes:
+                return self._send(404)
+            return self._send(200, server.notes[note_id])
+        etag = server.list_etag()
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, headers={'ETag': etag})
+        prune_before = int(query.get('pruneBefore', ['0'])[0])
+        notes = [note if note['modified'] >= prune_before else {'id': note['id']} for note in server.notes.values()]
+        return self._send(200, notes, {'ETag': etag})
+
+    def do_POST(self):
+        server = self.server
+        server.requests.append(('POST', self.path))
+        body = self._body()
+        server.clock += 10
+        self._send(200, server.add_note(body['title'], body['content'], body['category']))
+
+    def do_PUT(self):
+        server = self.server
+        note_id, query = self._route()
+        server.requests.append(('PUT', self.path))
+        body = self._body()
+        if note_id not in server.notes:
+            return self._send(404)
+        if self.headers.get('If-Match') not in (None, '"{}"'.format(server.notes[note_id]['etag'])):
+            return self._send(412)
+        server.clock += 10
+        note = dict(server.notes[note_id], **body, modified=server.clock)
+        note['etag'] = hashlib.md5(json.dumps(note, sort_keys=True).encode()).hexdigest()
+        server.notes[note_id] = note
+        self._send(200, note)
+
+    def do_DELETE(self):
+        server = self.server
+        note_id, query = self._route()
+        server.requests.append(('DELETE', self.path))
+        if server.notes.pop(note_id, None) is None:
+            return self._send(404)
+        self._send(200)
+
+
+@pytest.fixture
+def notes_server(tmp_path):
+    data_location = helpers.DATA_LOCATION
+    helpers.DATA_LOCATION = tmp_path
+    server = NotesServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    helpers.DATA_LOCATION = data_location
+
+
+class TestNextCloudNotes:
+
+    def test_fetch_notes(self, notes_server):
+        notes_server.add_note('One', '# One\nFirst\n', 'Sync', modified=900)
+        notes_server.add_note('Two', '# Two\nSecond\n', 'Sync', modified=950)
+        notes_server.add_note('Three', '# Three\n', 'Other', modified=950)
+        api = NextCloudNotesApi(notes_server.url, 'user', 'password')
+
+        # First sync fetches everything
+        success, notes = api.fetch_notes()
+        assert success is True
+        assert sorted(note['title'] for note in notes.values()) == ['One', 'Three', 'Two']
+        success, folders = NextCloudNoteFolder.load_folders(api)
+        assert success is True
+        assert [folder.name for folder in folders] == ['Other', 'Sync']
+        assert len(notes_server.requests) == 1
+        api.finish_sync()
+
+        # Nothing is transferred if nothing changed
+        api = NextCloudNotesApi(notes_server.url, 'user', 'password')
+        success, notes = api.fetch_notes()
+        assert success is True
+        assert len(notes) == 3 and all('content' not in note for note in notes.values())
+        assert notes_server.requests[-1] == ('GET', NextCloudNotesApi.API_PATH + '/notes?pruneBefore=950')
+        api.finish_sync()
+
+        # Only changed notes are transferred, and deleted notes are dropped
+        notes_server.notes[1].update(content='# One\nChanged\n', modified=1200)
+        del notes_server.notes[3]
+        notes_server.add_note('Four', '# Four\n', 'Sync', modified=800)
+        api = NextCloudNotesApi(notes_server.url, 'user', 'password')
+        success, notes = api.fetch_notes()
+        assert success is True
+        assert notes[1]['content'] == '# One\nChanged\n'
+        assert notes[4]['content'] == '# Four\n'
+        assert 3 not in notes
+        api.finish_sync()
+        success, notes = NextCloudNotesApi(notes_server.url, 'user', 'password').fetch_notes()
+        assert success is True
+        assert 'content' not in notes[2] and notes[2]['title'] == 'Two'
+        assert sorted(notes.keys()) == [1, 2, 4]
+
+        # Fail - Server unreachable
+        api = NextCloudNotesApi('http://127.0.0.1:1', 'user', 'password', timeout=1)
+        success, data = api.fetch_notes()
+        assert success is False
+
+    def test_note_from_api(self):
+        note = NextCloudNoteFolder.note_from_api({'id': 1, 'title': 'Pictures', 'category': 'Sync', 'modified': 900,
+                                                  'content': '# Pictures\nBefore\n![x](x.png)\nAfter\n'})
+        assert note.name == 'Pictures'
+        assert note.body_markdown == '# Pictures\nBefore\n![x](x.png)\nAfter\n'
+        assert note.attachments == []
+        assert 'x.png' in note.body_html and 'file://' not in note.body_html
+
+        # Notes without content only have their name and dates
+        note = NextCloudNoteFolder.note_from_api({'id': 1, 'title': 'Pictures', 'category': 'Sync', 'modified': 900})
+        assert note.name == 'Pictures' and note.body_markdown == ''
+
+    def test_sync_notes(self, notes_server):
+        old_date = datetime.datetime.fromtimestamp(500)
+        notes_server.add_note('Remote', '# Remote\nFrom server\n', 'Sync', modified=900)
+        notes_server.add_note('Shared', '# Shared\nOld\n', 'Sync', modified=900)
+        NoteFolder.NOTES_API = NextCloudNotesApi(notes_server.url, 'user', 'password')
+        NoteFolder.reset_list()
+        try:
+            NoteFolder.seed_note_table()
+            success, folders = NoteFolder.load_remote_folders(None)
+            assert success is True
+            folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), folders[0], NoteFolder.SYNC_BOTH)
+            folder.local_notes = [
+                Note(name='Local', created_date=old_date, modified_date=datetime.datetime.now(),
+                     body_markdown='# Local\nFrom Mac\n', uuid='x-coredata://local'),
+                Note(name='Shared', created_date=old_date, modified_date=datetime.datetime.now(),
+                     body_markdown='# Shared\nNew\n', uuid='x-coredata://shared')
+            ]
+            success, data = folder.load_remote_notes()
+            assert success is True
+
+            # noinspection PyUnusedLocal
+            def mock_run_applescript(script, *args):
+                with open(args[0]) as fp:
+                    lines = fp.read().splitlines()
+                return 0, '\n'.join('{0}~~OK~~x-coredata://new~~Saturday, 1 June 2024 at 09:00:00'.format(idx)
+                                    for idx in range(len(lines))), ''
+
+            with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+                success, data = folder.sync_notes()
+                assert success is True
+                assert data['remote_added'] == ['Local']
+                assert data['remote_updated'] == ['Shared']
+                assert data['local_added'] == ['Remote']
+                titles = {note['title']: note['content'] for note in notes_server.notes.values()}
+                assert titles == {'Remote': '# Remote\nFrom server\n', 'Shared': '# Shared\nNew\n',
+                                  'Local': '# Local\nFrom Mac\n'}
+
+                # Unchanged notes are not uploaded again
+                folder.local_notes.append(Note(name='Remote', created_date=old_date,
+                                               modified_date=datetime.datetime.now(),
+                                               body_markdown='# Remote\nFrom server\n', uuid='x-coredata://new'))
+                success, data = folder.load_remote_notes()
+                assert success is True
+                requests = len(notes_server.requests)
+                success, data = folder.sync_notes()
+                assert success is True
+                assert data['remote_updated'] == []
+                assert len(notes_server.requests) == requests
+
+                # A note changed on the server since it was fetched is not overwritten
+                notes_server.notes[2]['etag'] = 'changed'
+                folder.local_notes[1].body_markdown = '# Shared\nNewer\n'
+                folder.local_notes[1].modified_date = datetime.datetime.now() + datetime.timedelta(minutes=1)
+                success, data = folder.sync_notes()
+                assert success is False
+                assert notes_server.notes[2]['content'] == '# Shared\nNew\n'
+        finally:
+            NoteFolder.NOTES_API = None
+            NoteFolder.reset_list()
@@ -168,6 +168,23 @@ That was a ladybird"""
         # Clean up
         TestNote._clean_artefacts()
 
+    def test_build_local_body(self):
+        note = Note(name="testnote2", created_date=datetime.datetime.now(), modified_date=datetime.datetime.now(),
+                    body_html=TestNote.MOCK_TESTNOTE2_HTML)
+        body, attachments = note.build_local_body()
+
+        assert body.startswith("<h1>testnote2</h1><p>This is a remote note. </p>")
+        assert '\n' not in body
+        assert body.count('<img ') == 1
+        assert 'src="file:///tmp/Sync/.attachments.295/ladybird.jpg"/><div><br></div>' in body
+        assert attachments == ['/tmp/Sync/.attachments.295/ladybird.jpg']
+
+        # Inline images are left as they are, and not attached
+        note.body_html = '<div><img src="data:image/jpeg;base64,AAAA"/></div>'
+        body, attachments = note.build_local_body()
+        assert body == '<h1>testnote2</h1><div><img src="data:image/jpeg;base64,AAAA"/></div>'
+        assert attachments == []
+
     @pytest.mark.skipif(TEST_ENV != 'local', reason="Requires local filesystem.")
     def test_create_local(self):
         new_note = TestNote._create_note_from_local()
@@ -234,6 +251,154 @@ That was a ladybird"""
         delete_note_script = notescript.delete_note_script
         helpers.run_applescript(delete_note_script, "Sync", "testnote1")
 
+    def test_update_local_by_uuid(self, tmp_path):
+        calls = []
+
+        # noinspection PyUnusedLocal
+        def mock_run_applescript(script, *args):
+            calls.append(args)
+            return 0, '', ''
+
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        note = Note(name="testnote2", created_date=datetime.datetime.now(), modified_date=datetime.datetime.now(),
+                    body_html=TestNote.MOCK_TESTNOTE2_HTML,
+                    uuid="x-coredata://F77D9C83-AA4B-4884-81D5-EBD145E61E85/ICNote/p3379")
+        with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+            # Notes with a local UUID are addressed by UUID
+            success, data = note.update_local('Sync')
+            assert success is True
+            assert calls[-1][3] == note.uuid
+            assert calls[-1][4:] == ('/tmp/Sync/.attachments.295/ladybird.jpg',)
+
+            # Notes without a local UUID fall back to their name
+            note.uuid = None
+            success, data = note.update_local('Sync')
+            assert success is True
+            assert calls[-1][:2] == ('Sync', 'testnote2')
+            assert calls[-1][3] == ''
+        helpers.DATA_LOCATION = data_location
+
+    def test_upsert_local_bulk(self, tmp_path):
+        manifests = []
+        manifest_paths = []
+
+        # noinspection PyUnusedLocal
+        def mock_run_applescript(script, *args):
+            manifest_paths.append(Path(args[0]))
+            with open(args[0], 'r') as fp:
+                manifests.append(fp.read().splitlines())
+            return 0, ('0~~OK~~x-coredata://F77D9C83-AA4B-4884-81D5-EBD145E61E85/ICNote/p4000~~'
+                       'Friday, 5 April 2024 at 08:14:01\n1~~ERROR~~Can’t get note.\n'), ''
+
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        new_note = Note(name="testnote2", created_date=datetime.datetime.now(),
+                        modified_date=datetime.datetime.now(), body_html=TestNote.MOCK_TESTNOTE2_HTML)
+        existing_note = Note(name="existing", created_date=datetime.datetime.now(),
+                             modified_date=datetime.datetime.now(), body_html="<h1>existing</h1><div>Body</div>",
+                             uuid="x-coredata://F77D9C83-AA4B-4884-81D5-EBD145E61E85/ICNote/p3379")
+        unreported_note = Note(name="unreported", created_date=datetime.datetime.now(),
+                               modified_date=datetime.datetime.now(), body_html="<div>Body</div>")
+        with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+            success, data = Note.upsert_local_bulk([
+                (Note.LOCAL_CREATE, 'Sync', new_note),
+                (Note.LOCAL_UPDATE, 'Sync', existing_note),
+                (Note.LOCAL_UPDATE, 'Sync', unreported_note)
+            ])
+        helpers.DATA_LOCATION = data_location
+        assert success is True
+
+        # All notes are written in a single invocation
+        assert len(manifests) == 1
+        fields = [line.split('~~') for line in manifests[0]]
+        assert fields[0][:4] == ['create', 'Sync', '', 'testnote2']
+        assert fields[0][5:] == ['/tmp/Sync/.attachments.295/ladybird.jpg']
+        assert fields[1][:4] == ['update', 'Sync', existing_note.uuid, 'existing']
+        assert fields[2][:4] == ['update', 'Sync', '', 'unreported']
+
+        # Written notes take the local UUID and modification date
+        assert data['written'] == [(new_note, new_note.uuid, new_note.modified_date)]
+        assert new_note.uuid == "x-coredata://F77D9C83-AA4B-4884-81D5-EBD145E61E85/ICNote/p4000"
+        assert new_note.modified_date == datetime.datetime(2024, 4, 5, 8, 14, 1)
+        assert [(note.name, error) for note, error in data['failed']] == [
+            ('existing', 'Can’t get note.'), ('unreported', 'No result returned for local note unreported')]
+
+        # Bulk files are written to a folder of their own, which is cleaned up
+        assert manifest_paths[0].parent.parent == tmp_path / 'tmp'
+        assert manifest_paths[0].parent.name.startswith('notes-bulk-')
+        assert not manifest_paths[0].parent.exists()
+
+    def test_upsert_remote_unchanged(self, tmp_path):
+        note = Note(name="testnote", created_date=datetime.datetime(2024, 4, 5, 8, 0, 0),
+                    modified_date=datetime.datetime(2024, 4, 5, 8, 14, 1),
+                    body_markdown="# testnote  \nLine one    \n  \nLine two\n\n")
+        remote_file = tmp_path / 'testnote.md'
+
+        # The note is written normalised, with its modification date
+        success, data = note.upsert_remote(tmp_path)
+        assert success is True
+        with open(remote_file) as fp:
+            assert fp.read() == "# testnote  \nLine one  \n\nLine two\n"
+        assert remote_file.stat().st_mtime == note.modified_date.timestamp()
+        assert note.is_remote_unchanged(tmp_path) is True
+
+        # Unchanged notes are not written again
+        note.modified_date = datetime.datetime(2024, 4, 6, 9, 0, 0)
+        note.body_markdown = "# testnote  \nLine one  \n\nLine two  \n"
+        assert note.is_remote_unchanged(tmp_path) is False
+        note.body_markdown = "# testnote    \nLine one  \n    \nLine two\n"
+        success, data = note.upsert_remote(tmp_path)
+        assert success is True
+        assert remote_file.stat().st_mtime == datetime.datetime(2024, 4, 5, 8, 14, 1).timestamp()
+
+        # Batched writes only happen on commit
+        batch = helpers.AtomicWriteBatch()
+        note.body_markdown = "# testnote\nChanged\n"
+        success, data = note.upsert_remote(tmp_path, batch)
+        assert success is True
+        assert note.is_remote_unchanged(tmp_path) is False
+        success, data = batch.commit()
+        assert success is True
+        assert note.is_remote_unchanged(tmp_path) is True
+        assert [p.name for p in tmp_path.iterdir()] == ['testnote.md']
+
+    def test_remote_metadata(self, tmp_path):
+        note = Note(name="testnote", created_date=datetime.datetime(2024, 4, 5, 8, 0, 0),
+                    modified_date=datetime.datetime(2024, 4, 5, 8, 14, 1),
+                    body_markdown="# testnote\nLine one\n", uuid='x-coredata://ABC/ICNote/p1')
+        remote_file = tmp_path / 'testnote.md'
+
+        # No trailer is written unless enabled
+        assert note.remote_content() == b"# testnote\nLine one\n"
+
+        Note.EMBED_METADATA = True
+        try:
+            success, data = note.upsert_remote(tmp_path)
+            assert success is True
+            with open(remote_file) as fp:
+                content = fp.read()
+            assert content.startswith("# testnote\nLine one\n\n[//]: # (taskbridge id=x-coredata://ABC/ICNote/p1 hash=")
+            assert content.endswith(" modified=2024-04-05T08:14:01)\n")
+            assert Note.read_remote_metadata(remote_file)['id'] == 'x-coredata://ABC/ICNote/p1'
+
+            # The trailer is removed when parsing, and the UUID is read from it
+            remote_note = Note.create_from_remote(content, tmp_path, 'testnote.md')
+            assert remote_note.uuid == 'x-coredata://ABC/ICNote/p1'
+            assert remote_note.body_markdown == "# testnote\nLine one\n"
+            assert remote_note.remote_metadata['modified'] == '2024-04-05T08:14:01'
+
+            # A newer modification date alone does not rewrite the note
+            note.modified_date = datetime.datetime(2024, 4, 6, 9, 0, 0)
+            assert note.is_remote_unchanged(tmp_path) is True
+            note.uuid = 'x-coredata://ABC/ICNote/p2'
+            assert note.is_remote_unchanged(tmp_path) is False
+        finally:
+            Note.EMBED_METADATA = False
+
+        # Notes without a trailer are returned as is
+        assert Note.split_remote_metadata("# testnote\n[//]: # (comment)\n") == ("# testnote\n[//]: # (comment)\n", {})
+
     @pytest.mark.skipif(TEST_ENV != 'local', reason="Requires local filesystem.")
     def test_upsert_remote(self):
         new_note = TestNote._create_note_from_remote()
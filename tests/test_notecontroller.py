@@ -47,7 +47,7 @@ class TestNoteController:
         succeed = True
 
         # noinspection PyUnusedLocal
-        def mock_sync_folder_deletions(local_folders, remote_folders):
+        def mock_sync_folder_deletions(local_folders, remote_folders, assoc):
             return succeed, ""
 
         with mock.patch("{}.NoteFolder.sync_folder_deletions".format(TestNoteController.FOLDER_BASE), mock_sync_folder_deletions):
@@ -112,7 +112,9 @@ class TestNoteController:
                 'local_updated': []
             }
 
-        with mock.patch('{}.NoteFolder.sync_notes'.format(TestNoteController.FOLDER_BASE), mock_sync_notes):
+        with (mock.patch('{}.NoteFolder.sync_notes'.format(TestNoteController.FOLDER_BASE), mock_sync_notes),
+              mock.patch('taskbridgeapp.notes.controller.NoteSnapshot.save') as mock_save,
+              mock.patch('taskbridgeapp.helpers.SearchIndex.retain', return_value=(True, '')) as mock_retain):
             NoteFolder.FOLDER_LIST.append(NoteFolder(
                 LocalNoteFolder("Test"),
                 RemoteNoteFolder(Path("/tmp/test"), "Test"),
@@ -123,8 +125,11 @@ class TestNoteController:
             succeed = True
             success, data = NoteController.sync_notes()
             assert success is True
+            mock_save.assert_called_once()
+            mock_retain.assert_called_once_with('note', [])
 
             # Fail
             succeed = False
             success, data = NoteController.sync_notes()
             assert success is False
+            mock_save.assert_called_once()
@@ -1062,3 +1062,327 @@ end tell"""
         NoteFolder.FOLDER_LIST.append(NoteFolder(None, None, NoteFolder.SYNC_NONE))
         NoteFolder.reset_list()
         assert len(NoteFolder.FOLDER_LIST) == 0
+
+    def test_sync_notes_in_batches(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        old_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        new_date = datetime.datetime(2024, 6, 1, 8, 0, 0)
+        for name, date in [('remote_only_1', old_date), ('remote_only_2', old_date), ('remote_newer', new_date),
+                           ('local_newer', old_date)]:
+            with open(remote_path / (name + '.md'), 'w') as fp:
+                fp.write('# {}\nRemote body\n'.format(name))
+            os.utime(remote_path / (name + '.md'), (date.timestamp(), date.timestamp()))
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        folder.local_notes = [
+            Note(name='local_only', created_date=old_date, modified_date=old_date, body_markdown='Local body\n',
+                 uuid='x-coredata://local_only'),
+            Note(name='remote_newer', created_date=old_date, modified_date=old_date, body_markdown='Local body\n',
+                 uuid='x-coredata://remote_newer'),
+            Note(name='local_newer', created_date=old_date, modified_date=new_date, body_markdown='Local body\n',
+                 uuid='x-coredata://local_newer')
+        ]
+
+        bulk_writes = []
+
+        # noinspection PyUnusedLocal
+        def mock_run_applescript(script, *args):
+            with open(args[0]) as fp:
+                lines = fp.read().splitlines()
+            bulk_writes.append([line.split('~~')[3] for line in lines])
+            return 0, '\n'.join('{0}~~OK~~x-coredata://{1}~~Saturday, 1 June 2024 at 09:00:00'.format(
+                idx, line.split('~~')[3]) for idx, line in enumerate(lines)), ''
+
+        NoteFolder.REMOTE_BATCH_SIZE = 2
+        try:
+            NoteFolder.seed_note_table()
+            success, data = folder.load_remote_notes()
+            assert success is True
+            assert all(note.body_markdown == '' for note in folder.remote_notes)
+
+            with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+                success, data = folder.sync_notes()
+
+            # The search index holds the notes as they are after sync
+            success_search, hits = helpers.SearchIndex.search('remote body')
+        finally:
+            NoteFolder.REMOTE_BATCH_SIZE = None
+            helpers.DATA_LOCATION = data_location
+        assert success is True
+        assert sorted(row['title'] for row in hits) == ['remote_newer', 'remote_only_1', 'remote_only_2']
+        assert sorted(data['local_added']) == ['remote_only_1', 'remote_only_2']
+        assert data['local_updated'] == ['remote_newer']
+        assert sorted(data['remote_updated']) == ['local_newer']
+        assert data['remote_added'] == ['local_only']
+
+        # Local notes are written in one bulk call per batch
+        assert len(bulk_writes) == 2
+        assert all(len(names) <= 2 for names in bulk_writes)
+        with open(remote_path / 'local_only.md') as fp:
+            assert fp.read() == 'Local body\n'
+
+        # Remote records are linked to their local notes
+        records = {note.name: note.uuid for note in folder.remote_notes}
+        assert records['remote_only_1'] == 'x-coredata://remote_only_1'
+        assert records['local_newer'] == 'x-coredata://local_newer'
+        NoteFolder.reset_list()
+
+    def test_sync_renamed_note(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        old_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        new_date = datetime.datetime(2024, 6, 1, 8, 0, 0)
+        with open(remote_path / 'old name.md', 'w') as fp:
+            fp.write('# old name\nBody\n\n[//]: # (taskbridge id=x-coredata://renamed hash=0)\n')
+        os.utime(remote_path / 'old name.md', (old_date.timestamp(), old_date.timestamp()))
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        folder.local_notes = [Note(name='new name', created_date=old_date, modified_date=new_date,
+                                   body_markdown='# new name\nBody\n', uuid='x-coredata://renamed')]
+        Note.EMBED_METADATA = True
+        try:
+            NoteFolder.seed_note_table()
+            success, data = folder.load_remote_notes()
+            assert success is True
+            assert folder.remote_notes[0].uuid == 'x-coredata://renamed'
+            with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+                success, data = folder.sync_notes()
+        finally:
+            Note.EMBED_METADATA = False
+            helpers.DATA_LOCATION = data_location
+        assert success is True
+
+        # The renamed note is moved rather than deleted and added again
+        assert data['remote_updated'] == ['new name']
+        assert data['remote_added'] == [] and data['local_added'] == []
+        assert [p.name for p in remote_path.iterdir()] == ['new name.md']
+        assert Note.read_remote_metadata(remote_path / 'new name.md')['id'] == 'x-coredata://renamed'
+        NoteFolder.reset_list()
+
+    def test_sync_with_failed_index(self, tmp_path, caplog):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        folder.local_notes = [Note(name='Local', created_date=date, modified_date=date, body_markdown='# Local\n',
+                                   uuid='x-coredata://local')]
+        try:
+            NoteFolder.seed_note_table()
+            success, data = folder.load_remote_notes()
+            assert success is True
+
+            # A search index which cannot be updated does not fail the sync
+            with mock.patch('taskbridgeapp.helpers.SearchIndex.update', return_value=(False, 'database is locked')):
+                success, data = folder.sync_notes()
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+        assert success is True
+        assert data['remote_added'] == ['Local']
+        assert 'Failed to update search index: database is locked' in caplog.text
+
+    def test_reload_changed_notes(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        for name in ['One', 'Two']:
+            with open(remote_path / '{}.md'.format(name), 'w') as fp:
+                fp.write('# {}\nBefore\n'.format(name))
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        calls = []
+
+        # noinspection PyUnusedLocal
+        def mock_run_applescript(script, *args):
+            calls.append(args)
+            return 0, str(tmp_path), ''
+
+        try:
+            # Nothing was loaded yet, so every note is loaded
+            with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+                success, data = folder.reload_changed_notes({'Two'})
+            assert success is True
+            assert calls == [('Sync',)]
+            assert sorted(note.name for note in folder.remote_notes) == ['One', 'Two']
+
+            # Only the changed notes are reloaded, and the other notes are kept
+            folder.local_notes = [Note(name=name, created_date=date, modified_date=date,
+                                       body_markdown='# {}\nBefore\n'.format(name), uuid='x-coredata://' + name)
+                                  for name in ['One', 'Two']]
+            with open(remote_path / 'Two.md', 'w') as fp:
+                fp.write('# Two\nAfter\n')
+            with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+                success, data = folder.reload_changed_notes({'Two'})
+            assert success is True
+            assert calls[-1] == ('Sync', 'Two')
+            assert sorted((note.name, note.body_markdown) for note in folder.remote_notes) == [
+                ('One', '# One\nBefore\n'), ('Two', '# Two\nAfter\n')]
+            assert [note.name for note in folder.local_notes] == ['One']
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+
+    def test_sync_recreated_note(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        old_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        new_date = datetime.datetime(2024, 6, 1, 8, 0, 0)
+        body = 'Packing list for the trip: passport, charger, walking boots and a rain jacket.\n'
+        with open(remote_path / 'Trip.md', 'w') as fp:
+            fp.write('# Trip\n' + body)
+        os.utime(remote_path / 'Trip.md', (old_date.timestamp(), old_date.timestamp()))
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        try:
+            NoteFolder.seed_note_table()
+            folder.local_notes = [Note(name='Trip', created_date=old_date, modified_date=old_date,
+                                       body_markdown='# Trip\n' + body, uuid='x-coredata://old')]
+            NoteFolder.persist_notes()
+
+            # The note was renamed and recreated locally, so it has a new UUID
+            folder.local_notes = [Note(name='Trip to Wales', created_date=new_date, modified_date=new_date,
+                                       body_markdown='# Trip to Wales\n' + body, uuid='x-coredata://new')]
+            folder.load_remote_notes()
+            result = {'remote_deleted': [], 'remote_not_found': []}
+            success, data = NoteFolder.delete_remote_notes(folder, tmp_path, result)
+            assert success is True
+            assert result['remote_deleted'] == []
+
+            with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+                success, data = folder.sync_notes()
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+        assert success is True
+
+        # The remote note is moved rather than deleted and added again
+        assert data['remote_updated'] == ['Trip to Wales']
+        assert data['remote_added'] == [] and data['local_added'] == []
+        assert [p.name for p in remote_path.iterdir()] == ['Trip to Wales.md']
+
+    def test_sync_renamed_folder(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Work'
+        remote_path.mkdir()
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        with open(remote_path / 'Plan.md', 'w') as fp:
+            fp.write('# Plan\nBody\n')
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Work', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Work'),
+                            NoteFolder.SYNC_BOTH)
+        associations = {'bi_directional': ['Work'], 'local_to_remote': [], 'remote_to_local': []}
+        try:
+            NoteFolder.seed_folder_table()
+            NoteFolder.persist_folders()
+            NoteFolder.seed_note_table()
+            folder.local_notes = [Note(name='Plan', created_date=date, modified_date=date, uuid='x-coredata://1')]
+            NoteFolder.persist_notes()
+
+            # The local folder keeps its UUID when renamed
+            discovered_remote = [RemoteNoteFolder(remote_path, 'Work')]
+            with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+                success, data = NoteFolder.sync_folder_deletions([LocalNoteFolder('Projects', 'x-coredata://folder')],
+                                                                 discovered_remote, associations)
+            assert success is True
+
+            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+                rows = connection.execute("SELECT DISTINCT folder FROM tb_note").fetchall()
+                folders = connection.execute("SELECT local_name, remote_name FROM tb_folder").fetchall()
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+
+        # The remote folder is renamed with its notes, rather than deleted, and its stored folder is kept
+        assert not remote_path.exists()
+        assert (tmp_path / 'Projects' / 'Plan.md').exists()
+        assert discovered_remote[0].name == 'Projects' and discovered_remote[0].path == tmp_path / 'Projects'
+        assert associations['bi_directional'] == ['Projects']
+        assert rows == [('Projects',)]
+        assert folders == [('Projects', 'Projects')]
+
+    def test_sync_failed_folder_rename(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Work'
+        remote_path.mkdir()
+
+        NoteFolder.reset_list()
+        NoteFolder(LocalNoteFolder('Work', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Work'),
+                   NoteFolder.SYNC_BOTH)
+        try:
+            NoteFolder.seed_folder_table()
+            NoteFolder.persist_folders()
+            with mock.patch.object(RemoteNoteFolder, 'rename', return_value=(False, 'Rename failed')):
+                success, data = NoteFolder.sync_folder_deletions([LocalNoteFolder('Projects', 'x-coredata://folder')],
+                                                                 [RemoteNoteFolder(remote_path, 'Work')])
+            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+                folders = connection.execute("SELECT local_name, remote_name FROM tb_folder").fetchall()
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+
+        # The stored folder is not swept, so the rename is tried again on the next sync
+        assert success is False and data == 'Rename failed'
+        assert folders == [('Work', 'Work')]
+
+    def test_sweep_deleted_notes(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        for name in ['Kept', 'Deleted']:
+            with open(remote_path / (name + '.md'), 'w') as fp:
+                fp.write('# {}\n'.format(name))
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_LOCAL_TO_REMOTE)
+        try:
+            NoteFolder.seed_note_table()
+            folder.local_notes = [Note(name=name, created_date=date, modified_date=date, uuid='x-coredata://' + name)
+                                  for name in ['Kept', 'Deleted']]
+            NoteFolder.persist_notes()
+
+            # Only the notes which are not seen in the new generation are deleted
+            folder.local_notes = folder.local_notes[:1]
+            folder.load_remote_notes()
+            result = {'remote_deleted': [], 'remote_not_found': []}
+            success, generation = helpers.SyncGeneration.start('tb_note')
+            assert success is True
+            success, data = NoteFolder.delete_remote_notes(folder, tmp_path, result, generation)
+            assert success is True
+
+            with closing(sqlite3.connect(helpers.db_folder())) as connection:
+                rows = connection.execute("SELECT name, generation FROM tb_note").fetchall()
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+
+        assert result == {'remote_deleted': ['Deleted'], 'remote_not_found': []}
+        assert [p.name for p in remote_path.iterdir()] == ['Kept.md']
+        assert rows == [('Kept', generation)]
@@ -0,0 +1,118 @@
+import json
+import os
+import pathlib
+import zlib
+from unittest import mock
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.notesnapshot import NoteSnapshot
+from taskbridgeapp.notes.model.remotemanifest import RemoteNoteManifest
+
+
+class TestNoteSnapshot:
+    RES_DIR = pathlib.Path(__file__).parent.resolve() / 'resources'
+
+    @staticmethod
+    def _reset():
+        RemoteNoteManifest.reset_cache()
+        NoteSnapshot.reset_cache()
+
+    def test_parse_local(self, tmp_path):
+        TestNoteSnapshot._reset()
+        with open(TestNoteSnapshot.RES_DIR / 'mock_testnote1_staged.staged') as fp:
+            staged_content = fp.read()
+        staging_folder = tmp_path / 'staging'
+        parsed = Note.create_from_local(staged_content, staging_folder)
+        image_path = staging_folder / '.attachments' / parsed.attachments[0].uuid
+        os.remove(image_path)
+
+        note = NoteSnapshot.parse_local(staged_content, staging_folder)
+        assert note.body_markdown == parsed.body_markdown
+
+        # The same export is not parsed again, but its images are written again
+        os.remove(image_path)
+        with mock.patch('taskbridgeapp.notes.model.note.Note.create_from_local') as mock_create_from_local:
+            cached = NoteSnapshot.parse_local(staged_content, staging_folder)
+            mock_create_from_local.assert_not_called()
+        assert cached is not note and cached.body_markdown == parsed.body_markdown
+        assert cached.attachments[0].staged_location == image_path and image_path.exists()
+        TestNoteSnapshot._reset()
+
+    def test_save_load(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        TestNoteSnapshot._reset()
+        with open(TestNoteSnapshot.RES_DIR / 'mock_simplenote_staged.staged') as fp:
+            staged_content = fp.read()
+        remote_folder = tmp_path / 'Sync'
+        remote_folder.mkdir()
+        with open(remote_folder / 'one.md', 'w') as fp:
+            fp.write('# one\nFirst note\n')
+
+        # Nothing to load before the first sync
+        assert NoteSnapshot.load() == (True, 'No note snapshot found.')
+        local_note = NoteSnapshot.parse_local(staged_content, tmp_path)
+        success, remote_notes = RemoteNoteManifest.load_notes(remote_folder)
+        assert success is True
+        success, data = NoteSnapshot.save()
+        assert success is True
+        assert data == 'Note snapshot saved: 1 remote and 1 local notes.'
+
+        # A new run starts from the snapshot, so neither note is parsed again
+        TestNoteSnapshot._reset()
+        assert NoteSnapshot.load() == (True, 'Note snapshot loaded: 1 remote and 1 local notes.')
+        with (mock.patch('taskbridgeapp.notes.model.note.Note.create_from_local') as mock_create_from_local,
+              mock.patch('taskbridgeapp.notes.model.note.Note.create_from_remote') as mock_create_from_remote):
+            note = NoteSnapshot.parse_local(staged_content, tmp_path)
+            success, data = RemoteNoteManifest.load_notes(remote_folder)
+            mock_create_from_local.assert_not_called()
+            mock_create_from_remote.assert_not_called()
+        assert (note.uuid, note.name, note.modified_date, note.body_markdown) == (
+            local_note.uuid, local_note.name, local_note.modified_date, local_note.body_markdown)
+        assert [(n.name, n.body_markdown) for n in data] == [('one', remote_notes[0].body_markdown)]
+
+        # A snapshot of another version is discarded
+        with open(NoteSnapshot.snapshot_file(), 'wb') as fp:
+            fp.write(zlib.compress(json.dumps({'version': 0, 'remote': {}, 'local': {}}).encode()))
+        TestNoteSnapshot._reset()
+        assert NoteSnapshot.load() == (True, 'Note snapshot discarded: version 0 is not supported.')
+        assert NoteSnapshot.LOCAL_NOTES == {} and RemoteNoteManifest.PARSED_NOTES == {}
+
+        TestNoteSnapshot._reset()
+        helpers.DATA_LOCATION = data_location
+
+    def test_save_load_images(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        TestNoteSnapshot._reset()
+        with open(TestNoteSnapshot.RES_DIR / 'mock_testnote1_staged.staged') as fp:
+            staged_content = fp.read()
+        staging_folder = tmp_path / 'staging'
+        parsed = NoteSnapshot.parse_local(staged_content, staging_folder)
+        image_path = staging_folder / '.attachments' / parsed.attachments[0].uuid
+        with open(image_path, 'rb') as fp:
+            image = fp.read()
+        success, data = NoteSnapshot.save()
+        assert success is True
+
+        # The image data is not saved in the snapshot, neither in the attachment nor in the HTML of the note
+        with open(NoteSnapshot.snapshot_file(), 'rb') as fp:
+            snapshot = zlib.decompress(fp.read()).decode()
+        assert parsed.attachments[0].b64_data.split('base64,')[1][:100] not in snapshot
+        assert parsed.attachments[0].uuid in snapshot
+
+        # The image is staged again from the export
+        TestNoteSnapshot._reset()
+        os.remove(image_path)
+        assert NoteSnapshot.load()[0] is True
+        with mock.patch('taskbridgeapp.notes.model.note.Note.create_from_local') as mock_create_from_local:
+            note = NoteSnapshot.parse_local(staged_content, staging_folder)
+            mock_create_from_local.assert_not_called()
+        assert note.body_html == parsed.body_html and note.attachments[0].uuid == parsed.attachments[0].uuid
+        assert note.attachments[0].staged_location == image_path
+        with open(image_path, 'rb') as fp:
+            assert fp.read() == image
+
+        TestNoteSnapshot._reset()
+        helpers.DATA_LOCATION = data_location
@@ -0,0 +1,209 @@
+import datetime
+import os
+import pathlib
+from unittest import mock
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model import notescript
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.notefolder import LocalNoteFolder, NoteFolder, RemoteNoteFolder
+from taskbridgeapp.notes.model.notestate import NoteState
+
+
+class TestNoteState:
+
+    @staticmethod
+    def _note(body, modified_date, uuid='x-coredata://1'):
+        return Note(name='note', created_date=modified_date, modified_date=modified_date, body_markdown=body, uuid=uuid)
+
+    @staticmethod
+    def _write_remote(remote_path, body, modified_date):
+        with open(remote_path / 'note.md', 'w') as fp:
+            fp.write(body)
+        os.utime(remote_path / 'note.md', (modified_date.timestamp(), modified_date.timestamp()))
+
+    # noinspection PyUnusedLocal
+    @staticmethod
+    def _mock_run_applescript(script, *args):
+        with open(args[0]) as fp:
+            lines = fp.read().splitlines()
+        return 0, '\n'.join('{0}~~OK~~x-coredata://1~~Saturday, 1 June 2024 at 09:00:00'.format(idx)
+                            for idx in range(len(lines))), ''
+
+    @staticmethod
+    def _staged(body_html, modified_date):
+        return ('x-coredata://1~~note~~{0}~~{0}\n~~START_ATTACHMENTS~~\n~~END_ATTACHMENTS~~\n'.format(modified_date) +
+                body_html.replace('><', '>\n<') + '\n')
+
+    @staticmethod
+    def _mock_write_without_date(staging_path, written, modified_date):
+        # Notes are written without returning their modification date, and exported again with ``modified_date``
+        # noinspection PyUnusedLocal
+        def mock_run_applescript(script, *args):
+            if script == notescript.get_notes_script:
+                staging_path.mkdir(exist_ok=True)
+                with open(staging_path / 'note.staged', 'w') as fp:
+                    fp.write(TestNoteState._staged(written[-1], modified_date))
+                return 0, str(staging_path), ''
+            with open(args[0]) as fp:
+                lines = fp.read().splitlines()
+            for line in lines:
+                with open(line.split('~~')[4]) as body:
+                    written.append(body.read())
+            return 0, '\n'.join('{0}~~OK~~x-coredata://1~~'.format(idx) for idx in range(len(lines))), ''
+        return mock_run_applescript
+
+    def test_classify(self):
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        later = datetime.datetime(2024, 2, 1, 8, 0, 0)
+        base = NoteState.observe(TestNoteState._note('Body\n', date), TestNoteState._note('Body\n', date))
+        assert base.local_hash == base.remote_hash
+
+        # Only the dates changed, as after a remote note is written locally
+        current = NoteState.observe(TestNoteState._note('Body\n', later), TestNoteState._note('Body\n', date), base)
+        assert base.classify(current) == NoteState.UNCHANGED
+
+        current = NoteState.observe(TestNoteState._note('Local\n', later), TestNoteState._note('Body\n', date), base)
+        assert base.classify(current) == NoteState.LOCAL_CHANGED
+        current = NoteState.observe(TestNoteState._note('Body\n', date), TestNoteState._note('Remote\n', later), base)
+        assert base.classify(current) == NoteState.REMOTE_CHANGED
+        current = NoteState.observe(TestNoteState._note('Local\n', later), TestNoteState._note('Remote\n', later), base)
+        assert base.classify(current) == NoteState.CONFLICT
+        current = NoteState.observe(TestNoteState._note('Same\n', later), TestNoteState._note('Same\n', later), base)
+        assert base.classify(current) == NoteState.UNCHANGED
+
+        # A side whose date did not change is not hashed again
+        remote_stub = TestNoteState._note('', date)
+        current = NoteState.observe(TestNoteState._note('Body\n', date), remote_stub, base)
+        assert base.classify(current) == NoteState.UNCHANGED
+
+    def test_sync_with_base_state(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        remote_date = datetime.datetime(2024, 5, 1, 8, 0, 0)
+        written_date = datetime.datetime(2024, 6, 1, 9, 0, 0)
+        TestNoteState._write_remote(remote_path, '# note\nRemote\n', remote_date)
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        try:
+            NoteFolder.seed_note_table()
+            folder.local_notes = [TestNoteState._note('# note\nLocal\n', datetime.datetime(2024, 1, 1, 8, 0, 0))]
+            folder.load_remote_notes()
+            with mock.patch('taskbridgeapp.helpers.run_applescript', TestNoteState._mock_run_applescript):
+                success, data = folder.sync_notes()
+            assert success is True
+            assert data['local_updated'] == ['note']
+
+            # The local note is now newer, but it has the remote note's content so it is not uploaded again
+            folder.local_notes = [TestNoteState._note('# note\nRemote\n', written_date)]
+            folder.load_remote_notes()
+            with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+                success, data = folder.sync_notes()
+            assert success is True
+            assert all(len(changes) == 0 for changes in data.values())
+
+            # The remote note changed, and is older than the local note, but only the remote note changed
+            TestNoteState._write_remote(remote_path, '# note\nEdited remotely\n', datetime.datetime(2024, 5, 2))
+            folder.load_remote_notes()
+            with mock.patch('taskbridgeapp.helpers.run_applescript', TestNoteState._mock_run_applescript):
+                success, data = folder.sync_notes()
+            assert success is True
+            assert data['local_updated'] == ['note'] and data['remote_updated'] == []
+
+            # The local note changed
+            folder.local_notes = [TestNoteState._note('# note\nEdited locally\n', datetime.datetime(2024, 6, 2))]
+            folder.load_remote_notes()
+            success, data = folder.sync_notes()
+            assert success is True
+            assert data['remote_updated'] == ['note'] and data['local_updated'] == []
+            with open(remote_path / 'note.md') as fp:
+                assert fp.read() == '# note\nEdited locally\n'
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+
+    def test_sync_after_local_write(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        remote_body = '# note\nline one\nline two\n- item\n'
+        TestNoteState._write_remote(remote_path, remote_body, datetime.datetime(2024, 5, 1, 8, 0, 0))
+        written = []
+        mock_run_applescript = TestNoteState._mock_write_without_date(tmp_path / 'staged', written,
+                                                                      'Saturday, 1 June 2024 at 09:00:00')
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        try:
+            NoteFolder.seed_note_table()
+            folder.local_notes = [TestNoteState._note('# note\nLocal\n', datetime.datetime(2024, 1, 1, 8, 0, 0))]
+            folder.load_remote_notes()
+            with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+                success, data = folder.sync_notes()
+            assert success is True
+            assert data['local_updated'] == ['note'] and len(written) == 1
+
+            # The written note is exported again by Notes, and does not convert back to the same Markdown
+            staged_content = TestNoteState._staged(written[0], 'Saturday, 1 June 2024 at 09:00:00')
+            local_note = Note.create_from_local(staged_content, pathlib.Path(tmp_path))
+            assert NoteState.content_hash(local_note) != NoteState.content_hash(folder.remote_notes[0])
+            for sync in range(2):
+                folder.local_notes = [local_note]
+                folder.load_remote_notes()
+                with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+                    success, data = folder.sync_notes()
+                assert success is True
+                assert all(len(changes) == 0 for changes in data.values())
+                with open(remote_path / 'note.md') as fp:
+                    assert fp.read() == remote_body
+
+            # A later local change is still synchronised
+            folder.local_notes = [TestNoteState._note('# note\nEdited locally\n', datetime.datetime(2024, 6, 2))]
+            folder.load_remote_notes()
+            success, data = folder.sync_notes()
+            assert success is True
+            assert data['remote_updated'] == ['note'] and data['local_updated'] == []
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
+
+    def test_local_edit_before_next_sync(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        remote_path = tmp_path / 'Sync'
+        remote_path.mkdir()
+        remote_body = '# note\nline one\nline two\n'
+        TestNoteState._write_remote(remote_path, remote_body, datetime.datetime(2024, 5, 1, 8, 0, 0))
+        written = []
+        # The date of the reloaded note cannot be parsed either
+        mock_run_applescript = TestNoteState._mock_write_without_date(tmp_path / 'staged', written, 'not a date')
+
+        NoteFolder.reset_list()
+        folder = NoteFolder(LocalNoteFolder('Sync', 'x-coredata://folder'), RemoteNoteFolder(remote_path, 'Sync'),
+                            NoteFolder.SYNC_BOTH)
+        try:
+            NoteFolder.seed_note_table()
+            folder.local_notes = [TestNoteState._note('# note\nLocal\n', datetime.datetime(2024, 1, 1, 8, 0, 0))]
+            folder.load_remote_notes()
+            with mock.patch('taskbridgeapp.helpers.run_applescript', mock_run_applescript):
+                success, data = folder.sync_notes()
+            assert success is True
+            assert data['local_updated'] == ['note'] and len(written) == 1
+
+            # The written note is edited locally before the next sync
+            folder.local_notes = [TestNoteState._note('# note\nEdited locally\n', None)]
+            folder.load_remote_notes()
+            success, data = folder.sync_notes()
+            assert success is True
+            assert data['remote_updated'] == ['note'] and data['local_updated'] == []
+            with open(remote_path / 'note.md') as fp:
+                assert fp.read() == '# note\nEdited locally\n'
+        finally:
+            helpers.DATA_LOCATION = data_location
+            NoteFolder.reset_list()
@@ -0,0 +1,100 @@
+import datetime
+import time
+
+import pytest
+from decouple import config
+
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.reconcile import NoteFingerprint, NoteIndex, NoteReconciliation
+
+TEST_ENV = config('TEST_ENV', default='remote')
+
+
+class TestNoteReconciliation:
+
+    @staticmethod
+    def _note(name, uuid=None):
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        return Note(name=name, created_date=date, modified_date=date, uuid=uuid)
+
+    def test_index(self):
+        one = TestNoteReconciliation._note('one', 'x-coredata://1')
+        two = TestNoteReconciliation._note('two')
+        index = NoteIndex([one, two])
+        assert index.find('x-coredata://1', 'renamed') is one
+        assert index.find(None, 'two') is two
+        assert index.find('x-coredata://2', 'three') is None
+        assert index.contains('x-coredata://1', None) is True
+        assert index.contains(None, 'two') is True
+        assert index.contains('', 'three') is False
+
+    def test_reconcile(self):
+        local_renamed = TestNoteReconciliation._note('new name', 'x-coredata://1')
+        local_same = TestNoteReconciliation._note('same', 'x-coredata://2')
+        local_only = TestNoteReconciliation._note('local only', 'x-coredata://3')
+        remote_renamed = TestNoteReconciliation._note('old name', 'x-coredata://1')
+        remote_same = TestNoteReconciliation._note('same')
+        remote_only = TestNoteReconciliation._note('remote only')
+
+        reconciliation = NoteReconciliation([local_renamed, local_same, local_only],
+                                            [remote_only, remote_same, remote_renamed])
+        assert reconciliation.pairs == [(local_renamed, remote_renamed), (local_same, remote_same), (local_only, None)]
+        assert reconciliation.remote_only == [remote_only]
+
+        # A remote note is only paired once
+        duplicate = TestNoteReconciliation._note('same', 'x-coredata://4')
+        reconciliation = NoteReconciliation([local_same, duplicate], [remote_same])
+        assert reconciliation.pairs == [(local_same, remote_same), (duplicate, None)]
+        assert reconciliation.remote_only == []
+
+    def test_fingerprint(self):
+        body = 'Remember to water the plants on the balcony every other morning before work.\n'
+        original = TestNoteReconciliation._note('Plants')
+        original.body_markdown = '# Plants\n' + body
+        renamed = TestNoteReconciliation._note('Balcony')
+        renamed.body_markdown = '# Balcony\n' + body.replace('morning', 'day')
+        unrelated = TestNoteReconciliation._note('Shopping')
+        unrelated.body_markdown = '# Shopping\nEggs, flour, milk, butter, sugar and a bag of coffee beans.\n'
+        short = TestNoteReconciliation._note('Short')
+        short.body_markdown = '# Short\nCall Sam\n'
+
+        # The title is left out, so only the body is compared
+        assert NoteFingerprint.words(original)[0] == 'remember'
+        assert NoteFingerprint.distance(NoteFingerprint.of(original), NoteFingerprint.of(renamed)) <= \
+               NoteFingerprint.MAX_DISTANCE
+        assert NoteFingerprint.find_similar(original, [unrelated, renamed]) is renamed
+        assert NoteFingerprint.find_similar(unrelated, [original, renamed]) is None
+        assert NoteFingerprint.of(short) is None
+
+    def test_reconcile_renamed(self):
+        body = 'Meeting notes: agree the budget, review the roadmap and book the venue for the offsite.\n'
+        local_renamed = TestNoteReconciliation._note('Offsite plan', 'x-coredata://1')
+        local_renamed.body_markdown = '# Offsite plan\n' + body
+        local_new = TestNoteReconciliation._note('Brand new', 'x-coredata://2')
+        local_new.body_markdown = '# Brand new\nSomething else entirely, with nothing in common at all.\n'
+        remote_old = TestNoteReconciliation._note('Meeting')
+        remote_old.body_markdown = '# Meeting\n' + body
+        remote_new = TestNoteReconciliation._note('Remote new')
+        remote_new.body_markdown = '# Remote new\nA different note which was only added on the server today.\n'
+
+        reconciliation = NoteReconciliation([local_renamed, local_new], [remote_old, remote_new])
+        assert reconciliation.pairs == [(local_renamed, remote_old), (local_new, None)]
+        assert reconciliation.renamed == [(local_renamed, remote_old)]
+        assert reconciliation.remote_only == [remote_new]
+
+    @pytest.mark.skipif(TEST_ENV != 'benchmark', reason="Benchmark")
+    def test_benchmark(self):
+        timings = {}
+        for count in [10000, 50000]:
+            local_notes = [TestNoteReconciliation._note('note {}'.format(i), 'x-coredata://{}'.format(i))
+                           for i in range(count)]
+            remote_notes = [TestNoteReconciliation._note('note {}'.format(i)) for i in range(count // 2, count * 3 // 2)]
+            start = time.perf_counter()
+            reconciliation = NoteReconciliation(local_notes, remote_notes)
+            timings[count] = time.perf_counter() - start
+            assert sum(1 for local, remote in reconciliation.pairs if remote is not None) == count // 2
+            assert len(reconciliation.remote_only) == count // 2
+        print('Note reconciliation: {}'.format(
+            ', '.join('{0} notes in {1:.3f}s'.format(count, timing) for count, timing in timings.items())))
+        # Pairing 50k notes by scanning the other list would take minutes
+        assert timings[50000] < 2
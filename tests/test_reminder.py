@@ -287,6 +287,18 @@ END:VCALENDAR
         success, ical_string = reminder5.get_ical_string()
         assert success is False
 
+    def test_field_hash(self):
+        local = TestReminder.__create_reminder_from_local()
+        remote = TestReminder.__create_reminder_from_local()
+        remote.uuid = "f4a682ac-86f2-4f81-a08e-ccbff061d7da"
+        remote.modified_date = datetime.datetime.now()
+        remote.body = local.body + "\n"
+        remote.due_date = local.due_date.astimezone(datetime.timezone.utc) if local.due_date else None
+        assert local.field_hash() == remote.field_hash()
+
+        remote.completed = True
+        assert local.field_hash() != remote.field_hash()
+
     def test___str__(self):
         reminder = TestReminder.__create_reminder_from_local()
         name = reminder.__str__()
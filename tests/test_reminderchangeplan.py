@@ -0,0 +1,185 @@
+import datetime
+import json
+from unittest import mock
+
+from taskbridgeapp import helpers
+from taskbridgeapp.reminders.model.changeplan import ReminderChange, ReminderChangePlan, ReminderPlanExecutor
+from taskbridgeapp.reminders.model.reminder import Reminder
+
+
+class TestReminderChangePlan:
+
+    @staticmethod
+    def _mock_calendar(container):
+        container.remote_calendar.cal_obj = mock.MagicMock()
+        container.remote_calendar.cal_obj.search.return_value = [mock.MagicMock()]
+        return container
+
+    # noinspection PyUnusedLocal
+    @staticmethod
+    def _mock_run_applescript(script, *args):
+        with open(args[0]) as fp:
+            lines = fp.read().splitlines()
+        return 0, '\n'.join('{0}~~OK~~x-apple-reminder://new-{0}'.format(idx) for idx in range(len(lines))), ''
+
+    @staticmethod
+    def _sync_container(make_reminder, make_container):
+        old_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        new_date = datetime.datetime(2024, 6, 1, 8, 0, 0)
+        local_reminders = [
+            make_reminder('Changed locally', 'x-apple-reminder://1', new_date, 'New'),
+            make_reminder('Changed remotely', 'x-apple-reminder://2', old_date),
+            make_reminder('Local only', 'x-apple-reminder://3', old_date)
+        ]
+        remote_reminders = [
+            make_reminder('Changed locally', 'x-apple-reminder://1', old_date),
+            make_reminder('Changed remotely', 'x-apple-reminder://2', new_date, 'New'),
+            make_reminder('Remote only', 'remote-1', old_date)
+        ]
+        return TestReminderChangePlan._mock_calendar(make_container(local_reminders, remote_reminders))
+
+    def test_plan(self, container_list, make_reminder, make_container):
+        container = TestReminderChangePlan._sync_container(make_reminder, make_container)
+        plan = container.new_plan()
+        container.plan_local_reminders_to_remote(plan)
+        container.plan_remote_reminders_to_local(plan)
+        assert [(change.side, change.operation, change.reminder.name) for change in plan.changes] == [
+            (ReminderChange.REMOTE, ReminderChange.UPDATE, 'Changed locally'),
+            (ReminderChange.LOCAL, ReminderChange.UPDATE, 'Changed remotely'),
+            (ReminderChange.REMOTE, ReminderChange.CREATE, 'Local only'),
+            (ReminderChange.LOCAL, ReminderChange.CREATE, 'Remote only')
+        ]
+        assert [change.result_key() for change in plan.changes_for(ReminderChange.LOCAL)] == [
+            'local_updated', 'local_added']
+
+        # Nothing is written while planning
+        container.remote_calendar.cal_obj.search.assert_not_called()
+        exported = json.loads(plan.to_json())
+        assert exported['local'] == 'Sync' and len(exported['changes']) == 4
+        assert exported['changes'][3] == {'side': 'local', 'operation': 'create', 'name': 'Remote only',
+                                          'uuid': 'remote-1', 'source_uuid': 'remote-1'}
+
+    def test_execute(self, container_list, make_reminder, make_container):
+        container = TestReminderChangePlan._sync_container(make_reminder, make_container)
+        result = {'remote_added': [], 'remote_updated': [], 'local_added': [], 'local_updated': []}
+        plan = container.new_plan()
+        container.plan_local_reminders_to_remote(plan)
+        container.plan_remote_reminders_to_local(plan)
+        with mock.patch('taskbridgeapp.helpers.run_applescript',
+                        side_effect=TestReminderChangePlan._mock_run_applescript) as mock_run_applescript:
+            with mock.patch.object(ReminderPlanExecutor, 'MAX_REMOTE_WORKERS', 2):
+                success, data = container.execute_plan(plan, result)
+            mock_run_applescript.assert_called_once()
+        assert success is True
+        assert result == {'remote_added': ['Local only'], 'remote_updated': ['Changed locally'],
+                          'local_added': ['Remote only'], 'local_updated': ['Changed remotely']}
+        assert container.plans == [plan]
+
+        # Both local writes are made at once, and the remote reminders written locally get the new local UUIDs
+        assert plan.changes[3].source.uuid == 'x-apple-reminder://new-1'
+        assert set(container.recorded_hashes) == {'x-apple-reminder://1', 'x-apple-reminder://3',
+                                                  'x-apple-reminder://new-0', 'x-apple-reminder://new-1'}
+        assert container.written_reminders == {'x-apple-reminder://new-0': plan.changes[1].reminder,
+                                               'x-apple-reminder://new-1': plan.changes[3].reminder}
+        assert container.remote_calendar.cal_obj.search.return_value[0].save.call_count == 4
+
+        # A failed remote write does not stop the other changes
+        result = {'remote_added': [], 'remote_updated': [], 'local_added': [], 'local_updated': []}
+        container.remote_calendar.cal_obj.search.return_value = []
+        with mock.patch('taskbridgeapp.helpers.run_applescript', TestReminderChangePlan._mock_run_applescript):
+            success, data = ReminderPlanExecutor.execute(container, plan, result)
+        assert success is False
+        assert data == 'Could not find remote reminder to update UUID: x-apple-reminder://new-0 (Changed remotely)'
+        assert result['remote_added'] == ['Local only'] and result['local_updated'] == []
+
+    def test_execute_without_outcome(self, container_list, make_reminder, make_container):
+        container = TestReminderChangePlan._sync_container(make_reminder, make_container)
+        result = {'remote_added': [], 'remote_updated': [], 'local_added': [], 'local_updated': []}
+        plan = container.new_plan()
+        container.plan_local_reminders_to_remote(plan)
+        container.plan_remote_reminders_to_local(plan)
+
+        # A local write which is neither reported written nor failed is a failure, and the other changes are made
+        with mock.patch.object(Reminder, 'upsert_local_bulk', return_value=(True, {'written': [], 'failed': []})):
+            success, data = ReminderPlanExecutor.execute(container, plan, result)
+        assert success is False
+        assert data == 'No outcome for reminder change: Changed remotely'
+        assert result == {'remote_added': ['Local only'], 'remote_updated': ['Changed locally'],
+                          'local_added': [], 'local_updated': []}
+
+    def test_execute_deletions(self, container_list, make_reminder, make_container):
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        local_reminder = make_reminder('Deleted remotely', 'x-apple-reminder://1', date)
+        remote_reminder = make_reminder('Deleted locally', 'remote-1', date)
+        container = TestReminderChangePlan._mock_calendar(make_container([local_reminder], [remote_reminder]))
+        plan = container.new_plan()
+        plan.add(ReminderChange(ReminderChange.LOCAL, ReminderChange.DELETE, local_reminder))
+        plan.add(ReminderChange(ReminderChange.REMOTE, ReminderChange.DELETE, remote_reminder))
+        result = {'deleted_local_reminders': [], 'deleted_remote_reminders': []}
+        with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(0, '', '')) as mock_run_applescript:
+            success, data = container.execute_plan(plan, result)
+            mock_run_applescript.assert_called_once()
+        assert success is True
+        assert result == {'deleted_local_reminders': [local_reminder], 'deleted_remote_reminders': [remote_reminder]}
+        assert container.local_reminders == [] and container.remote_reminders == []
+        container.remote_calendar.cal_obj.search.return_value[0].delete.assert_called_once()
+
+    def test_execute_with_failed_journal(self, container_list, make_reminder, make_container, caplog):
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        local_reminder = make_reminder('Deleted remotely', 'x-apple-reminder://1', date)
+        remote_reminder = make_reminder('Deleted locally', 'remote-1', date)
+        container = TestReminderChangePlan._mock_calendar(make_container([local_reminder], [remote_reminder]))
+        plan = container.new_plan()
+        plan.add(ReminderChange(ReminderChange.LOCAL, ReminderChange.DELETE, local_reminder))
+        plan.add(ReminderChange(ReminderChange.REMOTE, ReminderChange.DELETE, remote_reminder))
+
+        # The changes are made even if their journal entries cannot be completed
+        result = {'deleted_local_reminders': [], 'deleted_remote_reminders': []}
+        with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(0, '', '')):
+            with mock.patch.object(helpers.SyncJournal, 'complete', return_value=(False, 'Journal failed')):
+                success, data = container.execute_plan(plan, result)
+        assert success is True
+        assert result == {'deleted_local_reminders': [local_reminder], 'deleted_remote_reminders': [remote_reminder]}
+        assert caplog.text.count('Failed to complete sync journal entries: Journal failed') == 2
+
+    def test_execute_resumed(self, container_list, make_reminder, make_container):
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        deleted = make_reminder('Deleted remotely', 'x-apple-reminder://1', date)
+        written = make_reminder('Written', 'x-apple-reminder://2', date)
+        remote_deleted = make_reminder('Deleted locally', 'remote-1', date)
+        container = TestReminderChangePlan._mock_calendar(make_container([deleted, written], [remote_deleted]))
+
+        # An interrupted sync deleted a remote reminder, and wrote a pair whose hash was not saved
+        plan = container.new_plan()
+        plan.add(ReminderChange(ReminderChange.REMOTE, ReminderChange.DELETE, remote_deleted))
+        success, entry_ids = helpers.SyncJournal.plan(ReminderPlanExecutor.DELETE_JOURNAL, 'Sync',
+                                                      [plan.changes[0].journal_entry()])
+        helpers.SyncJournal.complete([(entry_ids[0], None)])
+        success, entry_ids = helpers.SyncJournal.plan(ReminderPlanExecutor.WRITE_JOURNAL, 'Sync',
+                                                      [('remote_update', 'x-apple-reminder://2')])
+        helpers.SyncJournal.complete([(entry_ids[0], {'uuid': 'x-apple-reminder://2', 'hash': 'abc',
+                                                      'modified': [1.0, 2.0]})])
+
+        assert container.load_synced_hashes()[0] is True
+        assert container.synced_hashes == {'x-apple-reminder://2': 'abc'}
+        assert container.synced_modified == {'x-apple-reminder://2': (1.0, 2.0)}
+
+        # The deletion is not made again
+        result = {'deleted_local_reminders': [], 'deleted_remote_reminders': []}
+        success, data = container.execute_plan(plan, result)
+        assert success is True
+        assert result['deleted_remote_reminders'] == [remote_deleted]
+        container.remote_calendar.cal_obj.search.assert_not_called()
+        assert helpers.SyncJournal.completed(ReminderPlanExecutor.DELETE_JOURNAL, 'Sync') == (True, {})
+        assert len(helpers.SyncJournal.completed(ReminderPlanExecutor.WRITE_JOURNAL, 'Sync')[1]) == 1
+
+    def test_export(self, tmp_path, make_reminder):
+        plan = ReminderChangePlan('Sync', 'Sync')
+        plan.add(ReminderChange(ReminderChange.REMOTE, ReminderChange.DELETE,
+                                make_reminder('Gone', 'remote-1', None)))
+        success, data = ReminderChangePlan.export([plan], tmp_path / 'plan.json')
+        assert success is True
+        with open(tmp_path / 'plan.json') as fp:
+            assert json.load(fp)[0]['changes'][0]['operation'] == 'delete'
+        success, data = ReminderChangePlan.export([plan], tmp_path / 'missing' / 'plan.json')
+        assert success is False
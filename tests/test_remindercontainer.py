@@ -4,6 +4,7 @@ import json
 import sqlite3
 from contextlib import closing
 from pathlib import Path
+from unittest import mock
 
 import caldav
 import pytest
@@ -289,7 +290,7 @@ class TestReminderContainer:
                     sql_columns_exist = "PRAGMA table_info('tb_container');"
                     columns_result = cursor.execute(sql_columns_exist)
 
-                    columns = ['id', 'local_name', 'remote_name', 'sync']
+                    columns = ['id', 'local_name', 'remote_name', 'sync', 'local_id']
                     for col in columns_result:
                         assert col['name'] in columns
         except sqlite3.OperationalError as e:
@@ -891,6 +892,48 @@ class TestReminderContainer:
             delete_reminder_script = reminderscript.delete_reminder_script
             helpers.run_applescript(delete_reminder_script, local_uuid)
 
+    def test_load_local_reminders_bulk(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path
+        saved_containers = list(ReminderContainer.CONTAINER_LIST)
+        work = ReminderContainer(LocalList('Work'), RemoteCalendar(calendar_name='Work'), True)
+        home = ReminderContainer(LocalList('Home'), RemoteCalendar(calendar_name='Home'), True)
+        unlinked = ReminderContainer(None, RemoteCalendar(calendar_name='Remote only'), True)
+        date = 'Thursday, 18 April 2024 at 08:00:00'
+        fields = '|'.join([date, 'false', 'missing value', 'missing value', 'missing value', date, 'missing value'])
+        export_paths = []
+
+        # noinspection PyUnusedLocal
+        def mock_run_applescript(script, export_path, *args):
+            export_paths.append(export_path)
+            with open(export_path, 'w') as fp:
+                fp.write('1|x-apple-reminder://1|Report|{0}|First line\n\n2|x-apple-reminder://|last line\n'.format(
+                    fields))
+                fp.write('2|x-apple-reminder://2|Groceries|{0}|Milk | eggs\n'.format(fields))
+                fp.write('1|x-apple-reminder://3|Call Sam|{0}|missing value\n'.format(fields))
+            return 0, export_path + '\n', ''
+
+        with mock.patch('taskbridgeapp.helpers.run_applescript',
+                        side_effect=mock_run_applescript) as mock_applescript:
+            success, data = ReminderContainer.load_local_reminders_bulk([work, home, unlinked])
+            # Every list is exported in one invocation, to a file of its own
+            mock_applescript.assert_called_once_with(reminderscript.get_reminders_in_lists_script, mock.ANY,
+                                                     'Work', 'Home')
+            ReminderContainer.load_local_reminders_bulk([ReminderContainer(LocalList('Other'), None, True)])
+        ReminderContainer.CONTAINER_LIST[:] = saved_containers
+        assert success is True and data == 3
+        assert [(r.uuid, r.name, r.body) for r in work.local_reminders] == [
+            ('x-apple-reminder://1', 'Report', 'First line\n\n2|x-apple-reminder://|last line'),
+            ('x-apple-reminder://3', 'Call Sam', None)]
+        assert [(r.name, r.body) for r in home.local_reminders] == [('Groceries', 'Milk | eggs')]
+        assert home.local_index.find('x-apple-reminder://2', None) is home.local_reminders[0]
+        assert len(set(export_paths)) == 2
+        assert all(Path(path).parent == helpers.temp_folder() and not Path(path).exists() for path in export_paths)
+
+        with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Reminders is not running')):
+            assert ReminderContainer.load_local_reminders_bulk([work]) == (False, 'Reminders is not running')
+        helpers.DATA_LOCATION = data_location
+
     @pytest.mark.skipif(TEST_ENV != 'local', reason="Requires CalDAV credentials")
     def test_load_remote_reminders(self):
         TestReminderContainer.__reset_state()
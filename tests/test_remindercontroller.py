@@ -165,12 +165,14 @@ class TestReminderController:
             MockReminderContainer(LocalList('test1'), RemoteCalendar(calendar_name='test1'), True)
         ]
 
-        with mock.patch('{}.ReminderContainer.CONTAINER_LIST'.format(TestReminderController.CONTAINER_BASE),
-                        MockReminderContainer.CONTAINER_LIST):
+        with (mock.patch('{}.ReminderContainer.CONTAINER_LIST'.format(TestReminderController.CONTAINER_BASE),
+                         MockReminderContainer.CONTAINER_LIST),
+              mock.patch('taskbridgeapp.helpers.SearchIndex.retain', return_value=(True, '')) as mock_retain):
             # Success
             succeed = True
             success, data = ReminderController.sync_reminders()
             assert success is True
+            mock_retain.assert_called_once_with('reminder', ['test2', 'test1'])
 
             # Fail
             succeed = False
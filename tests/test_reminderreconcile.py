@@ -0,0 +1,349 @@
+import datetime
+import sqlite3
+import time
+from contextlib import closing
+from functools import partial
+from unittest import mock
+
+import pytest
+from decouple import config
+
+from taskbridgeapp import helpers
+from taskbridgeapp.reminders.model.reconcile import ReminderColumns, ReminderIndex
+from taskbridgeapp.reminders.model.reminder import Reminder
+from taskbridgeapp.reminders.model.remindercontainer import LocalList, ReminderContainer, RemoteCalendar
+
+TEST_ENV = config('TEST_ENV', default='remote')
+
+
+class TestReminderIndex:
+
+    # noinspection PyUnusedLocal
+    @staticmethod
+    def _mock_upsert_reminders(written, script, *args):
+        with open(args[0]) as fp:
+            lines = fp.read().splitlines()
+        for line in lines:
+            fields = line.split('~~')
+            if fields[7]:
+                with open(fields[7]) as fp:
+                    fields[7] = fp.read()
+            written.append(fields)
+        return 0, '\n'.join('{0}~~OK~~x-apple-reminder://{1}'.format(idx, idx + 1) for idx in range(len(lines))), ''
+
+    def test_index(self, make_reminder):
+        one = make_reminder('one', 'x-apple-reminder://1')
+        two = make_reminder('two')
+        index = ReminderIndex([one, two])
+        assert index.find('x-apple-reminder://1', 'renamed') is one
+        assert index.find(None, 'two') is two
+        assert index.find('x-apple-reminder://2', 'three') is None
+        assert index.contains('', 'two') is True
+        assert index.contains('', '') is False
+
+        index.remove(one)
+        assert index.find('x-apple-reminder://1', 'one') is None
+        index.add(one)
+        assert index.find('x-apple-reminder://1', None) is one
+
+    def test_persist_pairs(self, container_list, make_reminder, make_container):
+        local_reminder = make_reminder('Buy milk', 'x-apple-reminder://1')
+        paired_remote = make_reminder('Buy milk', 'x-apple-reminder://1')
+        remote_only = make_reminder('Walk dog', 'remote-1')
+        make_container([local_reminder], [remote_only, paired_remote])
+
+        success, data = ReminderContainer.seed_reminder_table()
+        assert success is True
+        success, data = ReminderContainer.persist_reminders()
+        assert success is True
+        success, rows = ReminderContainer.get_saved_reminders()
+        assert success is True
+        assert sorted(tuple(row)[1:7] for row in rows) == [
+            ('', '', 'remote-1', 'Walk dog', '', 'Sync'),
+            ('x-apple-reminder://1', 'Buy milk', 'x-apple-reminder://1', 'Buy milk', 'Sync', 'Sync')
+        ]
+
+    def test_renamed_reminders_are_not_deleted(self, container_list, make_reminder, make_container):
+        saved = make_reminder('Old name', 'x-apple-reminder://1')
+        make_container([saved], [make_reminder('Old name', 'x-apple-reminder://1')])
+        ReminderContainer.seed_reminder_table()
+        ReminderContainer.persist_reminders()
+        success, rows = ReminderContainer.get_saved_reminders()
+        assert success is True
+        container_list.clear()
+
+        # Renamed locally - the remote task is still there, so nothing is deleted
+        renamed = make_reminder('New name', 'x-apple-reminder://1')
+        remote_reminder = make_reminder('Old name', 'x-apple-reminder://1')
+        container = make_container([renamed], [remote_reminder])
+        result = {'deleted_local_reminders': [], 'deleted_remote_reminders': []}
+        with mock.patch('taskbridgeapp.helpers.run_applescript') as mock_run_applescript:
+            success, data = ReminderContainer._delete_local_reminders(rows, container, result)
+            assert success is True
+            success, data = ReminderContainer._delete_remote_reminders(rows, container, result)
+            assert success is True
+            mock_run_applescript.assert_not_called()
+        assert result == {'deleted_local_reminders': [], 'deleted_remote_reminders': []}
+
+        # Renamed locally and deleted remotely - the local reminder is found through the stored pairing
+        container.remote_reminders.clear()
+        container.remote_index = ReminderIndex([])
+        with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(0, '', '')) as mock_run_applescript:
+            success, data = ReminderContainer._delete_local_reminders(rows, container, result)
+            assert success is True
+            mock_run_applescript.assert_called_once()
+        assert result['deleted_local_reminders'] == [renamed]
+        assert container.local_reminders == []
+        assert container.local_index.find('x-apple-reminder://1', 'New name') is None
+
+    def test_sync_with_failed_index(self, container_list, caplog, make_container):
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        local_reminder = Reminder('x-apple-reminder://1', 'Buy milk', None, date, None, 'Semi-skimmed', None, None)
+        remote_reminder = Reminder('x-apple-reminder://1', 'Buy milk', None, date, None, 'Semi-skimmed', None, None)
+        container = make_container([local_reminder], [remote_reminder])
+
+        # A search index which cannot be updated does not fail the sync
+        with mock.patch('taskbridgeapp.helpers.SearchIndex.update', return_value=(False, 'database is locked')):
+            success, data = container.sync_reminders()
+        assert success is True
+        assert 'Failed to update search index: database is locked' in caplog.text
+
+    def test_sync_with_field_hashes(self, container_list, make_container):
+        old_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        new_date = datetime.datetime(2024, 6, 1, 8, 0, 0)
+        local_reminder = Reminder('x-apple-reminder://1', 'Buy milk', None, new_date, None, 'Semi-skimmed', None, None)
+        remote_reminder = Reminder('x-apple-reminder://1', 'Buy milk', None, old_date, None, 'Semi-skimmed', None, None)
+        container = make_container([local_reminder], [remote_reminder])
+        container.remote_calendar.cal_obj = mock.MagicMock()
+        container.remote_calendar.cal_obj.search.return_value = []
+
+        # The local reminder is newer, but has the same fields, so nothing is written
+        with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+            success, data = container.sync_reminders()
+        assert success is True
+        assert all(len(changes) == 0 for changes in data.values())
+        container.remote_calendar.cal_obj.save_todo.assert_not_called()
+
+        # Only the remote reminder changed since the last sync, so it is synchronised even though it is older
+        remote_reminder.body = 'Whole'
+        remote_reminder.modified_date = old_date + datetime.timedelta(days=1)
+        container.remote_calendar.cal_obj.search.return_value = [mock.MagicMock()]
+        written = []
+        with mock.patch('taskbridgeapp.helpers.run_applescript',
+                        partial(TestReminderIndex._mock_upsert_reminders, written)) as mock_run_applescript:
+            success, data = container.sync_reminders()
+        assert success is True
+        assert data['local_updated'] == ['Buy milk'] and data['remote_updated'] == []
+        assert written == [['', 'Buy milk', 'false', '', '', 'false', '', 'Whole']]
+        assert container.recorded_hashes == {'x-apple-reminder://1': remote_reminder.field_hash()}
+
+        # Only the local reminder changed
+        local_reminder.body = 'Whole'
+        local_reminder.completed = True
+        local_reminder.modified_date = new_date + datetime.timedelta(days=1)
+        container.remote_calendar.cal_obj.search.return_value = []
+        with mock.patch('taskbridgeapp.helpers.run_applescript', return_value=(1, '', 'Not expected')):
+            success, data = container.sync_reminders()
+        assert success is True
+        assert data['remote_updated'] == ['Buy milk'] and data['local_updated'] == []
+        container.remote_calendar.cal_obj.save_todo.assert_called_once()
+
+    def test_columns(self):
+        old_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        new_date = datetime.datetime(2024, 6, 1, 8, 0, 0, tzinfo=datetime.timezone.utc)
+        local_reminders = [Reminder('x-apple-reminder://1', 'Same', None, new_date, None, None, None, None),
+                           Reminder('x-apple-reminder://2', 'Renamed', None, new_date, None, None, None, None),
+                           Reminder('x-apple-reminder://3', 'Remote changed', None, new_date, None, None, None, None),
+                           Reminder('x-apple-reminder://4', 'Local only', None, old_date, None, None, None, None),
+                           Reminder('x-apple-reminder://5', 'Same time', None, old_date, None, 'Local', None, None)]
+        remote_reminders = [Reminder('x-apple-reminder://5', 'Same time', None, old_date, None, 'Remote', None, None),
+                            Reminder('remote-1', 'Same', None, old_date, None, None, None, None),
+                            Reminder('x-apple-reminder://2', 'Old name', None, old_date, None, None, None, None),
+                            Reminder('x-apple-reminder://3', 'Remote changed', None, old_date, None, 'New', None,
+                                     None)]
+        local_columns = ReminderColumns(local_reminders)
+        remote_columns = ReminderColumns(remote_reminders)
+        assert ReminderColumns.timestamp(new_date) > ReminderColumns.timestamp(old_date)
+        assert ReminderColumns.stored_time(ReminderColumns.timestamp(None)) is None
+
+        pairs = local_columns.pair(remote_columns)
+        assert pairs == [1, 2, 3, -1, 0]
+        synced_hashes = {'x-apple-reminder://3': local_reminders[2].field_hash()}
+        assert local_columns.decide(remote_columns, pairs, synced_hashes, {}) == [
+            ReminderColumns.EQUAL, ReminderColumns.PUSH, ReminderColumns.PULL, ReminderColumns.PUSH,
+            ReminderColumns.NONE]
+        assert local_columns.decide(remote_columns, pairs, synced_hashes, {}, skip_equal=False)[0] == \
+               ReminderColumns.PUSH
+
+        # Reminders whose modification time was recorded after the last sync are not hashed again
+        local_columns = ReminderColumns(local_reminders)
+        remote_columns = ReminderColumns(remote_reminders)
+        synced_modified = {'x-apple-reminder://5': (ReminderColumns.timestamp(old_date), ReminderColumns.timestamp(old_date))}
+        decisions = local_columns.decide(remote_columns, pairs, {'x-apple-reminder://5': 'recorded'}, synced_modified)
+        assert decisions[4] == ReminderColumns.EQUAL
+        assert local_columns.hashes[4] == remote_columns.hashes[0] == 'recorded'
+
+    @pytest.mark.skipif(TEST_ENV != 'benchmark', reason="Benchmark")
+    def test_benchmark_columns(self):
+        count = 100000
+        date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        # One pair in a hundred changed since the last sync
+        local_reminders = [Reminder('x-apple-reminder://{}'.format(i), 'reminder {}'.format(i), None,
+                                    date + datetime.timedelta(minutes=1 if i % 100 == 0 else 0), None,
+                                    'changed' if i % 100 == 0 else 'body', None, None) for i in range(count)]
+        remote_reminders = [Reminder('x-apple-reminder://{}'.format(i), 'reminder {}'.format(i), None, date, None,
+                                     'body', None, None) for i in range(count)]
+
+        # The hashes and modification times recorded by the previous sync, given to both paths
+        local_columns = ReminderColumns(local_reminders)
+        remote_columns = ReminderColumns(remote_reminders)
+        pairs = local_columns.pair(remote_columns)
+        decisions = local_columns.decide(remote_columns, pairs, {}, {})
+        synced_hashes = {uuid: local_hash for uuid, local_hash, decision in
+                         zip(local_columns.uuids, local_columns.hashes, decisions) if decision == ReminderColumns.EQUAL}
+        synced_modified = {uuid: (local_columns.modified[position], remote_columns.modified[pairs[position]])
+                           for position, uuid in enumerate(local_columns.uuids) if uuid in synced_hashes}
+
+        # Object-based path, deciding each pair from the reminder objects
+        start = time.perf_counter()
+        remote_index = ReminderIndex(remote_reminders)
+        object_decisions = []
+        for local_reminder in local_reminders:
+            remote_reminder = remote_index.find(local_reminder.uuid, local_reminder.name)
+            synced_hash = synced_hashes.get(local_reminder.uuid)
+            synced_local, synced_remote = synced_modified.get(local_reminder.uuid, (None, None))
+            if synced_hash and local_reminder.modified_date.timestamp() == synced_local:
+                local_hash = synced_hash
+            else:
+                local_hash = local_reminder.field_hash()
+            if synced_hash and remote_reminder.modified_date.timestamp() == synced_remote:
+                remote_hash = synced_hash
+            else:
+                remote_hash = remote_reminder.field_hash()
+            if local_hash == remote_hash:
+                object_decisions.append(ReminderColumns.EQUAL)
+            elif synced_hash == remote_hash:
+                object_decisions.append(ReminderColumns.PUSH)
+            elif synced_hash == local_hash:
+                object_decisions.append(ReminderColumns.PULL)
+            else:
+                object_decisions.append(ReminderColumns.newer(local_reminder.modified_date,
+                                                              remote_reminder.modified_date))
+        object_timing = time.perf_counter() - start
+
+        # Columnar path
+        start = time.perf_counter()
+        local_columns = ReminderColumns(local_reminders)
+        remote_columns = ReminderColumns(remote_reminders)
+        decisions = local_columns.decide(remote_columns, local_columns.pair(remote_columns), synced_hashes,
+                                         synced_modified)
+        columns_timing = time.perf_counter() - start
+
+        assert decisions == object_decisions
+        print('Reminder decisions for {0} pairs: objects in {1:.3f}s, columns in {2:.3f}s'.format(
+            count, object_timing, columns_timing))
+        # With the same recorded state, both paths skip the same hashes: the columns must not be slower
+        assert columns_timing < object_timing * 1.5
+
+    @pytest.mark.skipif(TEST_ENV != 'benchmark', reason="Benchmark")
+    def test_benchmark(self, container_list, make_reminder):
+        timings = {}
+        for count in [10000, 50000, 100000]:
+            local_reminders = [make_reminder('reminder {}'.format(i), 'x-apple-reminder://{}'.format(i))
+                               for i in range(count)]
+            remote_reminders = [make_reminder('reminder {}'.format(i), 'x-apple-reminder://{}'.format(i))
+                                for i in range(count)]
+            start = time.perf_counter()
+            container = ReminderContainer(LocalList('Sync'), RemoteCalendar(calendar_name='Sync'), True)
+            container.local_reminders = local_reminders
+            container.remote_reminders = remote_reminders
+            container.local_index = ReminderIndex(local_reminders)
+            container.remote_index = ReminderIndex(remote_reminders)
+            result = {'remote_added': [], 'remote_updated': [], 'local_added': [], 'local_updated': [],
+                      'deleted_local_reminders': [], 'deleted_remote_reminders': []}
+            success, data = container.sync_local_reminders_to_remote(result)
+            assert success is True
+            success, data = container.sync_remote_reminders_to_local(result)
+            assert success is True
+            ReminderContainer.seed_reminder_table()
+            ReminderContainer.persist_reminders()
+            success, rows = ReminderContainer.get_saved_reminders()
+            ReminderContainer._delete_remote_reminders(rows, container, result)
+            ReminderContainer._delete_local_reminders(rows, container, result)
+            timings[count] = time.perf_counter() - start
+            assert len(rows) == count
+            assert all(len(changes) == 0 for changes in result.values())
+            container_list.clear()
+        print('Reminder reconciliation: {}'.format(
+            ', '.join('{0} reminders in {1:.3f}s'.format(count, timing) for count, timing in timings.items())))
+        # Scanning the other list for every reminder would take hours at 100k reminders
+        assert timings[100000] < 10
+
+    def test_rename_remote_containers(self, container_list):
+        ReminderContainer(LocalList('Work', 'x-apple-reminder-list://1'), RemoteCalendar(calendar_name='Work'), True)
+        ReminderContainer.seed_container_table()
+        ReminderContainer.persist_containers()
+        with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            connection.row_factory = sqlite3.Row
+            saved = connection.execute("SELECT * FROM tb_container").fetchone()
+        assert saved['local_id'] == 'x-apple-reminder-list://1'
+
+        remote_calendar = RemoteCalendar(calendar_name='Work')
+        remote_calendar.cal_obj = mock.MagicMock()
+        to_sync = ['Work']
+        renamed = [(saved, LocalList('Projects', 'x-apple-reminder-list://1'))]
+        success, data = ReminderContainer._rename_remote_containers(renamed, [remote_calendar], to_sync)
+        assert success is True
+        remote_calendar.cal_obj.set_properties.assert_called_once()
+        assert remote_calendar.name == 'Projects'
+        assert to_sync == ['Projects']
+
+    def test_sweep_containers(self, container_list):
+        ReminderContainer(LocalList('Work', 'x-apple-reminder-list://1'), RemoteCalendar(calendar_name='Work'), True)
+        ReminderContainer(LocalList('Home', 'x-apple-reminder-list://2'), RemoteCalendar(calendar_name='Home'), True)
+        ReminderContainer(LocalList('Other', 'x-apple-reminder-list://3'), None, False)
+        ReminderContainer.seed_container_table()
+        ReminderContainer.persist_containers()
+
+        # The local list Home is deleted: only its row is removed, the others are kept
+        success, data = ReminderContainer.sweep_containers([LocalList('Work', 'x-apple-reminder-list://1')],
+                                                           [RemoteCalendar(calendar_name='Work'),
+                                                            RemoteCalendar(calendar_name='Home')])
+        assert success is True
+        with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            rows = connection.execute("SELECT local_name FROM tb_container ORDER BY local_name").fetchall()
+        assert rows == [('Other',), ('Work',)]
+
+        # The saved containers are stored in the generation of the sweep
+        success, generation = helpers.SyncGeneration.current('tb_container')
+        container_list.pop(1)
+        ReminderContainer.persist_containers()
+        with closing(sqlite3.connect(helpers.db_folder())) as connection:
+            rows = connection.execute("SELECT local_name, generation FROM tb_container ORDER BY id").fetchall()
+        assert rows == [('Work', generation), ('Other', generation)]
+
+    def test_sweep_reminders(self, container_list, make_reminder, make_container):
+        kept = make_reminder('Kept', 'x-apple-reminder://1')
+        deleted = make_reminder('Deleted', 'x-apple-reminder://2')
+        remote_kept = make_reminder('Kept', 'x-apple-reminder://1')
+        remote_deleted = make_reminder('Deleted', 'x-apple-reminder://2')
+        make_container([kept, deleted], [remote_kept, remote_deleted])
+        ReminderContainer.seed_reminder_table()
+        ReminderContainer.persist_reminders()
+        container_list.clear()
+
+        # The local reminder is deleted, and the remote task is renamed
+        remote_kept.name = 'Renamed'
+        container = make_container([kept], [remote_kept, remote_deleted])
+        success, generation = helpers.SyncGeneration.start('tb_reminder')
+        assert success is True
+        success, data = ReminderContainer.sweep_reminders(container, generation)
+        assert success is True
+        swept_local, swept_remote = data
+        assert [r['local_name'] for r in swept_local] == ['Deleted']
+        assert swept_remote == []
+
+        # A new generation sweeps the same row again until it is removed
+        success, generation = helpers.SyncGeneration.start('tb_reminder')
+        success, data = ReminderContainer.sweep_reminders(container, generation)
+        assert [r['local_name'] for r in data[0]] == ['Deleted']
@@ -0,0 +1,72 @@
+import datetime
+import os
+from unittest import mock
+
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
+from taskbridgeapp.notes.model.remotemanifest import RemoteNoteManifest
+
+
+class TestRemoteNoteManifest:
+
+    @staticmethod
+    def _write_note(path, content):
+        with open(path, 'w') as fp:
+            fp.write(content)
+
+    def test_load_notes(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        RemoteNoteManifest.reset_cache()
+        remote_folder = tmp_path / 'Sync'
+        remote_folder.mkdir()
+        TestRemoteNoteManifest._write_note(remote_folder / 'one.md', '# one\nFirst note\n')
+        TestRemoteNoteManifest._write_note(remote_folder / 'two.md', '# two\nSecond note\n')
+        TestRemoteNoteManifest._write_note(remote_folder / 'ignored.txt', 'Not a note\n')
+
+        parsed = []
+        create_from_remote = Note.create_from_remote
+
+        def mock_create_from_remote(remote_content, remote_location, remote_file_name, load_images=True):
+            parsed.append(remote_file_name)
+            return create_from_remote(remote_content, remote_location, remote_file_name, load_images)
+
+        with mock.patch('taskbridgeapp.notes.model.note.Note.create_from_remote', mock_create_from_remote):
+            # All notes are parsed on first load
+            success, data = RemoteNoteManifest.load_notes(remote_folder)
+            assert success is True
+            assert sorted(n.name for n in data) == ['one', 'two']
+            assert sorted(parsed) == ['one.md', 'two.md']
+
+            # Unchanged notes are served from the cache
+            parsed.clear()
+            success, data = RemoteNoteManifest.load_notes(remote_folder)
+            assert success is True
+            assert sorted(n.name for n in data) == ['one', 'two']
+            assert parsed == []
+
+            # Touched but unchanged notes are not parsed again
+            stat = os.stat(remote_folder / 'one.md')
+            os.utime(remote_folder / 'one.md', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            success, data = RemoteNoteManifest.load_notes(remote_folder)
+            assert success is True
+            assert parsed == []
+            one = next(n for n in data if n.name == 'one')
+            assert one.modified_date == datetime.datetime.fromtimestamp(os.path.getmtime(remote_folder / "one.md"))
+
+            # Changed notes are parsed again, deleted notes are dropped
+            TestRemoteNoteManifest._write_note(remote_folder / 'two.md', '# two\nSecond note, changed\n')
+            os.remove(remote_folder / 'one.md')
+            success, data = RemoteNoteManifest.load_notes(remote_folder)
+            assert success is True
+            assert [n.name for n in data] == ['two']
+            assert parsed == ['two.md']
+            assert 'changed' in data[0].body_markdown
+            assert str(remote_folder / 'one.md') not in RemoteNoteManifest.PARSED_NOTES
+
+            success, manifest = RemoteNoteManifest.load_manifest(remote_folder)
+            assert success is True
+            assert list(manifest.keys()) == [str(remote_folder / 'two.md')]
+
+        RemoteNoteManifest.reset_cache()
+        helpers.DATA_LOCATION = data_location
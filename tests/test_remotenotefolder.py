@@ -1,10 +1,14 @@
+import datetime
 from pathlib import Path
 from unittest import mock
 
 import pytest
 from decouple import config
 
+from taskbridgeapp import helpers
+from taskbridgeapp.notes.model.note import Note
 from taskbridgeapp.notes.model.notefolder import RemoteNoteFolder
+from taskbridgeapp.notes.model.remotemanifest import RemoteNoteManifest
 
 TEST_ENV = config('TEST_ENV', default='remote')
 
@@ -59,3 +63,43 @@ class TestRemoteNoteFolder:
         test_folder = RemoteNoteFolder(Path("/tmp/Test"), "Test")
         name = test_folder.__str__()
         assert name == "Remote Folder: Test"
+
+    def test_note_interface(self, tmp_path):
+        data_location = helpers.DATA_LOCATION
+        helpers.DATA_LOCATION = tmp_path / 'data'
+        RemoteNoteManifest.reset_cache()
+        test_folder = RemoteNoteFolder(tmp_path / 'Sync', 'Sync')
+        test_folder.create()
+        note = Note(name='One', created_date=datetime.datetime.now(), modified_date=datetime.datetime.now(),
+                    body_markdown='# One\nFirst note\n')
+
+        # Upsert
+        assert test_folder.is_note_unchanged(note) is False
+        success, data = test_folder.upsert_note(note)
+        assert success is True
+        assert test_folder.is_note_unchanged(note) is True
+
+        # Load
+        success, data = test_folder.load_notes()
+        assert success is True
+        assert [(n.name, n.body_markdown) for n in data] == [('One', '# One\nFirst note\n')]
+        success, data = test_folder.load_notes(summary_only=True)
+        assert success is True
+        assert [(n.name, n.body_markdown) for n in data] == [('One', '')]
+        assert test_folder.load_full_note(data[0]) == (True, data[0])
+
+        # Rename
+        success, data = test_folder.rename_note(note, 'Two')
+        assert success is True
+        assert note.name == 'Two'
+        assert sorted(p.name for p in test_folder.path.iterdir()) == ['Two.md']
+
+        # Delete
+        success, data = test_folder.delete_note(note)
+        assert success is True
+        assert list(test_folder.path.iterdir()) == []
+        success, data = test_folder.delete_note(note)
+        assert success is False
+
+        RemoteNoteManifest.reset_cache()
+        helpers.DATA_LOCATION = data_location
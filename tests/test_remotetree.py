@@ -0,0 +1,53 @@
+from taskbridgeapp.notes.model.notefolder import NoteFolder
+from taskbridgeapp.notes.model.remotetree import RemoteTreeIndex
+
+
+class TestRemoteTreeIndex:
+
+    @staticmethod
+    def _create_tree(root):
+        (root / 'Sync' / '.attachments').mkdir(parents=True)
+        (root / 'Sync' / 'Nested').mkdir()
+        (root / 'Other').mkdir()
+        (root / '.hidden').mkdir()
+        for path in ['Sync/one.md', 'Sync/two.md', 'Sync/.one.md.tbtmp', 'Sync/notes.txt', 'Sync/Nested/three.md',
+                     'Sync/.attachments/image.png', 'Other/four.md', '.hidden/five.md']:
+            with open(root / path, 'w') as fp:
+                fp.write(path)
+
+    def test_build(self, tmp_path):
+        TestRemoteTreeIndex._create_tree(tmp_path)
+        success, index = RemoteTreeIndex.build(tmp_path)
+        assert success is True
+        assert RemoteTreeIndex.CURRENT is index
+
+        # Only top level folders are note folders
+        assert sorted(index.folders.keys()) == ['Other', 'Sync']
+        sync = index.folders['Sync']
+        assert sync.path == tmp_path / 'Sync'
+        assert sorted(sync.notes.keys()) == ['one.md', 'two.md']
+        assert sync.notes['one.md'].path == str(tmp_path / 'Sync' / 'one.md')
+        assert sync.notes['one.md'].size == len('Sync/one.md')
+        assert list(sync.attachments.keys()) == ['.attachments/image.png']
+        assert list(index.folders['Other'].notes.keys()) == ['four.md']
+
+        # Folders are served from the current index, or scanned if not indexed
+        assert RemoteTreeIndex.get_folder(tmp_path / 'Sync') is sync
+        (tmp_path / 'New').mkdir()
+        with open(tmp_path / 'New' / 'six.md', 'w') as fp:
+            fp.write('six')
+        assert list(RemoteTreeIndex.get_folder(tmp_path / 'New').notes.keys()) == ['six.md']
+
+        # Fail - Folder doesn't exist
+        success, data = RemoteTreeIndex.build(tmp_path / 'bogus')
+        assert success is False
+        assert RemoteTreeIndex.CURRENT is index
+        RemoteTreeIndex.CURRENT = None
+
+    def test_load_remote_folders(self, tmp_path):
+        TestRemoteTreeIndex._create_tree(tmp_path)
+        success, folders = NoteFolder.load_remote_folders(tmp_path)
+        assert success is True
+        assert sorted((folder.name, folder.path) for folder in folders) == [
+            ('Other', tmp_path / 'Other'), ('Sync', tmp_path / 'Sync')]
+        RemoteTreeIndex.CURRENT = None
@@ -0,0 +1,78 @@
+import threading
+
+from taskbridgeapp.notes.watcher import RemoteNoteWatcher
+
+
+class TestRemoteNoteWatcher:
+
+    def test_mark_dirty(self, tmp_path):
+        flushed = []
+        watcher = RemoteNoteWatcher(tmp_path, flushed.append, debounce=60)
+
+        watcher.mark_dirty(str(tmp_path / 'Sync' / 'one.md'))
+        watcher.mark_dirty(str(tmp_path / 'Sync' / 'one.md'))
+        watcher.mark_dirty(str(tmp_path / 'Sync' / 'two.md'))
+        watcher.mark_dirty(str(tmp_path / 'Sync' / '.one.md.swp'))
+        watcher.mark_dirty(str(tmp_path / 'Sync' / 'notes.txt'))
+        watcher.mark_dirty(str(tmp_path / 'Other' / '.attachments' / 'image.png'))
+        watcher.mark_dirty(str(tmp_path / '.hidden' / 'three.md'))
+        watcher.mark_dirty('/elsewhere/Sync/one.md')
+
+        # Events are coalesced until the debounce period passes
+        assert flushed == []
+        watcher.flush()
+        assert flushed == [{'Sync': {'one', 'two'}, 'Other': set()}]
+        assert watcher.dirty == {}
+
+        # Nothing is flushed when there are no changes
+        watcher.flush()
+        assert len(flushed) == 1
+        watcher.stop()
+
+    def test_queue_while_syncing(self, tmp_path):
+        flushed = []
+
+        def callback(dirty):
+            flushed.append(dirty)
+            if len(flushed) == 1:
+                # Changes made while synchronising are queued
+                watcher.mark_dirty(str(tmp_path / 'Sync' / 'two.md'))
+                assert watcher.dirty == {}
+
+        watcher = RemoteNoteWatcher(tmp_path, callback, debounce=60)
+        watcher.mark_dirty(str(tmp_path / 'Sync' / 'one.md'))
+        watcher.flush()
+        assert flushed == [{'Sync': {'one'}}]
+
+        # The queued changes are synchronised once the callback returns
+        assert watcher.dirty == {'Sync': {'two'}} and watcher.pending == {}
+        watcher.flush()
+        assert flushed == [{'Sync': {'one'}}, {'Sync': {'two'}}]
+        watcher.stop()
+
+    def test_polling(self, tmp_path):
+        (tmp_path / 'Sync').mkdir()
+        with open(tmp_path / 'Sync' / 'one.md', 'w') as fp:
+            fp.write('# one\n')
+
+        flushed = []
+        done = threading.Event()
+
+        def callback(dirty):
+            flushed.append(dirty)
+            if len(flushed) == 1:
+                # Writes made while synchronising are synchronised afterwards
+                with open(tmp_path / 'Sync' / 'one.md', 'a') as fp:
+                    fp.write('Synchronised\n')
+            else:
+                done.set()
+
+        watcher = RemoteNoteWatcher(tmp_path, callback, debounce=0.1, poll_interval=0.05, use_polling=True)
+        watcher.start()
+        with open(tmp_path / 'Sync' / 'two.md', 'w') as fp:
+            fp.write('# two\n')
+        assert done.wait(5)
+        done.clear()
+        assert not done.wait(0.5)
+        watcher.stop()
+        assert flushed == [{'Sync': {'two'}}, {'Sync': {'one'}}]